@@ -10,6 +10,7 @@ import time
 
 from ccmlib.node import handle_external_tool_process
 from dtest import Tester
+from tools.stress import run_stress
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -26,7 +27,7 @@ class TestAuditlog(Tester):
                                                                             'archive_command':'%s %%path'%(move_script)}})
         cluster.populate(1).start(wait_for_binary_proto=True)
         node = cluster.nodelist()[0]
-        node.stress(['write', 'n=100k', "no-warmup", "cl=ONE", "-rate", "threads=300"])
+        run_stress(node, ['write', 'n=100k', "no-warmup", "cl=ONE", "-rate", "threads=300"])
         node.nodetool("disableauditlog")
         assert len(os.listdir(moved_log_dir)) > 0
         for f in os.listdir(log_dir):
@@ -41,7 +42,7 @@ class TestAuditlog(Tester):
         cluster.populate(1).start(wait_for_binary_proto=True)
         node = cluster.nodelist()[0]
         node.nodetool("enablefullquerylog --archive-command \"%s %%path\" --roll-cycle=TEST_SECONDLY"%move_script)
-        node.stress(['write', 'n=100k', "no-warmup", "cl=ONE", "-rate", "threads=300"])
+        run_stress(node, ['write', 'n=100k', "no-warmup", "cl=ONE", "-rate", "threads=300"])
         # make sure at least one file has been rolled and archived:
         assert node.grep_log("Executing archive command", filename="debug.log")
         assert len(os.listdir(moved_log_dir)) > 0
@@ -61,7 +62,7 @@ class TestAuditlog(Tester):
         cluster.populate(1).start(wait_for_binary_proto=True)
         node = cluster.nodelist()[0]
         node.nodetool("enablefullquerylog")
-        node.stress(['write', 'n=100k', "no-warmup", "cl=ONE", "-rate", "threads=300"])
+        run_stress(node, ['write', 'n=100k', "no-warmup", "cl=ONE", "-rate", "threads=300"])
         # make sure at least one file has been rolled and archived:
         assert node.grep_log("Executing archive command", filename="debug.log")
         assert len(os.listdir(moved_log_dir)) > 0
@@ -9,6 +9,7 @@ from cassandra.query import SimpleStatement
 from dtest import Tester, create_ks
 from tools.assertions import (assert_all, assert_invalid, assert_one,
                               assert_unavailable)
+from tools.byteman import byteman_submit
 from tools.jmxutils import (JolokiaAgent, make_mbean,
                             remove_perf_disable_shared_mem)
 
@@ -373,7 +374,7 @@ class TestBatch(Tester):
                                      protocol_version=protocol_version, install_byteman=True)
 
         coordinator = self.cluster.nodelist()[coordinator_idx]
-        coordinator.byteman_submit(['./byteman/fail_after_batchlog_write.btm'])
+        byteman_submit(coordinator, ['./byteman/fail_after_batchlog_write.btm'])
         logger.debug("Injected byteman scripts to enable batchlog replay {}".format(coordinator.name))
 
         query = """
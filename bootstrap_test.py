@@ -18,17 +18,17 @@ import pytest
 from dtest import Tester, create_ks, create_cf, data_size
 from tools.assertions import (assert_almost_equal, assert_bootstrap_state, assert_not_running,
                               assert_one, assert_stderr_clean)
+from tools.byteman import byteman_submit, versioned_script
 from tools.data import query_c1c2
 from tools.intervention import InterruptBootstrap, KillOnBootstrap
 from tools.misc import new_node
 from tools.misc import generate_ssl_stores
+from tools.stress import run_stress
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
 
 class TestBootstrap(Tester):
-    byteman_submit_path_pre_4_0 = './byteman/pre4.0/stream_failure.btm'
-    byteman_submit_path_4_0 = './byteman/4.0/stream_failure.btm'
 
     @pytest.fixture(autouse=True)
     def fixture_add_additional_log_patterns(self, fixture_dtest_setup):
@@ -180,13 +180,13 @@ class TestBootstrap(Tester):
         cluster.start(wait_other_notice=True)
 
         # Create more than one sstable larger than 1MB
-        node1.stress(['write', 'n=1K', '-rate', 'threads=8', '-schema',
-                      'compaction(strategy=SizeTieredCompactionStrategy, enabled=false)'])
+        run_stress(node1, ['write', 'n=1K', '-rate', 'threads=8', '-schema',
+                           'compaction(strategy=SizeTieredCompactionStrategy, enabled=false)'])
         cluster.flush()
 
         logger.debug("Submitting byteman script to {} to".format(node1.name))
         # Sleep longer than streaming_socket_timeout_in_ms to make sure the node will not be killed
-        node1.byteman_submit(['./byteman/stream_5s_sleep.btm'])
+        byteman_submit(node1, ['./byteman/stream_5s_sleep.btm'])
 
         # Bootstraping a new node with very small streaming_socket_timeout_in_ms
         node2 = new_node(cluster)
@@ -226,7 +226,7 @@ class TestBootstrap(Tester):
         cluster.start()
 
         node1 = cluster.nodes['node1']
-        node1.stress(['write', 'n=10K', 'no-warmup', '-rate', 'threads=8', '-schema', 'replication(factor=2)'])
+        run_stress(node1, ['write', 'n=10K', 'no-warmup', '-rate', 'threads=8', '-schema', 'replication(factor=2)'])
 
         session = self.patient_cql_connection(node1)
         stress_table = 'keyspace1.standard1'
@@ -273,7 +273,7 @@ class TestBootstrap(Tester):
 
         cluster.start()
 
-        node1.stress(['write', 'n=10K', 'no-warmup', '-rate', 'threads=8', '-schema', 'replication(factor={})'.format(rf)])
+        run_stress(node1, ['write', 'n=10K', 'no-warmup', '-rate', 'threads=8', '-schema', 'replication(factor={})'.format(rf)])
 
         # change system_auth keyspace to 2 (default is 1) to avoid
         # "Unable to find sufficient sources for streaming" warning
@@ -324,11 +324,8 @@ class TestBootstrap(Tester):
 
         cluster.start(wait_other_notice=True)
         # kill stream to node3 in the middle of streaming to let it fail
-        if cluster.version() < '4.0':
-            node1.byteman_submit([self.byteman_submit_path_pre_4_0])
-        else:
-            node1.byteman_submit([self.byteman_submit_path_4_0])
-        node1.stress(['write', 'n=1K', 'no-warmup', 'cl=TWO', '-schema', 'replication(factor=2)', '-rate', 'threads=50'])
+        byteman_submit(node1, [versioned_script('stream_failure.btm', cluster.version())])
+        run_stress(node1, ['write', 'n=1K', 'no-warmup', 'cl=TWO', '-schema', 'replication(factor=2)', '-rate', 'threads=50'])
         cluster.flush()
 
         # start bootstrapping node3 and wait for streaming
@@ -348,7 +345,7 @@ class TestBootstrap(Tester):
 
         logger.debug("Check data is present")
         # Let's check stream bootstrap completely transferred data
-        stdout, stderr, _ = node3.stress(['read', 'n=1k', 'no-warmup', '-schema', 'replication(factor=2)', '-rate', 'threads=8'])
+        stdout, stderr, _ = run_stress(node3, ['read', 'n=1k', 'no-warmup', '-schema', 'replication(factor=2)', '-rate', 'threads=8'])
 
         if stdout is not None:
             assert "FAILURE" not in stdout
@@ -361,7 +358,7 @@ class TestBootstrap(Tester):
         cluster.populate(2).start(wait_other_notice=True)
 
         node1 = cluster.nodes['node1']
-        node1.stress(['write', 'n=100K', '-schema', 'replication(factor=2)'])
+        run_stress(node1, ['write', 'n=100K', '-schema', 'replication(factor=2)'])
         node1.flush()
 
         # kill node1 in the middle of streaming to let it fail
@@ -399,8 +396,8 @@ class TestBootstrap(Tester):
         cluster.populate(2).start(wait_other_notice=True)
         (node1, node2) = cluster.nodelist()
 
-        node1.stress(['write', 'n=1K', 'no-warmup', '-schema', 'replication(factor=2)',
-                      '-rate', 'threads=1', '-pop', 'dist=UNIFORM(1..1000)'])
+        run_stress(node1, ['write', 'n=1K', 'no-warmup', '-schema', 'replication(factor=2)',
+                           '-rate', 'threads=1', '-pop', 'dist=UNIFORM(1..1000)'])
 
         session = self.patient_exclusive_cql_connection(node2)
         stress_table = 'keyspace1.standard1'
@@ -451,17 +448,17 @@ class TestBootstrap(Tester):
         with tempfile.NamedTemporaryFile(mode='w+') as stress_config:
             stress_config.write(yaml_config)
             stress_config.flush()
-            node1.stress(['user', 'profile=' + stress_config.name, 'n=2M', 'no-warmup',
-                          'ops(insert=1)', '-rate', 'threads=50'])
+            run_stress(node1, ['user', 'profile=' + stress_config.name, 'n=2M', 'no-warmup',
+                               'ops(insert=1)', '-rate', 'threads=50'])
 
             node3 = new_node(cluster, data_center='dc2')
             node3.start(no_wait=True)
             time.sleep(3)
 
-            out, err, _ = node1.stress(['user', 'profile=' + stress_config.name, 'ops(insert=1)',
-                                        'n=500K', 'no-warmup', 'cl=LOCAL_QUORUM',
-                                        '-rate', 'threads=5',
-                                        '-errors', 'retries=2'])
+            out, err, _ = run_stress(node1, ['user', 'profile=' + stress_config.name, 'ops(insert=1)',
+                                             'n=500K', 'no-warmup', 'cl=LOCAL_QUORUM',
+                                             '-rate', 'threads=5',
+                                             '-errors', 'retries=2'])
 
         logger.debug(out)
         assert_stderr_clean(err)
@@ -490,7 +487,7 @@ class TestBootstrap(Tester):
 
         # write some data
         node1 = cluster.nodelist()[0]
-        node1.stress(['write', 'n=10K', 'no-warmup', '-rate', 'threads=8'])
+        run_stress(node1, ['write', 'n=10K', 'no-warmup', '-rate', 'threads=8'])
 
         session = self.patient_cql_connection(node1)
         original_rows = list(session.execute("SELECT * FROM {}".format(stress_table,)))
@@ -523,7 +520,7 @@ class TestBootstrap(Tester):
 
         # write some data
         node1 = cluster.nodelist()[0]
-        node1.stress(['write', 'n=10K', 'no-warmup', '-rate', 'threads=8'])
+        run_stress(node1, ['write', 'n=10K', 'no-warmup', '-rate', 'threads=8'])
 
         session = self.patient_cql_connection(node1)
         original_rows = list(session.execute("SELECT * FROM {}".format(stress_table,)))
@@ -602,7 +599,7 @@ class TestBootstrap(Tester):
 
         # write some data, enough for the bootstrap to fail later on
         node1 = cluster.nodelist()[0]
-        node1.stress(['write', 'n=100K', 'no-warmup', '-rate', 'threads=8'])
+        run_stress(node1, ['write', 'n=100K', 'no-warmup', '-rate', 'threads=8'])
         node1.flush()
 
         session = self.patient_cql_connection(node1)
@@ -648,8 +645,8 @@ class TestBootstrap(Tester):
 
         node1, = cluster.nodelist()
 
-        node1.stress(['write', 'n=500K', 'no-warmup', '-schema', 'replication(factor=1)',
-                      '-rate', 'threads=10'])
+        run_stress(node1, ['write', 'n=500K', 'no-warmup', '-schema', 'replication(factor=1)',
+                           '-rate', 'threads=10'])
 
         node2 = new_node(cluster)
         node2.start(wait_other_notice=True)
@@ -684,7 +681,7 @@ class TestBootstrap(Tester):
         cluster.start(wait_for_binary_proto=True)
         node1, = cluster.nodelist()
         for x in range(0, 5):
-            node1.stress(['write', 'n=100k', 'no-warmup', '-schema', 'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)', 'replication(factor=1)', '-rate', 'threads=10'])
+            run_stress(node1, ['write', 'n=100k', 'no-warmup', '-schema', 'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)', 'replication(factor=1)', '-rate', 'threads=10'])
             node1.flush()
         node2 = new_node(cluster)
         node2.start(wait_for_binary_proto=True, wait_other_notice=True)
@@ -742,11 +739,8 @@ class TestBootstrap(Tester):
 
         cluster.start(wait_other_notice=True)
         # kill stream to node2 in the middle of streaming to let it fail
-        if cluster.version() < '4.0':
-            node1.byteman_submit([self.byteman_submit_path_pre_4_0])
-        else:
-            node1.byteman_submit([self.byteman_submit_path_4_0])
-        node1.stress(['write', 'n=1K', 'no-warmup', 'cl=ONE', '-schema', 'replication(factor=3)', '-rate', 'threads=50', '-mode', 'native', 'cql3', 'user=cassandra', 'password=cassandra'])
+        byteman_submit(node1, [versioned_script('stream_failure.btm', cluster.version())])
+        run_stress(node1, ['write', 'n=1K', 'no-warmup', 'cl=ONE', '-schema', 'replication(factor=3)', '-rate', 'threads=50', '-mode', 'native', 'cql3', 'user=cassandra', 'password=cassandra'])
         cluster.flush()
 
         # start bootstrapping node2 and wait for streaming
@@ -773,12 +767,9 @@ class TestBootstrap(Tester):
         node3.set_configuration_options(values=config)
 
         # kill stream to node3 in the middle of streaming to let it fail
-        if cluster.version() < '4.0':
-            node1.byteman_submit([self.byteman_submit_path_pre_4_0])
-            node2.byteman_submit([self.byteman_submit_path_pre_4_0])
-        else:
-            node1.byteman_submit([self.byteman_submit_path_4_0])
-            node2.byteman_submit([self.byteman_submit_path_4_0])
+        script = versioned_script('stream_failure.btm', cluster.version())
+        byteman_submit(node1, [script])
+        byteman_submit(node2, [script])
         node3.start(jvm_args=["-Dcassandra.write_survey=true", "-Dcassandra.ring_delay_ms=5000"], wait_other_notice=True)
         self.assert_log_had_msg(node3, 'Some data streaming failed', timeout=30)
         self.assert_log_had_msg(node3, "Not starting client transports in write_survey mode as it's bootstrapping or auth is enabled", timeout=30)
@@ -17,6 +17,7 @@ from parse import parse
 from dtest import Tester, create_ks
 from tools.assertions import (assert_almost_equal, assert_none, assert_one, assert_lists_equal_ignoring_order)
 from tools.data import rows_to_list
+from tools.stress import run_stress
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -112,7 +113,7 @@ class TestCommitLog(Tester):
         self.prepare(configuration=conf, create_test_keyspace=False)
 
         segment_size = segment_size_in_mb * 1024 * 1024
-        self.node1.stress(['write', 'n=150k', 'no-warmup', '-rate', 'threads=25'])
+        run_stress(self.node1, ['write', 'n=150k', 'no-warmup', '-rate', 'threads=25'])
         time.sleep(1)
 
         commitlogs = self._get_commitlog_files()
@@ -11,6 +11,7 @@ import logging
 
 from dtest import Tester, create_ks
 from tools.assertions import assert_length_equal, assert_none, assert_one
+from tools.stress import run_stress
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -123,9 +124,9 @@ class TestCompaction(Tester):
         [node1] = cluster.nodelist()
 
         for x in range(0, 5):
-            node1.stress(['write', 'n=100K', "no-warmup", "cl=ONE", "-rate",
-                          "threads=300", "-schema", "replication(factor=1)",
-                          "compaction({},enabled=false)".format(strategy_string)])
+            run_stress(node1, ['write', 'n=100K', "no-warmup", "cl=ONE", "-rate",
+                               "threads=300", "-schema", "replication(factor=1)",
+                               "compaction({},enabled=false)".format(strategy_string)])
             node1.flush()
 
         node1.nodetool('enableautocompaction')
@@ -583,4 +584,4 @@ def get_random_word(wordLen, population=string.ascii_letters + string.digits):
 
 
 def stress_write(node, keycount=100000):
-    node.stress(['write', 'n={keycount}'.format(keycount=keycount)])
+    run_stress(node, ['write', 'n={keycount}'.format(keycount=keycount)])
@@ -13,6 +13,9 @@ from cassandra.concurrent import execute_concurrent
 from ccmlib.node import Node
 
 from dtest import Tester, create_ks
+from tools.benchmark import BenchmarkResults
+from tools.git import cassandra_git_sha
+from tools.schema import SchemaAgreementWaiter
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -147,7 +150,8 @@ class TestConcurrentSchemaChanges(Tester):
         for (success, result) in results:
             assert success, "didn't get success on table create: {}".format(result)
 
-        wait(10)
+        with SchemaAgreementWaiter(session) as waiter:
+            logger.debug("tables propagated after {:.3f}s".format(waiter.wait()))
 
         session.cluster.refresh_schema_metadata()
         table_meta = session.cluster.metadata.keyspaces["lots_o_tables"].tables
@@ -180,7 +184,8 @@ class TestConcurrentSchemaChanges(Tester):
             assert success, "didn't get success on table create: {}".format(result)
 
         logger.debug("waiting for alters to propagate")
-        wait(30)
+        with SchemaAgreementWaiter(session) as waiter:
+            logger.debug("alters propagated after {:.3f}s".format(waiter.wait()))
 
         session.cluster.refresh_schema_metadata()
         table_meta = session.cluster.metadata.keyspaces["lots_o_alters"].tables
@@ -223,7 +228,8 @@ class TestConcurrentSchemaChanges(Tester):
         wait(5)
 
         logger.debug("validating schema and index list")
-        session.cluster.control_connection.wait_for_schema_agreement()
+        with SchemaAgreementWaiter(session) as waiter:
+            waiter.wait()
         session.cluster.refresh_schema_metadata()
         index_meta = session.cluster.metadata.keyspaces["lots_o_indexes"].indexes
         self.validate_schema_consistent(node1)
@@ -261,10 +267,11 @@ class TestConcurrentSchemaChanges(Tester):
             session.execute(insert_stmt, [n] * 10)
 
         wait(10)
-        for n in range(1, 11):
-            session.execute(("CREATE MATERIALIZED VIEW src_by_c{0} AS SELECT * FROM source_data "
-                             "WHERE c{0} IS NOT NULL AND id IS NOT NULL PRIMARY KEY (c{0}, id)".format(n)))
-            session.cluster.control_connection.wait_for_schema_agreement()
+        with SchemaAgreementWaiter(session) as waiter:
+            for n in range(1, 11):
+                waiter.execute(("CREATE MATERIALIZED VIEW src_by_c{0} AS SELECT * FROM source_data "
+                                "WHERE c{0} IS NOT NULL AND id IS NOT NULL PRIMARY KEY (c{0}, id)".format(n)))
+        logger.debug("views time to agreement: {}".format(waiter.stats()))
 
         logger.debug("waiting for indexes to fill in")
         wait(60)
@@ -295,7 +302,8 @@ class TestConcurrentSchemaChanges(Tester):
             assert success, "didn't get success: {}".format(result)
 
     def _verify_lots_of_schema_actions(self, session):
-        session.cluster.control_connection.wait_for_schema_agreement()
+        with SchemaAgreementWaiter(session) as waiter:
+            waiter.wait()
 
         # the above should guarentee this -- but to be sure
         node1, node2, node3 = self.cluster.nodelist()
@@ -578,3 +586,34 @@ class TestConcurrentSchemaChanges(Tester):
         session.execute('CREATE TABLE standard1 (KEY text PRIMARY KEY)')
 
         tcompact.join()
+
+
+class TestSchemaPropagation(Tester):
+
+    @pytest.mark.benchmark
+    def test_schema_propagation_benchmark(self):
+        """
+        Measure the time taken by schema changes to reach every node of a 3 nodes cluster,
+        record it in the schema_propagation benchmark results and fail if the median time to
+        agreement regressed by more than 25% compared with the last run of a different Cassandra build.
+        """
+        cluster = self.cluster
+        cluster.populate(3).start(wait_for_binary_proto=True)
+        node1 = cluster.nodelist()[0]
+        session = self.patient_cql_connection(node1)
+
+        with SchemaAgreementWaiter(session) as waiter:
+            waiter.execute("CREATE KEYSPACE propagation WITH replication = {'class': 'SimpleStrategy', 'replication_factor': 3}")
+            for n in range(20):
+                waiter.execute("CREATE TABLE propagation.t_{0} (id int PRIMARY KEY, c1 int)".format(n))
+            for n in range(20):
+                waiter.execute("ALTER TABLE propagation.t_{0} ADD c2 text".format(n))
+            for n in range(20):
+                waiter.execute("DROP TABLE propagation.t_{0}".format(n))
+
+        results = BenchmarkResults('schema_propagation', cassandra_version=cluster.version(),
+                                   build_sha=cassandra_git_sha(node1.get_install_dir()))
+        record = results.record('test_schema_propagation_benchmark', {'nodes': 3}, waiter.stats())
+        regressions = results.compare_with_baseline(['median_time_to_agreement'], records=[record],
+                                                    tolerance=0.25, higher_is_better=False)
+        assert not regressions, 'Schema propagation regressed: {}'.format(regressions)
@@ -24,6 +24,12 @@ from ccmlib.common import validate_install_dir, is_win, get_version_from_build
 from dtest_config import DTestConfig
 from dtest_setup import DTestSetup
 from dtest_setup_overrides import DTestSetupOverrides
+from tools import load_generator
+from tools.jmx_nodetool import nodetool_stats
+from tools.metric_sampler import MetricSampler
+from tools.sleep_profiler import SleepProfiler
+from tools.stress import stress_recorder
+from tools.wait import wait_stats
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +84,24 @@ def pytest_addoption(parser):
                      help="Enable JaCoCo Code Coverage Support")
     parser.addoption("--upgrade-version-selection", action="store", default="indev",
                      help="Specify whether to run indev, releases, or both")
+    parser.addoption("--execute-benchmark-tests", action="store_true", default=False,
+                     help="Execute benchmark tests (e.g. tests annotated with the benchmark mark), which record "
+                          "their measurements in the benchmarks directory of the dtests (or "
+                          "$BENCHMARK_RESULTS_DIR) and flag regressions against measurements of previous builds")
+    parser.addoption("--profile-sleeps", action="store_true", default=False,
+                     help="Record the time spent in time.sleep by each test and each call site, and report "
+                          "the largest totals at the end of the session")
+    parser.addoption("--sample-jmx-metrics", action="store", type=float, default=None, metavar="INTERVAL",
+                     help="Sample the JMX metrics of every node through Jolokia every INTERVAL seconds during "
+                          "each test, save them next to the logs of the test and record their peak and "
+                          "percentile values in the JUnit report")
+    parser.addoption("--record-stress-results", action="store_true", default=False,
+                     help="Parse the summary of the cassandra-stress runs of each test, record it in the "
+                          "benchmarks directory and warn about throughput or latency regressions against "
+                          "the runs of a previous build")
+    parser.addoption("--disable-in-process-stress", action="store_true", default=False,
+                     help="Always run cassandra-stress, instead of running small write and read workloads "
+                          "through the driver from the test process")
 
 
 def sufficient_system_resources_for_resource_intensive_tests():
@@ -256,6 +280,7 @@ def copy_logs(request, cluster, directory=None, name=None):
             os.unlink(name)
         if not is_win():
             os.symlink(basedir, name)
+        return logdir
 
 
 def reset_environment_vars(initial_environment):
@@ -293,6 +318,12 @@ def fixture_dtest_setup(request,
     if not dtest_config.disable_active_log_watching:
         dtest_setup.begin_active_log_watch()
 
+    metric_sampler = None
+    if dtest_config.sample_jmx_metrics:
+        # Jolokia can't attach to nodes started with -XX:+PerfDisableSharedMem, the environment is reset after the test
+        os.environ['JVM_EXTRA_OPTS'] = (os.environ.get('JVM_EXTRA_OPTS', '') + ' -XX:-PerfDisableSharedMem').strip()
+        metric_sampler = MetricSampler(dtest_setup.cluster, interval=dtest_config.sample_jmx_metrics).start()
+
     # at this point we're done with our setup operations in this fixture
     # yield to allow the actual test to run
     yield dtest_setup
@@ -300,9 +331,24 @@ def fixture_dtest_setup(request,
     # phew! we're back after executing the test, now we need to do
     # all of our teardown and cleanup operations
 
+    if metric_sampler is not None:
+        metric_sampler.stop()
+        for name, value in metric_sampler.summary_properties():
+            request.node.user_properties.append((name, value))
+
     reset_environment_vars(initial_environment)
     dtest_setup.jvm_args = []
 
+    for site, (waits, timeouts, seconds) in sorted(wait_stats.by_site(test=request.node.nodeid).items()):
+        logger.debug("Waited {:.1f}s in {} wait(s) at {}, {} timed out".format(seconds, waits, site, timeouts))
+    avoided, launched = nodetool_stats.by_test().get(request.node.nodeid, (0, 0))
+    if avoided:
+        logger.debug("Ran {} nodetool command(s) through JMX, launched nodetool {} time(s)".format(avoided, launched))
+    if stress_recorder.enabled:
+        # regressions are logged as warnings
+        stress_recorder.regressions(test=request.node.nodeid)
+
+    dtest_setup.close_cqlsh_sessions()
     for con in dtest_setup.connections:
         con.cluster.shutdown()
     dtest_setup.connections = []
@@ -319,7 +365,9 @@ def fixture_dtest_setup(request,
         try:
             # save the logs for inspection
             if failed or not dtest_config.delete_logs:
-                copy_logs(request, dtest_setup.cluster)
+                log_dir = copy_logs(request, dtest_setup.cluster)
+                if metric_sampler is not None and log_dir is not None:
+                    metric_sampler.write(log_dir)
         except Exception as e:
             logger.error("Error saving log:", str(e))
         finally:
@@ -424,6 +472,38 @@ def dtest_config(request):
     yield dtest_config
 
 
+def pytest_configure(config):
+    # waits are reported per test, don't carry them over from an earlier session in the same process
+    wait_stats.reset()
+    if config.getoption("--profile-sleeps", default=False):
+        config._sleep_profiler = SleepProfiler().install()
+    if config.getoption("--record-stress-results", default=False):
+        stress_recorder.enable()
+    if config.getoption("--disable-in-process-stress", default=False):
+        load_generator.IN_PROCESS_MAX_OPERATIONS = 0
+
+
+def pytest_collection_finish(session):
+    profiler = getattr(session.config, '_sleep_profiler', None)
+    if profiler is not None:
+        # test modules are only imported during collection
+        profiler.patch_modules(str(session.config.rootdir))
+
+
+def pytest_terminal_summary(terminalreporter):
+    profiler = getattr(terminalreporter.config, '_sleep_profiler', None)
+    if profiler is not None:
+        terminalreporter.section("sleep profile")
+        for line in profiler.report():
+            terminalreporter.write_line(line)
+
+
+def pytest_unconfigure(config):
+    profiler = getattr(config, '_sleep_profiler', None)
+    if profiler is not None:
+        profiler.uninstall()
+
+
 def pytest_collection_modifyitems(items, config):
     """
     This function is called upon during the pytest test collection phase and allows for modification
@@ -493,6 +573,10 @@ def pytest_collection_modifyitems(items, config):
             if not config.getoption("--execute-upgrade-tests"):
                 deselect_test = True
 
+        if item.get_closest_marker("benchmark"):
+            if not config.getoption("--execute-benchmark-tests"):
+                deselect_test = True
+
         if item.get_closest_marker("no_offheap_memtables"):
             if config.getoption("use_off_heap_memtables"):
                 deselect_test = True
@@ -8,6 +8,7 @@ from cassandra import ConsistencyLevel
 from cassandra.query import SimpleStatement
 
 from tools.assertions import assert_invalid, assert_length_equal, assert_one
+from tools.columnar import assert_column_values, assert_columns_equal, fetch_columns
 from dtest import Tester, create_ks, create_cf
 from tools.data import rows_to_list
 
@@ -150,12 +151,10 @@ class TestCounters(Tester):
             session = sessions[i % len(nodes)]
             keys = ",".join(["'counter%i'" % c for c in range(0, nb_counter)])
             query = SimpleStatement("SELECT key, c FROM cf WHERE key IN (%s)" % keys, consistency_level=ConsistencyLevel.QUORUM)
-            res = list(session.execute(query))
+            columns = fetch_columns(session, query)
 
-            assert_length_equal(res, nb_counter)
-            for c in range(0, nb_counter):
-                assert len(res[c]) == 2, "Expecting key and counter for counter {}, got {}".format(c, str(res[c]))
-                assert res[c][1] == i + 1, "Expecting counter {} = {}, got {}".format(c, i + 1, res[c][0])
+            assert_length_equal(columns['key'], nb_counter)
+            assert_columns_equal(columns['c'], i + 1, keys=columns['key'])
 
     def test_upgrade(self):
         """ Test for bug of #4436 """
@@ -193,11 +192,9 @@ class TestCounters(Tester):
         def check(i):
             session = self.patient_cql_connection(nodes[0], keyspace='ks')
             query = SimpleStatement("SELECT * FROM counterTable", consistency_level=ConsistencyLevel.QUORUM)
-            rows = list(session.execute(query))
+            columns = fetch_columns(session, query)
 
-            assert len(rows) == len(keys), "Expected {} rows, got {}: {}".format(len(keys), len(rows), str(rows))
-            for row in rows:
-                assert row[1], i * updates == "Unexpected value {}".format(str(row))
+            assert_column_values(columns, 'k', 'c', dict((k, i * updates) for k in keys))
 
         def rolling_restart():
             # Rolling restart
@@ -289,19 +286,14 @@ class TestCounters(Tester):
             counter[counter_id]['counter_two'] += 5
 
         # let's verify the counts are correct, using CL.ALL
-        for counter_dict in counters:
-            counter_id = list(counter_dict.keys())[0]
-
-            query = SimpleStatement("""
-                SELECT counter_one, counter_two
-                FROM counter_table WHERE id = {uuid}
-                """.format(uuid=counter_id), consistency_level=ConsistencyLevel.ALL)
-            rows = list(session.execute(query))
-
-            counter_one_actual, counter_two_actual = rows[0]
-
-            assert counter_one_actual == counter_dict[counter_id]['counter_one']
-            assert counter_two_actual == counter_dict[counter_id]['counter_two']
+        query = SimpleStatement("SELECT id, counter_one, counter_two FROM counter_table",
+                                consistency_level=ConsistencyLevel.ALL)
+        columns = fetch_columns(session, query)
+
+        for column in ('counter_one', 'counter_two'):
+            expected = dict((uuid.UUID(counter_id), values[column])
+                            for counter_dict in counters for counter_id, values in counter_dict.items())
+            assert_column_values(columns, 'id', column, expected)
 
     def test_multi_counter_update(self):
         """
@@ -1,9 +1,22 @@
 import csv
+import datetime
+import json
+import os
 import random
+import re
+import shutil
+import string
+import tempfile
+import uuid
+import zlib
+
+from collections import Counter
+from multiprocessing import Pool
 
 import cassandra
 
 from cassandra.cluster import ResultSet
+from cassandra.util import uuid_from_time
 from typing import List
 
 
@@ -25,13 +38,135 @@ def csv_rows(filename, delimiter=None):
             yield row
 
 
-def assert_csvs_items_equal(filename1, filename2):
+# approximate number of bytes of encoded items held in memory per partition when diffing
+DIFF_PARTITION_BYTES = 64 * 1024 * 1024
+
+
+def _partition_items(items, partition_files):
+    """
+    Spread items over partition_files by hashing their json encoding, so that equal
+    items always land in the same partition. Returns the number of items written.
+    """
+    count = 0
+    for item in items:
+        encoded = json.dumps(item)
+        partition_files[zlib.crc32(encoded.encode('utf-8')) % len(partition_files)].write(encoded + '\n')
+        count += 1
+    return count
+
+
+def _read_partition(f):
+    f.seek(0)
+    return Counter(line.rstrip('\n') for line in f)
+
+
+def diff_items(items_x, items_y, num_partitions=1, max_diffs=10):
+    """
+    Compare two iterables of json-serializable items without regard to order, counting duplicates.
+
+    With num_partitions > 1 the items are first hash-partitioned into temporary files and each pair
+    of partitions is compared in turn, so at most one partition of each side is held in memory.
+    Items are only ever consumed once, which means generators such as csv readers or driver
+    result sets can be passed in directly.
+
+    @return a tuple (count_x, count_y, diffs) where diffs is a list of at most max_diffs tuples
+            (side, item, count), side being 0 for items only found in items_x and 1 for items
+            only found in items_y.
+    """
+    diffs = []
+
+    def add_diffs(counts_x, counts_y):
+        for side, (a, b) in enumerate(((counts_x, counts_y), (counts_y, counts_x))):
+            for encoded, count in (a - b).items():
+                if len(diffs) >= max_diffs:
+                    return
+                diffs.append((side, json.loads(encoded), count))
+
+    if num_partitions <= 1:
+        counts_x = Counter(json.dumps(item) for item in items_x)
+        counts_y = Counter(json.dumps(item) for item in items_y)
+        add_diffs(counts_x, counts_y)
+        return sum(counts_x.values()), sum(counts_y.values()), diffs
+
+    tmpdir = tempfile.mkdtemp(prefix='csvdiff')
+    try:
+        files_x = [open(os.path.join(tmpdir, 'x{}'.format(i)), 'w+') for i in range(num_partitions)]
+        files_y = [open(os.path.join(tmpdir, 'y{}'.format(i)), 'w+') for i in range(num_partitions)]
+        try:
+            count_x = _partition_items(items_x, files_x)
+            count_y = _partition_items(items_y, files_y)
+            for fx, fy in zip(files_x, files_y):
+                add_diffs(_read_partition(fx), _read_partition(fy))
+                if len(diffs) >= max_diffs:
+                    break
+        finally:
+            for f in files_x + files_y:
+                f.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    return count_x, count_y, diffs
+
+
+def _num_partitions_for(total_size):
+    return int(total_size // DIFF_PARTITION_BYTES) + 1
+
+
+def _format_diffs(labels, count_x, count_y, diffs):
+    msg = ['{} has {} items, {} has {} items'.format(labels[0], count_x, labels[1], count_y)]
+    for side, item, count in diffs:
+        msg.append('only in {} ({} times): {}'.format(labels[side], count, item))
+    return '\n'.join(msg)
+
+
+def assert_csvs_items_equal(filename1, filename2, max_diffs=10):
+    """
+    Assert two files contain the same lines, in any order.
+
+    Large files are compared by hash-partitioning their lines into temporary files
+    (see diff_items) so that memory usage stays bounded. On failure, up to
+    max_diffs differing lines are reported.
+    """
+    num_partitions = _num_partitions_for(os.path.getsize(filename1) + os.path.getsize(filename2))
     with open(filename1, 'r') as x, open(filename2, 'r') as y:
-        list_x = list(x.readlines())
-        list_y = list(y.readlines())
-        list_x.sort()
-        list_y.sort()
-        assert list_x == list_y
+        count_x, count_y, diffs = diff_items(x, y, num_partitions=num_partitions, max_diffs=max_diffs)
+    assert not diffs, _format_diffs((filename1, filename2), count_x, count_y, diffs)
+
+
+def assert_csv_matches_rows(filename, rows, delimiter=None, max_diffs=10):
+    """
+    Assert the csv file contains the same rows as the rows iterable, in any order.
+
+    `rows` should yield lists of strings formatted the same way cqlsh formats them, for
+    example by passing each row of a paged driver result through a formatter. The rows
+    are consumed as they are produced, so a table can be compared against a csv file by
+    streaming a full scan without holding the result set in memory.
+    """
+    # the rows should take about as much space as the file
+    num_partitions = _num_partitions_for(2 * os.path.getsize(filename))
+    count_x, count_y, diffs = diff_items(csv_rows(filename, delimiter=delimiter), rows,
+                                         num_partitions=num_partitions, max_diffs=max_diffs)
+    assert not diffs, _format_diffs((filename, 'rows'), count_x, count_y, diffs)
+
+
+def parse_copy_rate_file(filename):
+    """
+    Parse the last progress report of a COPY RATEFILE, which looks like
+    'Processed: 200000 rows; Rate:   25000 rows/s; Avg. rate:   21000 rows/s'.
+
+    @return a dict with the number of rows processed, the last and the average rate in rows per second,
+            or None if the file contains no report
+    """
+    pattern = re.compile(r'Processed: (\d+) rows; Rate:\s*([\d.]+) rows/s; Avg\. rate:\s*([\d.]+) rows/s')
+    last = None
+    with open(filename, 'r') as f:
+        for line in f:
+            match = pattern.search(line)
+            if match:
+                last = match
+    if last is None:
+        return None
+    return {'rows': int(last.group(1)), 'rate': float(last.group(2)), 'avg_rate': float(last.group(3))}
 
 
 def random_list(gen=None, n=None):
@@ -56,6 +191,204 @@ def write_rows_to_csv(filename, data):
         csvfile.close
 
 
+def parse_cql_type(type_str):
+    """
+    Parse a cql type name, as found in driver metadata, into a tree of
+    (name, [subtypes]) tuples, dropping any frozen<> wrapper. For example
+    'frozen<map<int, list<text>>>' becomes ('map', [('int', []), ('list', [('text', [])])]).
+    """
+    def parse(pos):
+        start = pos
+        while pos < len(type_str) and type_str[pos] not in '<>,':
+            pos += 1
+        name = type_str[start:pos].strip().strip('"')
+        subtypes = []
+        if pos < len(type_str) and type_str[pos] == '<':
+            while type_str[pos] != '>':
+                subtype, pos = parse(pos + 1)
+                subtypes.append(subtype)
+            pos += 1
+        if name == 'frozen':
+            return subtypes[0], pos
+        return (name, subtypes), pos
+
+    return parse(0)[0]
+
+
+class CsvDataGenerator(object):
+    """
+    Generates random, type-correct csv rows for COPY FROM, given the names and cql types
+    of the columns of a table.
+
+    Values are formatted the way COPY FROM parses them, including collections, tuples and
+    user types (whose field definitions must be passed in `user_types`, see from_table_metadata).
+    If `unique_column` is given, that column is derived from the row number, so that all generated
+    rows have a distinct primary key and the number of rows in the table matches the number of
+    rows generated. When `seed` is set, the same rows are generated for the same seed and row numbers.
+    """
+
+    TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.{ms:03d}+0000'
+
+    def __init__(self, columns, user_types=None, unique_column=None, seed=None, max_collection_size=5):
+        self.columns = [(name, parse_cql_type(cql_type)) for name, cql_type in columns]
+        self.user_types = {name: [(field, parse_cql_type(cql_type)) for field, cql_type in fields]
+                           for name, fields in (user_types or {}).items()}
+        self.unique_column = unique_column
+        self.seed = seed
+        self.max_collection_size = max_collection_size
+
+    @classmethod
+    def from_table_metadata(cls, table_meta, keyspace_meta=None, **kwargs):
+        """
+        Create a generator for all the columns of a driver TableMetadata, looking up user
+        types in `keyspace_meta`. The first partition key column is used as the unique column.
+        """
+        user_types = {}
+        if keyspace_meta is not None:
+            user_types = {name: list(zip(ut.field_names, ut.field_types))
+                          for name, ut in keyspace_meta.user_types.items()}
+        kwargs.setdefault('unique_column', table_meta.partition_key[0].name)
+        return cls([(c.name, c.cql_type) for c in table_meta.columns.values()], user_types=user_types, **kwargs)
+
+    @property
+    def column_names(self):
+        return [name for name, _ in self.columns]
+
+    def rng_for(self, shard):
+        return random.Random('{}-{}'.format(self.seed, shard)) if self.seed is not None else random.Random()
+
+    def generate_rows(self, start, end, rng):
+        """
+        Yield the csv fields of rows numbered start (inclusive) to end (exclusive).
+        """
+        for row_num in range(start, end):
+            yield [self.unique_value(cql_type, row_num) if name == self.unique_column
+                   else self.format_value(cql_type, rng, nested=False)
+                   for name, cql_type in self.columns]
+
+    def unique_value(self, cql_type, row_num):
+        name = cql_type[0]
+        if name in ('int', 'bigint', 'varint', 'smallint', 'tinyint', 'counter'):
+            limits = {'smallint': 2 ** 15, 'tinyint': 2 ** 7}
+            if name in limits and row_num >= limits[name]:
+                raise ValueError('Cannot generate {} unique {} values'.format(row_num + 1, name))
+            return str(row_num)
+        elif name in ('text', 'ascii', 'varchar'):
+            return 'key{}'.format(row_num)
+        elif name in ('uuid', 'timeuuid'):
+            return str(uuid_from_time(946684800 + row_num / 1000.0, node=0, clock_seq=0)) if name == 'timeuuid' \
+                else str(uuid.UUID(int=row_num, version=4))
+        elif name in ('double', 'float', 'decimal'):
+            return '{}.5'.format(row_num)
+        elif name == 'blob':
+            return '0x{:016x}'.format(row_num)
+        raise ValueError('Cannot generate unique values of type {}'.format(name))
+
+    def format_value(self, cql_type, rng, nested):
+        """
+        Return a random value of `cql_type` formatted as a csv field, or as an element of a
+        collection, tuple or user type if `nested` is true, where strings must be quoted.
+        """
+        name, subtypes = cql_type
+
+        def quote(s):
+            return "'{}'".format(s.replace("'", "''")) if nested else s
+
+        def collection_size():
+            return rng.randint(1, self.max_collection_size)
+
+        if name == 'list':
+            return '[{}]'.format(', '.join(self.format_value(subtypes[0], rng, True)
+                                           for _ in range(collection_size())))
+        elif name == 'set':
+            return '{{{}}}'.format(', '.join(sorted(set(self.format_value(subtypes[0], rng, True)
+                                                        for _ in range(collection_size())))))
+        elif name == 'map':
+            entries = dict((self.format_value(subtypes[0], rng, True), self.format_value(subtypes[1], rng, True))
+                           for _ in range(collection_size()))
+            return '{{{}}}'.format(', '.join('{}: {}'.format(k, v) for k, v in sorted(entries.items())))
+        elif name == 'tuple':
+            return '({})'.format(', '.join(self.format_value(t, rng, True) for t in subtypes))
+        elif name in self.user_types:
+            return '{{{}}}'.format(', '.join('{}: {}'.format(field, self.format_value(t, rng, True))
+                                             for field, t in self.user_types[name]))
+        elif name in ('int', 'counter'):
+            return str(rng.randint(-2 ** 31, 2 ** 31 - 1))
+        elif name == 'bigint':
+            return str(rng.randint(-2 ** 63, 2 ** 63 - 1))
+        elif name == 'smallint':
+            return str(rng.randint(-2 ** 15, 2 ** 15 - 1))
+        elif name == 'tinyint':
+            return str(rng.randint(-2 ** 7, 2 ** 7 - 1))
+        elif name == 'varint':
+            return str(rng.randint(-2 ** 80, 2 ** 80))
+        elif name == 'decimal':
+            return '{}.{}'.format(rng.randint(-10 ** 6, 10 ** 6), rng.randint(0, 999))
+        elif name in ('double', 'float'):
+            return repr(round(rng.uniform(-1000, 1000), 2))
+        elif name == 'boolean':
+            return rng.choice(['True', 'False'])
+        elif name in ('text', 'varchar', 'ascii'):
+            return quote(''.join(rng.choice(string.ascii_letters + string.digits + ' ')
+                                 for _ in range(rng.randint(1, 20))))
+        elif name == 'blob':
+            return '0x' + ''.join(rng.choice('0123456789abcdef') for _ in range(2 * rng.randint(1, 16)))
+        elif name == 'inet':
+            return quote('127.{}.{}.{}'.format(rng.randint(0, 255), rng.randint(0, 255), rng.randint(1, 254)))
+        elif name == 'uuid':
+            return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        elif name == 'timeuuid':
+            return str(uuid_from_time(946684800 + rng.uniform(0, 20 * 365 * 86400),
+                                      node=rng.getrandbits(48), clock_seq=rng.getrandbits(14)))
+        elif name == 'timestamp':
+            ts = datetime.datetime(2000, 1, 1) + datetime.timedelta(seconds=rng.randint(0, 20 * 365 * 86400))
+            return quote(ts.strftime(self.TIMESTAMP_FORMAT.format(ms=rng.randint(0, 999))))
+        elif name == 'date':
+            return quote((datetime.date(2000, 1, 1) + datetime.timedelta(days=rng.randint(0, 20 * 365))).isoformat())
+        elif name == 'time':
+            return quote('{:02d}:{:02d}:{:02d}.{:09d}'.format(rng.randint(0, 23), rng.randint(0, 59),
+                                                              rng.randint(0, 59), rng.randint(0, 10 ** 9 - 1)))
+        elif name == 'duration':
+            return '{}h{}m{}s'.format(rng.randint(0, 100), rng.randint(0, 59), rng.randint(0, 59))
+        raise ValueError('Unsupported cql type {}'.format(name))
+
+    def write_csv(self, filename, start, end, shard=0):
+        with open(filename, 'w') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerows(self.generate_rows(start, end, self.rng_for(shard)))
+        return filename
+
+    def write_csv_shards(self, filenames, num_rows, num_processes=None):
+        """
+        Write num_rows rows split evenly across the csv files in `filenames`, one shard per file,
+        generating the shards in parallel in up to num_processes worker processes
+        (by default one per shard, capped at the number of cores).
+
+        Shard i contains rows numbered [i * num_rows / num_shards, (i + 1) * num_rows / num_shards).
+
+        @return the list of file names, which can be joined with a comma for COPY FROM
+        """
+        num_shards = len(filenames)
+        bounds = [num_rows * i // num_shards for i in range(num_shards + 1)]
+        tasks = [(self, filename, bounds[i], bounds[i + 1], i) for i, filename in enumerate(filenames)]
+        if num_processes is None:
+            num_processes = min(num_shards, os.cpu_count() or 1)
+        if num_processes <= 1:
+            return [_write_csv_shard(task) for task in tasks]
+
+        pool = Pool(processes=num_processes)
+        try:
+            return pool.map(_write_csv_shard, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def _write_csv_shard(task):
+    generator, filename, start, end, shard = task
+    return generator.write_csv(filename, start, end, shard)
+
+
 def deserialize_date_fallback_int(byts, protocol_version):
     timestamp_ms = cassandra.marshal.int64_unpack(byts)
     try:
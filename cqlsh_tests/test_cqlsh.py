@@ -24,6 +24,7 @@ from ccmlib import common
 from .cqlsh_tools import monkeypatch_driver, unmonkeypatch_driver
 from dtest import Tester, create_ks, create_cf
 from tools.assertions import assert_all, assert_none
+from tools.cqlsh_session import runs_once
 from tools.data import create_c1c2_table, insert_c1c2, rows_to_list
 
 since = pytest.mark.since
@@ -1752,7 +1753,8 @@ Tracing session:""")
     def run_cqlsh(self, node, cmds, cqlsh_options=None, env_vars=None):
         """
         Local version of run_cqlsh to open a cqlsh subprocess with
-        additional environment variables.
+        additional environment variables. Commands are run in the cqlsh
+        session kept open on the node when possible, see DTestSetup.cqlsh_session.
         """
         if env_vars is None:
             env_vars = {}
@@ -1769,6 +1771,11 @@ Tracing session:""")
         else:
             host = node.network_interfaces['thrift'][0]
             port = node.network_interfaces['thrift'][1]
+        session = None if runs_once(cmds, cqlsh_options) else self.cqlsh_session(node, cqlsh_options=cqlsh_options, env=env)
+        if session is not None:
+            output, err, _ = session.run(''.join(cmd + ';\n' for cmd in cmds.split(';')))
+            return output, err
+
         args = cqlsh_options + [host, str(port)]
         sys.stdout.flush()
         p = subprocess.Popen([cli] + args, env=env, stdin=subprocess.PIPE,
@@ -10,11 +10,12 @@ import time
 import pytest
 import logging
 
-from collections import namedtuple
+from collections import OrderedDict, namedtuple
 from contextlib import contextmanager
 from decimal import Decimal
 from distutils.version import LooseVersion
 from functools import partial
+from itertools import product
 from tempfile import NamedTemporaryFile, gettempdir, template
 from uuid import uuid1, uuid4
 
@@ -25,13 +26,18 @@ from cassandra.murmur3 import murmur3
 from cassandra.util import SortedSet
 from ccmlib.common import is_win
 
-from .cqlsh_tools import (DummyColorMap, assert_csvs_items_equal, csv_rows,
-                         monkeypatch_driver, random_list, unmonkeypatch_driver,
-                         write_rows_to_csv)
+from .cqlsh_tools import (CsvDataGenerator, DummyColorMap, assert_csv_matches_rows,
+                          assert_csvs_items_equal, csv_rows, monkeypatch_driver,
+                          parse_copy_rate_file, random_list, unmonkeypatch_driver,
+                          write_rows_to_csv)
 from dtest import (Tester, create_ks)
 from dtest import (FlakyRetryPolicy, Tester, create_ks)
+from tools.benchmark import BenchmarkResults, ProcessTreeMemorySampler
+from tools.cqlsh_session import runs_once
 from tools.data import rows_to_list
+from tools.git import cassandra_git_sha
 from tools.metadata_wrapper import (UpdatingClusterMetadataWrapper,
+                                    UpdatingKeyspaceMetadataWrapper,
                                     UpdatingTableMetadataWrapper)
 
 since = pytest.mark.since
@@ -181,14 +187,14 @@ class TestCqlshCopy(Tester):
         if retry_on_request_timeout:
             num_attempts = 0
             while num_attempts < 5:
-                ret = self.node1.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+                ret = self._run_cqlsh_once(cmds, cqlsh_options)
 
                 if not re.search(r"Client request timeout", ret[0]):
                     break
 
                 num_attempts += 1
         else:
-            ret = self.node1.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+            ret = self._run_cqlsh_once(cmds, cqlsh_options)
 
         if show_output:
             logger.debug('Output:\n{}'.format(ret[0]))  # show stdout of copy cmd
@@ -196,6 +202,19 @@ class TestCqlshCopy(Tester):
 
         return ret
 
+    def _run_cqlsh_once(self, cmds, cqlsh_options):
+        """
+        Run cmds in the cqlsh session kept open on node1, which saves starting a new cqlsh
+        process for every command, unless sessions are not supported or cqlsh runs once and
+        exits, see tools.cqlsh_session.runs_once.
+        """
+        if runs_once(cmds, cqlsh_options):
+            return self.node1.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+        session = self.cqlsh_session(self.node1, cqlsh_options=cqlsh_options)
+        if session is None:
+            return self.node1.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+        return session.run_cqlsh(cmds)
+
     @property
     def default_time_format(self):
         """
@@ -406,6 +425,26 @@ class TestCqlshCopy(Tester):
                         logger.warning("Value in result: " + str(processed_results[0][x]))
             raise e
 
+    def assertCsvMatchesTable(self, csv_filename, table_name, columns=None, nullval='', fetch_size=1000):
+        """
+        Compare a csv file with the content of a table, in any order, by streaming a paged
+        scan of the table through the cqlsh formatter. Unlike assertCsvResultEqual, neither
+        the table nor the csv file are loaded in memory, so this can be used with large tables.
+        """
+        table_meta = UpdatingTableMetadataWrapper(
+            self.session.cluster,
+            ks_name=self.ks,
+            table_name=table_name
+        )
+        column_names = [c for c in table_meta.columns if columns is None or c in columns]
+        cql_type_names = [table_meta.columns[c].cql_type for c in column_names]
+
+        statement = SimpleStatement("SELECT {} FROM {}.{}".format(', '.join('"{}"'.format(c) for c in column_names),
+                                                                  self.ks, table_name),
+                                    fetch_size=fetch_size)
+        results = self.session.execute(statement)
+        assert_csv_matches_rows(csv_filename, self.iter_csv_rows(results, cql_type_names, nullval=nullval))
+
     def make_csv_formatter(self, time_format, nullval):
         with self._cqlshlib() as cqlshlib:  # noqa
             from cqlshlib.formatting import format_value, format_value_default
@@ -468,13 +507,19 @@ class TestCqlshCopy(Tester):
         Given an object returned from a CQL query, returns a string formatted by
         the cqlsh formatting utilities.
         """
+        return list(self.iter_csv_rows(results, cql_type_names, time_format=time_format, nullval=nullval))
+
+    def iter_csv_rows(self, results, cql_type_names, time_format=None, nullval=''):
+        """
+        Same as result_to_csv_rows but yields the formatted rows one at a time, so that
+        paged results are formatted as they are fetched.
+        """
         # This has no real dependencies on Tester except that self._cqlshlib has
         # to grab self.cluster's install directory. This should be pulled out
         # into a bare function if cqlshlib is made easier to interact with.
         if not time_format:
             time_format = self.default_time_format
 
-        processed = []
         format_fn = self.make_csv_formatter(time_format, nullval)
 
         # build the typemap once ahead of time to speed up formatting
@@ -486,11 +531,9 @@ class TestCqlshCopy(Tester):
         except ImportError:
             cql_type_map = {}
 
-        for i, row in enumerate(results):
-            formatted_row = [format_fn(v, t, cql_type_map.get(t))
-                             for v, t in zip(row, cql_type_names)]
-            processed.append(formatted_row)
-        return processed
+        for row in results:
+            yield [format_fn(v, t, cql_type_map.get(t))
+                   for v, t in zip(row, cql_type_names)]
 
     @pytest.mark.depends_cqlshlib
     def test_list_data(self):
@@ -1854,6 +1897,35 @@ class TestCqlshCopy(Tester):
         _test(True)
         _test(False)
 
+    def test_reading_generated_all_datatypes(self):
+        """
+        Test COPY FROM with several csv files of generated rows covering every datatype, by:
+
+        - creating a table containing all datatypes,
+        - generating csv shards from the table metadata in parallel,
+        - COPYing all the shards into the table, and
+        - checking that all generated rows were imported.
+
+        @jira_ticket CASSANDRA-9303
+        """
+        self.all_datatypes_prepare()
+
+        num_rows = 10000
+        num_shards = 4
+        generator = CsvDataGenerator.from_table_metadata(
+            UpdatingTableMetadataWrapper(self.session.cluster, ks_name=self.ks, table_name='testdatatype'),
+            UpdatingKeyspaceMetadataWrapper(self.session.cluster, ks_name=self.ks),
+            seed=0)
+        filenames = [self.get_temp_file(prefix='testgenerated{}'.format(i), suffix='.csv').name
+                     for i in range(num_shards)]
+        generator.write_csv_shards(filenames, num_rows)
+
+        logger.debug('Importing from csv files: {}'.format(filenames))
+        out, err, _ = self.run_cqlsh(cmds="COPY ks.testdatatype ({}) FROM '{}'"
+                                     .format(', '.join(generator.column_names), ','.join(filenames)))
+        assert 'Failed to import' not in err
+        assert [[num_rows]] == rows_to_list(self.session.execute("SELECT COUNT(*) FROM ks.testdatatype"))
+
     def test_boolstyle_round_trip(self):
         """
         Test that a CSV file with booleans in a different style successfully round-trips
@@ -2545,6 +2617,8 @@ class TestCqlshCopy(Tester):
 
         # check the length of both files is the same to ensure all exported records were imported
         assert sum(1 for _ in open(tempfile1.name)) == sum(1 for _ in open(tempfile2.name))
+        # and that they were imported unchanged, this compares the files with bounded memory
+        assert_csvs_items_equal(tempfile1.name, tempfile2.name)
 
         return ret
 
@@ -2644,6 +2718,102 @@ class TestCqlshCopy(Tester):
         self._test_bulk_round_trip(nodes=3, partitioner="murmur3", num_operations=250000,
                                    copy_from_options={'MAXINFLIGHTMESSAGES': 64, 'MAXPENDINGCHUNKS': 1})
 
+    # COPY TO does not accept the COPY FROM options, so it only varies the number of processes
+    COPY_TO_BENCHMARK_OPTIONS = OrderedDict([('NUMPROCESSES', [1, 4, 8])])
+    COPY_FROM_BENCHMARK_OPTIONS = OrderedDict([('NUMPROCESSES', [1, 4]),
+                                               ('CHUNKSIZE', [1000, 5000]),
+                                               ('MAXBATCHSIZE', [10, 20]),
+                                               ('PREPAREDSTATEMENTS', [True, False])])
+
+    def _benchmark_copy(self, shape, table, regression_tolerance=0.25):
+        """
+        Run COPY TO, then COPY FROM into the truncated table, for every combination of the options in
+        COPY_TO_BENCHMARK_OPTIONS and COPY_FROM_BENCHMARK_OPTIONS. The average rate reported in the
+        rate file and the peak memory used by cqlsh and its worker processes are recorded in the
+        cqlsh_copy benchmark results, and the test fails if the rate of any configuration regressed by
+        more than regression_tolerance compared with the last run of a different Cassandra build.
+
+        `table` must already be populated, `shape` is a label describing its rows.
+        """
+        results = BenchmarkResults('cqlsh_copy', cassandra_version=self.cluster.version(),
+                                   build_sha=cassandra_git_sha(self.node1.get_install_dir()))
+        tempfile = self.get_temp_file()
+        ratefile = self.get_temp_file()
+        num_rows = None
+        records = []
+
+        def run_copy(direction, options):
+            with_options = ["RATEFILE='{}'".format(ratefile.name)]
+            with_options.extend('{}={}'.format(k, v) for k, v in options.items())
+            with_options = ' AND '.join(with_options)
+            cmd = "COPY {} {} '{}' WITH {}".format(table, direction, tempfile.name, with_options)
+            logger.debug('Running {}'.format(cmd))
+            with ProcessTreeMemorySampler(cmdline_filter='cqlsh') as sampler:
+                start = time.time()
+                _, err, _ = self.run_cqlsh(cmds=cmd, show_output=False)
+                elapsed = time.time() - start
+            rate = parse_copy_rate_file(ratefile.name)
+            assert rate is not None, 'No rate reported by {}: {}'.format(cmd, err)
+            config = OrderedDict([('shape', shape), ('direction', direction)])
+            config.update(options)
+            records.append(results.record('test_copy_benchmark', config,
+                                          {'rows': rate['rows'],
+                                           'rows_per_second': rate['avg_rate'],
+                                           'elapsed_seconds': elapsed,
+                                           'peak_rss_bytes': sampler.peak_rss}))
+            return rate['rows']
+
+        for values in product(*self.COPY_TO_BENCHMARK_OPTIONS.values()):
+            rows = run_copy('TO', OrderedDict(zip(self.COPY_TO_BENCHMARK_OPTIONS.keys(), values)))
+            assert num_rows is None or num_rows == rows
+            num_rows = rows
+
+        for values in product(*self.COPY_FROM_BENCHMARK_OPTIONS.values()):
+            self.session.execute('TRUNCATE {}'.format(table))
+            assert num_rows == run_copy('FROM', OrderedDict(zip(self.COPY_FROM_BENCHMARK_OPTIONS.keys(), values)))
+
+        regressions = results.compare_with_baseline(['rows_per_second'], records=records,
+                                                    tolerance=regression_tolerance)
+        assert not regressions, '\n'.join('{}: {} went from {} to {}'.format(record['config'], metric, old, new)
+                                          for record, metric, old, new in regressions)
+
+    @pytest.mark.benchmark
+    def test_copy_benchmark_standard1(self):
+        """
+        Benchmark COPY with the narrow rows of the default cassandra-stress table
+        """
+        self.prepare(configuration_options={'truncate_request_timeout_in_ms': 60000})
+        self.node1.stress(['write', 'n=200K', 'no-warmup', '-rate', 'threads=50'])
+        self._benchmark_copy('standard1', 'keyspace1.standard1')
+
+    @pytest.mark.benchmark
+    def test_copy_benchmark_blogposts(self):
+        """
+        Benchmark COPY with the wide partitions of the blogposts stress profile
+        """
+        self.prepare(configuration_options={'truncate_request_timeout_in_ms': 60000,
+                                            'batch_size_warn_threshold_in_kb': '10'})
+        profile = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'blogposts.yaml')
+        self.node1.stress(['user', 'profile={}'.format(profile), 'ops(insert=1)',
+                           'n=20K', 'no-warmup', '-rate', 'threads=50'])
+        self._benchmark_copy('blogposts', 'stresscql.blogposts')
+
+    @pytest.mark.benchmark
+    def test_copy_benchmark_all_datatypes(self):
+        """
+        Benchmark COPY with generated rows containing every datatype
+        """
+        self.all_datatypes_prepare()
+        generator = CsvDataGenerator.from_table_metadata(
+            UpdatingTableMetadataWrapper(self.session.cluster, ks_name=self.ks, table_name='testdatatype'),
+            UpdatingKeyspaceMetadataWrapper(self.session.cluster, ks_name=self.ks),
+            seed=0)
+        filenames = [self.get_temp_file(prefix='testgenerated{}'.format(i), suffix='.csv').name for i in range(4)]
+        generator.write_csv_shards(filenames, 100000)
+        self.run_cqlsh(cmds="COPY ks.testdatatype ({}) FROM '{}'"
+                       .format(', '.join(generator.column_names), ','.join(filenames)), show_output=False)
+        self._benchmark_copy('all_datatypes', 'ks.testdatatype')
+
     def prepare_copy_to_with_failures(self):
         """
         Create a cluster for testing COPY TO with failure injection, we need at least 3 token ranges
@@ -2941,8 +3111,7 @@ class TestCqlshCopy(Tester):
         logger.debug('Importing from csv file {}'.format(tempfile.name))
         self.run_cqlsh(cmds="COPY {} FROM '{}' WITH MAXBATCHSIZE=1".format(stress_ks_table_name, tempfile.name))
 
-        results = list(self.session.execute("SELECT * FROM {}".format(stress_ks_table_name)))
-        self.assertCsvResultEqual(tempfile.name, results, stress_table_name)
+        self.assertCsvMatchesTable(tempfile.name, stress_table_name)
 
         # Import without prepared statements and verify
         self.session.execute("TRUNCATE {}".format(stress_ks_table_name))
@@ -2951,8 +3120,7 @@ class TestCqlshCopy(Tester):
         self.run_cqlsh(cmds="COPY {} FROM '{}' WITH MAXBATCHSIZE=1 AND PREPAREDSTATEMENTS=FALSE"
                        .format(stress_ks_table_name, tempfile.name))
 
-        results = list(self.session.execute("SELECT * FROM {}".format(stress_ks_table_name)))
-        self.assertCsvResultEqual(tempfile.name, results, stress_table_name)
+        self.assertCsvMatchesTable(tempfile.name, stress_table_name)
 
     @pytest.mark.depends_cqlshlib
     def test_copy_from_with_brackets_in_UDT(self):
@@ -12,6 +12,7 @@ from tools.data import create_c1c2_table, insert_c1c2, query_c1c2
 from tools.jmxutils import (JolokiaAgent, make_mbean,
                             remove_perf_disable_shared_mem)
 from tools.misc import new_node
+from tools.stress import run_stress
 from compaction_test import grep_sstables_in_each_level
 
 since = pytest.mark.since
@@ -40,8 +41,8 @@ class TestDiskBalance(Tester):
         cluster.populate(4).start(wait_for_binary_proto=True)
         node1 = cluster.nodes['node1']
 
-        node1.stress(['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=3)',
-                      'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
+        run_stress(node1, ['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=3)',
+                           'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
         cluster.flush()
         # make sure the data directories are balanced:
         for node in cluster.nodelist():
@@ -56,8 +57,8 @@ class TestDiskBalance(Tester):
         cluster.populate(4).start(wait_for_binary_proto=True)
         node1 = cluster.nodes['node1']
 
-        node1.stress(['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=3)',
-                      'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
+        run_stress(node1, ['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=3)',
+                           'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
         cluster.flush()
         node5 = new_node(cluster)
         node5.start(wait_for_binary_proto=True)
@@ -80,7 +81,7 @@ class TestDiskBalance(Tester):
         node1 = cluster.nodes['node1']
 
         logger.debug("Populating")
-        node1.stress(['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=3)', 'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
+        run_stress(node1, ['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=3)', 'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
         cluster.flush()
 
         logger.debug("Stopping and removing node2")
@@ -109,8 +110,8 @@ class TestDiskBalance(Tester):
         cluster.populate(4).start(wait_for_binary_proto=True)
         node1 = cluster.nodes['node1']
         node4 = cluster.nodes['node4']
-        node1.stress(['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=2)',
-                      'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
+        run_stress(node1, ['write', 'n=50k', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=2)',
+                           'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
         cluster.flush()
 
         node4.decommission()
@@ -156,11 +157,11 @@ class TestDiskBalance(Tester):
             cluster.set_configuration_options(values={'num_tokens': 256})
         cluster.populate(3).start(wait_for_binary_proto=True)
         node1 = cluster.nodes['node1']
-        node1.stress(['write', 'n=1', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=1)'])
+        run_stress(node1, ['write', 'n=1', 'no-warmup', '-rate', 'threads=100', '-schema', 'replication(factor=1)'])
         cluster.flush()
         session = self.patient_cql_connection(node1)
         session.execute("ALTER KEYSPACE keyspace1 WITH replication = {'class':'SimpleStrategy', 'replication_factor':2}")
-        node1.stress(['write', 'n=100k', 'no-warmup', '-rate', 'threads=100'])
+        run_stress(node1, ['write', 'n=100k', 'no-warmup', '-rate', 'threads=100'])
         cluster.flush()
         for node in cluster.nodelist():
             self.assert_balanced(node)
@@ -227,9 +228,9 @@ class TestDiskBalance(Tester):
             start_key = current_keys + 1
             end_key = current_keys + keys_per_flush
             logger.debug("Writing keys {}..{} and flushing".format(start_key, end_key))
-            node1.stress(['write', 'n={}'.format(keys_per_flush), "no-warmup", "cl=ALL", "-pop",
-                          "seq={}..{}".format(start_key, end_key), "-rate", "threads=1", "-schema", "replication(factor=1)",
-                          "compaction(strategy={},enabled=false)".format(compaction_opts)])
+            run_stress(node1, ['write', 'n={}'.format(keys_per_flush), "no-warmup", "cl=ALL", "-pop",
+                               "seq={}..{}".format(start_key, end_key), "-rate", "threads=1", "-schema", "replication(factor=1)",
+                               "compaction(strategy={},enabled=false)".format(compaction_opts)])
             node1.nodetool('flush keyspace1 standard1')
             current_keys = end_key
 
@@ -295,9 +296,9 @@ class TestDiskBalance(Tester):
             start_key = current_keys + 1
             end_key = current_keys + keys_per_flush
             logger.debug("Writing keys {}..{} and flushing".format(start_key, end_key))
-            node1.stress(['write', 'n={}'.format(keys_per_flush), "no-warmup", "cl=ALL", "-pop",
-                          "seq={}..{}".format(start_key, end_key), "-rate", "threads=1", "-schema", "replication(factor=1)",
-                          "compaction(strategy={},enabled=false)".format(compaction_opts)])
+            run_stress(node1, ['write', 'n={}'.format(keys_per_flush), "no-warmup", "cl=ALL", "-pop",
+                               "seq={}..{}".format(start_key, end_key), "-rate", "threads=1", "-schema", "replication(factor=1)",
+                               "compaction(strategy={},enabled=false)".format(compaction_opts)])
             node1.nodetool('flush keyspace1 standard1')
             current_keys = end_key
 
@@ -334,7 +335,7 @@ class TestDiskBalance(Tester):
         self.assert_balanced(node)
 
         logger.debug("Reading data back ({} keys)".format(total_keys))
-        node.stress(['read', 'n={}'.format(total_keys), "no-warmup", "cl=ALL", "-pop", "seq=1...{}".format(total_keys), "-rate", "threads=1"])
+        run_stress(node, ['read', 'n={}'.format(total_keys), "no-warmup", "cl=ALL", "-pop", "seq=1...{}".format(total_keys), "-rate", "threads=1"])
 
         if lcs:
             output = grep_sstables_in_each_level(node, "standard1")
@@ -22,6 +22,7 @@ from cassandra.auth import PlainTextAuthProvider
 from cassandra.cluster import ExecutionProfile
 from cassandra.policies import RetryPolicy, RoundRobinPolicy
 from ccmlib.node import ToolError, TimeoutError
+from tools.jmx_nodetool import JmxNodetool
 from tools.misc import retry_till_success
 
 
@@ -387,30 +388,18 @@ def make_auth(user, password):
 def data_size(node, ks, cf):
     """
     Return the size in bytes for given table in a node.
-    This gets the size from nodetool cfstats output.
-    This might brake if the format of nodetool cfstats change
-    as it is looking for specific text "Space used (total)" in output.
+    This gets the size from the TotalDiskSpaceUsed metric when the node runs a Jolokia agent,
+    or else from the "Space used (total)" line of the nodetool cfstats output.
     @param node: Node in which table size to be checked for
     @param ks: Keyspace name for the table
     @param cf: table name
     @return: data size in bytes
     """
-    cfstats = node.nodetool("cfstats {}.{}".format(ks,cf))[0]
-    regex = re.compile(r'[\t]')
-    stats_lines = [regex.sub("", s) for s in cfstats.split('\n')
-                  if regex.sub("", s).startswith('Space used (total)')]
-    if not len(stats_lines) == 1:
-        msg = ('Expected output from `nodetool cfstats` to contain exactly 1 '
-               'line starting with "Space used (total)". Found:\n') + cfstats
-        raise RuntimeError(msg)
-    space_used_line = stats_lines[0].split()
-
-    if len(space_used_line) == 4:
-        return float(space_used_line[3])
-    else:
-        msg = ('Expected format for `Space used (total)` in nodetool cfstats is `Space used (total): <number>`.'
-               'Found:\n') + stats_lines[0]
-        raise RuntimeError(msg)
+    nodetool = JmxNodetool(node)
+    try:
+        return nodetool.space_used_total(ks, cf)
+    finally:
+        nodetool.close()
 
 
 def get_port_from_node(node):
@@ -17,9 +17,11 @@ class DTestConfig:
         self.cassandra_version_from_build = None
         self.delete_logs = False
         self.execute_upgrade_tests = False
+        self.execute_benchmark_tests = False
         self.disable_active_log_watching = False
         self.keep_test_dir = False
         self.enable_jacoco_code_coverage = False
+        self.sample_jmx_metrics = None
         self.jemalloc_path = find_libjemalloc()
 
     def setup(self, request):
@@ -37,9 +39,11 @@ class DTestConfig:
 
         self.delete_logs = request.config.getoption("--delete-logs")
         self.execute_upgrade_tests = request.config.getoption("--execute-upgrade-tests")
+        self.execute_benchmark_tests = request.config.getoption("--execute-benchmark-tests")
         self.disable_active_log_watching = request.config.getoption("--disable-active-log-watching")
         self.keep_test_dir = request.config.getoption("--keep-test-dir")
         self.enable_jacoco_code_coverage = request.config.getoption("--enable-jacoco-code-coverage")
+        self.sample_jmx_metrics = request.config.getoption("--sample-jmx-metrics")
 
     def get_version_from_build(self):
         # There are times when we want to know the C* version we're testing against
@@ -24,6 +24,7 @@ from dtest import (get_ip_from_node, make_execution_profile, get_auth_provider,
 from distutils.version import LooseVersion
 
 from tools.context import log_filter
+from tools.cqlsh_session import CqlshSession, cqlsh_env
 from tools.funcutils import merge_dicts
 
 logger = logging.getLogger(__name__)
@@ -56,6 +57,7 @@ class DTestSetup:
         self.replacement_node = None
         self.allow_log_errors = False
         self.connections = []
+        self.cqlsh_sessions = {}
 
         self.log_saved_dir = "logs"
         try:
@@ -279,6 +281,35 @@ class DTestSetup:
             **kwargs
         )
 
+    def cqlsh_session(self, node, cqlsh_options=None, env=None):
+        """
+        Returns a running cqlsh session on node, started with cqlsh_options and env (by default
+        the environment ccm uses for cqlsh). The session started by a previous call for the same
+        node is reused, unless it was started with different options, environment or cqlshrc file,
+        or it ran a command that changed its state, in which case it is replaced with a new one.
+
+        Returns None on platforms where sessions are not supported, callers should then
+        fall back to node.run_cqlsh.
+        """
+        if not CqlshSession.supported:
+            return None
+        if env is None:
+            env = cqlsh_env(node)
+
+        session = self.cqlsh_sessions.get(node.name)
+        if session is not None and not session.matches(cqlsh_options, env):
+            session.close()
+            session = None
+        if session is None:
+            session = CqlshSession(node, cqlsh_options=cqlsh_options, env=env).start()
+            self.cqlsh_sessions[node.name] = session
+        return session
+
+    def close_cqlsh_sessions(self):
+        for session in self.cqlsh_sessions.values():
+            session.close()
+        self.cqlsh_sessions = {}
+
     def check_logs_for_errors(self):
         for node in self.cluster.nodelist():
             errors = list(self.__filter_errors(
@@ -379,6 +410,7 @@ class DTestSetup:
                     self.cleanup_last_test_dir()
 
     def cleanup_and_replace_cluster(self):
+        self.close_cqlsh_sessions()
         for con in self.connections:
             con.cluster.shutdown()
         self.connections = []
@@ -3,6 +3,7 @@ import logging
 import time
 
 from dtest import Tester
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -36,7 +37,7 @@ class TestInternodeMessaging(Tester):
         node1_log_mark = node1.mark_log()
         node2_log_mark = node2.mark_log()
 
-        node2.byteman_submit(['./byteman/corrupt_internode_messages_gossip.btm'])
+        byteman_submit(node2, ['./byteman/corrupt_internode_messages_gossip.btm'])
 
         # wait for the deserialization error to happen on node1
         time.sleep(10)
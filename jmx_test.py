@@ -9,7 +9,8 @@ import ccmlib.common
 from ccmlib.node import ToolError
 
 from dtest import Tester
-from tools.jmxutils import (JolokiaAgent, enable_jmx_ssl, make_mbean,
+from tools.jmx_nodetool import JmxNodetool
+from tools.jmxutils import (JolokiaAgent, enable_jmx_ssl, install_jolokia_javaagent, make_mbean,
                             remove_perf_disable_shared_mem)
 from tools.misc import generate_ssl_stores
 
@@ -94,7 +95,7 @@ class TestJMX(Tester):
             on_disk_size = jmx.read_attribute(disk_size, "Count")
             assert int(on_disk_size) == 0
 
-            node1.flush()
+            JmxNodetool(node1, jmx=jmx).flush()
 
             on_disk_size = jmx.read_attribute(disk_size, "Count")
             assert int(on_disk_size) > 10000
@@ -111,7 +112,7 @@ class TestJMX(Tester):
         cluster.set_configuration_options({'enable_materialized_views': 'true'})
         cluster.populate(1)
         node = cluster.nodelist()[0]
-        remove_perf_disable_shared_mem(node)
+        install_jolokia_javaagent(node)
         cluster.start(wait_for_binary_proto=True)
 
         node.run_cqlsh(cmds="""
@@ -145,14 +146,13 @@ class TestJMX(Tester):
                                  "but wasn't!"
 
         with JolokiaAgent(node) as jmx:
-            assert jmx.read_attribute(table_memtable_size, "Value") is not None, \
-                missing_metric_message.format("AllMemtablesHeapSize", "testtable")
-            assert jmx.read_attribute(table_view_read_time, "Count") is not None, \
-                missing_metric_message.format("ViewReadTime", "testtable")
-            assert jmx.read_attribute(table_view_lock_time, "Count") is not None, \
-                missing_metric_message.format("ViewLockAcquireTime", "testtable")
-            assert jmx.read_attribute(mv_memtable_size, "Value") is not None, \
-                missing_metric_message.format("AllMemtablesHeapSize", "testmv")
+            table_memtable, table_read_time, table_lock_time, mv_memtable = jmx.read_many(
+                [(table_memtable_size, "Value"), (table_view_read_time, "Count"),
+                 (table_view_lock_time, "Count"), (mv_memtable_size, "Value")])
+            assert table_memtable is not None, missing_metric_message.format("AllMemtablesHeapSize", "testtable")
+            assert table_read_time is not None, missing_metric_message.format("ViewReadTime", "testtable")
+            assert table_lock_time is not None, missing_metric_message.format("ViewLockAcquireTime", "testtable")
+            assert mv_memtable is not None, missing_metric_message.format("AllMemtablesHeapSize", "testmv")
             with pytest.raises(Exception, match=".*InstanceNotFoundException.*"):
                 jmx.read_attribute(mbean=mv_view_read_time, attribute="Count", verbose=False)
             with pytest.raises(Exception, match=".*InstanceNotFoundException.*"):
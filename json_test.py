@@ -81,6 +81,13 @@ def build_doc_context(tester, test_name, prepare=True, connection=None, nodes=No
         else:
             host = nodes[0].network_interfaces['thrift'][0]
             port = nodes[0].network_interfaces['thrift'][1]
+        text = "USE {};".format(enabled_ks()) + ''.join(cmd + ';\n' for cmd in cmds.split(';'))
+        session = tester.cqlsh_session(nodes[0], env=env)
+        if session is not None:
+            # every batch starts with USE, so the session can be reused even though it changes keyspace
+            output, err, _ = session.run(text, allow_state=('USE',))
+            return output.encode('utf-8'), err.encode('utf-8')
+
         args = [host, str(port)]
         sys.stdout.flush()
         p = subprocess.Popen([cli] + args, env=env, stdin=subprocess.PIPE, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
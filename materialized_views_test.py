@@ -24,9 +24,11 @@ from dtest import Tester, get_ip_from_node, create_ks
 from tools.assertions import (assert_all, assert_crc_check_chance_equal,
                               assert_invalid, assert_none, assert_one,
                               assert_unavailable)
+from tools.byteman import byteman_submit
 from tools.data import rows_to_list
 from tools.misc import new_node
 from tools.jmxutils import (JolokiaAgent, make_mbean, remove_perf_disable_shared_mem)
+from tools.wait import LogWatcher, WaitTimeout, wait_until
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -105,10 +107,10 @@ class TestMaterializedViews(Tester):
         for node in self.cluster.nodelist():
             if node.is_running():
                 node.nodetool("replaybatchlog")
-                attempts = 50  # 100 milliseconds per attempt, so 5 seconds total
-                while attempts > 0 and not _settled_stages(node):
-                    time.sleep(0.1)
-                    attempts -= 1
+                try:
+                    wait_until(lambda: _settled_stages(node), timeout=5, max_interval=0.5)
+                except WaitTimeout:
+                    logger.debug("%s did not settle after 5 seconds" % node.name)
 
     def _build_progress_table(self):
         if self.cluster.version() >= '4':
@@ -119,20 +121,18 @@ class TestMaterializedViews(Tester):
     def _wait_for_view(self, ks, view):
         logger.debug("waiting for view")
 
-        def _view_build_finished(node):
-            s = self.patient_exclusive_cql_connection(node)
-            query = "SELECT * FROM %s WHERE keyspace_name='%s' AND view_name='%s'" %\
-                    (self._build_progress_table(), ks, view)
-            result = list(s.execute(query))
-            return len(result) == 0
+        query = "SELECT * FROM %s WHERE keyspace_name='%s' AND view_name='%s'" %\
+                (self._build_progress_table(), ks, view)
 
         for node in self.cluster.nodelist():
             if node.is_running():
-                attempts = 50  # 1 sec per attempt, so 50 seconds total
-                while attempts > 0 and not _view_build_finished(node):
-                    time.sleep(1)
-                    attempts -= 1
-                if attempts <= 0:
+                s = self.patient_exclusive_cql_connection(node)
+                # the view builder logs when it marks the view as built, at debug level
+                pattern = r'Marking view\({}\.{}\) as built'.format(re.escape(ks), re.escape(view))
+                try:
+                    with LogWatcher(node, pattern, filename='debug.log') as watcher:
+                        wait_until(lambda: len(list(s.execute(query))) == 0, timeout=50, max_interval=1, wake=watcher.wake)
+                except WaitTimeout:
                     raise RuntimeError("View {}.{} build not finished after 50 seconds.".format(ks, view))
 
     def _wait_for_view_build_start(self, session, ks, view, wait_minutes=2):
@@ -971,7 +971,7 @@ class TestMaterializedViews(Tester):
         # Rename a column with an injected byteman rule to kill the node after the first schema update
         self.fixture_dtest_setup.allow_log_errors = True
         script_version = '4x' if self.cluster.version() >= '4' else '3x'
-        node.byteman_submit(['./byteman/merge_schema_failure_{}.btm'.format(script_version)])
+        byteman_submit(node, ['./byteman/merge_schema_failure_{}.btm'.format(script_version)])
         with pytest.raises(NoHostAvailable):
             session.execute("ALTER TABLE users RENAME username TO user")
 
@@ -1081,11 +1081,11 @@ class TestMaterializedViews(Tester):
         logger.debug("Avoid premature MV build finalization with byteman")
         for node in self.cluster.nodelist():
             if self.cluster.version() >= '4':
-                node.byteman_submit(['./byteman/4.0/skip_view_build_finalization.btm'])
-                node.byteman_submit(['./byteman/4.0/skip_view_build_task_finalization.btm'])
+                byteman_submit(node, ['./byteman/4.0/skip_view_build_finalization.btm'])
+                byteman_submit(node, ['./byteman/4.0/skip_view_build_task_finalization.btm'])
             else:
-                node.byteman_submit(['./byteman/pre4.0/skip_finish_view_build_status.btm'])
-                node.byteman_submit(['./byteman/pre4.0/skip_view_build_update_distributed.btm'])
+                byteman_submit(node, ['./byteman/pre4.0/skip_finish_view_build_status.btm'])
+                byteman_submit(node, ['./byteman/pre4.0/skip_view_build_update_distributed.btm'])
 
         session.execute("CREATE TABLE t (id int PRIMARY KEY, v int, v2 text, v3 decimal)")
 
@@ -1150,7 +1150,7 @@ class TestMaterializedViews(Tester):
 
         logger.debug("Slowing down MV build with byteman")
         for node in self.cluster.nodelist():
-            node.byteman_submit(['./byteman/4.0/view_builder_task_sleep.btm'])
+            byteman_submit(node, ['./byteman/4.0/view_builder_task_sleep.btm'])
 
         logger.debug("Create a MV")
         session.execute(("CREATE MATERIALIZED VIEW t_by_v AS SELECT * FROM t "
@@ -1199,7 +1199,7 @@ class TestMaterializedViews(Tester):
 
         logger.debug("Slowing down MV build with byteman")
         for node in nodes:
-            node.byteman_submit(['./byteman/4.0/view_builder_task_sleep.btm'])
+            byteman_submit(node, ['./byteman/4.0/view_builder_task_sleep.btm'])
 
         logger.debug("Create a MV")
         session.execute(("CREATE MATERIALIZED VIEW t_by_v AS SELECT * FROM t "
@@ -1258,7 +1258,7 @@ class TestMaterializedViews(Tester):
 
         logger.debug("Slowing down MV build with byteman")
         for node in nodes:
-            node.byteman_submit(['./byteman/4.0/view_builder_task_sleep.btm'])
+            byteman_submit(node, ['./byteman/4.0/view_builder_task_sleep.btm'])
 
         logger.debug("Create a MV")
         session.execute(("CREATE MATERIALIZED VIEW t_by_v AS SELECT * FROM t "
@@ -2500,7 +2500,7 @@ class TestMaterializedViews(Tester):
         session.cluster.control_connection.wait_for_schema_agreement()
 
         logger.debug('Make node1 fail {} view writes'.format(fail_phase))
-        node1.byteman_submit(['./byteman/fail_{}_view_write.btm'.format(fail_phase)])
+        byteman_submit(node1, ['./byteman/fail_{}_view_write.btm'.format(fail_phase)])
 
         logger.debug('Write 1000 rows - all node1 writes should fail')
 
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from cqlsh_tests import cqlsh_tools
+from cqlsh_tests.cqlsh_tools import assert_csv_matches_rows, assert_csvs_items_equal, diff_items
+
+
+class DiffItemsTest(TestCase):
+
+    def test_order_is_ignored(self):
+        x = [['1', 'a'], ['2', 'b'], ['3', 'c']]
+        for num_partitions in (1, 4):
+            self.assertEqual(diff_items(x, reversed(x), num_partitions=num_partitions), (3, 3, []))
+
+    def test_mismatches(self):
+        x = [['1', 'a'], ['2', 'b'], ['2', 'b'], ['3', 'c']]
+        y = [['3', 'c'], ['2', 'b'], ['4', 'd'], ['1', 'a']]
+        for num_partitions in (1, 4):
+            count_x, count_y, diffs = diff_items(iter(x), iter(y), num_partitions=num_partitions)
+            self.assertEqual((count_x, count_y), (4, 4))
+            # a duplicate only on one side is reported with the number of extra copies
+            self.assertEqual(sorted(diffs), [(0, ['2', 'b'], 1), (1, ['4', 'd'], 1)])
+
+    def test_max_diffs(self):
+        x = [[str(i)] for i in range(100)]
+        for num_partitions in (1, 4):
+            count_x, count_y, diffs = diff_items(x, [], num_partitions=num_partitions, max_diffs=5)
+            self.assertEqual(len(diffs), 5)
+            self.assertTrue(all(side == 0 for side, _, _ in diffs))
+
+
+class AssertCsvsTest(TestCase):
+
+    def _write(self, lines):
+        f = tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False)
+        f.write(''.join(line + '\n' for line in lines))
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_assert_csvs_items_equal(self):
+        first = self._write(['1,a', '2,b', '3,c'])
+        assert_csvs_items_equal(first, self._write(['3,c', '1,a', '2,b']))
+        with self.assertRaisesRegex(AssertionError, r"only in .* \(1 times\): 4,d"):
+            assert_csvs_items_equal(first, self._write(['3,c', '1,a', '4,d']))
+        with self.assertRaisesRegex(AssertionError, 'has 3 items, .* has 4 items'):
+            assert_csvs_items_equal(first, self._write(['3,c', '1,a', '2,b', '2,b']))
+
+    def test_large_files_are_partitioned(self):
+        lines = ['{},{}'.format(i, i * 2) for i in range(1000)]
+        first = self._write(lines)
+        with patch.object(cqlsh_tools, 'DIFF_PARTITION_BYTES', 1024):
+            assert_csvs_items_equal(first, self._write(reversed(lines)))
+            with self.assertRaisesRegex(AssertionError, '999,1998'):
+                assert_csvs_items_equal(first, self._write(lines[:-1]))
+
+    def test_assert_csv_matches_rows(self):
+        csv_file = self._write(['1,a', '2,"b,c"'])
+        assert_csv_matches_rows(csv_file, iter([['2', 'b,c'], ['1', 'a']]))
+        with self.assertRaises(AssertionError):
+            assert_csv_matches_rows(csv_file, iter([['1', 'a']]))
@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+from tools.benchmark import BenchmarkResults
+
+
+class BenchmarkResultsTest(TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.results_dir)
+
+    def _results(self, version, sha):
+        return BenchmarkResults('bench', cassandra_version=version, build_sha=sha, results_dir=self.results_dir)
+
+    def test_records_are_persisted(self):
+        results = self._results('4.0', 'a')
+        results.record('test', {'x': 1}, {'rate': 100})
+        results.record('test', {'x': 2}, {'rate': 200})
+        loaded = self._results('4.0', 'b').load()
+        assert [r['metrics']['rate'] for r in loaded] == [100, 200]
+        assert loaded[0]['config'] == {'x': 1}
+        assert loaded[0]['build_sha'] == 'a'
+
+    def test_no_regression_without_baseline(self):
+        results = self._results('4.0', 'a')
+        results.record('test', {'x': 1}, {'rate': 100})
+        assert results.compare_with_baseline(['rate']) == []
+
+    def test_regression_against_previous_build(self):
+        self._results('4.0', 'a').record('test', {'x': 1}, {'rate': 100})
+        results = self._results('4.0', 'b')
+        results.record('test', {'x': 1}, {'rate': 95})
+        results.record('test', {'x': 2}, {'rate': 10})
+        assert results.compare_with_baseline(['rate']) == []
+
+        results.record('test', {'x': 1}, {'rate': 50})
+        regressions = results.compare_with_baseline(['rate'])
+        assert [(r['config'], metric, old, new) for r, metric, old, new in regressions] == [({'x': 1}, 'rate', 100, 50)]
+
+    def test_lower_is_better(self):
+        self._results('4.0', 'a').record('test', {'x': 1}, {'latency': 10})
+        results = self._results('4.0', 'b')
+        results.record('test', {'x': 1}, {'latency': 20})
+        assert results.compare_with_baseline(['latency']) == []
+        assert len(results.compare_with_baseline(['latency'], higher_is_better=False)) == 1
+
+    def test_builds_without_sha_are_told_apart_by_version(self):
+        self._results('3.11', None).record('test', {'x': 1}, {'rate': 100})
+        results = self._results('4.0', None)
+        results.record('test', {'x': 1}, {'rate': 10})
+        assert len(results.compare_with_baseline(['rate'])) == 1
+
+    def test_baseline_from_given_build(self):
+        self._results('4.0', 'a').record('test', {'x': 1}, {'rate': 100})
+        self._results('4.0', 'b').record('test', {'x': 1}, {'rate': 40})
+        results = self._results('4.0', 'c')
+        record = results.record('test', {'x': 1}, {'rate': 50})
+        assert results.compare_with_baseline(['rate']) == []
+        assert len(results.compare_with_baseline(['rate'], build=('4.0', 'a'))) == 1
+
+        # a previous run of the current build
+        later = results.record('test', {'x': 1}, {'rate': 20})
+        regressions = results.compare_with_baseline(['rate'], records=[later], build=('4.0', 'c'))
+        assert [(old, new) for _, _, old, new in regressions] == [(50, 20)]
+        assert record['metrics'] == {'rate': 50}
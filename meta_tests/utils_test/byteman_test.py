@@ -0,0 +1,232 @@
+import os
+import re
+import socketserver
+import tempfile
+import threading
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from ccmlib.node import ToolError
+
+from tools import byteman
+from tools.byteman import (BytemanClient, BytemanError, ScriptValidationCache, attribute_test_script_output,
+                           byteman_validate, scripts_for_version, versioned_script)
+
+RULE = """RULE stop writes
+CLASS org.apache.cassandra.db.Mutation
+METHOD apply
+AT ENTRY
+IF true
+DO return
+ENDRULE"""
+
+
+class FakeListenerHandler(socketserver.StreamRequestHandler):
+    """
+    Answers requests as the listener of the Byteman agent, keeping the loaded scripts by name.
+    Scripts containing "broken" fail to load.
+    """
+
+    def read_scripts(self, end):
+        scripts = {}
+        line = self.rfile.readline().decode().rstrip('\n')
+        while line.startswith('SCRIPT '):
+            name, text = line[len('SCRIPT '):], []
+            line = self.rfile.readline().decode().rstrip('\n')
+            while line != 'ENDSCRIPT':
+                text.append(line)
+                line = self.rfile.readline().decode().rstrip('\n')
+            scripts[name] = '\n'.join(text)
+            line = self.rfile.readline().decode().rstrip('\n')
+        assert line == end, line
+        return scripts
+
+    def handle(self):
+        command = self.rfile.readline().decode().rstrip('\n')
+        self.server.commands.append(command)
+        rules = self.server.rules
+        if command == 'LOAD':
+            scripts = self.read_scripts('ENDLOAD')
+            if any('broken' in text for text in scripts.values()):
+                response = 'ERROR\nrule parse error\n'
+            else:
+                rules.update(scripts)
+                response = ''.join('install rule from {}\n'.format(name) for name in scripts)
+        elif command == 'DELETE':
+            for name in self.read_scripts('ENDDELETE'):
+                rules.pop(name, None)
+            response = ''
+        elif command == 'DELETEALL':
+            rules.clear()
+            response = ''
+        elif command == 'LIST':
+            response = ''.join('# File {}\n{}\n'.format(name, text) for name, text in rules.items())
+        elif command == 'VERSION':
+            response = 'Agent Version: 4.0.2\n'
+        else:
+            response = 'ERROR\nunknown command {}\n'.format(command)
+        self.wfile.write((response + 'OK\n').encode())
+
+
+class FakeNode(object):
+    name = 'node1'
+
+    def __init__(self, port):
+        self.byteman_port = str(port)
+
+
+class BytemanClientTest(TestCase):
+
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeListenerHandler)
+        self.server.daemon_threads = True
+        self.server.commands = []
+        self.server.rules = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = BytemanClient(self.server.server_address[1], address='127.0.0.1')
+
+        directory = tempfile.mkdtemp()
+        self.script = os.path.join(directory, 'stop_writes.btm')
+        with open(self.script, 'w') as f:
+            f.write(RULE)
+        self.broken = os.path.join(directory, 'broken.btm')
+        with open(self.broken, 'w') as f:
+            f.write('RULE broken\n')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_load_list_unload(self):
+        self.assertEqual(self.client.load(self.script), 'install rule from {}'.format(self.script))
+        self.assertEqual(self.server.rules, {self.script: RULE})
+        self.assertIn('RULE stop writes', self.client.list_rules())
+
+        self.client.unload(self.script)
+        self.assertEqual(self.server.rules, {})
+        self.assertEqual(self.server.commands, ['LOAD', 'LIST', 'DELETE'])
+        self.assertEqual(len(self.client.latencies), 3)
+
+    def test_submit_options(self):
+        node = FakeNode(self.server.server_address[1])
+        self.client.submit([self.script])
+        self.assertIn('RULE stop writes', self.client.submit(['-l']))
+        self.client.submit(['-u'])
+        self.assertEqual(self.server.rules, {})
+        self.assertEqual(self.server.commands, ['LOAD', 'LIST', 'DELETEALL'])
+        with self.assertRaises(ValueError):
+            self.client.submit(['-b', self.script])
+
+        client = BytemanClient.for_node(node)
+        self.assertEqual(client.port, self.server.server_address[1])
+        self.assertEqual(client.version(), 'Agent Version: 4.0.2')
+        with self.assertRaises(ValueError):
+            BytemanClient.for_node(FakeNode(0))
+
+    def test_errors(self):
+        with self.assertRaisesRegex(BytemanError, 'rule parse error'):
+            self.client.load(self.script, self.broken)
+        self.assertEqual(self.server.rules, {})
+        # as raised by node.byteman_submit
+        with self.assertRaises(ToolError):
+            self.client.submit([self.broken])
+
+    def test_versioned_script(self):
+        self.assertEqual(versioned_script('stream_failure.btm', '4.0'), './byteman/4.0/stream_failure.btm')
+        self.assertEqual(versioned_script('stream_failure.btm', '3.11.4'), './byteman/pre4.0/stream_failure.btm')
+        for version in ('3.11', '4.0'):
+            self.assertTrue(os.path.exists(versioned_script('stream_failure.btm', version)))
+
+
+class FakeInstallNode(object):
+
+    def __init__(self, install_dir, version='4.0'):
+        self.install_dir = install_dir
+        self.version = version
+
+    def get_install_dir(self):
+        return self.install_dir
+
+    def get_cassandra_version(self):
+        return self.version
+
+
+class ScriptValidationTest(TestCase):
+
+    def test_scripts_for_version(self):
+        scripts = scripts_for_version('4.0')
+        self.assertIn('./byteman/4.0/stream_failure.btm', scripts)
+        self.assertIn('./byteman/read_repair/stop_writes.btm', scripts)
+        self.assertNotIn('./byteman/pre4.0/stream_failure.btm', scripts)
+        self.assertIn('./byteman/pre4.0/stream_failure.btm', scripts_for_version('3.11'))
+
+    def test_attribute_output(self):
+        scripts = [('a.btm', 'RULE stop writes\nENDRULE\n'),
+                   ('b.btm', 'RULE sleep\nENDRULE\n'),
+                   ('c.btm', 'RULE stop writes\nENDRULE\nRULE delay\nENDRULE\n')]
+        out = '\n'.join(['Checking rule stop writes against class Mutation',
+                         'Type checked rule "stop writes"',
+                         'Checking rule sleep against class Stage',
+                         'Checking rule sleep against class OtherStage',
+                         'Checking rule stop writes against class Mutation',
+                         'ERROR : Failed to type check rule "stop writes"',
+                         'Checking rule delay against class Stage',
+                         'TestScript: 1 total errors'])
+        self.assertEqual(attribute_test_script_output(out, scripts),
+                         {'a.btm': ['Type checked rule "stop writes"'],
+                          'b.btm': [],
+                          'c.btm': ['ERROR : Failed to type check rule "stop writes"']})
+
+        # the rule of b.btm wasn't checked, its output could be in the section of a.btm
+        out = '\n'.join(['Checking rule stop writes against class Mutation',
+                         'ERROR : no matching class',
+                         'Checking rule delay against class Stage'])
+        self.assertEqual(attribute_test_script_output(out, scripts[:1] + [scripts[1], ('d.btm', 'RULE delay\n')]),
+                         {'d.btm': []})
+
+        # consecutive rules of the same name can't be told from a rule checked against two classes
+        out = 'Checking rule sleep against class A\nChecking rule sleep against class B\n'
+        self.assertEqual(attribute_test_script_output(out, [('b.btm', 'RULE sleep\n'), ('e.btm', 'RULE sleep\n')]), {})
+
+        self.assertEqual(attribute_test_script_output('ERROR : Failed to parse a.btm', scripts), {})
+
+    def test_validation_is_cached(self):
+        runs = []
+
+        def run_test_script(node, paths):
+            runs.append(paths)
+            sections = []
+            for path in paths:
+                with open(path) as f:
+                    for name in re.findall(r'^RULE (.+)$', f.read(), re.MULTILINE):
+                        sections.append('Checking rule {} against class C'.format(name))
+                        sections.append('ERROR : broken' if 'broken' in path else 'Type checked rule')
+            return '\n'.join(sections)
+
+        install_dir = tempfile.mkdtemp()
+        jar = os.path.join(install_dir, 'build', 'apache-cassandra-4.0.jar')
+        os.makedirs(os.path.dirname(jar))
+        with open(jar, 'wb') as f:
+            f.write(b'classes')
+        node = FakeInstallNode(install_dir)
+        broken = os.path.join(install_dir, 'broken.btm')
+        with open(broken, 'w') as f:
+            f.write('RULE broken script\nENDRULE\n')
+
+        cache = ScriptValidationCache()
+        with patch.object(byteman, 'validation_cache', cache), \
+                patch.object(cache, '_run_test_script', side_effect=run_test_script):
+            with self.assertRaisesRegex(AssertionError, "didn't compile"):
+                byteman_validate(node, broken)
+            byteman_validate(node, './byteman/read_repair/stop_writes.btm')
+            byteman_validate(node, './byteman/4.0/stream_failure.btm')
+            self.assertEqual(len(runs), 1)
+            self.assertIn(broken, runs[0])
+            self.assertNotIn('./byteman/pre4.0/stream_failure.btm', runs[0])
+
+            # a new build is validated again
+            with open(jar, 'wb') as f:
+                f.write(b'new classes')
+            cache.validate(node, './byteman/stop_writes.btm')
+            self.assertEqual(len(runs), 2)
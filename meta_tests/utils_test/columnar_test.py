@@ -0,0 +1,113 @@
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from tools import columnar
+from tools.columnar import (assert_column_values, assert_columns_equal, column_sum, equal_mask,
+                            fetch_columns, mismatch_indices)
+
+
+class FakeResultSet(list):
+
+    def __init__(self, column_names, rows):
+        super(FakeResultSet, self).__init__(rows)
+        self.column_names = column_names
+
+
+class FakeSession(object):
+
+    def __init__(self, column_names, rows):
+        self.result = FakeResultSet(column_names, rows)
+        self.executed = []
+
+    def execution_profile_clone_update(self, name, **kwargs):
+        return kwargs
+
+    def execute(self, query, parameters=None, execution_profile=None):
+        self.executed.append((query, parameters, execution_profile))
+        return self.result
+
+
+class FetchColumnsTest(TestCase):
+
+    @patch.object(columnar, 'COLUMNAR_SUPPORTED', False)
+    def test_fallback_to_rows(self):
+        session = FakeSession(['k', 'c'], [(1, 10), (2, 20), (3, None)])
+        columns = fetch_columns(session, 'SELECT k, c FROM t')
+        self.assertEqual(list(columns), ['k', 'c'])
+        self.assertEqual(list(columns['k']), [1, 2, 3])
+        self.assertEqual(list(columns['c']), [10, 20, None])
+        self.assertIs(session.executed[0][2]['row_factory'], columnar.tuple_factory)
+
+    @patch.object(columnar, 'COLUMNAR_SUPPORTED', False)
+    def test_empty_result(self):
+        columns = fetch_columns(FakeSession(['k', 'c'], []), 'SELECT k, c FROM t')
+        self.assertEqual(dict(columns), {'k': [], 'c': []})
+
+    @skipUnless(columnar.COLUMNAR_SUPPORTED, 'the driver does not support numpy results')
+    def test_pages_are_concatenated(self):
+        numpy = columnar.numpy
+        pages = [{'k': numpy.array([1, 2]), 'c': numpy.ma.masked_array([10, 0], mask=[False, True])},
+                 {'k': numpy.array([3]), 'c': numpy.ma.masked_array([30], mask=[False])}]
+        session = FakeSession(['k', 'c'], pages)
+        session.client_protocol_handler = None
+        columns = fetch_columns(session, 'SELECT k, c FROM t')
+        self.assertIsNone(session.client_protocol_handler)
+        self.assertEqual(columns['k'].tolist(), [1, 2, 3])
+        self.assertEqual(columns['c'].tolist(), [10, None, 30])
+        self.assertEqual(column_sum(columns['c']), 40)
+
+    @patch.object(columnar, 'COLUMNAR_SUPPORTED', False)
+    def test_columnar_results_unsupported(self):
+        with self.assertRaises(RuntimeError):
+            with columnar.columnar_results(FakeSession([], [])):
+                pass
+
+
+class ComparisonTest(TestCase):
+
+    def check_comparisons(self):
+        self.assertEqual(column_sum([1, 2, None, 4]), 7)
+        self.assertEqual(list(equal_mask([1, 2, 3], 2)), [False, True, False])
+        self.assertEqual(list(equal_mask([1, 2, None], [1, 3, None])), [True, False, False])
+        self.assertEqual(mismatch_indices([5, 5, 4, 5, 6], 5), [2, 4])
+
+        assert_columns_equal([1, 1, 1], 1)
+        with self.assertRaisesRegex(AssertionError, r'1 of 3 values differ: b: expected 2, got 3'):
+            assert_columns_equal([1, 3, 2], [1, 2, 2], keys=['a', 'b', 'c'])
+        with self.assertRaisesRegex(AssertionError, 'Expected 2 values, got 3'):
+            assert_columns_equal([1, 1, 1], [1, 1])
+
+    def test_comparisons(self):
+        with patch.object(columnar, 'numpy', None):
+            self.check_comparisons()
+
+    @skipUnless(columnar.numpy is not None, 'numpy is not installed')
+    def test_numpy_comparisons(self):
+        self.check_comparisons()
+        numpy = columnar.numpy
+        values = numpy.ma.masked_array([1, 2, 3], mask=[False, True, False])
+        self.assertEqual(column_sum(values), 4)
+        self.assertEqual(mismatch_indices(values, numpy.array([1, 2, 3])), [1])
+        assert_column_values({'k': numpy.array(['b', 'a']), 'c': numpy.array([2, 1])}, 'k', 'c', {'a': 1},
+                             ignore_unexpected=True)
+
+    def test_column_values(self):
+        columns = {'k1': ['a', 'a', 'b'], 'k2': [1, 2, 1], 'c': [3, 4, 5]}
+        assert_column_values(columns, ('k1', 'k2'), 'c', {('a', 1): 3, ('a', 2): 4, ('b', 1): 5})
+        assert_column_values({'k': ['b', 'a'], 'c': [2, 1]}, 'k', 'c', {'a': 1, 'b': 2})
+
+        with self.assertRaisesRegex(AssertionError, r"1 rows are missing: \['c'\]"):
+            assert_column_values({'k': ['b', 'a'], 'c': [2, 1]}, 'k', 'c', {'a': 1, 'b': 2, 'c': 3})
+        with self.assertRaisesRegex(AssertionError, r"1 rows are unexpected: \['b'\]"):
+            assert_column_values({'k': ['b', 'a'], 'c': [2, 1]}, 'k', 'c', {'a': 1})
+        with self.assertRaisesRegex(AssertionError, 'a: expected 2, got 1'):
+            assert_column_values({'k': ['b', 'a'], 'c': [2, 1]}, 'k', 'c', {'a': 2, 'b': 2})
+
+    def test_column_values_ignoring_unexpected_rows(self):
+        columns = {'k1': ['a', 'a', 'b'], 'k2': [1, 2, 1], 'c': [3, 4, 5]}
+        assert_column_values(columns, ('k1', 'k2'), 'c', {('a', 1): 3, ('b', 1): 5}, ignore_unexpected=True)
+
+        with self.assertRaisesRegex(AssertionError, 'b: expected 4, got 2'):
+            assert_column_values({'k': ['b', 'a'], 'c': [2, 1]}, 'k', 'c', {'b': 4}, ignore_unexpected=True)
+        with self.assertRaisesRegex(AssertionError, r"1 rows are missing: \['c'\]"):
+            assert_column_values({'k': ['b', 'a'], 'c': [2, 1]}, 'k', 'c', {'a': 1, 'c': 3}, ignore_unexpected=True)
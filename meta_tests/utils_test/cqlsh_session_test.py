@@ -0,0 +1,111 @@
+import os
+import stat
+import sys
+import tempfile
+
+from unittest import TestCase
+
+from tools.cqlsh_session import CqlshSession, runs_once
+
+SCHEMA_VERSIONS = ('5a69a4d5-6c3e-3a21-b2fa-0e8d1b3f1b9a', 'f6b0a0c2-3b8e-3d6a-9a2e-6f1e2c4d8b7e')
+
+# answers SHOW VERSION as cqlsh does, the schema version with the content of $HOME/schema_version,
+# and writes a large error for each other command
+FAKE_CQLSH = """#!{python}
+import os
+import sys
+
+for number, line in enumerate(sys.stdin, 1):
+    command = line.strip().rstrip(';')
+    if command.upper() == 'SHOW VERSION':
+        sys.stdout.write('[cqlsh 5.0.1 | Cassandra 4.0 | CQL spec 3.4.5 | Native protocol v4]\\n')
+    elif command == 'SELECT schema_version FROM system.local':
+        with open(os.path.join(os.environ['HOME'], 'schema_version')) as f:
+            sys.stdout.write('\\n schema_version\\n----\\n {{}}\\n\\n(1 rows)\\n'.format(f.read()))
+    elif command.upper() == 'QUIT':
+        break
+    elif command:
+        sys.stderr.write(('<stdin>:{{}}:bad input '.format(number) * 10000) + '\\n')
+        sys.stdout.write('ran {{}}\\n'.format(command))
+    sys.stdout.flush()
+    sys.stderr.flush()
+"""
+
+
+class FakeNode(object):
+    network_interfaces = {'binary': ('127.0.0.1', 9042)}
+
+    def __init__(self, cqlsh):
+        self.cqlsh = cqlsh
+
+    def get_base_cassandra_version(self):
+        return 4.0
+
+    def get_tool(self, name):
+        return self.cqlsh
+
+
+class CqlshSessionTest(TestCase):
+
+    def setUp(self):
+        if not CqlshSession.supported:
+            self.skipTest('cqlsh sessions need a pty')
+        directory = tempfile.mkdtemp()
+        cqlsh = os.path.join(directory, 'cqlsh')
+        with open(cqlsh, 'w') as f:
+            f.write(FAKE_CQLSH.format(python=sys.executable))
+        os.chmod(cqlsh, os.stat(cqlsh).st_mode | stat.S_IEXEC)
+        self.directory = directory
+        self.set_schema_version(SCHEMA_VERSIONS[0])
+        self.session = CqlshSession(FakeNode(cqlsh), env=dict(os.environ, HOME=directory), timeout=20).start()
+
+    def tearDown(self):
+        self.session.close()
+
+    def set_schema_version(self, version):
+        with open(os.path.join(self.directory, 'schema_version'), 'w') as f:
+            f.write(version)
+
+    def test_large_stderr(self):
+        # more than the pipe buffer is written to stderr before the sentinel is answered
+        out, err, rc = self.session.run_cqlsh('COPY ks.t FROM STDIN; SELECT 1')
+        self.assertEqual(out, 'ran COPY ks.t FROM STDIN\nran SELECT 1\n')
+        self.assertEqual(err.count('bad input'), 20000)
+        # line numbers are relative to the batch
+        self.assertTrue(err.startswith('<stdin>:1:bad input'))
+
+        out, err, _ = self.session.run_cqlsh('SELECT 2')
+        self.assertEqual(out, 'ran SELECT 2\n')
+        self.assertTrue(err.startswith('<stdin>:1:bad input'))
+
+    def test_restart_after_schema_change(self):
+        pid = self.session.process.pid
+        self.session.run_cqlsh('SELECT 1')
+        self.session.run_cqlsh('DESCRIBE TABLES')
+        self.assertEqual(self.session.process.pid, pid)
+
+        # another client changed the schema: COPY and DESCRIBE need a new process, other commands don't
+        self.set_schema_version(SCHEMA_VERSIONS[1])
+        self.session.run_cqlsh('SELECT 2')
+        self.assertEqual(self.session.process.pid, pid)
+        out, err, _ = self.session.run_cqlsh('COPY ks.t TO STDOUT')
+        self.assertNotEqual(self.session.process.pid, pid)
+        self.assertEqual(out, 'ran COPY ks.t TO STDOUT\n')
+        self.assertTrue(err.startswith('<stdin>:1:bad input'))
+
+        pid = self.session.process.pid
+        self.session.run_cqlsh('DESC KEYSPACES')
+        self.assertEqual(self.session.process.pid, pid)
+
+
+class RunsOnceTest(TestCase):
+
+    def test_runs_once(self):
+        self.assertFalse(runs_once('SELECT 1', ['--debug']))
+        self.assertFalse(runs_once('SELECT 1', None))
+        self.assertTrue(runs_once('', ['--debug']))
+        self.assertTrue(runs_once(None, None))
+        self.assertTrue(runs_once('SELECT 1', ['-f', 'cmds.cql']))
+        self.assertTrue(runs_once('SELECT 1', ['--file=cmds.cql']))
+        self.assertTrue(runs_once('SELECT 1', ['-e', 'SELECT 2']))
+        self.assertTrue(runs_once('SELECT 1', ['--execute=SELECT 2']))
@@ -0,0 +1,70 @@
+import uuid
+from collections import namedtuple
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from cassandra.cqltypes import Int32Type, UTF8Type, UUIDType
+
+from tools import datahelp
+from tools.datahelp import compile_table, coercers_for, create_rows, parse_data_into_dicts
+
+Column = namedtuple('Column', 'name type')
+
+DATA = """
+      | id | value   |
+      +----+---------+
+      | 1  | testing |
+    *3| 2  | more    |
+      | 3  |         |
+    """
+
+
+class CompiledTableTest(TestCase):
+
+    def test_compiled_once(self):
+        self.assertIs(compile_table(DATA), compile_table(DATA))
+
+    def test_rows(self):
+        table = compile_table(DATA)
+        self.assertEqual(table.headers, ('id', 'value'))
+        self.assertEqual(len(table), 5)
+        expected = [{'id': '1', 'value': 'testing'}, {'id': '2', 'value': 'more'}, {'id': '2', 'value': 'more'},
+                    {'id': '2', 'value': 'more'}, {'id': '3', 'value': ''}]
+        self.assertEqual(parse_data_into_dicts(DATA), expected)
+
+    def test_multiplied_rows_formatted_separately(self):
+        dicts = parse_data_into_dicts(DATA, format_funcs={'id': lambda v: uuid.uuid4()})
+        self.assertEqual(len(set(d['id'] for d in dicts)), 5)
+
+    def test_coercion(self):
+        coercers = coercers_for([Column('id', Int32Type), Column('value', UTF8Type), Column('u', UUIDType)])
+        self.assertEqual(set(coercers), {'id', 'u'})
+        dicts = list(compile_table(DATA).iter_dicts(coercers=coercers))
+        self.assertEqual([d['id'] for d in dicts], [1, 2, 2, 2, 3])
+        self.assertEqual(coercers['id'](''), None)
+
+    def test_format_funcs_have_priority_over_coercion(self):
+        coercers = coercers_for([Column('id', Int32Type)])
+        dicts = list(compile_table(DATA).iter_dicts(format_funcs={'id': str}, coercers=coercers))
+        self.assertEqual(dicts[0]['id'], '1')
+
+
+class CreateRowsTest(TestCase):
+
+    def _create_rows(self, return_rows):
+        session = Mock()
+        session.prepare.return_value.column_metadata = [Column('id', Int32Type), Column('value', UTF8Type)]
+        with patch.object(datahelp, 'execute_concurrent_with_args') as execute:
+            execute.side_effect = lambda session, statement, parameters, results_generator: iter(list(parameters))
+            rows = create_rows(DATA, session, 'ks.t', return_rows=return_rows)
+        return rows, execute.call_args[1]['results_generator']
+
+    def test_return_rows(self):
+        rows, results_generator = self._create_rows(return_rows=True)
+        self.assertEqual([row['id'] for row in rows], [1, 2, 2, 2, 3])
+        self.assertFalse(results_generator)
+
+    def test_streamed_results(self):
+        rows, results_generator = self._create_rows(return_rows=False)
+        self.assertIsNone(rows)
+        self.assertTrue(results_generator)
@@ -0,0 +1,76 @@
+from collections import OrderedDict, namedtuple
+from unittest import TestCase
+
+from meta_tests.utils_test.token_scan_test import FakeSession, Token
+from tools.divergence import ReplicaDivergenceDetector
+
+Host = namedtuple('Host', 'address')
+
+
+class FakeNode(object):
+
+    def __init__(self, name, address):
+        self.name = name
+        self._address = address
+
+    def address(self):
+        return self._address
+
+
+class FakeTokenMap(object):
+    """
+    A ring of two tokens, 0 owned by 127.0.0.1 and 2^62 by 127.0.0.2, with two replicas per range
+    when rf is 2.
+    """
+    ring = [Token(0), Token(2 ** 62)]
+    token_class = Token
+
+    def __init__(self, rf):
+        self.rf = rf
+
+    def get_replicas(self, keyspace, token):
+        owners = ['127.0.0.1', '127.0.0.2']
+        first = 0 if token.value <= 0 or token.value > 2 ** 62 else 1
+        return [Host(owners[(first + i) % 2]) for i in range(self.rf)]
+
+
+def fake_session(rows, rf):
+    session = FakeSession(rows, ring=[])
+    session.cluster.metadata.token_map = FakeTokenMap(rf)
+    return session
+
+
+class ReplicaDivergenceDetectorTest(TestCase):
+
+    rows = [(token, 'value') for token in range(-2 ** 63 + 1, 2 ** 63, 2 ** 59 + 7)]
+
+    def detector(self, node2_rows, rf=2, min_ranges=4):
+        node1, node2 = FakeNode('node1', '127.0.0.1'), FakeNode('node2', '127.0.0.2')
+        sessions = OrderedDict([(node1, fake_session(self.rows, rf)), (node2, fake_session(node2_rows, rf))])
+        return ReplicaDivergenceDetector(sessions, 'ks', 't', min_ranges=min_ranges)
+
+    def test_replica_ranges(self):
+        ranges = list(self.detector(self.rows, rf=1, min_ranges=1).replica_ranges().values())
+        self.assertEqual(ranges, [[(-2 ** 63, 0), (2 ** 62, 2 ** 63 - 1)], [(0, 2 ** 62)]])
+        ranges = list(self.detector(self.rows, rf=2, min_ranges=1).replica_ranges().values())
+        self.assertEqual(ranges[0], ranges[1])
+
+    def test_converged(self):
+        detector = self.detector(list(self.rows))
+        self.assertEqual(detector.divergent_ranges(), [])
+        detector.assert_converged()
+
+    def test_divergent_range(self):
+        missing = self.rows[5]
+        detector = self.detector([row for row in self.rows if row != missing])
+        divergences = detector.divergent_ranges()
+        self.assertEqual(len(divergences), 1)
+        start, end = divergences[0].token_range
+        self.assertTrue(start < missing[0] <= end)
+        digests = divergences[0].digests
+        self.assertEqual(digests['node2'][0], digests['node1'][0] - 1)
+        with self.assertRaisesRegex(AssertionError, 'diverge on 1 token range'):
+            detector.assert_converged()
+
+    def test_ranges_without_other_replica_do_not_diverge(self):
+        self.assertEqual(self.detector([], rf=1).divergent_ranges(), [])
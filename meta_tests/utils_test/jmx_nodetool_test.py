@@ -0,0 +1,175 @@
+import socket
+
+from unittest import TestCase
+from unittest.mock import Mock
+
+from tools.jmx_nodetool import (JmxNodetool, NodetoolStats, OPERATION_TIMEOUT, STORAGE_SERVICE, nodetool_stats,
+                                parse_compactionstats, parse_status, parse_tpstats)
+
+STATUS = """Datacenter: datacenter1
+=======================
+Status=Up/Down
+|/ State=Normal/Leaving/Joining/Moving
+--  Address    Load       Tokens       Owns (effective)  Host ID                               Rack
+UN  127.0.0.1  101.2 KiB  1            66.7%             0b9a4a6a-2a69-4cbb-a14d-9c8d7de1a2a4  rack1
+DL  127.0.0.2  98.05 KiB  1            66.7%             2d4e3f47-91c4-4e87-8c55-cdb0b1f0a7c4  rack1
+"""
+
+TPSTATS = """Pool Name                         Active   Pending      Completed   Blocked  All time blocked
+MutationStage                          0         0             12         0                 0
+ReadStage                              1         2             34         0                 0
+
+Message type           Dropped
+READ                         0
+"""
+
+COMPACTIONSTATS = """pending tasks: 2
+- ks.tbl: 2
+
+id                                   compaction type keyspace table completed total unit  progress
+8f6f9a90-b3f2-11e9-8a4b-5f5c2d0b5a11 Compaction      ks       tbl   1024      4096  bytes 25.00%
+Active compaction remaining time :   0h00m00s
+"""
+
+
+class FakeNode(object):
+    name = 'node1'
+
+    def __init__(self, outputs=None, version='4.0'):
+        self.outputs = outputs or {}
+        self.version = version
+        self.commands = []
+
+    def get_cassandra_version(self):
+        return self.version
+
+    def nodetool(self, command):
+        self.commands.append(command)
+        return self.outputs.get(command, ''), '', 0
+
+
+class FakeJmx(object):
+
+    def __init__(self, running=True, attributes=None, pattern=None, results=None):
+        self.running = running
+        self.attributes = attributes or {}
+        self.pattern = pattern or {}
+        self.results = results or {}
+        self.executed = []
+
+    def is_running(self):
+        return self.running
+
+    def read_attribute(self, mbean, attribute):
+        return self.attributes[(mbean, attribute)]
+
+    def read_many(self, reads):
+        return [self.read_attribute(mbean, attribute) for mbean, attribute in reads]
+
+    def read_pattern(self, pattern):
+        return self.pattern
+
+    def execute_method(self, mbean, operation, arguments):
+        self.executed.append((operation, arguments))
+        return self.results[operation]
+
+    def exec_many(self, operations, timeout=None):
+        self.executed.extend((operation, arguments) for _, operation, arguments in operations)
+        return [None] * len(operations)
+
+
+class ParseTest(TestCase):
+
+    def test_parse_status(self):
+        self.assertEqual(parse_status(STATUS), {'127.0.0.1': 'UN', '127.0.0.2': 'DL'})
+
+    def test_parse_tpstats(self):
+        pools = parse_tpstats(TPSTATS)
+        self.assertEqual(list(pools), ['MutationStage', 'ReadStage'])
+        self.assertEqual(pools['ReadStage'], {'Active': 1, 'Pending': 2, 'Completed': 34, 'Blocked': 0,
+                                              'All time blocked': 0})
+
+    def test_parse_compactionstats(self):
+        self.assertEqual(parse_compactionstats(COMPACTIONSTATS), {'pending': 2, 'active': 1})
+        self.assertEqual(parse_compactionstats('pending tasks: 0\n'), {'pending': 0, 'active': 0})
+
+
+class JmxNodetoolTest(TestCase):
+
+    def setUp(self):
+        nodetool_stats.reset()
+
+    def test_fallback_to_nodetool(self):
+        node = FakeNode({'status': STATUS, 'cfstats ks.t': '\t\tSpace used (total): 1234\n',
+                         'getendpoints ks t 1': '127.0.0.2\n127.0.0.3\n'})
+        nodetool = JmxNodetool(node, jmx=FakeJmx(running=False))
+        self.assertEqual(nodetool.status()['127.0.0.2'], 'DL')
+        self.assertEqual(nodetool.space_used_total('ks', 't'), 1234.0)
+        self.assertEqual(nodetool.getendpoints('ks', 't', 1), ['127.0.0.2', '127.0.0.3'])
+        nodetool.flush('ks', 't')
+        self.assertEqual(node.commands, ['status', 'cfstats ks.t', 'getendpoints ks t 1', 'flush ks t'])
+        self.assertEqual(list(nodetool_stats.by_test().values()), [(0, 4)])
+
+    def test_through_jmx(self):
+        node = FakeNode()
+        jmx = FakeJmx(attributes={(STORAGE_SERVICE, 'Keyspaces'): ['ks', 'system'],
+                                  (STORAGE_SERVICE, 'LiveNodes'): ['127.0.0.1', '127.0.0.3'],
+                                  (STORAGE_SERVICE, 'UnreachableNodes'): ['127.0.0.2'],
+                                  (STORAGE_SERVICE, 'JoiningNodes'): [],
+                                  (STORAGE_SERVICE, 'LeavingNodes'): ['127.0.0.2'],
+                                  (STORAGE_SERVICE, 'MovingNodes'): [],
+                                  ('org.apache.cassandra.metrics:type=Table,keyspace=ks,scope=t,name=TotalDiskSpaceUsed',
+                                   'Count'): 1234},
+                      pattern={'org.apache.cassandra.metrics:type=ThreadPools,path=request,scope=ReadStage,name=PendingTasks':
+                               {'Value': 2},
+                               'org.apache.cassandra.metrics:type=ThreadPools,path=request,scope=ReadStage,name=TotalBlockedTasks':
+                               {'Count': 1}},
+                      results={'getNaturalEndpointsWithPort(java.lang.String,java.lang.String,java.lang.String)':
+                               ['127.0.0.2:7000', '127.0.0.3:7000']})
+        nodetool = JmxNodetool(node, jmx=jmx)
+        self.assertEqual(nodetool.status(), {'127.0.0.1': 'UN', '127.0.0.3': 'UN', '127.0.0.2': 'DL'})
+        self.assertEqual(nodetool.space_used_total('ks', 't'), 1234.0)
+        self.assertEqual(nodetool.tpstats(), {'ReadStage': {'Active': 0, 'Pending': 2, 'Completed': 0, 'Blocked': 0,
+                                                            'All time blocked': 1}})
+        self.assertEqual(nodetool.getendpoints('ks', 't', 1), ['127.0.0.2', '127.0.0.3'])
+
+        nodetool.flush()
+        self.assertEqual(nodetool.nodetool('compact ks t'), ('', '', 0))
+        self.assertEqual(jmx.executed[-3:], [
+            ('forceKeyspaceFlush(java.lang.String,[Ljava.lang.String;)', ['ks', []]),
+            ('forceKeyspaceFlush(java.lang.String,[Ljava.lang.String;)', ['system', []]),
+            ('forceKeyspaceCompaction(boolean,java.lang.String,[Ljava.lang.String;)', [False, 'ks', ['t']])])
+
+        self.assertEqual(node.commands, [])
+        self.assertEqual(nodetool_stats.launches_avoided(), 6)
+
+    def test_failed_jmx_call_falls_back(self):
+        node = FakeNode({'compactionstats': COMPACTIONSTATS})
+        nodetool = JmxNodetool(node, jmx=FakeJmx())
+        self.assertEqual(nodetool.compactionstats(), {'pending': 2, 'active': 1})
+        self.assertEqual(node.commands, ['compactionstats'])
+
+    def test_timed_out_operation_is_not_run_again(self):
+        node = FakeNode()
+        jmx = FakeJmx()
+        jmx.exec_many = Mock(side_effect=socket.timeout('timed out'))
+        with self.assertRaises(socket.timeout):
+            JmxNodetool(node, jmx=jmx).compact('ks', 't')
+        self.assertEqual(jmx.exec_many.call_args[1], {'timeout': OPERATION_TIMEOUT})
+        self.assertEqual(node.commands, [])
+
+    def test_unsupported_commands_run_nodetool(self):
+        node = FakeNode()
+        nodetool = JmxNodetool(node, jmx=FakeJmx())
+        nodetool.nodetool('flush -- ks')
+        nodetool.nodetool('repair ks')
+        self.assertEqual(node.commands, ['flush -- ks', 'repair ks'])
+
+    def test_stats(self):
+        stats = NodetoolStats()
+        stats.record(True, test='t1')
+        stats.record(True, test='t1')
+        stats.record(False, test='t1')
+        self.assertEqual(stats.by_test(), {'t1': (2, 1)})
+        self.assertEqual(stats.launches_avoided('t1'), 2)
+        self.assertEqual(stats.launches_avoided('t2'), 0)
@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+from tools import jmxutils
+from tools.jmxutils import JolokiaAgent, install_jolokia_javaagent, make_mbean
+
+MBEAN = make_mbean('metrics', type='ReadRepair', name='RepairedBlocking')
+
+
+class FakeJolokiaHandler(BaseHTTPRequestHandler):
+    """
+    Answers Jolokia requests: reads return the requested attribute name, execs return their arguments,
+    and unknown mbeans are not found.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def answer(self, request):
+        self.server.requests.append(request)
+        if request['type'] == 'version':
+            return {'status': 200, 'value': {'agent': '1.2.3'}}
+        if 'Unknown' in request['mbean']:
+            return {'status': 404, 'error': 'javax.management.InstanceNotFoundException', 'stacktrace': ''}
+        if request['type'] == 'exec':
+            return {'status': 200, 'value': request['arguments']}
+        if request['mbean'].endswith('*'):
+            return {'status': 200, 'value': {MBEAN: {request['attribute']: 1}}}
+        return {'status': 200, 'value': request.get('attribute')}
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        if self.server.dropped_requests > 0:
+            # as if the connection was lost once the request was received
+            self.server.dropped_requests -= 1
+            self.server.requests.extend(body if isinstance(body, list) else [body])
+            self.close_connection = True
+            return
+        if isinstance(body, list):
+            response = [self.answer(request) for request in body]
+        else:
+            response = self.answer(body)
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeNode(object):
+    network_interfaces = {'binary': ('127.0.0.1', 9042)}
+    pid = 1234
+
+    def __init__(self):
+        self.environment_variables = {}
+
+    def set_environment_variable(self, key, value):
+        self.environment_variables[key] = value
+
+    def get_env(self):
+        return dict(os.environ, **self.environment_variables)
+
+
+class JolokiaAgentTest(TestCase):
+
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), FakeJolokiaHandler)
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.dropped_requests = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.jmx = JolokiaAgent(FakeNode())
+        self.jmx.port = self.server.server_address[1]
+
+    def tearDown(self):
+        self.jmx.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_is_kept_alive(self):
+        for _ in range(5):
+            self.assertEqual(self.jmx.read_attribute(MBEAN, 'Count'), 'Count')
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(len(self.jmx.latencies), 5)
+
+    def test_reconnects_after_close(self):
+        self.jmx.read_attribute(MBEAN, 'Count')
+        self.jmx.close()
+        self.jmx.read_attribute(MBEAN, 'Count')
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_reads_are_retried_on_a_lost_connection(self):
+        self.jmx.read_attribute(MBEAN, 'Count')
+        self.server.dropped_requests = 1
+        self.assertEqual(self.jmx.read_many([(MBEAN, 'Count'), (MBEAN, 'Value')]), ['Count', 'Value'])
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_execs_are_not_sent_twice(self):
+        self.jmx.read_attribute(MBEAN, 'Count')
+        self.server.dropped_requests = 1
+        with self.assertRaises(ConnectionError):
+            self.jmx.exec_many([(MBEAN, 'forceFlush', ['ks'])])
+        self.assertEqual([request['type'] for request in self.server.requests], ['read', 'exec'])
+        self.assertEqual(self.jmx.exec_many([(MBEAN, 'forceFlush', ['ks'])]), [['ks']])
+
+    def test_exec_timeout(self):
+        self.jmx.read_attribute(MBEAN, 'Count')
+        self.jmx.exec_many([(MBEAN, 'forceFlush', ['ks'])], timeout=600)
+        self.assertEqual(self.jmx._connection.sock.gettimeout(), 600)
+        self.jmx.read_attribute(MBEAN, 'Count')
+        self.assertEqual(self.jmx._connection.sock.gettimeout(), self.jmx.timeout)
+
+    def test_read_many(self):
+        values = self.jmx.read_many([(MBEAN, 'Count'), (MBEAN, 'Value', 'used'), (MBEAN, None)])
+        self.assertEqual(values, ['Count', 'Value', None])
+        self.assertEqual(len(self.jmx.latencies), 1)
+        self.assertEqual(self.server.requests[1], {'type': 'read', 'mbean': MBEAN, 'attribute': 'Value', 'path': 'used'})
+        self.assertEqual(self.jmx.read_many([]), [])
+
+    def test_exec_many(self):
+        results = self.jmx.exec_many([(MBEAN, 'forceFlush', ['ks']), (MBEAN, 'reset')])
+        self.assertEqual(results, [['ks'], []])
+
+    def test_read_pattern(self):
+        self.assertEqual(self.jmx.read_pattern('org.apache.cassandra.metrics:type=ReadRepair,*', 'Count'),
+                         {MBEAN: {'Count': 1}})
+        self.assertEqual(self.jmx.read_pattern('org.apache.cassandra.metrics:type=Unknown,*'), {})
+
+    def test_errors(self):
+        with self.assertRaisesRegex(Exception, 'InstanceNotFoundException'):
+            self.jmx.read_attribute('org.apache.cassandra.db:type=Unknown', 'Count', verbose=False)
+        with self.assertRaisesRegex(Exception, 'InstanceNotFoundException'):
+            self.jmx.read_many([(MBEAN, 'Count'), ('org.apache.cassandra.db:type=Unknown', 'Count')], verbose=False)
+        self.assertEqual(self.jmx.read_many([(MBEAN, 'Count'), ('org.apache.cassandra.db:type=Unknown', 'Count')],
+                                            default=None), ['Count', None])
+
+    @patch.object(jmxutils.subprocess, 'check_output')
+    def test_running_agent_is_reused(self, check_output):
+        self.assertTrue(self.jmx.is_running())
+        self.jmx.start()
+        self.jmx.stop()
+        check_output.assert_not_called()
+
+    @patch.object(jmxutils.subprocess, 'check_output')
+    def test_agent_is_attached(self, check_output):
+        self.jmx.port = 1
+        self.assertFalse(self.jmx.is_running())
+        self.jmx.start()
+        self.jmx.stop()
+        self.jmx.stop()
+        self.assertEqual([call[0][0][-2] for call in check_output.call_args_list], ['start', 'stop'])
+
+    def test_install_javaagent(self):
+        node = FakeNode()
+        install_jolokia_javaagent(node)
+        with patch.dict(os.environ, {'JVM_EXTRA_OPTS': '-XX:-PerfDisableSharedMem'}):
+            node.set_environment_variable('JVM_EXTRA_OPTS', '-Dcassandra.test=true')
+            install_jolokia_javaagent(node)
+            install_jolokia_javaagent(node)
+        option = node.environment_variables['JVM_EXTRA_OPTS']
+        self.assertRegex(option, r'^-Dcassandra.test=true -javaagent:/.*jolokia-jvm-1.2.3-agent.jar=host=127.0.0.1,port=8778$')
+
+        node = FakeNode()
+        with patch.dict(os.environ, {'JVM_EXTRA_OPTS': '-XX:-PerfDisableSharedMem'}):
+            install_jolokia_javaagent(node)
+        option = node.environment_variables['JVM_EXTRA_OPTS']
+        self.assertRegex(option, r'^-XX:-PerfDisableSharedMem -javaagent:/.*jolokia-jvm-1.2.3-agent.jar=host=127.0.0.1,port=8778$')
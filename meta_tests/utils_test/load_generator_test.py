@@ -0,0 +1,172 @@
+import threading
+
+from collections import namedtuple
+from unittest import TestCase
+from unittest.mock import patch
+
+from ccmlib.node import ToolError
+
+from tools import load_generator
+from tools.load_generator import (COLUMNS, JavaRandom, LoadGenerator, StressOptions, parse_stress_options,
+                                  schema_statements, should_run_in_process, stress_key, stress_values)
+from tools.stress import parse_stress_summary
+
+Row = namedtuple('Row', ['key'] + COLUMNS)
+
+
+class FakeFuture(object):
+    """
+    Completes from another thread, or right away when `synchronous`.
+    """
+
+    def __init__(self, result, synchronous):
+        self.result = result
+        self.synchronous = synchronous
+
+    def add_callbacks(self, callback, errback, callback_args=(), errback_args=()):
+        def complete():
+            if isinstance(self.result, Exception):
+                errback(self.result, *errback_args)
+            else:
+                callback(self.result, *callback_args)
+        if self.synchronous:
+            complete()
+        else:
+            threading.Thread(target=complete).start()
+
+
+class FakeSession(object):
+    """
+    Stores the rows inserted into standard1, and fails the first attempt of each key in `flaky`.
+    """
+
+    def __init__(self, synchronous=False, flaky=()):
+        self.rows = {}
+        self.executed = []
+        self.synchronous = synchronous
+        self.flaky = set(flaky)
+        self._lock = threading.Lock()
+
+    def execute(self, statement, timeout=None):
+        self.executed.append(statement)
+
+    def prepare(self, query):
+        return query
+
+    def execute_async(self, statement, parameters):
+        with self._lock:
+            if parameters[0] in self.flaky:
+                self.flaky.remove(parameters[0])
+                return FakeFuture(Exception('WriteTimeout'), self.synchronous)
+            if statement.startswith('INSERT'):
+                self.rows[parameters[0]] = Row(*parameters)
+                result = []
+            else:
+                result = [self.rows[parameters[0]]] if parameters[0] in self.rows else []
+        return FakeFuture(result, self.synchronous)
+
+
+class FakeCluster(object):
+
+    def shutdown(self):
+        pass
+
+
+class FakeNode(object):
+
+    def __init__(self):
+        self.cluster = FakeCluster()
+
+    def get_cassandra_version(self):
+        return '4.0'
+
+
+class ParseStressOptionsTest(TestCase):
+
+    def test_supported_options(self):
+        self.assertEqual(parse_stress_options(['write', 'n=10K', 'no-warmup', 'cl=TWO', '-schema', 'replication(factor=2)',
+                                               'compaction(strategy=LeveledCompactionStrategy,enabled=false)',
+                                               '-rate', 'threads=8']),
+                         StressOptions('write', 10000, 'TWO', 8, [('factor', '2')],
+                                       [('strategy', 'LeveledCompactionStrategy'), ('enabled', 'false')]))
+        self.assertEqual(parse_stress_options(['read', 'n=1k']).n, 1000)
+
+    def test_unsupported_options(self):
+        for options in (['user', 'profile=x.yaml', 'n=1K'], ['write', 'err<0.9', 'n>1'], ['write'],
+                        ['write', 'n=1K', '-pop', 'seq=1..1K'], ['write', 'n=1K', '-mode', 'native', 'cql3'],
+                        ['write', 'n=1K', 'cl=SOMETIMES'], ['write', 'n=1K', '-rate', 'throttle=100/s']):
+            self.assertIsNone(parse_stress_options(options), options)
+
+    def test_schema(self):
+        options = parse_stress_options(['write', 'n=1', '-schema', 'replication(factor=3)',
+                                        'compaction(strategy=SizeTieredCompactionStrategy,enabled=false)'])
+        keyspace, table = schema_statements(options, '4.0')
+        self.assertIn("{'class': 'SimpleStrategy', 'replication_factor': '3'}", keyspace)
+        self.assertEqual(table, 'CREATE TABLE IF NOT EXISTS keyspace1.standard1 (key blob PRIMARY KEY, "C0" blob, '
+                                '"C1" blob, "C2" blob, "C3" blob, "C4" blob) WITH compaction = '
+                                "{'class': 'SizeTieredCompactionStrategy', 'enabled': 'false'}")
+        options = parse_stress_options(['write', 'n=1', '-schema', 'replication(strategy=NetworkTopologyStrategy,dc1=2)'])
+        keyspace, table = schema_statements(options, '3.11')
+        self.assertIn("{'class': 'NetworkTopologyStrategy', 'dc1': '2'}", keyspace)
+        self.assertTrue(table.endswith('WITH COMPACT STORAGE'))
+
+    def test_java_random(self):
+        # the values of new Random(seed).nextInt(), nextDouble() and nextLong() in Java
+        self.assertEqual(JavaRandom(42).next(32), -1170105035)
+        self.assertEqual(JavaRandom(42).next_double(), 0.7275636800328681)
+        self.assertEqual(JavaRandom(0).next_long(), -4962768465676381896)
+
+    def test_keys_and_values(self):
+        # the first partitions written by cassandra-stress write n=3
+        self.assertEqual([stress_key(seed) for seed in range(1, 4)], [b'1N3K6L16M0', b'0P2PN216M0', b'M3M35K06M0'])
+        self.assertEqual(stress_values(1)[0].hex(),
+                         'a8027fc67304637cd21f2837c3d47c4cbd1ad4fcf4bd3d3b0be5bd87c0a7ac0c610d')
+        self.assertEqual(stress_values(3)[4].hex(),
+                         'd3e1567b31243b8dcc5de6657d271ef8434d9e42fd565660d1ccb84e4c2ee9afc66f')
+
+        keys = set(stress_key(seed) for seed in range(1, 1001))
+        self.assertEqual(len(keys), 1000)
+        for key in keys:
+            self.assertRegex(key, rb'^[0-9K-P]{10}$')
+        self.assertEqual(stress_values(7), stress_values(7))
+        self.assertEqual([len(v) for v in stress_values(7)], [34] * 5)
+        self.assertEqual(len(set(stress_values(7))), 5)
+
+    def test_should_run_in_process(self):
+        self.assertTrue(should_run_in_process(['write', 'n=10K']))
+        self.assertTrue(should_run_in_process(['read', 'n=1K']))
+        self.assertFalse(should_run_in_process(['write', 'n=100K']))
+        self.assertFalse(should_run_in_process(['write', 'n=1K', '-pop', 'seq=1..1K']))
+        self.assertFalse(should_run_in_process(['user', 'profile=x.yaml', 'ops(insert=1)', 'n=1K']))
+        with patch.object(load_generator, 'IN_PROCESS_MAX_OPERATIONS', 0):
+            self.assertFalse(should_run_in_process(['write', 'n=1']))
+
+
+class LoadGeneratorTest(TestCase):
+
+    def _run(self, session, options):
+        with patch.object(LoadGenerator, '_session', return_value=(FakeCluster(), session)):
+            return LoadGenerator(FakeNode()).run(options)
+
+    def test_write_then_read(self):
+        for synchronous in (False, True):
+            session = FakeSession(synchronous=synchronous, flaky=[stress_key(3)])
+            out, err, rc = self._run(session, ['write', 'n=500', '-rate', 'threads=7'])
+            self.assertEqual(len(session.rows), 500)
+            self.assertEqual(session.rows[stress_key(1)][1:], tuple(stress_values(1)))
+            summary = parse_stress_summary(out)
+            self.assertEqual((summary.total_partitions, summary.total_errors), (500, 0))
+            self.assertEqual(summary.by_operation['op_rate'].keys(), {'WRITE'})
+            self.assertEqual(len(session.executed), 2)
+
+            out, _, _ = self._run(session, ['read', 'n=500', 'cl=ONE'])
+            self.assertEqual(parse_stress_summary(out).total_errors, 0)
+
+    def test_read_failures(self):
+        session = FakeSession()
+        self._run(session, ['write', 'n=10'])
+        with self.assertRaisesRegex(ToolError, 'No data returned'):
+            self._run(session, ['read', 'n=11'])
+        session.rows[stress_key(2)] = Row(stress_key(2), *([b'x'] * 5))
+        with self.assertRaisesRegex(ToolError, 'Data returned was not validated'):
+            self._run(session, ['read', 'n=10'])
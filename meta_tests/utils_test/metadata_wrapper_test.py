@@ -3,7 +3,8 @@ from collections import defaultdict
 from unittest import TestCase
 
 from mock import MagicMock, Mock
-from tools.metadata_wrapper import (UpdatingClusterMetadataWrapper,
+from tools.metadata_wrapper import (SchemaVersionTracker,
+                                    UpdatingClusterMetadataWrapper,
                                     UpdatingKeyspaceMetadataWrapper,
                                     UpdatingMetadataWrapperBase,
                                     UpdatingTableMetadataWrapper)
@@ -225,3 +226,50 @@ class UpdatingClusterMetadataWrapperTest(TestCase):
                 self.max_schema_agreement_wait_sentinel
             )
         )
+
+
+class SchemaVersionTrackerTest(TestCase):
+
+    def setUp(self):
+        self.cluster_mock = MagicMock()
+        self.session_mock = MagicMock(is_shutdown=False)
+        self.cluster_mock.sessions = [self.session_mock]
+        self.cluster_mock.metadata.all_hosts.return_value = [Mock(is_up=True), Mock(is_up=True), Mock(is_up=False)]
+        self.versions = ['v1', 'v1']
+        self.session_mock.execute.side_effect = lambda statement, host: [(self.versions.pop(0),)]
+        self.tracker = SchemaVersionTracker(self.cluster_mock)
+
+    def test_schema_versions_of_live_nodes(self):
+        self.versions = ['v1', 'v2']
+        self.assertEqual(self.tracker.schema_versions(), {'v1', 'v2'})
+        self.assertEqual(self.session_mock.execute.call_count, 2)
+
+    def test_refresh_avoided_while_schema_unchanged(self):
+        refresh = Mock()
+        self.tracker.refresh('target', refresh)
+        self.versions = ['v1', 'v1']
+        self.tracker.refresh('target', refresh)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual((self.tracker.refreshes, self.tracker.refreshes_avoided), (1, 1))
+
+        # another target was never refreshed
+        self.versions = ['v1', 'v1']
+        self.tracker.refresh('other', refresh)
+        self.assertEqual(refresh.call_count, 2)
+
+    def test_refresh_when_schema_changed_or_disagreed(self):
+        refresh = Mock()
+        self.tracker.refresh('target', refresh)
+        self.versions = ['v1', 'v2']
+        self.tracker.refresh('target', refresh)
+        self.versions = ['v2', 'v2']
+        self.tracker.refresh('target', refresh)
+        self.assertEqual(refresh.call_count, 3)
+        self.assertEqual(self.tracker.refreshes_avoided, 0)
+
+    def test_always_refresh_without_session(self):
+        self.cluster_mock.sessions = []
+        refresh = Mock()
+        self.tracker.refresh('target', refresh)
+        self.tracker.refresh('target', refresh)
+        self.assertEqual(refresh.call_count, 2)
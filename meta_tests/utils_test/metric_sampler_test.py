@@ -0,0 +1,134 @@
+import csv
+import os
+import tempfile
+import time
+
+from unittest import TestCase
+
+from tools.metric_sampler import MetricSampler, SampledMetric, percentile
+
+METRICS = [SampledMetric('pending', 'org.apache.cassandra.metrics:type=Compaction,name=PendingTasks', 'Value', None),
+           SampledMetric('heap', 'java.lang:type=Memory', 'HeapMemoryUsage', 'used')]
+
+
+class FakeNode(object):
+
+    def __init__(self, name, running=True):
+        self.name = name
+        self.pid = 100
+        self.running = running
+
+    def is_running(self):
+        return self.running
+
+
+class FakeCluster(object):
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def nodelist(self):
+        return self.nodes
+
+
+class FakeAgent(object):
+    """
+    Returns the number of the sample as pending compactions, the heap is not readable. Once
+    `detached` is set, as when a test stops the agent the sampler reused, requests fail.
+    """
+    started = []
+    detached = False
+
+    def __init__(self, node):
+        self.node = node
+        self.reads = 0
+        self.stopped = False
+
+    def is_running(self):
+        return not FakeAgent.detached
+
+    def start(self):
+        if self.node.name == 'broken':
+            raise Exception('could not attach')
+        FakeAgent.started.append((self.node.name, self.node.pid))
+        FakeAgent.detached = False
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        pass
+
+    def read_many(self, reads, verbose=True, default=None):
+        if FakeAgent.detached:
+            raise ConnectionRefusedError()
+        self.reads += 1
+        return [self.reads, default]
+
+
+class MetricSamplerTest(TestCase):
+
+    def setUp(self):
+        FakeAgent.started = []
+        FakeAgent.detached = False
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2, 4], 50), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 99), 99)
+        self.assertEqual(percentile([5], 99), 5)
+
+    def test_sample(self):
+        node1, node2, broken = FakeNode('node1'), FakeNode('node2', running=False), FakeNode('broken')
+        sampler = MetricSampler(FakeCluster([node1, node2, broken]), metrics=METRICS, agent_class=FakeAgent)
+        for _ in range(4):
+            sampler.sample()
+        self.assertEqual(list(sampler.samples), ['node1'])
+        self.assertEqual([values for _, values in sampler.samples['node1']], [[1, None], [2, None], [3, None], [4, None]])
+        self.assertEqual(FakeAgent.started, [('node1', 100)])
+
+        # a restarted node gets a new agent
+        node1.pid = 101
+        sampler.sample()
+        self.assertEqual(FakeAgent.started, [('node1', 100), ('node1', 101)])
+        self.assertEqual(sampler.samples['node1'][-1][1], [1, None])
+
+        sampler.stop()
+        self.assertEqual(sampler._agents, {})
+
+    def test_reattach_after_agent_stopped(self):
+        node1 = FakeNode('node1')
+        sampler = MetricSampler(FakeCluster([node1]), metrics=METRICS, agent_class=FakeAgent)
+        sampler.sample()
+
+        # the agent went away although the node wasn't restarted
+        FakeAgent.detached = True
+        sampler.sample()
+        self.assertEqual(sampler._agents, {})
+        sampler.sample()
+        self.assertEqual(FakeAgent.started, [('node1', 100), ('node1', 100)])
+        self.assertEqual([values for _, values in sampler.samples['node1']], [[1, None], [1, None]])
+
+    def test_summary_and_write(self):
+        sampler = MetricSampler(FakeCluster([FakeNode('node1')]), metrics=METRICS, agent_class=FakeAgent)
+        for _ in range(10):
+            sampler.sample()
+        self.assertEqual(sampler.summary(), {'node1': {'pending': {'max': 10, 'p50': 5, 'p99': 10}}})
+        self.assertIn(('node1.pending.max', 10), sampler.summary_properties())
+
+        directory = tempfile.mkdtemp()
+        paths = sampler.write(directory)
+        self.assertEqual(paths, [os.path.join(directory, 'node1_metrics.csv')])
+        with open(paths[0]) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ['seconds', 'pending', 'heap'])
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[1][1:], ['1', ''])
+
+    def test_background_sampling(self):
+        sampler = MetricSampler(FakeCluster([FakeNode('node1')]), metrics=METRICS, interval=0.01,
+                                agent_class=FakeAgent).start()
+        while len(sampler.samples.get('node1', [])) < 3:
+            time.sleep(0.01)
+        sampler.stop()
+        self.assertTrue(sampler.samples['node1'][0][0] <= sampler.samples['node1'][-1][0])
+        self.assertTrue(FakeAgent.started)
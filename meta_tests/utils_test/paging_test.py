@@ -0,0 +1,70 @@
+import threading
+from unittest import TestCase
+
+from tools.paging import PageFetcher
+
+
+class FakeResponseFuture(object):
+    """
+    Delivers the given pages from another thread, like the driver's ResponseFuture.
+    """
+
+    def __init__(self, pages, error=None):
+        self.pages = list(pages)
+        self.error = error
+        self.callback = None
+        self.errback = None
+
+    def add_callbacks(self, callback, errback):
+        self.callback, self.errback = callback, errback
+        self._deliver()
+
+    @property
+    def has_more_pages(self):
+        return bool(self.pages) or self.error is not None
+
+    def start_fetching_next_page(self):
+        self._deliver()
+
+    def _deliver(self):
+        if self.pages:
+            threading.Timer(0.01, self.callback, [self.pages.pop(0)]).start()
+        elif self.error is not None:
+            error, self.error = self.error, None
+            threading.Timer(0.01, self._errback, [error]).start()
+
+    def _errback(self, error):
+        try:
+            self.errback(error)
+        except Exception:
+            pass
+
+
+class PageFetcherTest(TestCase):
+
+    def test_request_all(self):
+        pf = PageFetcher(FakeResponseFuture([[1, 2], [3, 4], [5], []])).request_all()
+        self.assertEqual(pf.pagecount(), 3)
+        self.assertEqual(pf.num_results_all(), [2, 2, 1])
+        self.assertEqual(pf.all_data(), [1, 2, 3, 4, 5])
+        self.assertEqual(pf.retrieved_empty_pages, 1)
+
+    def test_stats(self):
+        pf = PageFetcher(FakeResponseFuture([[1, 2], [3], []])).request_all()
+        stats = pf.stats()
+        self.assertEqual((stats['pages'], stats['empty_pages'], stats['rows']), (2, 1, 3))
+        self.assertEqual(len(pf.latencies), 3)
+        self.assertTrue(0 < stats['min_latency'] <= stats['median_latency'] <= stats['max_latency'])
+
+    def test_summaries_only(self):
+        pf = PageFetcher(FakeResponseFuture([[1, 2], [3]]), keep_rows=False).request_all()
+        self.assertEqual(pf.num_results_all(), [2, 1])
+        self.assertIsNone(pf.pages[0].data)
+        with self.assertRaises(RuntimeError):
+            pf.all_data()
+
+    def test_error_wakes_up_wait(self):
+        pf = PageFetcher(FakeResponseFuture([[1]], error=ValueError('node down')))
+        with self.assertRaisesRegex(RuntimeError, 'Requested pages were not delivered before timeout.*node down'):
+            pf.request_all(timeout=60)
+        self.assertIsInstance(pf.error, ValueError)
@@ -0,0 +1,146 @@
+from unittest import TestCase
+
+from tools import placement
+from tools.placement import PlacementOracle, Replica, Ring, parse_replication_factor
+from tools.tokens import Partitioner
+
+
+class FakeHost(object):
+
+    def __init__(self, address, is_up=True):
+        self.address = address
+        self.is_up = is_up
+
+
+class FakeRows(list):
+
+    def one(self):
+        return self[0]
+
+
+class FakeSession(object):
+    """
+    Answers the queries of system.local and system.peers as each node of a three node cluster would,
+    from the node given as host, or from the next node in round robin order otherwise.
+    """
+
+    def __init__(self, hosts):
+        self.hosts = hosts
+        self.cluster = type('Cluster', (), {'metadata': type('Metadata', (), {'all_hosts': lambda _: hosts})()})
+        self.coordinators = []
+        self.tokens = {'127.0.0.1': ['-100'], '127.0.0.2': ['0'], '127.0.0.3': ['100']}
+
+    def execute(self, query, host=None):
+        if host is None:
+            host = self.hosts[len(self.coordinators) % len(self.hosts)]
+        self.coordinators.append(host.address)
+        if 'system.local' in query:
+            return FakeRows([(host.address, 'dc1', 'rack1', self.tokens[host.address])])
+        return FakeRows([(address, 'dc1', 'rack1', tokens) for address, tokens in self.tokens.items()
+                         if address != host.address])
+
+
+def simple_ring(*tokens):
+    owners = dict((token, '127.0.0.{}'.format(i + 1)) for i, token in enumerate(tokens))
+    return Ring(owners, dict((address, 'dc1') for address in owners.values()))
+
+
+class RingTest(TestCase):
+
+    def test_position_wraps_around(self):
+        ring = simple_ring(-100, 0, 100)
+        self.assertEqual(ring.position(-150), 0)
+        self.assertEqual(ring.position(-100), 0)
+        self.assertEqual(ring.position(-99), 1)
+        self.assertEqual(ring.position(100), 2)
+        self.assertEqual(ring.position(101), 0)
+
+    def test_version(self):
+        self.assertEqual(simple_ring(-100, 0, 100), simple_ring(-100, 0, 100))
+        self.assertNotEqual(simple_ring(-100, 0, 100), simple_ring(100, 0, -100))
+        self.assertNotEqual(simple_ring(-100, 0, 100).version, simple_ring(-100, 0, 101).version)
+
+    def test_equality_compares_rings(self):
+        ring = simple_ring(-100, 0, 100)
+        other = simple_ring(-100, 0, 101)
+        other.version = ring.version
+        self.assertNotEqual(ring, other)
+
+    def test_from_session_reads_a_single_node(self):
+        hosts = [FakeHost('127.0.0.1', is_up=False), FakeHost('127.0.0.2'), FakeHost('127.0.0.3')]
+        session = FakeSession(hosts)
+        ring = Ring.from_session(session)
+        self.assertEqual(session.coordinators, ['127.0.0.2', '127.0.0.2'])
+        self.assertEqual(ring, simple_ring(-100, 0, 100))
+
+        session = FakeSession(hosts)
+        self.assertEqual(Ring.from_session(session, host=hosts[2]), simple_ring(-100, 0, 100))
+        self.assertEqual(session.coordinators, ['127.0.0.3', '127.0.0.3'])
+
+    def test_parse_replication_factor(self):
+        self.assertEqual(parse_replication_factor(3), (3, 0))
+        self.assertEqual(parse_replication_factor('3/1'), (3, 1))
+
+
+class PlacementOracleTest(TestCase):
+
+    def test_simple_strategy(self):
+        oracle = PlacementOracle(simple_ring(-100, 0, 100),
+                                 {'ks': {'class': 'org.apache.cassandra.locator.SimpleStrategy', 'replication_factor': '2'}})
+        self.assertEqual(oracle.endpoints('ks', -100), ['127.0.0.1', '127.0.0.2'])
+        self.assertEqual(oracle.endpoints('ks', 50), ['127.0.0.3', '127.0.0.1'])
+        self.assertEqual(oracle.endpoints('ks', 200), ['127.0.0.1', '127.0.0.2'])
+
+    def test_replication_factor_larger_than_the_cluster(self):
+        oracle = PlacementOracle(simple_ring(-100, 0, 100), {'ks': {'class': 'SimpleStrategy', 'replication_factor': 5}})
+        self.assertEqual(oracle.endpoints('ks', 0), ['127.0.0.2', '127.0.0.3', '127.0.0.1'])
+
+    def test_transient_replicas(self):
+        oracle = PlacementOracle(simple_ring(-100, 0, 100), {'ks': {'class': 'SimpleStrategy', 'replication_factor': '3/1'}})
+        self.assertEqual(oracle.replicas('ks', 0), [Replica('127.0.0.2', True), Replica('127.0.0.3', True),
+                                                    Replica('127.0.0.1', False)])
+        self.assertEqual(oracle.endpoints('ks', 0, full=False), ['127.0.0.1'])
+
+    def test_network_topology_strategy(self):
+        # dc1 has two racks, whose nodes alternate on the ring, dc2 has a single rack
+        owners = {0: 'a1', 10: 'b1', 20: 'a2', 30: 'b2', 40: 'a3', 50: 'b3', 60: 'a4'}
+        datacenters = {'a1': 'dc1', 'a2': 'dc1', 'a3': 'dc1', 'a4': 'dc1', 'b1': 'dc2', 'b2': 'dc2', 'b3': 'dc2'}
+        racks = {'a1': 'r1', 'a2': 'r1', 'a3': 'r2', 'a4': 'r2', 'b1': 'r1', 'b2': 'r1', 'b3': 'r1'}
+        oracle = PlacementOracle(Ring(owners, datacenters, racks),
+                                 {'ks': {'class': 'NetworkTopologyStrategy', 'dc1': '2', 'dc2': '2'},
+                                  'ks3': {'class': 'NetworkTopologyStrategy', 'dc1': '3'},
+                                  'transient': {'class': 'NetworkTopologyStrategy', 'dc2': '3/1'}})
+        # a2 is skipped as a1 already is in rack r1
+        self.assertEqual(oracle.endpoints('ks', 0), ['a1', 'b1', 'b2', 'a3'])
+        # the third replica of dc1 repeats a rack
+        self.assertEqual(oracle.endpoints('ks3', 0), ['a1', 'a2', 'a3'])
+        self.assertEqual(oracle.endpoints('ks3', 45), ['a4', 'a1', 'a2'])
+        self.assertEqual(oracle.replicas('transient', 55), [Replica('b1', True), Replica('b2', True),
+                                                            Replica('b3', False)])
+
+    def test_placements_are_cached(self):
+        placement._placements.cache_clear()
+        oracle = PlacementOracle(simple_ring(-100, 0, 100), {'ks': {'class': 'SimpleStrategy', 'replication_factor': 2}})
+        for token in range(-200, 200):
+            oracle.endpoints('ks', token)
+        PlacementOracle(simple_ring(-100, 0, 100), {'other': {'class': 'SimpleStrategy', 'replication_factor': 2}})\
+            .endpoints('other', 0)
+        self.assertEqual(placement._placements.cache_info().misses, 1)
+
+    def test_unknown_keyspace(self):
+        oracle = PlacementOracle(simple_ring(0))
+        with self.assertRaises(KeyError):
+            oracle.endpoints('ks', 0)
+        with self.assertRaises(ValueError):
+            oracle.refresh()
+
+    def test_replicas_by_endpoint(self):
+        tokens = Partitioner.for_name('Murmur3Partitioner', 'int').token_map(range(10))
+        oracle = PlacementOracle(simple_ring(-2 ** 62, 0, 2 ** 62),
+                                 {'ks': {'class': 'SimpleStrategy', 'replication_factor': 1}})
+        by_endpoint = oracle.replicas_by_endpoint('ks', range(10), 'int')
+        self.assertEqual(list(by_endpoint), ['127.0.0.1', '127.0.0.2', '127.0.0.3'])
+        self.assertEqual(sorted(sum(by_endpoint.values(), [])), list(range(10)))
+        for address, keys in by_endpoint.items():
+            for key in keys:
+                self.assertEqual(oracle.endpoints('ks', tokens[key]), [address])
@@ -0,0 +1,23 @@
+import threading
+from unittest import TestCase
+
+from tools.schema import SchemaDisagreement, wait_for_schema_agreement
+
+
+class WaitForSchemaAgreementTest(TestCase):
+
+    def test_returns_once_versions_agree(self):
+        versions = [None, {'v1', 'v2'}, {'v2'}]
+        wait_for_schema_agreement(lambda: versions.pop(0), timeout=10, poll_interval=0.01)
+        self.assertEqual(versions, [])
+
+    def test_raises_on_timeout(self):
+        with self.assertRaisesRegex(SchemaDisagreement, 'v1'):
+            wait_for_schema_agreement(lambda: {'v1', 'v2'}, timeout=0.05, poll_interval=0.01)
+
+    def test_schema_change_wakes_up_wait(self):
+        changed = threading.Event()
+        versions = [{'v1', 'v2'}, {'v2'}]
+        threading.Timer(0.05, changed.set).start()
+        waited = wait_for_schema_agreement(lambda: versions.pop(0), timeout=60, changed=changed, poll_interval=30)
+        self.assertLess(waited, 10)
@@ -0,0 +1,41 @@
+import threading
+import time
+from unittest import TestCase
+
+from tools.sleep_profiler import SleepProfiler
+
+
+class SleepProfilerTest(TestCase):
+
+    def setUp(self):
+        self.profiler = SleepProfiler().install()
+
+    def tearDown(self):
+        self.profiler.uninstall()
+
+    def test_records_sleeps_per_call_site(self):
+        time.sleep(0.01)
+        time.sleep(0.01)
+        sites = self.profiler.stats.by_site()
+        self.assertEqual(len(sites), 2)
+        for site, (calls, _, seconds) in sites.items():
+            self.assertIn('test_records_sleeps_per_call_site', site)
+            self.assertEqual(calls, 1)
+            self.assertGreaterEqual(seconds, 0.01)
+
+    def test_ignores_background_threads(self):
+        thread = threading.Thread(target=time.sleep, args=(0.01,))
+        thread.start()
+        thread.join()
+        self.assertEqual(self.profiler.stats.by_site(), {})
+
+    def test_uninstall_restores_sleep(self):
+        self.profiler.uninstall()
+        self.assertNotEqual(time.sleep, self.profiler._sleep)
+        self.assertTrue(callable(time.sleep))
+
+    def test_report(self):
+        time.sleep(0.01)
+        report = self.profiler.report()
+        self.assertTrue(report[0].startswith('Slept 0.0s in 1 call(s)'))
+        self.assertIn('test_report', '\n'.join(report))
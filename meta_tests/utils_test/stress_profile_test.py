@@ -0,0 +1,272 @@
+import os
+import random
+import tempfile
+import threading
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from tools import stress_profile
+from tools.stress import parse_stress_summary
+from tools.stress_profile import (ProfileLoadGenerator, ProfileTable, ProfileWorkload, StressProfile, column_value,
+                                  parse_distribution, parse_ratio, parse_user_options, query_columns)
+
+# the profile of bootstrap_test.test_local_quorum_bootstrap, with a clustering column
+USERS_PROFILE = """
+        keyspace: keyspace1
+        keyspace_definition: |
+          CREATE KEYSPACE keyspace1 WITH replication = {'class': 'NetworkTopologyStrategy', 'dc1': 1, 'dc2': 1};
+        table: users
+        table_definition:
+          CREATE TABLE users (
+            username text,
+            login int,
+            email text,
+            PRIMARY KEY(username, login)
+          ) WITH compaction = {'class':'SizeTieredCompactionStrategy'};
+        columnspec:
+          - name: username
+            population: uniform(1..3)
+          - name: login
+            cluster: fixed(4)
+          - name: email
+            size: fixed(20)
+        insert:
+          partitions: fixed(1)
+          batchtype: UNLOGGED
+        queries:
+          read:
+            cql: select * from users where username = ? and login = ?
+            fields: samerow
+          logins:
+            cql: select * from users where username = ?
+            fields: multirow
+        """
+
+USERS_TABLE = ProfileTable([('username', 'text')], [('login', 'int')], [('email', 'text')])
+
+
+class FakeBatch(object):
+
+    def __init__(self, batch_type):
+        self.batch_type = batch_type
+        self.statements = []
+
+    def add(self, statement, parameters):
+        self.statements.append((statement, parameters))
+
+
+class FakeFuture(object):
+
+    def __init__(self, result):
+        self.result = result
+
+    def add_callbacks(self, callback, errback, callback_args=(), errback_args=()):
+        threading.Thread(target=callback, args=(self.result,) + tuple(callback_args)).start()
+
+
+class FakeSession(object):
+    """
+    Keeps the rows inserted into the users table, and answers the queries with the rows matching
+    their bound columns.
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, query):
+        return query
+
+    def execute_async(self, statement, parameters):
+        with self._lock:
+            if isinstance(statement, FakeBatch):
+                inserts = [parameters for _, parameters in statement.statements]
+            elif statement.startswith('INSERT'):
+                inserts = [parameters]
+            else:
+                inserts = []
+                bound = dict(zip(query_columns(statement), parameters))
+                rows = [row for row in self.rows.values() if all(row[c] == v for c, v in bound.items())]
+                self.hits += 1 if rows else 0
+                return FakeFuture(rows)
+            for username, login, email in inserts:
+                self.rows[(username, login)] = {'username': username, 'login': login, 'email': email}
+        return FakeFuture([])
+
+
+class DistributionTest(TestCase):
+
+    def test_parse(self):
+        self.assertEqual((parse_distribution('fixed(1M)').min, parse_distribution('FIXED(1M)').max), (10 ** 6, 10 ** 6))
+        uniform = parse_distribution('uniform(1..100B)')
+        self.assertEqual((uniform.kind, uniform.min, uniform.max), ('uniform', 1, 100 * 10 ** 9))
+        self.assertEqual(parse_distribution('gauss(1..10,2)').parameters, (2,))
+        self.assertEqual(parse_distribution('weibull(1..1K,0.5)').kind, 'extreme')
+        self.assertTrue(parse_distribution('~exp(1..100)').inverted)
+        for spec in ('zipf(1..10)', 'fixed(1..10)', 'uniform(10)', 'extreme(1..10)', 'fixed(x)'):
+            with self.assertRaises(ValueError):
+                parse_distribution(spec)
+
+        distribution, divisor = parse_ratio('fixed(10)/10')
+        self.assertEqual((distribution.min, divisor), (10, 10))
+        self.assertEqual(parse_ratio('uniform(1..2)')[1], 1)
+
+    def test_sample(self):
+        rand = random.Random(0)
+        for spec in ('uniform(5..10)', 'gaussian(5..10,3)', 'gaussian(5..10,9,4)', 'exp(5..10)', 'extr(5..10,1.5)',
+                     '~exp(5..10)'):
+            values = [parse_distribution(spec).sample(rand) for _ in range(1000)]
+            self.assertTrue(all(5 <= v <= 10 for v in values), spec)
+        self.assertEqual(set(parse_distribution('uniform(5..6)').sample(rand) for _ in range(100)), {5, 6})
+        seq = parse_distribution('seq(1..3)')
+        self.assertEqual([seq.sample(rand) for _ in range(5)], [1, 2, 3, 1, 2])
+        exp = [parse_distribution('exp(1..1000)').sample(rand) for _ in range(1000)]
+        self.assertGreater(sorted(exp)[500], 50)
+        self.assertLess(sorted(exp)[500], 200)
+
+
+class StressProfileTest(TestCase):
+
+    def test_load(self):
+        profile = StressProfile.load('stress_profiles/repair_wide_rows.yaml')
+        self.assertEqual((profile.keyspace, profile.table), ('stresscql', 'typestest'))
+        self.assertEqual(profile.column('col1').cluster.max, 10 ** 6)
+        self.assertEqual(profile.column('val').size.max, 1000)
+        self.assertEqual(profile.column('unknown').size.max, 8)
+        self.assertEqual(profile.insert['batchtype'], 'LOGGED')
+        self.assertEqual(list(profile.queries), ['simple1'])
+
+        profile = StressProfile.from_yaml(USERS_PROFILE)
+        self.assertTrue(profile.table_definition.startswith('CREATE TABLE users ( username text'))
+        self.assertEqual(profile.insert['batchtype'], 'UNLOGGED')
+        self.assertEqual(profile.queries['logins'].fields, 'multirow')
+
+    def test_parse_user_options(self):
+        options = parse_user_options(['user', 'profile=users.yaml', 'ops(insert=1,read=2)', 'n=500K', 'no-warmup',
+                                      'cl=LOCAL_QUORUM', '-rate', 'threads=5', '-errors', 'retries=2',
+                                      '-insert', 'visits=FIXED(100K)', 'revisit=FIXED(10)'])
+        self.assertEqual((options.profile, options.n), ('users.yaml', 500000))
+        self.assertEqual(options.ops, [('insert', 1), ('read', 2)])
+        self.assertEqual((options.consistency_level, options.threads, options.retries), ('LOCAL_QUORUM', 5, 2))
+        self.assertEqual((options.visits.max, options.revisit.max), (100000, 10))
+        for unsupported in (['user', 'profile=a.yaml', 'n=1'],
+                            ['user', 'profile=a.yaml', 'ops(insert=1)', 'duration=1m'],
+                            ['user', 'profile=a.yaml', 'ops(insert=1)', 'n=1', '-insert', 'partitions=FIXED(2)'],
+                            ['write', 'n=1']):
+            self.assertIsNone(parse_user_options(unsupported), unsupported)
+
+    def test_query_columns(self):
+        self.assertEqual(query_columns('select * from typestest where key = ? and col1 = ? LIMIT 100'), ['key', 'col1'])
+        self.assertEqual(query_columns('SELECT * FROM t WHERE "Key" = ? AND c >= ?'), ['Key', 'c'])
+        with self.assertRaises(ValueError):
+            query_columns('select * from t where token(key) > ?')
+
+    def test_column_value(self):
+        spec = StressProfile.from_yaml(USERS_PROFILE).column('email')
+        self.assertEqual(column_value('email', 'text', spec, 7), column_value('email', 'text', spec, 7))
+        self.assertNotEqual(column_value('email', 'text', spec, 7), column_value('email', 'text', spec, 8))
+        self.assertEqual(len(column_value('email', 'text', spec, 7)), 20)
+        self.assertIsInstance(column_value('login', 'int', spec, 7), int)
+        with self.assertRaises(ValueError):
+            column_value('emails', 'set<text>', spec, 7)
+
+
+class ProfileWorkloadTest(TestCase):
+
+    def test_inserts_and_queries(self):
+        profile = StressProfile.from_yaml(USERS_PROFILE)
+        session = FakeSession()
+        # every partition is fully written before the queries
+        with patch.object(stress_profile, 'BatchStatement', FakeBatch):
+            inserts = ProfileWorkload(profile, USERS_TABLE, {'insert': 1}, 30)
+            operations = list(inserts.operations(session))
+        self.assertEqual(set(o.rows for o in operations), {4})
+        self.assertEqual(set(o.statement.batch_type for o in operations), {stress_profile.BatchType.UNLOGGED})
+        for operation in operations:
+            session.execute_async(operation.statement, operation.parameters)
+        self.assertEqual(len(session.rows), 12)
+        self.assertEqual(set(len(row['email']) for row in session.rows.values()), {20})
+
+        queries = ProfileWorkload(profile, USERS_TABLE, {'read': 1, 'logins': 1}, 100)
+        for operation in queries.operations(session):
+            self.assertIn(operation.name, ('read', 'logins'))
+            session.execute_async(operation.statement, operation.parameters)
+        self.assertEqual(session.hits, 100)
+
+    def test_visits_and_select(self):
+        profile = StressProfile.load('stress_profiles/repair_wide_rows.yaml')
+        table = ProfileTable([('key', 'text')], [('col1', 'text')], [('val', 'blob')])
+        with patch.object(stress_profile, 'BatchStatement', FakeBatch):
+            workload = ProfileWorkload(profile, table, [('insert', 1)], 3, visits=parse_distribution('FIXED(100K)'))
+            operations = list(workload.operations(FakeSession()))
+        # a single partition of 1M rows, written 10 rows at a time
+        self.assertEqual(set(o.key for o in operations), {operations[0].key})
+        self.assertEqual(len(operations[0].key), 10)
+        self.assertEqual([o.rows for o in operations], [10, 10, 10])
+        rows = [parameters for o in operations for _, parameters in o.statement.statements]
+        self.assertEqual(len(set(row[1] for row in rows)), 30)
+        self.assertEqual(set(len(row[2]) for row in rows), {1000})
+
+        with self.assertRaises(ValueError):
+            ProfileWorkload(profile, table, [('scan', 1)], 1)
+        with self.assertRaises(ValueError):
+            ProfileWorkload(profile, ProfileTable([('key', 'text')], [], [('tags', 'set<text>')]), [('insert', 1)], 1)
+
+    def test_revisit(self):
+        profile = StressProfile.from_yaml(USERS_PROFILE.replace('uniform(1..3)', 'uniform(1..1B)'))
+        with patch.object(stress_profile, 'BatchStatement', FakeBatch):
+            # each partition is written in two inserts, to at most three partitions at a time
+            workload = ProfileWorkload(profile, USERS_TABLE, [('insert', 1)], 60, visits=parse_distribution('FIXED(2)'),
+                                       revisit=parse_distribution('FIXED(3)'))
+            keys = [o.key for o in workload.operations(FakeSession())]
+        visits = {}
+        for key in keys:
+            visits[key] = visits.get(key, 0) + 1
+            self.assertLessEqual(visits[key], 2)
+            self.assertLessEqual(sum(1 for count in visits.values() if count == 1), 3)
+        self.assertGreater(sum(1 for count in visits.values() if count == 2), 25)
+        # without revisits, every insert goes to a new partition
+        with patch.object(stress_profile, 'BatchStatement', FakeBatch):
+            workload = ProfileWorkload(profile, USERS_TABLE, [('insert', 1)], 60, visits=parse_distribution('FIXED(2)'),
+                                       revisit=parse_distribution('FIXED(100)'))
+            keys = [o.key for o in workload.operations(FakeSession())]
+        self.assertEqual(len(set(keys)), 60)
+
+
+class FakeCluster(object):
+    metadata = None
+
+    def shutdown(self):
+        pass
+
+
+class FakeNode(object):
+
+    def get_cassandra_version(self):
+        return '4.0'
+
+
+class ProfileLoadGeneratorTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.profile = os.path.join(directory, 'users.yaml')
+        with open(self.profile, 'w') as f:
+            f.write(USERS_PROFILE)
+
+    def test_run(self):
+        session = FakeSession()
+        generator = ProfileLoadGenerator(FakeNode())
+        with patch.object(ProfileLoadGenerator, '_session', return_value=(FakeCluster(), session)), \
+                patch.object(ProfileLoadGenerator, '_create_schema'), \
+                patch.object(stress_profile, 'profile_table', return_value=USERS_TABLE), \
+                patch.object(stress_profile, 'BatchStatement', FakeBatch):
+            out, err, rc = generator.run(['user', 'profile=' + self.profile, 'ops(insert=1,read=1)', 'n=200',
+                                          '-rate', 'threads=4'])
+        summary = parse_stress_summary(out)
+        self.assertEqual((summary.total_partitions, summary.total_errors, rc), (200, 0, 0))
+        self.assertEqual(set(summary.by_operation['op_rate']), {'insert', 'read'})
+        self.assertEqual(sum(h.count for h in generator.histograms.values()), 200)
+        self.assertGreater(summary.row_rate, summary.op_rate)
@@ -0,0 +1,147 @@
+import shutil
+import tempfile
+
+from unittest import TestCase
+from unittest.mock import patch
+
+from tools.load_generator import LoadGenerator
+from tools.stress import StressRecorder, parse_stress_summary, run_stress, stress_recorder
+
+STRESS_4_0 = b"""******************** Stress Settings ********************
+Command:
+  Type: write
+Results:
+Op rate                   :   11,349 op/s  [WRITE: 11,349 op/s]
+Partition rate            :   11,349 pk/s  [WRITE: 11,349 pk/s]
+Row rate                  :   11,349 row/s [WRITE: 11,349 row/s]
+Latency mean              :    4.3 ms [WRITE: 4.3 ms]
+Latency median            :    2.6 ms [WRITE: 2.6 ms]
+Latency 95th percentile   :   12.5 ms [WRITE: 12.5 ms]
+Latency 99th percentile   :   28.3 ms [WRITE: 28.3 ms]
+Latency 99.9th percentile :   67.1 ms [WRITE: 67.1 ms]
+Latency max               :  115.1 ms [WRITE: 115.1 ms]
+Total partitions          :    100,000 [WRITE: 100,000]
+Total errors              :          0 [WRITE: 0]
+Total GC count            : 2
+Total GC memory           : 1.235 GiB
+Total GC time             :    0.1 seconds
+Avg GC time               :   52.5 ms
+StdDev GC time            :    2.5 ms
+Total operation time      : 00:01:08
+
+END
+"""
+
+STRESS_3_0 = """Results:
+op rate                   : 9817 [READ:4900, WRITE:4917]
+partition rate            : 9817 [READ:4900, WRITE:4917]
+row rate                  : 9817 [READ:4900, WRITE:4917]
+latency mean              : 5.1 [READ:5.3, WRITE:4.9]
+latency median            : 3.2 [READ:3.3, WRITE:3.1]
+latency 95th percentile   : 14.0 [READ:14.5, WRITE:13.2]
+latency 99th percentile   : 31.4 [READ:32.0, WRITE:30.1]
+latency 99.9th percentile : 70.2 [READ:71.0, WRITE:68.8]
+latency max               : 150.3 [READ:150.3, WRITE:120.4]
+Total partitions          : 10000 [READ:5000, WRITE:5000]
+Total errors              : 3 [READ:3, WRITE:0]
+total gc count            : 0
+total gc mb               : 0
+total gc time (s)         : 0
+avg gc time(ms)           : NaN
+stdev gc time(ms)         : 0
+Total operation time      : 00:00:01
+"""
+
+
+class FakeCluster(object):
+    pass
+
+
+class FakeNode(object):
+
+    def __init__(self, output, install_dir):
+        self.output = output
+        self.install_dir = install_dir
+        self.cluster = FakeCluster()
+        self.calls = []
+
+    def stress(self, options, whitelist=False):
+        self.calls.append((options, whitelist))
+        return self.output, b'', 0
+
+    def get_cassandra_version(self):
+        return '4.0'
+
+    def get_install_dir(self):
+        return self.install_dir
+
+
+class ParseStressSummaryTest(TestCase):
+
+    def test_parse_4_0(self):
+        summary = parse_stress_summary(STRESS_4_0)
+        self.assertEqual(summary.op_rate, 11349)
+        self.assertEqual(summary.latency_p99_ms, 28.3)
+        self.assertEqual(summary.latency_max_ms, 115.1)
+        self.assertEqual(summary.total_partitions, 100000)
+        self.assertEqual(summary.total_errors, 0)
+        self.assertEqual(summary.gc_count, 2)
+        self.assertEqual(summary.gc_time_s, 0.1)
+        self.assertEqual(summary.duration_s, 68)
+        self.assertEqual(summary.by_operation['op_rate'], {'WRITE': 11349})
+
+    def test_parse_3_0(self):
+        summary = parse_stress_summary(STRESS_3_0)
+        self.assertEqual(summary.op_rate, 9817)
+        self.assertEqual(summary.latency_median_ms, 3.2)
+        self.assertEqual(summary.total_errors, 3)
+        self.assertEqual(summary.gc_time_s, 0)
+        self.assertEqual(summary.duration_s, 1)
+        self.assertEqual(summary.by_operation['latency_p95_ms'], {'READ': 14.5, 'WRITE': 13.2})
+
+    def test_no_summary(self):
+        self.assertIsNone(parse_stress_summary(b'java.io.IOException: Operation x10 on key(s) [4c]: Error executing'))
+        self.assertIsNone(parse_stress_summary(None))
+
+
+class StressRecorderTest(TestCase):
+
+    def setUp(self):
+        self.results_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        stress_recorder.disable()
+        shutil.rmtree(self.results_dir)
+
+    def test_run_stress(self):
+        node = FakeNode(STRESS_4_0, self.results_dir)
+        out, err, rc = run_stress(node, ['write', 'n=1K'], whitelist=True, in_process=False)
+        self.assertEqual((out, rc), (STRESS_4_0, 0))
+        self.assertEqual(run_stress(node, ['write', 'n=1K', '-pop', 'seq=1..1K']).summary.op_rate, 11349)
+        self.assertEqual(run_stress(node, ['write', 'n=1M']).summary.op_rate, 11349)
+        self.assertEqual(node.calls, [(['write', 'n=1K'], True), (['write', 'n=1K', '-pop', 'seq=1..1K'], False),
+                                      (['write', 'n=1M'], False)])
+        # small workloads run in process
+        with patch.object(LoadGenerator, 'run', return_value=(STRESS_4_0, b'', 0)) as generator:
+            self.assertEqual(run_stress(node, ['read', 'n=1K']).summary.op_rate, 11349)
+        generator.assert_called_once_with(['read', 'n=1K'])
+        self.assertEqual(len(node.calls), 3)
+        self.assertEqual(stress_recorder.records(test='t'), [])
+
+    def test_record_and_regressions(self):
+        stress_recorder.enable(self.results_dir)
+        baseline_node = FakeNode(STRESS_3_0, self.results_dir)
+        run_stress(baseline_node, ['mixed', 'n=10K'])
+        self.assertEqual(stress_recorder.records()[0]['metrics']['op_rate'], 9817)
+
+        # the stress results of the same test, with a lower op rate and higher latencies
+        recorder = StressRecorder().enable(self.results_dir)
+        summary = parse_stress_summary(STRESS_3_0.replace('op rate                   : 9817',
+                                                          'op rate                   : 5000')
+                                       .replace('latency 99th percentile   : 31.4',
+                                                'latency 99th percentile   : 62.0'))
+        recorder.record(baseline_node, ['mixed', 'n=10K'], summary, test=stress_recorder.records()[0]['test'])
+        regressions = recorder.regressions(test=stress_recorder.records()[0]['test'],
+                                           build=('4.0', None))
+        self.assertEqual(sorted((metric, old, new) for _, metric, old, new in regressions),
+                         [('latency_p99_ms', 31.4, 62.0), ('op_rate', 9817, 5000)])
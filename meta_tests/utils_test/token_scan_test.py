@@ -0,0 +1,101 @@
+from collections import namedtuple
+from unittest import TestCase
+
+from tools.token_scan import TokenRangeScanner, ring_ranges, row_digest, split_range
+
+MURMUR3 = 'org.apache.cassandra.dht.Murmur3Partitioner'
+Token = namedtuple('Token', 'value')
+Column = namedtuple('Column', 'name')
+
+
+class FakeStatement(object):
+
+    def __init__(self, query):
+        self.query = query
+
+
+class FakeRows(list):
+
+    def one(self):
+        return self[0]
+
+
+class FakeSession(object):
+    """
+    A session over a table whose partition key is its own token.
+    """
+
+    def __init__(self, rows, ring, partitioner=MURMUR3):
+        self.rows = rows
+        table = type('Table', (), {'partition_key': [Column('k')]})
+        keyspace = type('Keyspace', (), {'tables': {'t': table}})
+        metadata = type('Metadata', (), {'partitioner': partitioner,
+                                         'token_map': type('TokenMap', (), {'ring': [Token(t) for t in ring]}),
+                                         'keyspaces': {'ks': keyspace}})
+        self.cluster = type('Cluster', (), {'metadata': metadata})
+        self.queries = []
+
+    def execution_profile_clone_update(self, name, **kwargs):
+        return kwargs
+
+    def prepare(self, query):
+        return FakeStatement(query)
+
+    def execute(self, statement, parameters=None, timeout=None, execution_profile=None):
+        self.queries.append((statement.query, parameters))
+        if parameters is None:
+            rows = list(self.rows)
+        else:
+            rows = [row for row in self.rows if parameters[0] < row[0] <= parameters[1]]
+        if statement.query.startswith('SELECT count(*)'):
+            return FakeRows([(len(rows),)])
+        return FakeRows(rows)
+
+
+class TokenRangesTest(TestCase):
+
+    def test_split_range(self):
+        self.assertEqual(split_range(0, 10, 2), [(0, 5), (5, 10)])
+        self.assertEqual(split_range(0, 2, 5), [(0, 1), (1, 2)])
+        self.assertEqual(split_range(-10, 10, 1), [(-10, 10)])
+
+    def test_ring_ranges(self):
+        self.assertEqual(ring_ranges([50, -50], -100, 100), [(-100, -50), (-50, 50), (50, 100)])
+        self.assertEqual(ring_ranges([], -100, 100, min_ranges=4), [(-100, -50), (-50, 0), (0, 50), (50, 100)])
+        ranges = ring_ranges([0], -100, 100, min_ranges=5)
+        self.assertEqual(len(ranges), 6)
+        self.assertEqual(ranges[0][0], -100)
+        self.assertEqual(ranges[-1][1], 100)
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(ranges, ranges[1:])))
+
+
+class TokenRangeScannerTest(TestCase):
+
+    rows = [(token, 'value{}'.format(token)) for token in range(-2 ** 63 + 1, 2 ** 63, 2 ** 58 + 12345)]
+
+    def test_count(self):
+        session = FakeSession(self.rows, ring=[-2 ** 62, 0, 2 ** 62])
+        self.assertEqual(TokenRangeScanner(session, 'ks', 't', min_ranges=16).count(), len(self.rows))
+        self.assertEqual(len(session.queries), 16)
+        self.assertEqual(session.queries[0][0], 'SELECT count(*) FROM ks.t WHERE token(k) > ? AND token(k) <= ?')
+
+    def test_checksum_does_not_depend_on_ranges(self):
+        one_range = TokenRangeScanner(FakeSession(self.rows, ring=[]), 'ks', 't', min_ranges=1).checksum()
+        many_ranges = TokenRangeScanner(FakeSession(list(reversed(self.rows)), ring=[0]), 'ks', 't').checksum()
+        self.assertEqual(one_range, many_ranges)
+        self.assertEqual(one_range[0], len(self.rows))
+
+        changed = list(self.rows)
+        changed[3] = (changed[3][0], 'changed')
+        self.assertNotEqual(TokenRangeScanner(FakeSession(changed, ring=[]), 'ks', 't').checksum(), one_range)
+        self.assertNotEqual(row_digest(changed[3]), row_digest(self.rows[3]))
+
+    def test_scan(self):
+        seen = []
+        TokenRangeScanner(FakeSession(self.rows, ring=[0]), 'ks', 't', concurrency=4).scan(seen.append)
+        self.assertEqual(sorted(seen), self.rows)
+
+    def test_unsupported_partitioner(self):
+        session = FakeSession(self.rows, ring=[0], partitioner='org.apache.cassandra.dht.ByteOrderedPartitioner')
+        self.assertEqual(TokenRangeScanner(session, 'ks', 't').count(), len(self.rows))
+        self.assertEqual(session.queries, [('SELECT count(*) FROM ks.t', None)])
@@ -0,0 +1,65 @@
+import os
+import uuid
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from cassandra.metadata import MD5Token, Murmur3Token
+
+from tools import tokens
+from tools.tokens import PartitionKeyEncoder, Partitioner, murmur3_tokens_array
+
+
+class PartitionKeyEncoderTest(TestCase):
+
+    def test_single_column(self):
+        self.assertEqual(PartitionKeyEncoder('int').encode(1), b'\x00\x00\x00\x01')
+        self.assertEqual(PartitionKeyEncoder(['text']).encode('ab'), b'ab')
+
+    def test_composite(self):
+        self.assertEqual(PartitionKeyEncoder(['text', 'int']).encode(('ab', 1)),
+                         b'\x00\x02ab\x00\x00\x04\x00\x00\x00\x01\x00')
+
+
+class PartitionerTest(TestCase):
+
+    def test_murmur3(self):
+        partitioner = Partitioner.for_name('Murmur3Partitioner', 'text')
+        for key in ('', 'a', 'key', 'a much longer key, of more than sixteen bytes'):
+            self.assertEqual(partitioner.token(key), Murmur3Token.hash_fn(key.encode('utf-8')))
+
+    def test_random(self):
+        partitioner = Partitioner.for_name('org.apache.cassandra.dht.RandomPartitioner', 'int')
+        self.assertEqual(partitioner.token(1), MD5Token.hash_fn(b'\x00\x00\x00\x01'))
+        self.assertEqual(partitioner.tokens([1, 2]), [partitioner.token(1), partitioner.token(2)])
+
+    def test_unsupported_partitioner(self):
+        with self.assertRaises(ValueError):
+            Partitioner.for_name('ByteOrderedPartitioner', 'int')
+
+    def test_tokens_without_numpy(self):
+        partitioner = Partitioner.for_name('Murmur3Partitioner', ['text', 'int'])
+        keys = [('k{}'.format(i), i) for i in range(20)]
+        with patch.object(tokens, 'numpy', None):
+            self.assertEqual(partitioner.tokens(keys), [partitioner.token(key) for key in keys])
+        self.assertEqual(partitioner.token_map(keys[:2]), {keys[0]: partitioner.token(keys[0]),
+                                                           keys[1]: partitioner.token(keys[1])})
+
+
+@skipUnless(tokens.numpy is not None, 'numpy is not installed')
+class VectorizedMurmur3Test(TestCase):
+
+    def test_all_tail_lengths(self):
+        numpy = tokens.numpy
+        for length in range(0, 40):
+            keys = [os.urandom(length) for _ in range(50)]
+            array = numpy.frombuffer(b''.join(keys), dtype=numpy.uint8).reshape(len(keys), length)
+            self.assertEqual(murmur3_tokens_array(array).tolist(), [Murmur3Token.hash_fn(k) for k in keys])
+
+    def test_batches(self):
+        for types, keys in ((['int'], list(range(-500, 500))),
+                            (['bigint'], [2 ** 40 + i for i in range(100)]),
+                            (['uuid'], [uuid.uuid4() for _ in range(100)]),
+                            (['text'], ['k' * (i % 20) for i in range(100)]),
+                            (['text', 'int'], [('k{}'.format(i), i) for i in range(100)])):
+            partitioner = Partitioner.for_name('Murmur3Partitioner', types)
+            self.assertEqual(partitioner.tokens(keys), [partitioner.token(key) for key in keys])
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+from mock import Mock
+
+from tools.wait import JmxWatcher, LogWatcher, WaitStats, WaitTimeout, wait_stats, wait_until
+
+
+class WaitUntilTest(TestCase):
+
+    def setUp(self):
+        wait_stats.reset()
+
+    def test_returns_predicate_value(self):
+        values = [None, 0, 'done']
+        self.assertEqual(wait_until(lambda: values.pop(0), timeout=10, interval=0.001), 'done')
+
+    def test_backoff_bounded_by_max_interval(self):
+        sleeps = []
+        wake = Mock()
+        wake.wait.side_effect = sleeps.append
+        wait_until(lambda: len(sleeps) == 5, timeout=60, interval=0.1, max_interval=0.5, backoff=2, wake=wake)
+        self.assertEqual(sleeps, [0.1, 0.2, 0.4, 0.5, 0.5])
+
+    def test_timeout(self):
+        with self.assertRaises(WaitTimeout):
+            wait_until(lambda: False, timeout=0.05, interval=0.01, site='somewhere')
+        self.assertEqual(wait_stats.by_site()['somewhere'][:2], (1, 1))
+
+    def test_wake_up_early(self):
+        wake = threading.Event()
+        calls = []
+        threading.Timer(0.05, wake.set).start()
+        wait_until(lambda: calls.append(1) or len(calls) == 2, timeout=60, interval=30, wake=wake)
+        self.assertEqual(len(calls), 2)
+
+    def test_stats_per_site(self):
+        wait_until(lambda: True)
+        sites = list(wait_stats.by_site())
+        self.assertEqual(len(sites), 1)
+        self.assertIn('wait_test.py', sites[0])
+        self.assertIn('test_stats_per_site', sites[0])
+
+
+class WaitStatsTest(TestCase):
+
+    def test_totals(self):
+        stats = WaitStats()
+        stats.record('a', 1.0, test='t1')
+        stats.record('a', 2.0, timed_out=True, test='t2')
+        stats.record('b', 4.0, test='t2')
+        self.assertEqual(stats.by_site(), {'a': (2, 1, 3.0), 'b': (1, 0, 4.0)})
+        self.assertEqual(stats.by_site(test='t2'), {'a': (1, 1, 2.0), 'b': (1, 0, 4.0)})
+        self.assertEqual(stats.by_test(), {'t1': (1, 0, 1.0), 't2': (2, 1, 6.0)})
+
+
+class LogWatcherTest(TestCase):
+
+    def test_wakes_on_new_matching_line(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            log = os.path.join(log_dir, 'system.log')
+            with open(log, 'w') as f:
+                f.write('Index build complete\n')
+            node = Mock()
+            node.logfilename.return_value = log
+            node.mark_log.return_value = os.path.getsize(log)
+
+            with LogWatcher(node, 'build complete', interval=0.01) as watcher:
+                with open(log, 'a') as f:
+                    f.write('something else\nIndex build complete\n')
+                self.assertTrue(watcher.wake.wait(10))
+            self.assertEqual(watcher.matches, ['Index build complete'])
+
+
+class JmxWatcherTest(TestCase):
+
+    def test_wakes_when_value_matches(self):
+        values = [3, 2, 1, 0]
+        jmx = Mock()
+        jmx.read_attribute.side_effect = lambda mbean, attribute: values.pop(0) if len(values) > 1 else values[0]
+
+        with JmxWatcher(jmx, 'org.apache.cassandra.metrics:type=Compaction,name=PendingTasks', 'Value',
+                        lambda pending: pending == 0, interval=0.01) as watcher:
+            self.assertTrue(watcher.wake.wait(10))
+        self.assertEqual(values, [0])
+        jmx.read_attribute.assert_called_with('org.apache.cassandra.metrics:type=Compaction,name=PendingTasks', 'Value')
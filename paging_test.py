@@ -9,6 +9,7 @@ from distutils.version import LooseVersion
 
 from cassandra import ConsistencyLevel as CL
 from cassandra import InvalidRequest, ReadFailure, ReadTimeout
+from cassandra.concurrent import execute_concurrent_with_args
 from cassandra.policies import FallthroughRetryPolicy
 from cassandra.query import (SimpleStatement, dict_factory,
                              named_tuple_factory, tuple_factory)
@@ -16,8 +17,10 @@ from cassandra.query import (SimpleStatement, dict_factory,
 from dtest import Tester, run_scenarios, create_ks
 from tools.assertions import (assert_all, assert_invalid, assert_length_equal,
                               assert_one, assert_lists_equal_ignoring_order)
+from tools.benchmark import BenchmarkResults
 from tools.data import rows_to_list
 from tools.datahelp import create_rows, flatten_into_set, parse_data_into_dicts
+from tools.git import cassandra_git_sha
 from tools.paging import PageAssertionMixin, PageFetcher
 
 since = pytest.mark.since
@@ -178,6 +181,39 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
         # make sure expected and actual have same data elements (ignoring order)
         assert_lists_equal_ignoring_order(expected_data, pf.all_data(), sort_key="id")
 
+    @pytest.mark.benchmark
+    def test_paging_benchmark(self):
+        """
+        Page through a 100K rows table with several page sizes, keeping only page summaries,
+        and record the page latencies in the paging benchmark results. Fails if the median page
+        latency regressed by more than 25% compared with the last run of a different Cassandra build.
+        """
+        session = self.prepare()
+        create_ks(session, 'test_paging_size', 2)
+        session.execute("CREATE TABLE paging_test ( id int PRIMARY KEY, value text )")
+        num_rows = 100000
+        insert = session.prepare("INSERT INTO paging_test (id, value) VALUES (?, ?)")
+        insert.consistency_level = CL.ALL
+        execute_concurrent_with_args(session, insert, [(i, 'value{}'.format(i)) for i in range(num_rows)],
+                                     concurrency=100)
+
+        node1 = self.cluster.nodelist()[0]
+        results = BenchmarkResults('paging', cassandra_version=self.cluster.version(),
+                                   build_sha=cassandra_git_sha(node1.get_install_dir()))
+        records = []
+        for fetch_size in (100, 1000, 5000):
+            future = session.execute_async(
+                SimpleStatement("select * from paging_test", fetch_size=fetch_size, consistency_level=CL.ALL)
+            )
+            pf = PageFetcher(future, keep_rows=False).request_all(timeout=60)
+            stats = pf.stats()
+            assert num_rows == stats['rows']
+            records.append(results.record('test_paging_benchmark', {'fetch_size': fetch_size}, stats))
+
+        regressions = results.compare_with_baseline(['median_latency'], records=records,
+                                                    tolerance=0.25, higher_is_better=False)
+        assert not regressions, 'Paging latency regressed: {}'.format(regressions)
+
 
 @since('2.0')
 class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
@@ -2918,7 +2954,8 @@ class TestPagingDatasetChanges(BasePagingTester, PageAssertionMixin):
             *300| 1  | [random] |
             *400| 2  | [random] |
             """,
-            session, 'paging_test', cl=CL.ALL, format_funcs={'id': int, 'mytext': random_txt}, postfix='USING TTL 10'
+            session, 'paging_test', cl=CL.ALL, format_funcs={'id': int, 'mytext': random_txt}, postfix='USING TTL 10',
+            return_rows=False
         )
 
         # create rows without TTL
@@ -2928,7 +2965,7 @@ class TestPagingDatasetChanges(BasePagingTester, PageAssertionMixin):
                 +----+----------+
             *500| 3  | [random] |
             """,
-            session, 'paging_test', cl=CL.ALL, format_funcs={'id': int, 'mytext': random_txt}
+            session, 'paging_test', cl=CL.ALL, format_funcs={'id': int, 'mytext': random_txt}, return_rows=False
         )
 
         future = session.execute_async(
@@ -3028,7 +3065,7 @@ class TestPagingDatasetChanges(BasePagingTester, PageAssertionMixin):
                   +---------+--------+
             *10000| [uuid]  | foo    |
             """,
-            session, 'paging_test', cl=CL.ALL, format_funcs={'id': make_uuid}
+            session, 'paging_test', cl=CL.ALL, format_funcs={'id': make_uuid}, return_rows=False
         )
 
         future = session.execute_async(
@@ -1,10 +1,7 @@
 from contextlib import contextmanager
-import glob
-import os
 import time
 import pytest
 import logging
-import subprocess
 import typing
 
 from cassandra import ConsistencyLevel, WriteTimeout, ReadTimeout
@@ -15,44 +12,16 @@ from pytest import raises
 
 from dtest import Tester, create_ks
 from tools.assertions import assert_one
+from tools.byteman import byteman_submit, byteman_validate
 from tools.data import rows_to_list
-from tools.jmxutils import JolokiaAgent, make_mbean
+from tools.divergence import ReplicaDivergenceDetector, prefer_local_replica_reads
+from tools.jmxutils import JolokiaAgent, install_jolokia_javaagent, make_mbean
 from tools.misc import retry_till_success
+from tools.placement import PlacementOracle
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
 
-def byteman_validate(node, script, verbose=False, opts=None):
-    opts = opts or []
-    cdir = node.get_install_dir()
-    byteman_cmd = []
-    byteman_cmd.append(os.path.join(os.environ['JAVA_HOME'],
-                                    'bin',
-                                    'java'))
-    byteman_cmd.append('-cp')
-    jars = [
-        glob.glob(os.path.join(cdir, 'build', 'lib', 'jars', 'byteman-[0-9]*.jar'))[0],
-        os.path.join(cdir, 'build', '*'),
-    ]
-    byteman_cmd.append(':'.join(jars))
-    byteman_cmd.append('org.jboss.byteman.check.TestScript')
-    byteman_cmd.append('-p')
-    byteman_cmd.append(node.byteman_port)
-    if verbose and '-v' not in opts:
-        byteman_cmd.append('-v')
-    byteman_cmd.append(script)
-    # process = subprocess.Popen(byteman_cmd)
-    # out, err = process.communicate()
-    out = subprocess.check_output(byteman_cmd)
-    if (out is not None) and isinstance(out, bytes):
-        out = out.decode()
-
-    has_errors = 'ERROR' in out
-    if verbose and not has_errors:
-        print (out)
-
-    assert not has_errors, "byteman script didn't compile\n" + out
-
 
 class TestReadRepair(Tester):
 
@@ -60,16 +29,9 @@ class TestReadRepair(Tester):
     def fixture_set_cluster_settings(self, fixture_dtest_setup):
         cluster = fixture_dtest_setup.cluster
         cluster.populate(3)
-        # disable dynamic snitch to make replica selection deterministic
-        # when we use patient_exclusive_cql_connection, CL=1 and RF=n
-        cluster.set_configuration_options(values={'hinted_handoff_enabled': False,
-                                                  'endpoint_snitch': 'GossipingPropertyFileSnitch',
-                                                  'dynamic_snitch': False})
-        for node in cluster.nodelist():
-            with open(os.path.join(node.get_conf_dir(), 'cassandra-rackdc.properties'), 'w') as snitch_file:
-                snitch_file.write("dc=datacenter1" + os.linesep)
-                snitch_file.write("rack=rack1" + os.linesep)
-                snitch_file.write("prefer_local=true" + os.linesep)
+        cluster.set_configuration_options(values={'hinted_handoff_enabled': False})
+        # make replica selection deterministic when we use patient_exclusive_cql_connection, CL=1 and RF=n
+        prefer_local_replica_reads(cluster)
 
         cluster.start(wait_for_binary_proto=True)
 
@@ -107,6 +69,7 @@ class TestReadRepair(Tester):
 
         # Check each replica individually again now that we expect the data to be fully repaired
         self.check_data_on_each_replica(expect_fully_repaired=True, initial_replica=initial_replica)
+        ReplicaDivergenceDetector.connect(self, 'alter_rf_test', 't1').assert_converged()
 
     @since('2.1', max_version='3.11.x')
     def test_read_repair_chance(self):
@@ -213,8 +176,8 @@ class TestReadRepair(Tester):
         :return: tuple containing the initial replica, plus a list of the other 2 replicas.
         """
         nodes = self.cluster.nodelist()
-        out, _, _ = nodes[0].nodetool("getendpoints alter_rf_test t1 1")
-        address = out.split('\n')[-2]
+        oracle = PlacementOracle.from_session(self.patient_cql_connection(nodes[0]))
+        address = oracle.endpoints_for_key('alter_rf_test', 't1', 1)[0]
         initial_replica = None
         non_replicas = []
         for node in nodes:
@@ -392,6 +355,15 @@ class StorageProxy(object):
     def speculated_rr_write(self):
         return self._get_metric("SpeculatedWrite")
 
+    @property
+    def read_repair_counts(self):
+        """
+        The (blocking, speculated read, speculated write) read repair counts, read in a single request.
+        """
+        metrics = ("RepairedBlocking", "SpeculatedRead", "SpeculatedWrite")
+        return tuple(self.jmx.read_many([(make_mbean("metrics", type="ReadRepair", name=metric), "Count")
+                                         for metric in metrics]))
+
     def get_table_metric(self, keyspace, table, metric, attr="Count"):
         mbean = make_mbean("metrics", keyspace=keyspace, scope=table, type="Table", name=metric)
         return self.jmx.read_attribute(mbean, attr)
@@ -417,7 +389,9 @@ class TestSpeculativeReadRepair(Tester):
                                                   'read_request_timeout_in_ms': 500})
         cluster.populate(3, install_byteman=True, debug=True)
         byteman_validate(cluster.nodelist()[0], './byteman/read_repair/sorted_live_endpoints.btm', verbose=True)
-        cluster.start(wait_for_binary_proto=True, jvm_args=['-XX:-PerfDisableSharedMem'])
+        for node in cluster.nodelist():
+            install_jolokia_javaagent(node)
+        cluster.start(wait_for_binary_proto=True)
         session = fixture_dtest_setup.patient_exclusive_cql_connection(cluster.nodelist()[0], timeout=2)
 
         session.execute("CREATE KEYSPACE ks WITH replication = {'class': 'SimpleStrategy', 'replication_factor': 3}")
@@ -439,20 +413,18 @@ class TestSpeculativeReadRepair(Tester):
         session = self.get_cql_connection(node1, timeout=2)
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node2.byteman_submit(['./byteman/read_repair/stop_rr_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_rr_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_rr_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_rr_writes.btm'])
 
         with raises(WriteTimeout):
             session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)"))
 
-        node2.byteman_submit(['./byteman/read_repair/sorted_live_endpoints.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/sorted_live_endpoints.btm'])
         session = self.get_cql_connection(node2)
         with StorageProxy(node2) as storage_proxy:
-            assert storage_proxy.blocking_read_repair == 0
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (0, 0, 0)
 
             with raises(ReadTimeout):
                 session.execute(quorum("SELECT * FROM ks.tbl WHERE k=1"))
@@ -472,31 +444,27 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_writes.btm'])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', './byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['-u', './byteman/read_repair/stop_writes.btm'])
 
-        node2.byteman_submit(['./byteman/read_repair/sorted_live_endpoints.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/sorted_live_endpoints.btm'])
         coordinator = node2
         # Stop reads on coordinator in order to make sure we do not go through
         # the messaging service for the local reads
         with StorageProxy(node2) as storage_proxy, stop_reads(coordinator):
-            assert storage_proxy.blocking_read_repair == 0
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (0, 0, 0)
 
             session = self.get_cql_connection(coordinator)
             expected = [kcv(1, 0, 1), kcv(1, 1, 2)]
             results = session.execute(quorum("SELECT * FROM ks.tbl WHERE k=1"))
             assert listify(results) == expected
 
-            assert storage_proxy.blocking_read_repair == 1
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (1, 0, 0)
 
     @since('4.0')
     def test_speculative_data_request(self):
@@ -509,28 +477,24 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_writes.btm'])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', './byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['-u', './byteman/read_repair/stop_writes.btm'])
 
-        node1.byteman_submit(['./byteman/read_repair/sorted_live_endpoints.btm'])
+        byteman_submit(node1, ['./byteman/read_repair/sorted_live_endpoints.btm'])
         with StorageProxy(node1) as storage_proxy:
-            assert storage_proxy.blocking_read_repair == 0
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (0, 0, 0)
 
             session = self.get_cql_connection(node1)
-            node2.byteman_submit(['./byteman/read_repair/stop_data_reads.btm'])
+            byteman_submit(node2, ['./byteman/read_repair/stop_data_reads.btm'])
             results = session.execute(quorum("SELECT * FROM ks.tbl WHERE k=1"))
             assert listify(results) == [kcv(1, 0, 1), kcv(1, 1, 2)]
 
-            assert storage_proxy.blocking_read_repair == 1
-            assert storage_proxy.speculated_rr_read == 1
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (1, 1, 0)
 
     @since('4.0')
     def test_speculative_write(self):
@@ -543,28 +507,24 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_writes.btm'])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes on node 3, leave them off on node2
-        node2.byteman_submit(['./byteman/read_repair/stop_rr_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_rr_writes.btm'])
 
-        node1.byteman_submit(['./byteman/read_repair/sorted_live_endpoints.btm'])
+        byteman_submit(node1, ['./byteman/read_repair/sorted_live_endpoints.btm'])
         with StorageProxy(node1) as storage_proxy:
-            assert storage_proxy.blocking_read_repair == 0
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (0, 0, 0)
 
             session = self.get_cql_connection(node1)
             expected = [kcv(1, 0, 1), kcv(1, 1, 2)]
             results = session.execute(quorum("SELECT * FROM ks.tbl WHERE k=1"))
             assert listify(results) == expected
 
-            assert storage_proxy.blocking_read_repair == 1
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 1
+            assert storage_proxy.read_repair_counts == (1, 0, 1)
 
     @since('4.0')
     def test_quorum_requirement(self):
@@ -579,27 +539,25 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_writes.btm'])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', './byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['-u', './byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['-u', './byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['-u', './byteman/read_repair/stop_writes.btm'])
 
         # force endpoint order
-        node1.byteman_submit(['./byteman/read_repair/sorted_live_endpoints.btm'])
+        byteman_submit(node1, ['./byteman/read_repair/sorted_live_endpoints.btm'])
 
-        # node2.byteman_submit(['./byteman/read_repair/stop_digest_reads.btm'])
-        node2.byteman_submit(['./byteman/read_repair/stop_data_reads.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_rr_writes.btm'])
+        # byteman_submit(node2, ['./byteman/read_repair/stop_digest_reads.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_data_reads.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_rr_writes.btm'])
 
         with StorageProxy(node1) as storage_proxy:
             assert storage_proxy.get_table_metric("ks", "tbl", "SpeculativeRetries") == 0
-            assert storage_proxy.blocking_read_repair == 0
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (0, 0, 0)
 
             session = self.get_cql_connection(node1)
             expected = [kcv(1, 0, 1), kcv(1, 1, 2)]
@@ -607,9 +565,7 @@ class TestSpeculativeReadRepair(Tester):
             assert listify(results) == expected
 
             assert storage_proxy.get_table_metric("ks", "tbl", "SpeculativeRetries") == 0
-            assert storage_proxy.blocking_read_repair == 1
-            assert storage_proxy.speculated_rr_read == 1
-            assert storage_proxy.speculated_rr_write == 1
+            assert storage_proxy.read_repair_counts == (1, 1, 1)
 
     @since('4.0')
     def test_quorum_requirement_on_speculated_read(self):
@@ -624,27 +580,25 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_writes.btm'])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', './byteman/read_repair/stop_writes.btm'])
-        node3.byteman_submit(['-u', './byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node2, ['-u', './byteman/read_repair/stop_writes.btm'])
+        byteman_submit(node3, ['-u', './byteman/read_repair/stop_writes.btm'])
 
         # force endpoint order
-        node1.byteman_submit(['./byteman/read_repair/sorted_live_endpoints.btm'])
+        byteman_submit(node1, ['./byteman/read_repair/sorted_live_endpoints.btm'])
 
-        node2.byteman_submit(['./byteman/read_repair/stop_digest_reads.btm'])
-        node3.byteman_submit(['./byteman/read_repair/stop_data_reads.btm'])
-        node2.byteman_submit(['./byteman/read_repair/stop_rr_writes.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_digest_reads.btm'])
+        byteman_submit(node3, ['./byteman/read_repair/stop_data_reads.btm'])
+        byteman_submit(node2, ['./byteman/read_repair/stop_rr_writes.btm'])
 
         with StorageProxy(node1) as storage_proxy:
             assert storage_proxy.get_table_metric("ks", "tbl", "SpeculativeRetries") == 0
-            assert storage_proxy.blocking_read_repair == 0
-            assert storage_proxy.speculated_rr_read == 0
-            assert storage_proxy.speculated_rr_write == 0
+            assert storage_proxy.read_repair_counts == (0, 0, 0)
 
             session = self.get_cql_connection(node1)
             expected = [kcv(1, 0, 1), kcv(1, 1, 2)]
@@ -669,13 +623,13 @@ def _byteman_cycle(nodes, scripts):
         for name in scripts:
 
             print(node.name)
-            node.byteman_submit([script_path(name)])
+            byteman_submit(node, [script_path(name)])
     yield
 
     for node in nodes:
         for name in scripts:
             print(node.name)
-            node.byteman_submit(['-u', script_path(name)])
+            byteman_submit(node, ['-u', script_path(name)])
 
 
 @contextmanager
@@ -10,6 +10,7 @@ from cassandra import ConsistencyLevel
 from ccmlib.node import ToolError
 
 from dtest import Tester, create_ks, create_cf
+from tools.byteman import byteman_submit, versioned_script
 from tools.data import insert_c1c2, query_c1c2
 
 since = pytest.mark.since
@@ -210,11 +211,7 @@ class TestRebuild(Tester):
         session.execute("ALTER KEYSPACE system_auth WITH REPLICATION = {'class':'NetworkTopologyStrategy', 'dc1':1, 'dc2':1};")
 
         # Path to byteman script which makes the streaming to node2 throw an exception, making rebuild fail
-        if cluster.version() < '4.0':
-            script = ['./byteman/pre4.0/inject_failure_streaming_to_node2.btm']
-        else:
-            script = ['./byteman/4.0/inject_failure_streaming_to_node2.btm']
-        node3.byteman_submit(script)
+        byteman_submit(node3, [versioned_script('inject_failure_streaming_to_node2.btm', cluster.version())])
 
         # First rebuild must fail and data must be incomplete
         with pytest.raises(ToolError, message='Unexpected: SUCCEED'):
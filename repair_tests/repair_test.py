@@ -14,7 +14,11 @@ from cassandra.query import SimpleStatement
 from ccmlib.node import ToolError
 
 from dtest import FlakyRetryPolicy, Tester, create_ks, create_cf
+from tools.assertions import assert_row_count
+from tools.byteman import byteman_submit
 from tools.data import insert_c1c2, query_c1c2
+from tools.divergence import ReplicaDivergenceDetector, prefer_local_replica_reads
+from tools.stress import run_stress
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -72,8 +76,7 @@ class BaseRepairTest(Tester):
                 node.stop(wait_other_notice=True)
 
         session = self.patient_exclusive_cql_connection(node_to_check, 'ks')
-        result = list(session.execute("SELECT * FROM cf LIMIT {}".format(rows * 2), timeout=10))
-        assert len(result) == rows
+        assert_row_count(session, 'cf', rows, by_token_range=True)
 
         for k in found:
             query_c1c2(session, k, ConsistencyLevel.ONE)
@@ -87,7 +90,11 @@ class BaseRepairTest(Tester):
             for node in stopped_nodes:
                 node.start(wait_other_notice=True)
 
-    def _populate_cluster(self, start=True):
+    def _populate_cluster(self, start=True, prefer_local_reads=False):
+        """
+        Starts a 3 node cluster where node3 misses key 1000. With prefer_local_reads, each node serves
+        the reads it is a replica of, as _repair_and_verify's ReplicaDivergenceDetector needs.
+        """
         cluster = self.cluster
 
         # Disable hinted handoff and set batch commit log so this doesn't
@@ -95,7 +102,10 @@ class BaseRepairTest(Tester):
         cluster.set_configuration_options(values={'hinted_handoff_enabled': False})
         cluster.set_batch_commitlog(enabled=True)
         logger.debug("Starting cluster..")
-        cluster.populate(3).start()
+        cluster.populate(3)
+        if prefer_local_reads:
+            prefer_local_replica_reads(cluster)
+        cluster.start()
         node1, node2, node3 = cluster.nodelist()
 
         session = self.patient_cql_connection(node1, retry_policy=FlakyRetryPolicy(max_retries=15))
@@ -117,20 +127,20 @@ class BaseRepairTest(Tester):
         cluster.flush()
 
     def _repair_and_verify(self, sequential=True):
+        """
+        Expects a cluster started by _populate_cluster with prefer_local_reads.
+        """
         cluster = self.cluster
         node1, node2, node3 = cluster.nodelist()
 
-        # Verify that node3 has only 2000 keys
-        logger.debug("Checking data on node3...")
-        self.check_rows_on_node(node3, 2000, missings=[1000])
-
-        # Verify that node1 has 2001 keys
-        logger.debug("Checking data on node1...")
-        self.check_rows_on_node(node1, 2001, found=[1000])
-
-        # Verify that node2 has 2001 keys
-        logger.debug("Checking data on node2...")
-        self.check_rows_on_node(node2, 2001, found=[1000])
+        # Verify that node3 only misses the key written while it was down, so only one range diverges
+        logger.debug("Checking data on all nodes...")
+        detector = ReplicaDivergenceDetector.connect(self, 'ks', 'cf')
+        divergences = detector.divergent_ranges()
+        assert len(divergences) == 1, "Expected a single divergent range, got {}".format(divergences)
+        digests = divergences[0].digests
+        assert digests[node1.name] == digests[node2.name], digests
+        assert digests[node3.name][0] == digests[node1.name][0] - 1, digests
 
         time.sleep(10)  # see CASSANDRA-4373
         # Run repair
@@ -154,6 +164,7 @@ class BaseRepairTest(Tester):
             assert out_of_sync_nodes, valid_out_of_sync_pairs in str(out_of_sync_nodes)
 
         # Check node3 now has the key
+        detector.assert_converged()
         self.check_rows_on_node(node3, 2001, found=[1000], restart=False)
 
 
@@ -438,7 +449,7 @@ class TestRepair(BaseRepairTest):
         if order_preserving_partitioner:
             self.cluster.set_partitioner('org.apache.cassandra.dht.ByteOrderedPartitioner')
 
-        self._populate_cluster()
+        self._populate_cluster(prefer_local_reads=True)
         self._repair_and_verify(sequential)
 
     def _empty_vs_gcable_no_repair(self, sequential):
@@ -1082,8 +1093,9 @@ class TestRepair(BaseRepairTest):
         node2.stop(wait_other_notice=True)
         profile_path = os.path.join(os.getcwd(), 'stress_profiles/repair_wide_rows.yaml')
         logger.info(("yaml = " + profile_path))
-        node1.stress(['user', 'profile=' + profile_path, 'n=50', 'ops(insert=1)', 'no-warmup', '-rate', 'threads=8',
-                      '-insert', 'visits=FIXED(100K)', 'revisit=FIXED(100K)'])
+        # the rows are only streamed, not read back, so they can be written in process
+        run_stress(node1, ['user', 'profile=' + profile_path, 'n=50', 'ops(insert=1)', 'no-warmup', '-rate', 'threads=8',
+                           '-insert', 'visits=FIXED(100K)', 'revisit=FIXED(100K)'], in_process=True)
         node2.start(wait_for_binary_proto=True)
         node2.repair()
 
@@ -1204,7 +1216,7 @@ class TestRepair(BaseRepairTest):
         script = 'stream_sleep.btm' if phase == 'sync' else 'repair_{}_sleep.btm'.format(phase)
         logger.debug("Submitting byteman script to {}".format(node_to_kill.name))
         # Sleep on anticompaction/stream so there will be time for node to be killed
-        node_to_kill.byteman_submit(['./byteman/{}'.format(script)])
+        byteman_submit(node_to_kill, ['./byteman/{}'.format(script)])
 
         def node1_repair():
             global nodetool_error
@@ -15,6 +15,7 @@ from ccmlib.node import Node
 
 from dtest import Tester
 from tools.assertions import assert_bootstrap_state, assert_all, assert_not_running
+from tools.byteman import byteman_submit
 from tools.data import rows_to_list
 
 since = pytest.mark.since
@@ -466,11 +467,11 @@ class TestReplaceAddress(BaseReplaceAddressTest):
         logger.debug("Submitting byteman script to make stream fail")
 
         if self.cluster.version() < '4.0':
-            self.query_node.byteman_submit(['./byteman/pre4.0/stream_failure.btm'])
+            byteman_submit(self.query_node, ['./byteman/pre4.0/stream_failure.btm'])
             self._do_replace(jvm_option='replace_address_first_boot',
                              opts={'streaming_socket_timeout_in_ms': 1000})
         else:
-            self.query_node.byteman_submit(['./byteman/4.0/stream_failure.btm'])
+            byteman_submit(self.query_node, ['./byteman/4.0/stream_failure.btm'])
             self._do_replace(jvm_option='replace_address_first_boot')
 
         # Make sure bootstrap did not complete successfully
@@ -10,6 +10,8 @@ from cassandra import ConsistencyLevel
 from cassandra.query import SimpleStatement
 
 from dtest import DtestTimeoutError, Tester, create_ks
+from tools.placement import PlacementOracle, Ring
+from tools.tokens import Partitioner
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -20,30 +22,8 @@ TRACE_RESPOND_MESSAGE = re.compile(r'(?:MUTATION|REQUEST_RESPONSE) message recei
 TRACE_COMMIT_LOG = re.compile('Appending to commitlog')
 TRACE_FORWARD_WRITE = re.compile(r'Enqueuing forwarded write to /([0-9]+\.[0-9]+\.[0-9]+\.[0-9]+)')
 
-# Some pre-computed murmur 3 hashes; there are no good python murmur3
-# hashing libraries :(
-murmur3_hashes = {
-    5: -7509452495886106294,
-    10: -6715243485458697746,
-    16: -5477287129830487822,
-    13: -5034495173465742853,
-    11: -4156302194539278891,
-    1: -4069959284402364209,
-    19: -3974532302236993209,
-    8: -3799847372828181882,
-    2: -3248873570005575792,
-    4: -2729420104000364805,
-    18: -2695747960476065067,
-    15: -1191135763843456182,
-    20: 1388667306199997068,
-    7: 1634052884888577606,
-    6: 2705480034054113608,
-    9: 3728482343045213994,
-    14: 4279681877540623768,
-    17: 5467144456125416399,
-    12: 8582886034424406875,
-    3: 9010454139840013625
-}
+# the murmur3 tokens of the keys inserted by the tests
+murmur3_hashes = Partitioner.for_name('Murmur3Partitioner', 'int').token_map(range(1, 21))
 
 
 def query_system_traces_length(session):
@@ -145,50 +125,17 @@ class TestReplication(Tester):
                 }
 
     def get_replicas_for_token(self, token, replication_factor,
-                               strategy='SimpleStrategy', nodes=None):
+                               strategy='SimpleStrategy'):
         """
         Figure out which node(s) should receive data for a given token and
         replication factor
         """
-        if not nodes:
-            nodes = self.cluster.nodelist()
-        token_ranges = sorted(zip([n.initial_token for n in nodes], nodes))
-        replicas = []
-
-        # Find first replica:
-        for i, (r, node) in enumerate(token_ranges):
-            if token <= r:
-                replicas.append(node.address())
-                first_ring_position = i
-                break
-        else:
-            replicas.append(token_ranges[0][1].address())
-            first_ring_position = 0
-
-        # Find other replicas:
         if strategy == 'SimpleStrategy':
-            for node in nodes[first_ring_position + 1:]:
-                replicas.append(node.address())
-                if len(replicas) == replication_factor:
-                    break
-            if len(replicas) != replication_factor:
-                # Replication token range looped:
-                for node in nodes:
-                    replicas.append(node.address())
-                    if len(replicas) == replication_factor:
-                        break
-        elif strategy == 'NetworkTopologyStrategy':
-            # NetworkTopologyStrategy can be broken down into multiple
-            # SimpleStrategies, just once per datacenter:
-            for dc, rf in list(replication_factor.items()):
-                dc_nodes = [n for n in nodes if n.data_center == dc]
-                replicas.extend(self.get_replicas_for_token(
-                    token, rf, nodes=dc_nodes))
+            replication = {'class': strategy, 'replication_factor': replication_factor}
         else:
-            raise NotImplemented('replication strategy not implemented: %s'
-                                 % strategy)
-
-        return replicas
+            replication = dict(replication_factor, **{'class': strategy})
+        oracle = PlacementOracle(Ring.from_ccm(self.cluster), replications={'test': replication})
+        return oracle.endpoints('test', token)
 
     def pprint_trace(self, trace):
         """
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 """
 usage: run_dtests.py [-h] [--use-vnodes] [--use-off-heap-memtables] [--num-tokens NUM_TOKENS] [--data-dir-count-per-instance DATA_DIR_COUNT_PER_INSTANCE] [--force-resource-intensive-tests]
-                     [--skip-resource-intensive-tests] [--cassandra-dir CASSANDRA_DIR] [--cassandra-version CASSANDRA_VERSION] [--delete-logs] [--execute-upgrade-tests] [--disable-active-log-watching]
-                     [--keep-test-dir] [--enable-jacoco-code-coverage] [--dtest-enable-debug-logging] [--dtest-print-tests-only] [--dtest-print-tests-output DTEST_PRINT_TESTS_OUTPUT]
+                     [--skip-resource-intensive-tests] [--cassandra-dir CASSANDRA_DIR] [--cassandra-version CASSANDRA_VERSION] [--delete-logs] [--execute-upgrade-tests]
+                     [--execute-benchmark-tests] [--disable-active-log-watching] [--keep-test-dir] [--enable-jacoco-code-coverage] [--profile-sleeps]
+                     [--sample-jmx-metrics INTERVAL] [--record-stress-results] [--disable-in-process-stress]
+                     [--dtest-enable-debug-logging] [--dtest-print-tests-only] [--dtest-print-tests-output DTEST_PRINT_TESTS_OUTPUT]
                      [--pytest-options PYTEST_OPTIONS] [--dtest-tests DTEST_TESTS]
 
 optional arguments:
@@ -17,10 +19,21 @@ optional arguments:
   --cassandra-version CASSANDRA_VERSION
   --delete-logs
   --execute-upgrade-tests                                    Execute Cassandra Upgrade Tests (e.g. tests annotated with the upgrade_test mark) (default: False)
+  --execute-benchmark-tests                                  Execute benchmark tests (e.g. tests annotated with the benchmark mark), which record their measurements in the benchmarks
+                                                             directory of the dtests (or $BENCHMARK_RESULTS_DIR) and flag regressions against measurements of
+                                                             previous builds (default: False)
   --disable-active-log-watching                              Disable ccm active log watching, which will cause dtests to check for errors in the logs in a single operation instead of semi-realtime
                                                              processing by consuming ccm _log_error_handler callbacks (default: False)
   --keep-test-dir                                            Do not remove/cleanup the test ccm cluster directory and it's artifacts after the test completes (default: False)
   --enable-jacoco-code-coverage                              Enable JaCoCo Code Coverage Support (default: False)
+  --profile-sleeps                                           Record the time spent in time.sleep by each test and each call site, and report the largest totals at
+                                                             the end of the session (default: False)
+  --sample-jmx-metrics INTERVAL                              Sample the JMX metrics of every node through Jolokia every INTERVAL seconds during each test, save them
+                                                             next to the logs of the test and record their peak and percentile values in the JUnit report (default: None)
+  --record-stress-results                                    Parse the summary of the cassandra-stress runs of each test, record it in the benchmarks directory and warn
+                                                             about throughput or latency regressions against the runs of a previous build (default: False)
+  --disable-in-process-stress                                Always run cassandra-stress, instead of running small write and read workloads through the driver from the
+                                                             test process (default: False)
   --dtest-enable-debug-logging                               Enable debug logging (for this script, pytest, and during execution of test functions) (default: False)
   --dtest-print-tests-only                                   Print list of all tests found eligible for execution given the provided options. (default: False)
   --dtest-print-tests-output DTEST_PRINT_TESTS_OUTPUT        Path to file where the output of --dtest-print-tests-only should be written to (default: False)
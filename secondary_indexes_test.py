@@ -16,6 +16,7 @@ from cassandra.query import BatchStatement, SimpleStatement
 
 from dtest import Tester, create_ks, create_cf
 from tools.assertions import assert_bootstrap_state, assert_invalid, assert_none, assert_one, assert_row_count
+from tools.byteman import byteman_submit, versioned_script
 from tools.data import block_until_index_is_built, rows_to_list
 from tools.misc import new_node
 
@@ -348,7 +349,7 @@ class TestSecondaryIndexes(Tester):
 
         # Simulate a failing index rebuild
         before_files = self._index_sstables_files(node, 'k', 't', 'idx')
-        node.byteman_submit(['./byteman/index_build_failure.btm'])
+        byteman_submit(node, ['./byteman/index_build_failure.btm'])
         with pytest.raises(Exception):
             node.nodetool("rebuild_index k t idx")
         after_files = self._index_sstables_files(node, 'k', 't', 'idx')
@@ -374,7 +375,7 @@ class TestSecondaryIndexes(Tester):
 
         # Simulate another failing index rebuild
         before_files = self._index_sstables_files(node, 'k', 't', 'idx')
-        node.byteman_submit(['./byteman/index_build_failure.btm'])
+        byteman_submit(node, ['./byteman/index_build_failure.btm'])
         with pytest.raises(Exception):
             node.nodetool("rebuild_index k t idx")
         after_files = self._index_sstables_files(node, 'k', 't', 'idx')
@@ -1192,10 +1193,7 @@ class TestPreJoinCallback(Tester):
             node1.import_config_files()
             node1.start(wait_for_binary_proto=True)
 
-            if cluster.version() < '4.0':
-                node1.byteman_submit(['./byteman/pre4.0/inject_failure_streaming_to_node2.btm'])
-            else:
-                node1.byteman_submit(['./byteman/4.0/inject_failure_streaming_to_node2.btm'])
+            byteman_submit(node1, [versioned_script('inject_failure_streaming_to_node2.btm', cluster.version())])
 
             node2 = new_node(cluster)
 
@@ -11,6 +11,7 @@ from ccmlib import common as ccmcommon
 
 from dtest import Tester, create_ks, create_cf, MAJOR_VERSION_4
 from tools.assertions import assert_all, assert_none, assert_one
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -390,7 +391,7 @@ class TestSSTableGenerationAndLoading(TestBaseSStableLoader):
         assert_one(session, "SELECT * FROM k.t WHERE v = 8", [0, 2, 8])
 
         # Load SSTables with a failure during index creation
-        node.byteman_submit(['./byteman/index_build_failure.btm'])
+        byteman_submit(node, ['./byteman/index_build_failure.btm'])
         with pytest.raises(Exception):
             self.load_sstables(cluster, node, 'k')
 
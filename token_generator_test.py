@@ -8,8 +8,9 @@ import logging
 from cassandra.util import sortedset
 from ccmlib import common
 
-from dtest import Tester
+from dtest import Tester, create_ks
 from tools.data import rows_to_list
+from tools.tokens import Partitioner
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -115,6 +116,28 @@ class TestTokenGenerator(Tester):
             tok = int(cluster_token)
             assert dc_tokens.index(tok), 0 >= "token in cluster does not match generated tokens"
 
+        self._check_offline_tokens(session)
+
+    def _check_offline_tokens(self, session):
+        """
+        Check that the tokens computed by tools.tokens match those of the cluster, for single
+        column and composite partition keys.
+        """
+        create_ks(session, 'offline_tokens', 1)
+        session.execute("CREATE TABLE single (k int PRIMARY KEY)")
+        session.execute("CREATE TABLE composite (k1 text, k2 int, PRIMARY KEY ((k1, k2)))")
+        for i in range(100):
+            session.execute("INSERT INTO single (k) VALUES ({})".format(i))
+            session.execute("INSERT INTO composite (k1, k2) VALUES ('key{}', {})".format(i, i))
+
+        metadata = session.cluster.metadata
+        for table, query in (('single', "SELECT k, token(k) FROM single"),
+                             ('composite', "SELECT k1, k2, token(k1, k2) FROM composite")):
+            rows = [tuple(row) for row in session.execute(query)]
+            keys = [row[0] if len(row) == 2 else row[:-1] for row in rows]
+            offline_tokens = Partitioner.for_table(metadata, 'offline_tokens', table).tokens(keys)
+            assert offline_tokens == [int(row[-1]) for row in rows], "Offline tokens of {} don't match".format(table)
+
     def token_gen_def_test(self, nodes=3):
         """ Validate token-generator with Murmur3Partitioner with default token-generator behavior """
 
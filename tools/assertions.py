@@ -1,6 +1,7 @@
 import re
 from time import sleep
 from tools.misc import list_to_hashed_dict
+from tools.token_scan import TokenRangeScanner
 
 from cassandra import (InvalidRequest, ReadFailure, ReadTimeout, Unauthorized,
                        Unavailable, WriteFailure, WriteTimeout)
@@ -206,22 +207,30 @@ def assert_almost_equal(*args, **kwargs):
         "values not within {:.2f}% of the max: {} ({})".format(error * 100, args, error_message)
 
 
-def assert_row_count(session, table_name, expected, where=None):
+def assert_row_count(session, table_name, expected, where=None, by_token_range=False):
     """
     Assert the number of rows in a table matches expected.
     @param session Session to use
     @param table_name Name of the table to query
     @param expected Number of rows expected to be in table
     @param where string to append to CQL select query as where clause
+    @param by_token_range count the rows of each token range separately, in parallel, rather than with a
+                          single query that may time out on large tables (see tools.token_scan)
     Examples:
     assert_row_count(self.session1, 'ttl_table', 1)
+    assert_row_count(self.session1, 'ks.large_table', 1000000, by_token_range=True)
     """
-    if where is not None:
-        query = "SELECT count(*) FROM {} WHERE {};".format(table_name, where)
+    if by_token_range:
+        assert where is None, "Can't count the rows of a subset of the table by token range"
+        keyspace, _, table = table_name.rpartition('.')
+        count = TokenRangeScanner(session, keyspace or session.keyspace, table).count()
     else:
-        query = "SELECT count(*) FROM {};".format(table_name)
-    res = session.execute(query)
-    count = res[0][0]
+        if where is not None:
+            query = "SELECT count(*) FROM {} WHERE {};".format(table_name, where)
+        else:
+            query = "SELECT count(*) FROM {};".format(table_name)
+        res = session.execute(query)
+        count = res[0][0]
     assert count == expected, "Expected a row count of {} in table '{}', but got {}".format(
         expected, table_name, count
     )
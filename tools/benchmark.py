@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import time
+import logging
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# the benchmarks directory of the dtest checkout, whatever the working directory, unless overridden
+BENCHMARK_RESULTS_DIR = os.environ.get('BENCHMARK_RESULTS_DIR',
+                                       os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                    'benchmarks'))
+
+
+class BenchmarkResults(object):
+    """
+    Stores benchmark measurements as json lines, one file per benchmark, so that runs against
+    different Cassandra builds can be compared with each other.
+
+    Each record contains the name of the test, the configuration that was measured (a dict
+    of option names to values), the measured metrics (a dict of metric names to numbers) and the
+    version and git sha of the Cassandra build.
+
+    Example usage:
+
+        results = BenchmarkResults('cqlsh_copy', cassandra_version='4.0', build_sha='abc')
+        results.record('test_copy_from', {'NUMPROCESSES': 4}, {'rows_per_second': 12345})
+        regressions = results.compare_with_baseline(['rows_per_second'])
+    """
+
+    def __init__(self, name, cassandra_version=None, build_sha=None, results_dir=BENCHMARK_RESULTS_DIR):
+        self.name = name
+        self.cassandra_version = None if cassandra_version is None else str(cassandra_version)
+        self.build_sha = build_sha
+        self.filename = os.path.join(results_dir, '{}.json'.format(name))
+        if not os.path.exists(results_dir):
+            os.makedirs(results_dir)
+
+    def record(self, test_name, config, metrics):
+        record = {'test': test_name,
+                  'config': config,
+                  'metrics': metrics,
+                  'cassandra_version': self.cassandra_version,
+                  'build_sha': self.build_sha,
+                  'time': time.time()}
+        logger.info('Benchmark {} {} {}: {}'.format(self.name, test_name, config, metrics))
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(record, sort_keys=True) + '\n')
+        return record
+
+    def _is_current_build(self, record):
+        return (record['cassandra_version'], record['build_sha']) == (self.cassandra_version, self.build_sha)
+
+    def load(self):
+        if not os.path.exists(self.filename):
+            return []
+        with open(self.filename, 'r') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def baseline(self, build=None, exclude=()):
+        """
+        Returns, for every (test, config), the most recent record measured with a different build
+        than the current one, builds being identified by their version and git sha.
+
+        @param build a (cassandra_version, build_sha) to take the baseline from instead, which may
+                     be the current build to compare with its previous runs
+        @param exclude records which can't be part of the baseline, such as those compared with it
+        """
+        baseline = {}
+        for record in self.load():
+            if record in exclude:
+                continue
+            if build is None and self._is_current_build(record):
+                continue
+            if build is not None and (record['cassandra_version'], record['build_sha']) != tuple(build):
+                continue
+            baseline[_record_key(record)] = record
+        return baseline
+
+    def compare_with_baseline(self, metrics, records=None, tolerance=0.1, higher_is_better=True, build=None):
+        """
+        Compare records (by default, those recorded for the current build) with the baseline.
+
+        @param metrics the names of the metrics to compare
+        @param tolerance the relative change tolerated before a metric is flagged
+        @param higher_is_better True for throughput-like metrics, False for latency-like metrics
+        @param build the build to take the baseline from, see baseline()
+        @return a list of (record, metric, baseline_value, value) for each regression found
+        """
+        if records is None:
+            records = [r for r in self.load() if self._is_current_build(r)]
+        baseline = self.baseline(build=build, exclude=records)
+
+        regressions = []
+        for record in records:
+            base = baseline.get(_record_key(record))
+            if base is None:
+                continue
+            for metric in metrics:
+                old, new = base['metrics'].get(metric), record['metrics'].get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / float(old)
+                if (change < -tolerance) if higher_is_better else (change > tolerance):
+                    logger.warning('Benchmark regression in {} {} {}: {} -> {}'
+                                   .format(record['test'], record['config'], metric, old, new))
+                    regressions.append((record, metric, old, new))
+        return regressions
+
+
+def _record_key(record):
+    return record['test'], json.dumps(record['config'], sort_keys=True)
+
+
+class ProcessTreeMemorySampler(object):
+    """
+    Samples the total resident memory of all the descendants of a process (by default, of the
+    current process) in a background thread, and keeps the peak value. Useful to measure tools
+    such as cqlsh or cassandra-stress, which are run as child processes that may spawn workers.
+
+    If `cmdline_filter` is given, only the descendants whose command line contains it are
+    counted, so that for example cluster nodes started by ccm are ignored.
+
+    Example usage:
+
+        with ProcessTreeMemorySampler(cmdline_filter='cqlsh') as sampler:
+            node.run_cqlsh(cmds)
+        logger.debug(sampler.peak_rss)
+    """
+
+    def __init__(self, pid=None, cmdline_filter=None, interval=0.1):
+        self.process = psutil.Process(pid)
+        self.cmdline_filter = cmdline_filter
+        self.interval = interval
+        self.peak_rss = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = 0
+        for child in self.process.children(recursive=True):
+            try:
+                if self.cmdline_filter is None or self.cmdline_filter in ' '.join(child.cmdline()):
+                    rss += child.memory_info().rss
+            except psutil.Error:  # the child exited while we were looking at it
+                pass
+        self.peak_rss = max(self.peak_rss, rss)
+        return rss
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, value, traceback):
+        self.stop()
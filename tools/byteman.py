@@ -0,0 +1,336 @@
+import glob
+import hashlib
+import os
+import re
+import socket
+import subprocess
+import threading
+import time
+import logging
+
+from ccmlib.node import ToolError
+
+logger = logging.getLogger(__name__)
+
+BYTEMAN_DIR = './byteman'
+VERSIONED_DIRS = ('4.0', 'pre4.0')
+# the agent listener binds to localhost unless given an address, which ccm doesn't
+DEFAULT_ADDRESS = 'localhost'
+
+
+class BytemanError(ToolError):
+    """
+    A request which the Byteman agent answered with an error. A ToolError, as raised by
+    node.byteman_submit when the Submit process fails, so callers can expect either.
+    """
+
+    def __init__(self, request, response):
+        ToolError.__init__(self, ['byteman_submit', request], 1, stdout=response)
+        self.response = response
+
+
+def versioned_script(name, version):
+    """
+    The path of the byteman/4.0 or byteman/pre4.0 variant of a script, for a Cassandra version.
+    """
+    return '{}/{}/{}'.format(BYTEMAN_DIR, _versioned_dir(version), name)
+
+
+def _versioned_dir(version):
+    return '4.0' if version >= '4.0' else 'pre4.0'
+
+
+def scripts_for_version(version, directory=BYTEMAN_DIR):
+    """
+    The scripts of byteman/ and its subdirectories which apply to a Cassandra version, leaving out
+    the variants of the other side of 4.0.
+    """
+    excluded = set(VERSIONED_DIRS) - {_versioned_dir(version)}
+    scripts = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not (root == directory and d in excluded))
+        scripts.extend(os.path.join(root, f) for f in sorted(files) if f.endswith('.btm'))
+    return scripts
+
+
+class BytemanClient(object):
+    """
+    Loads, lists and unloads the rules of the Byteman agent of a node through its listener port,
+    speaking the text protocol of the agent instead of launching the Submit JVM for each request.
+
+    Each request is sent on its own connection, which the agent closes once it has answered with
+    the lines of its response followed by "OK".
+
+    Example usage:
+
+        byteman = BytemanClient.for_node(node1)
+        byteman.load('./byteman/stop_writes.btm')
+        assert 'stop_writes' in byteman.list_rules()
+        byteman.unload('./byteman/stop_writes.btm')
+    """
+
+    def __init__(self, port, address=DEFAULT_ADDRESS, timeout=30.0):
+        self.port = int(port)
+        self.address = address
+        self.timeout = timeout
+        # the duration, in seconds, of each request
+        self.latencies = []
+
+    @classmethod
+    def for_node(cls, node, **kwargs):
+        if str(node.byteman_port) == '0':
+            raise ValueError('{} was not started with the Byteman agent'.format(node.name))
+        return cls(node.byteman_port, **kwargs)
+
+    def _request(self, request):
+        """
+        Sends a request and returns the lines of the response, without the final "OK".
+        """
+        started = time.time()
+        with socket.create_connection((self.address, self.port), timeout=self.timeout) as sock:
+            sock.sendall(request.encode('utf-8'))
+            with sock.makefile('r', encoding='utf-8') as response:
+                lines = []
+                for line in response:
+                    line = line.strip()
+                    if line == 'OK':
+                        break
+                    lines.append(line)
+                else:
+                    raise BytemanError(request.split('\n', 1)[0], '\n'.join(lines + ['<connection closed>']))
+        self.latencies.append(time.time() - started)
+        if any(line.startswith(('ERROR', 'EXCEPTION')) for line in lines):
+            raise BytemanError(request.split('\n', 1)[0], '\n'.join(lines))
+        return lines
+
+    @staticmethod
+    def _scripts(scripts):
+        blocks = []
+        for path in scripts:
+            with open(path) as f:
+                text = f.read()
+            if text and not text.endswith('\n'):
+                text += '\n'
+            blocks.append('SCRIPT {}\n{}ENDSCRIPT\n'.format(path, text))
+        return ''.join(blocks)
+
+    def load(self, *scripts):
+        """
+        Loads the rules of script files, replacing the rules of the same names. Returns the response of the agent.
+        """
+        return '\n'.join(self._request('LOAD\n{}ENDLOAD\n'.format(self._scripts(scripts))))
+
+    def unload(self, *scripts):
+        """
+        Unloads the rules of script files, or every rule when none is given.
+        """
+        if not scripts:
+            return '\n'.join(self._request('DELETEALL\n'))
+        return '\n'.join(self._request('DELETE\n{}ENDDELETE\n'.format(self._scripts(scripts))))
+
+    def list_rules(self):
+        """
+        The text of the loaded rules, with their trigger and compilation state, as listed by Submit -l.
+        """
+        return '\n'.join(self._request('LIST\n'))
+
+    def version(self):
+        return '\n'.join(self._request('VERSION\n'))
+
+    def submit(self, opts):
+        """
+        Runs the Submit command line options used with node.byteman_submit: script files to load,
+        -u followed by scripts to unload (all rules if none), or -l to list rules.
+        Returns the response of the agent.
+        """
+        opts = list(opts)
+        if opts[:1] == ['-u']:
+            return self.unload(*opts[1:])
+        if opts == ['-l'] or not opts:
+            return self.list_rules()
+        if any(opt.startswith('-') for opt in opts):
+            raise ValueError('Unsupported byteman_submit options: {}'.format(opts))
+        return self.load(*opts)
+
+
+def byteman_submit(node, opts):
+    """
+    A drop-in for node.byteman_submit(opts) which talks to the agent directly.
+    """
+    response = BytemanClient.for_node(node).submit(opts)
+    logger.debug('byteman_submit {} on {}: {}'.format(' '.join(opts), node.name, response))
+    return response
+
+
+def _rule_names(text):
+    return [m.group(1).strip() for m in re.finditer(r'^\s*RULE\s+(.+)$', text, re.MULTILINE)]
+
+
+def attribute_test_script_output(out, scripts):
+    """
+    Splits the output of a TestScript run over `scripts`, given as [(path, text)] in the order
+    they were passed, into {path: lines of output}.
+
+    TestScript checks the rules in the order of the scripts and starts the output of each rule
+    with "Checking rule <name> against ...". Rule names repeat across scripts, so the sections
+    are matched to the rules in order. Scripts whose output can't be told apart are left out:
+    those with rules that were not checked, or whose section could hold the output of such rules.
+    """
+    rules = [(path, name) for path, text in scripts for name in _rule_names(text)]
+    by_script = dict((path, []) for path, _ in scripts)
+    seen, unattributed = set(), set()
+    position = None
+    for line in out.splitlines():
+        match = re.match(r'^Checking rule (.+?) against ', line)
+        if match:
+            name = match.group(1).strip()
+            first = 0 if position is None else position + 1
+            index = next((i for i in range(first, len(rules)) if rules[i][1] == name), None)
+            if position is not None and rules[position][1] == name:
+                # the rule is checked against another class, or a later rule has the same name
+                if index is not None:
+                    unattributed.update((rules[position][0], rules[index][0]))
+                continue
+            if index is None:
+                return {}
+            if position is not None and index > position + 1:
+                unattributed.add(rules[position][0])
+            position = index
+            seen.add(index)
+        elif line.startswith('TestScript:'):
+            continue
+        elif position is None:
+            if line.strip():
+                return {}
+        else:
+            by_script[rules[position][0]].append(line)
+    unattributed.update(path for i, (path, _) in enumerate(rules) if i not in seen)
+    return dict((path, lines) for path, lines in by_script.items() if path not in unattributed)
+
+
+def _order_for_attribution(scripts):
+    """
+    Orders [(path, text)] so that the last rule of a script and the first rule of the next one
+    don't share a name where possible, as their output couldn't be told apart.
+    """
+    remaining, ordered, last = list(scripts), [], None
+    while remaining:
+        pick = next((s for s in remaining if not _rule_names(s[1])[:1] == [last]), remaining[0])
+        remaining.remove(pick)
+        ordered.append(pick)
+        names = _rule_names(pick[1])
+        last = names[-1] if names else last
+    return ordered
+
+
+def _has_errors(lines):
+    return any('ERROR' in line for line in lines)
+
+
+class ScriptValidationCache(object):
+    """
+    Typechecks Byteman scripts against the classes of a Cassandra build with the TestScript tool
+    of Byteman, caching the result of each script by (hash of the script, build).
+
+    The first validation for a build checks every script of byteman/ applying to its version in
+    a single TestScript JVM, so later validations of any of them are lookups. A script whose
+    output can't be attributed in that run, or which isn't under byteman/, is checked on its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (script sha1, build sha1) -> (has errors, output)
+        self._results = {}
+        self._validated_builds = set()
+        # jar path -> ((size, mtime), sha1)
+        self._jar_hashes = {}
+        self.test_script_runs = 0
+
+    def build_sha(self, node):
+        """
+        A hash of the Cassandra jars of the install of a node, recomputed only when they change.
+        """
+        install_dir = node.get_install_dir()
+        jars = sorted(jar for directory in ('build', 'lib')
+                      for jar in glob.glob(os.path.join(install_dir, directory, 'apache-cassandra-*.jar')))
+        if not jars:
+            return hashlib.sha1('{}:{}'.format(install_dir, node.get_cassandra_version()).encode('utf-8')).hexdigest()
+        digest = hashlib.sha1()
+        for jar in jars:
+            stat = os.stat(jar)
+            cached = self._jar_hashes.get(jar)
+            if cached is None or cached[0] != (stat.st_size, stat.st_mtime):
+                jar_digest = hashlib.sha1()
+                with open(jar, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        jar_digest.update(chunk)
+                cached = ((stat.st_size, stat.st_mtime), jar_digest.hexdigest())
+                self._jar_hashes[jar] = cached
+            digest.update(cached[1].encode('utf-8'))
+        return digest.hexdigest()
+
+    def _run_test_script(self, node, paths):
+        """
+        Runs TestScript over script files and returns its output. It exits with an error when
+        some scripts don't typecheck, which is reported in the output of each of them.
+        """
+        cdir = node.get_install_dir()
+        jars = [
+            glob.glob(os.path.join(cdir, 'build', 'lib', 'jars', 'byteman-[0-9]*.jar'))[0],
+            os.path.join(cdir, 'build', '*'),
+        ]
+        byteman_cmd = [os.path.join(os.environ['JAVA_HOME'], 'bin', 'java'), '-cp', ':'.join(jars),
+                       'org.jboss.byteman.check.TestScript'] + list(paths)
+        self.test_script_runs += 1
+        process = subprocess.run(byteman_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        return process.stdout.decode()
+
+    def _validate_all(self, node, build, extra_script):
+        paths = scripts_for_version(node.get_cassandra_version())
+        if os.path.normpath(extra_script) not in [os.path.normpath(p) for p in paths]:
+            paths.append(extra_script)
+        scripts = []
+        for path in paths:
+            with open(path) as f:
+                scripts.append((path, f.read()))
+        scripts = _order_for_attribution(scripts)
+        out = self._run_test_script(node, [path for path, _ in scripts])
+        attributed = attribute_test_script_output(out, scripts)
+        for path, text in scripts:
+            if path in attributed:
+                self._results[(_sha1(text), build)] = (_has_errors(attributed[path]), '\n'.join(attributed[path]))
+        logger.debug('Validated {} of {} byteman scripts in one TestScript run'.format(len(attributed), len(scripts)))
+
+    def validate(self, node, script):
+        """
+        Returns (has errors, TestScript output) for a script, validating it if it isn't cached.
+        """
+        with open(script) as f:
+            key = (_sha1(f.read()), self.build_sha(node))
+        with self._lock:
+            if key not in self._results and key[1] not in self._validated_builds:
+                self._validated_builds.add(key[1])
+                self._validate_all(node, key[1], script)
+            if key not in self._results:
+                out = self._run_test_script(node, [script])
+                self._results[key] = (_has_errors(out.splitlines()), out)
+            return self._results[key]
+
+
+def _sha1(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+validation_cache = ScriptValidationCache()
+
+
+def byteman_validate(node, script, verbose=False):
+    """
+    Asserts that a Byteman script typechecks against the Cassandra build of a node, looking the
+    result up in the session-wide validation_cache.
+    """
+    has_errors, out = validation_cache.validate(node, script)
+    if verbose and not has_errors:
+        print(out)
+
+    assert not has_errors, "byteman script didn't compile\n" + out
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.protocol import NumpyProtocolHandler
+from cassandra.query import tuple_factory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the driver only provides NumpyProtocolHandler when it was built with Cython and numpy is installed
+COLUMNAR_SUPPORTED = NumpyProtocolHandler is not None
+
+
+@contextmanager
+def columnar_results(session):
+    """
+    Makes the driver decode the results of `session` straight into numpy arrays while in the block:
+    every page is then a dict of column name to array rather than a list of rows. Nullable numeric
+    columns are masked arrays.
+
+    The protocol handler belongs to the session, so it must not be used by other threads meanwhile.
+    Most callers should use fetch_columns, which also works when numpy is not available.
+    """
+    if not COLUMNAR_SUPPORTED:
+        raise RuntimeError('Columnar results need numpy and a python driver built with Cython')
+    previous = session.client_protocol_handler
+    session.client_protocol_handler = NumpyProtocolHandler
+    try:
+        yield session
+    finally:
+        session.client_protocol_handler = previous
+
+
+def fetch_columns(session, query, parameters=None):
+    """
+    Executes `query` and returns its result, all pages included, as an OrderedDict of column name
+    to column. Columns are numpy arrays when COLUMNAR_SUPPORTED, lists otherwise, and can be
+    compared with the functions of this module either way.
+    """
+    profile = session.execution_profile_clone_update(EXEC_PROFILE_DEFAULT, row_factory=tuple_factory)
+    if not COLUMNAR_SUPPORTED:
+        results = session.execute(query, parameters, execution_profile=profile)
+        rows = list(results)
+        return OrderedDict((name, [row[i] for row in rows]) for i, name in enumerate(results.column_names))
+
+    with columnar_results(session):
+        results = session.execute(query, parameters, execution_profile=profile)
+        pages = list(results)
+    columns = OrderedDict()
+    for name in results.column_names:
+        arrays = [page[name] for page in pages]
+        if not arrays:
+            columns[name] = numpy.array([])
+        elif any(numpy.ma.isMaskedArray(a) for a in arrays):
+            columns[name] = numpy.ma.concatenate(arrays)
+        else:
+            columns[name] = numpy.concatenate(arrays)
+    return columns
+
+
+def _masked(column):
+    """
+    `column` as a masked array whose nulls are masked.
+    """
+    if isinstance(column, numpy.ndarray):
+        return numpy.ma.asarray(column)
+    nulls = [value is None for value in column]
+    return numpy.ma.masked_array([0 if null else value for value, null in zip(column, nulls)], mask=nulls)
+
+
+def column_sum(column):
+    """
+    The sum of the values of a numeric column, nulls excluded.
+    """
+    if numpy is not None:
+        total = _masked(column).sum() if len(column) else 0
+        if total is numpy.ma.masked:  # only nulls
+            return 0
+        return total.item() if hasattr(total, 'item') else total
+    return sum(value for value in column if value is not None)
+
+
+def _is_column(values):
+    return isinstance(values, (list, tuple)) or (numpy is not None and isinstance(values, numpy.ndarray))
+
+
+def equal_mask(column, expected):
+    """
+    Returns, for each value of `column`, whether it is equal to the corresponding value of
+    `expected`, or to `expected` itself if it is a scalar. Nulls are never equal.
+    """
+    if numpy is not None:
+        values = _masked(column)
+        if _is_column(expected):
+            expected = numpy.asarray(expected, dtype=object if values.dtype == object else None)
+        return numpy.asarray(numpy.ma.filled(values == expected, False), dtype=bool)
+    if not _is_column(expected):
+        return [value is not None and value == expected for value in column]
+    return [value is not None and value == e for value, e in zip(column, expected)]
+
+
+def mismatch_indices(column, expected):
+    """
+    The indices of the values of `column` which are not equal to `expected`, see equal_mask.
+    """
+    mask = equal_mask(column, expected)
+    if numpy is not None:
+        return numpy.flatnonzero(~mask).tolist()
+    return [i for i, equal in enumerate(mask) if not equal]
+
+
+def _value(column, index):
+    value = column[index]
+    if numpy is not None and value is numpy.ma.masked:
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _to_list(column):
+    # masked values become None
+    return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+
+def assert_columns_equal(column, expected, keys=None, max_shown=10):
+    """
+    Asserts that `column` is equal to `expected` (a column of the same length or a scalar),
+    reporting the first `max_shown` differences along with the matching values of `keys`.
+    """
+    if _is_column(expected):
+        assert len(column) == len(expected), "Expected {} values, got {}".format(len(expected), len(column))
+    mismatches = mismatch_indices(column, expected)
+    if mismatches:
+        shown = ['{}: expected {}, got {}'.format(i if keys is None else _value(keys, i),
+                                                  _value(expected, i) if _is_column(expected) else expected,
+                                                  _value(column, i))
+                 for i in mismatches[:max_shown]]
+        raise AssertionError('{} of {} values differ: {}'.format(len(mismatches), len(column), '; '.join(shown)))
+
+
+def _take(column, indices):
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        return column[numpy.asarray(indices, dtype=int)]
+    return [column[i] for i in indices]
+
+
+def assert_column_values(columns, key_columns, value_column, expected, max_shown=10, ignore_unexpected=False):
+    """
+    Asserts that the rows fetched with fetch_columns are exactly those of `expected`, a dict of
+    key to expected value of `value_column`, whatever their order. `key_columns` is the name of
+    the key column, or a tuple of names for composite keys, whose keys are then tuples.
+
+    With `ignore_unexpected`, rows whose key is not in `expected` are left out of the comparison
+    rather than failing it.
+    """
+    if isinstance(key_columns, str):
+        keys = _to_list(columns[key_columns])
+    else:
+        keys = list(zip(*[_to_list(columns[name]) for name in key_columns]))
+    values = columns[value_column]
+    if ignore_unexpected:
+        indices = [i for i, key in enumerate(keys) if key in expected]
+        keys = [keys[i] for i in indices]
+        values = _take(values, indices)
+
+    missing = set(expected) - set(keys)
+    unexpected = set(keys) - set(expected)
+    assert not missing, "{} rows are missing: {}".format(len(missing), sorted(missing, key=str)[:max_shown])
+    assert not unexpected, "{} rows are unexpected: {}".format(len(unexpected), sorted(unexpected, key=str)[:max_shown])
+    assert len(keys) == len(expected), "Got {} rows for {} keys".format(len(keys), len(expected))
+    assert_columns_equal(values, [expected[key] for key in keys], keys=keys, max_shown=max_shown)
@@ -0,0 +1,293 @@
+import os
+import re
+import select
+import subprocess
+import time
+import logging
+
+from collections import namedtuple
+
+from ccmlib import extension
+from ccmlib.node import TimeoutError, ToolError
+
+try:
+    import pty
+    import tty
+except ImportError:  # not available on Windows
+    pty = None
+
+logger = logging.getLogger(__name__)
+
+# same fields as the value returned by ccmlib's Node.run_cqlsh
+CqlshResult = namedtuple('CqlshResult', 'stdout stderr rc')
+
+# cqlsh commands whose effect lasts beyond the statement, a session that ran any of
+# them is discarded so that the next caller gets the same state as a new cqlsh process
+STATEFUL_COMMANDS = ('USE', 'CONSISTENCY', 'SERIAL', 'TRACING', 'EXPAND', 'PAGING',
+                     'LOGIN', 'CAPTURE', 'SOURCE', 'DEBUG', 'EXIT', 'QUIT')
+
+# cqlsh commands which rely on the schema metadata of its driver, which a session may have
+# loaded before another client changed the schema
+SCHEMA_COMMANDS = ('COPY', 'DESC', 'DESCRIBE')
+
+SENTINEL = 'SHOW VERSION;\n'
+SENTINEL_OUTPUT = re.compile(r'\[cqlsh [^\n]*\]\n')
+SHOW_VERSION = re.compile(r'SHOW\s+VERSION', re.IGNORECASE)
+LINE_NUMBER = re.compile(r'<stdin>:(\d+):')
+SCHEMA_VERSION_QUERY = 'SELECT schema_version FROM system.local;\n'
+UUID = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def cqlsh_args(node, cqlsh_options=None):
+    """
+    The command line used by ccmlib to run cqlsh against `node`.
+    """
+    if node.get_base_cassandra_version() >= 2.1:
+        host, port = node.network_interfaces['binary']
+    else:
+        host, port = node.network_interfaces['thrift']
+    return [node.get_tool('cqlsh')] + list(cqlsh_options or []) + [host, str(port)]
+
+
+def cqlsh_env(node):
+    """
+    The environment used by ccmlib to run cqlsh against `node`.
+    """
+    env = node.get_env()
+    extension.append_to_client_env(node, env)
+    return env
+
+
+def runs_once(cmds, cqlsh_options=None):
+    """
+    Returns True if cqlsh exits after running `cmds` with `cqlsh_options`, without commands or
+    with -f/--file or -e/--execute, in which case it must be run as a new process rather than
+    in a CqlshSession.
+    """
+    options = cqlsh_options or []
+    return not cmds or any(option in ('-f', '-e') or option.startswith(('--file', '--execute')) for option in options)
+
+
+class CqlshSession(object):
+    """
+    A cqlsh process that is kept running to execute several batches of commands, which saves
+    the interpreter startup, driver import and connection setup that node.run_cqlsh pays on
+    every call.
+
+    cqlsh runs in its non-interactive mode, reading commands from a pipe, so its output is the
+    same as when running a new process. Its standard output is a pty so that it is line buffered,
+    and every batch of commands is followed by SHOW VERSION, whose output tells us the batch is
+    complete. Line numbers in error messages are rewritten relative to the start of the batch.
+    Before running COPY or DESCRIBE, the session is restarted if the schema changed since it
+    started, as its driver metadata could be out of date while a new process would not be.
+
+    Example usage:
+
+        session = CqlshSession(node).start()
+        out, err, _ = session.run_cqlsh('SELECT * FROM ks.cf')
+        session.close()
+
+    Most tests should use DTestSetup.cqlsh_session, which keeps one session per node and
+    closes them when the test ends.
+    """
+
+    supported = pty is not None
+
+    def __init__(self, node, cqlsh_options=None, env=None, timeout=120):
+        self.node = node
+        self.cqlsh_options = list(cqlsh_options or [])
+        self.env = env if env is not None else cqlsh_env(node)
+        self.timeout = timeout
+        self.process = None
+        self.stale = False
+        self._master = None
+        self._lines_sent = 0
+        self._version_line = None
+        self._pending_err = ''
+        self._schema_version = None
+        self._cqlshrc = self._read_cqlshrc(self.cqlsh_options, self.env)
+
+    def start(self):
+        master, slave = pty.openpty()
+        # no echo and no translation of \n into \r\n
+        tty.setraw(slave)
+        args = cqlsh_args(self.node, ['--no-color'] + self.cqlsh_options)
+        logger.debug('Starting cqlsh session: {}'.format(' '.join(args)))
+        self.process = subprocess.Popen(args, env=self.env, stdin=subprocess.PIPE, stdout=slave,
+                                        stderr=subprocess.PIPE, close_fds=True)
+        os.close(slave)
+        self._master = master
+        os.set_blocking(self.process.stderr.fileno(), False)
+
+        # wait for cqlsh to connect, and remember its version line to recognize the sentinel output
+        _, self._pending_err, self._version_line = self._execute('')
+        self._schema_version = self._read_schema_version()
+        return self
+
+    def restart(self):
+        self.close()
+        self._lines_sent = 0
+        self._version_line = None
+        return self.start()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def matches(self, cqlsh_options, env):
+        """
+        Returns True if this session can run commands meant for a new cqlsh process
+        started with `cqlsh_options` and `env`.
+        """
+        cqlsh_options = list(cqlsh_options or [])
+        same_config = cqlsh_options == self.cqlsh_options and env == self.env
+        return all((self.alive, not self.stale, same_config, self._read_cqlshrc(cqlsh_options, env) == self._cqlshrc))
+
+    @staticmethod
+    def _read_cqlshrc(cqlsh_options, env):
+        """
+        cqlsh only reads its configuration file when it starts, so a session must not be reused
+        once the file changed.
+        """
+        filename = os.path.join(env.get('HOME', os.path.expanduser('~')), '.cassandra', 'cqlshrc')
+        for i, option in enumerate(cqlsh_options):
+            if option.startswith('--cqlshrc='):
+                filename = option[len('--cqlshrc='):]
+            elif option == '--cqlshrc' and i + 1 < len(cqlsh_options):
+                filename = cqlsh_options[i + 1]
+        try:
+            with open(filename, 'r') as f:
+                return f.read()
+        except (IOError, OSError):
+            return None
+
+    def run(self, text, allow_state=()):
+        """
+        Write `text` to cqlsh verbatim and return a CqlshResult once all of it was executed.
+
+        If `text` runs a command from STATEFUL_COMMANDS that is not in `allow_state`, the session is
+        marked as stale, see matches().
+        """
+        if not text.endswith('\n'):
+            text += '\n'
+        stateful = set(STATEFUL_COMMANDS) - set(c.upper() for c in allow_state)
+        pattern = r'(?:^|;)\s*({})\b'.format('|'.join(stateful))
+        if re.search(pattern, text, re.IGNORECASE | re.MULTILINE):
+            self.stale = True
+        if self._uses_schema(text) and self._read_schema_version() != self._schema_version:
+            logger.debug('Restarting cqlsh session, the schema changed since it started')
+            pending_err = self._pending_err
+            self.restart()
+            self._pending_err = pending_err + self._pending_err
+
+        base = self._lines_sent
+        out, err, _ = self._execute(text)
+        err = LINE_NUMBER.sub(lambda m: '<stdin>:{}:'.format(int(m.group(1)) - base), err)
+        if self._pending_err:
+            err, self._pending_err = self._pending_err + err, ''
+        return CqlshResult(stdout=out, stderr=err, rc=0)
+
+    def run_cqlsh(self, cmds):
+        """
+        Run `cmds` the same way as ccmlib's Node.run_cqlsh, one statement per line.
+        """
+        text = ''.join(cmd.strip() + ';\n' for cmd in cmds.split(';') if cmd.strip())
+        return self.run(text)
+
+    @staticmethod
+    def _uses_schema(text):
+        pattern = r'(?:^|;)\s*({})\b'.format('|'.join(SCHEMA_COMMANDS))
+        return re.search(pattern, text, re.IGNORECASE | re.MULTILINE) is not None
+
+    def _read_schema_version(self):
+        """
+        The schema version of the node, read through this session.
+        """
+        out, _, _ = self._execute(SCHEMA_VERSION_QUERY)
+        match = UUID.search(out)
+        return match.group(0) if match else None
+
+    def _execute(self, text):
+        expected_versions = len(SHOW_VERSION.findall(text)) + 1
+        self.process.stdin.write((text + SENTINEL).encode('utf-8'))
+        self.process.stdin.flush()
+        self._lines_sent += text.count('\n') + SENTINEL.count('\n')
+
+        out, err = b'', self._read_err()
+        # stderr is read along with stdout, so that cqlsh can't block on a full stderr pipe
+        err_fd = self.process.stderr.fileno()
+        fds = [self._master, err_fd]
+        deadline = time.time() + self.timeout
+        while not self._complete(out.decode('utf-8', 'replace'), expected_versions):
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.close(kill=True)
+                raise TimeoutError('cqlsh did not complete {!r} within {} seconds, output so far: {}'
+                                   .format(text, self.timeout, out))
+            readable, _, _ = select.select(fds, [], [], min(remaining, 1))
+            if err_fd in readable:
+                data = self._read_err()
+                if not data:  # closed, the process is exiting
+                    fds.remove(err_fd)
+                err += data
+            if self._master in readable:
+                try:
+                    data = os.read(self._master, 65536)
+                except OSError:  # EIO once the process exited
+                    data = b''
+                if not data:
+                    err += self._read_err()
+                    returncode = self.process.wait()
+                    self.close()
+                    raise ToolError(['cqlsh', text], returncode, out, err.decode('utf-8', 'replace'))
+                out += data
+
+        out = out.decode('utf-8')
+        sentinel_start = out.rindex('[cqlsh ')
+        err += self._read_err()
+        return out[:sentinel_start], err.decode('utf-8'), out[sentinel_start:]
+
+    def _complete(self, out, expected_versions):
+        """
+        The output is complete once it ends with the output of the sentinel, which is the
+        expected_versions-th SHOW VERSION of the batch.
+        """
+        versions = [v for v in SENTINEL_OUTPUT.findall(out) if self._version_line in (None, v)]
+        return len(versions) >= expected_versions and out.endswith(versions[-1])
+
+    def _read_err(self):
+        """
+        Reads the bytes available on stderr without blocking.
+        """
+        chunks = []
+        while True:
+            try:
+                data = os.read(self.process.stderr.fileno(), 65536)
+            except BlockingIOError:
+                data = None
+            if not data:
+                break
+            chunks.append(data)
+        return b''.join(chunks)
+
+    def close(self, kill=False):
+        if self.process is None:
+            return
+        if self.alive:
+            if kill:
+                self.process.kill()
+            else:
+                try:
+                    self.process.stdin.write(b'quit;\n')
+                    self.process.stdin.close()
+                except (IOError, OSError):
+                    pass
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process.stderr.close()
+        os.close(self._master)
+        self._master = None
+        self.process = None
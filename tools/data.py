@@ -1,3 +1,4 @@
+import re
 import time
 import logging
 
@@ -8,6 +9,8 @@ from cassandra.query import SimpleStatement
 from . import assertions
 from dtest import create_cf, DtestTimeoutError
 from tools.funcutils import get_rate_limited_function
+from tools.metadata_wrapper import schema_tracker
+from tools.wait import LogWatcher, WaitTimeout, wait_until
 
 logger = logging.getLogger(__name__)
 
@@ -137,8 +140,13 @@ def get_schema_metadata(session):
 
 
 def get_table_metadata(session, keyspace_name, table_name):
+    """
+    Returns the table's metadata, refreshed if the schema changed since the last time it was.
+    """
     cluster = session.cluster
-    cluster.refresh_table_metadata(keyspace_name, table_name)
+    schema_tracker(cluster).refresh(('table', keyspace_name, table_name),
+                                    lambda: cluster.refresh_table_metadata(keyspace_name, table_name),
+                                    session=session)
     return cluster.metadata.keyspaces[keyspace_name].tables[table_name]
 
 
@@ -157,14 +165,17 @@ def index_is_built(node, session, keyspace, table_name, idx_name):
 def block_until_index_is_built(node, session, keyspace, table_name, idx_name):
     """
     Waits up to 30 seconds for a secondary index to be built, and raises
-    DtestTimeoutError if it is not.
+    DtestTimeoutError if it is not. The index is checked again as soon as
+    the node logs that an index build of idx_name completed.
     """
-    start = time.time()
     rate_limited_debug_logger = get_rate_limited_function(logger.debug, 5)
-    while time.time() < start + 30:
+
+    def built():
         rate_limited_debug_logger("waiting for index to build")
-        time.sleep(1)
-        if index_is_built(node, session, keyspace, table_name, idx_name):
-            break
-    else:
+        return index_is_built(node, session, keyspace, table_name, idx_name)
+
+    try:
+        with LogWatcher(node, r'Index build of .*{}.* complete'.format(re.escape(idx_name))) as watcher:
+            wait_until(built, timeout=30, max_interval=1, wake=watcher.wake)
+    except WaitTimeout:
         raise DtestTimeoutError()
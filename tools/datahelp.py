@@ -22,6 +22,10 @@ It's meant to be used in tests when comparing expected to actual data, for valid
 For more examples reference paging_test.py
 """
 import re
+import uuid
+
+from decimal import Decimal
+from functools import lru_cache
 
 from cassandra.concurrent import execute_concurrent_with_args
 
@@ -47,7 +51,7 @@ def parse_headers_into_list(data):
 
 def get_row_multiplier(row):
     # find prefix like *1234 meaning create 1,234 rows
-    row_cells = [l.strip() for l in row.split('|')]
+    row_cells = [cell.strip() for cell in row.split('|')]
     m = re.findall(r'\*(\d+)$', row_cells[0])
 
     if m:
@@ -64,7 +68,7 @@ def row_has_multiplier(row):
 
 
 def parse_row_into_dict(row, headers, format_funcs=None):
-    row_cells = [l.strip() for l in row.split('|')]
+    row_cells = [cell.strip() for cell in row.split('|')]
 
     if row_has_multiplier(row):
         row_multiplier = get_row_multiplier(row)
@@ -106,30 +110,89 @@ def row_describes_data(row):
     return False
 
 
-def parse_data_into_dicts(data, format_funcs=None):
-    # throw out leading/trailing space and pipes
-    # so we can split on the data without getting
-    # extra empty fields
-    rows = list(map(strip, data.split('\n')))
+class CompiledTable(object):
+    """
+    A markdown-style table parsed once into its headers and, for each row, its multiplier and
+    cells. Rows are only expanded into dicts, and formatted, when iterating with iter_dicts.
 
-    # remove any remaining empty/decoration lines (i.e. '') from data
-    rows = list(filter(row_describes_data, rows))
+    Use compile_table, which caches the compiled tables by their text.
+    """
 
-    # remove headers
-    headers = parse_headers_into_list(rows.pop(0))
+    def __init__(self, data):
+        # throw out leading/trailing space and pipes
+        # so we can split on the data without getting
+        # extra empty fields
+        rows = list(map(strip, data.split('\n')))
 
-    values = []
+        # remove any remaining empty/decoration lines (i.e. '') from data
+        rows = list(filter(row_describes_data, rows))
 
-    for row in rows:
-        if row_has_multiplier(row):
-            values.extend(parse_row_into_dict(row, headers, format_funcs=format_funcs))
-        else:
-            values.append(parse_row_into_dict(row, headers, format_funcs=format_funcs))
+        # remove headers
+        self.headers = tuple(parse_headers_into_list(rows.pop(0)))
 
-    return values
+        self.rows = []
+        for row in rows:
+            multiplier = get_row_multiplier(row)
+            cells = [cell.strip() for cell in row.split('|')]
+            if multiplier is not None:
+                cells = cells[1:]
+            self.rows.append((1 if multiplier is None else multiplier, tuple(cells[:len(self.headers)])))
+
+    def __len__(self):
+        return sum(multiplier for multiplier, _ in self.rows)
+
+    def iter_dicts(self, format_funcs=None, coercers=None):
+        """
+        Generates a dict per row, expanding multiplied rows. Values of the columns with a function
+        in format_funcs are passed through it, for each generated row, other values are passed
+        through the function in coercers for their column, if any.
+        """
+        format_funcs = format_funcs or {}
+        coercers = coercers or {}
+        funcs = [format_funcs.get(h, coercers.get(h)) for h in self.headers]
+        for multiplier, cells in self.rows:
+            for _ in range(multiplier):
+                yield dict((header, value if func is None else func(value))
+                           for header, value, func in zip(self.headers, cells, funcs))
+
+
+@lru_cache(maxsize=128)
+def compile_table(data):
+    return CompiledTable(data)
 
 
-def create_rows(data, session, table_name, cl=None, format_funcs=None, prefix='', postfix=''):
+def _parse_bool(value):
+    return value.lower() == 'true'
+
+
+# functions converting table cells to the python type of a cql type, for the types that can be
+# written as plain text in a table
+CQL_TYPE_COERCERS = {
+    'int': int, 'bigint': int, 'smallint': int, 'tinyint': int, 'varint': int, 'counter': int,
+    'float': float, 'double': float, 'decimal': Decimal,
+    'boolean': _parse_bool,
+    'uuid': uuid.UUID, 'timeuuid': uuid.UUID,
+}
+
+
+def coercers_for(column_metadata):
+    """
+    Returns {column name: function} converting text cells to the types of the given columns,
+    typically the column_metadata of a prepared statement. Empty cells become None.
+    """
+    coercers = {}
+    for column in column_metadata:
+        coercer = CQL_TYPE_COERCERS.get(getattr(column.type, 'typename', None))
+        if coercer is not None:
+            coercers[column.name] = (lambda coercer: lambda value: coercer(value) if value != '' else None)(coercer)
+    return coercers
+
+
+def parse_data_into_dicts(data, format_funcs=None):
+    return list(compile_table(data).iter_dicts(format_funcs=format_funcs))
+
+
+def create_rows(data, session, table_name, cl=None, format_funcs=None, prefix='', postfix='', return_rows=True):
     """
     Creates db rows using given session, with table name provided,
     using data formatted like:
@@ -139,27 +202,36 @@ def create_rows(data, session, table_name, cl=None, format_funcs=None, prefix=''
     |value2  |value2  |
 
     format_funcs should be a dictionary of {columnname: function} if data needs to be formatted
-    before being included in CQL.
+    before being included in CQL. Values of the other columns are converted to the type of their
+    column when it is a numeric, boolean or uuid type.
 
-    Returns a list of maps describing the data created.
+    Returns a list of maps describing the data created, or None if return_rows is False, in which
+    case rows are streamed to the database without being kept in memory.
     """
-    values = []
-    dicts = parse_data_into_dicts(data, format_funcs=format_funcs)
+    table = compile_table(data)
 
-    # use the first dictionary to build a prepared statement for all
+    # build a prepared statement for all the rows
     prepared = session.prepare(
         "{prefix} INSERT INTO {table} ({cols}) values ({vals}) {postfix}".format(
-            prefix=prefix, table=table_name, cols=', '.join(list(dicts[0].keys())),
-            vals=', '.join('?' for k in list(dicts[0].keys())), postfix=postfix)
+            prefix=prefix, table=table_name, cols=', '.join(table.headers),
+            vals=', '.join('?' for k in table.headers), postfix=postfix)
     )
     if cl is not None:
         prepared.consistency_level = cl
 
-    query_results = execute_concurrent_with_args(session, prepared, [list(d.values()) for d in dicts])
+    values = [] if return_rows else None
+
+    def parameters():
+        for row in table.iter_dicts(format_funcs=format_funcs, coercers=coercers_for(prepared.column_metadata)):
+            if return_rows:
+                values.append(row)
+            yield list(row.values())
 
-    for i, (status, result_or_exc) in enumerate(query_results):
-        # should maybe check status here before appening to expected values
-        values.append(dicts[i])
+    # without return_rows, results are streamed too and consumed as they complete, so that
+    # they don't pile up in memory either. This raises the first error, if any.
+    results = execute_concurrent_with_args(session, prepared, parameters(), results_generator=not return_rows)
+    for _ in results:
+        pass
 
     return values
 
@@ -0,0 +1,116 @@
+import os
+import logging
+
+from collections import OrderedDict, namedtuple
+
+from cassandra import ConsistencyLevel
+
+from tools.token_scan import TokenRangeScanner
+
+logger = logging.getLogger(__name__)
+
+# the (number of rows, checksum) of a token range on each of its replicas, by node name
+Divergence = namedtuple('Divergence', 'token_range digests')
+
+
+def prefer_local_replica_reads(cluster):
+    """
+    Configures a populated cluster, before it is started, so that a read at CL.ONE through an exclusive
+    connection to a replica is served by that replica: the dynamic snitch is disabled, as it may send the
+    read to another replica, and the snitch orders replicas with the local node first.
+    """
+    cluster.set_configuration_options(values={'endpoint_snitch': 'GossipingPropertyFileSnitch',
+                                              'dynamic_snitch': False})
+    for node in cluster.nodelist():
+        with open(os.path.join(node.get_conf_dir(), 'cassandra-rackdc.properties'), 'w') as snitch_file:
+            snitch_file.write("dc=datacenter1" + os.linesep)
+            snitch_file.write("rack=rack1" + os.linesep)
+            snitch_file.write("prefer_local=true" + os.linesep)
+
+
+class ReplicaDivergenceDetector(object):
+    """
+    Finds the token ranges of a table whose data differs between replicas, without stopping any node.
+
+    Every node reads, through its own exclusive connection at CL.ONE, the token ranges it is a replica of,
+    and computes the number of rows and an order-independent checksum of each of them (see
+    tools.token_scan.TokenRangeScanner.checksums). Ranges whose replicas don't agree are divergent.
+
+    This relies on each node serving the reads of its own ranges, see prefer_local_replica_reads.
+
+    Example usage:
+
+        detector = ReplicaDivergenceDetector.connect(self, 'ks', 'cf')
+        assert [d.token_range for d in detector.divergent_ranges()] == [expected_range]
+        node1.nodetool('repair ks')
+        detector.assert_converged()
+    """
+
+    def __init__(self, sessions, keyspace, table, **scanner_options):
+        """
+        @param sessions an OrderedDict of node to an exclusive session connected to that node
+        @param scanner_options options of the TokenRangeScanner of each node, such as min_ranges
+        """
+        self.sessions = sessions
+        self.keyspace = keyspace
+        self.table = table
+        self.scanner_options = scanner_options
+
+    @classmethod
+    def connect(cls, tester, keyspace, table, nodes=None, **scanner_options):
+        """
+        Creates a detector comparing the running nodes of the cluster of `tester` (a Tester or DTestSetup),
+        or `nodes`.
+        """
+        nodes = [n for n in tester.cluster.nodelist() if n.is_running()] if nodes is None else nodes
+        sessions = OrderedDict((node, tester.patient_exclusive_cql_connection(node)) for node in nodes)
+        return cls(sessions, keyspace, table, **scanner_options)
+
+    def replica_ranges(self):
+        """
+        Returns an OrderedDict of node to the token ranges it is a replica of.
+        """
+        session = next(iter(self.sessions.values()))
+        token_map = session.cluster.metadata.token_map
+        nodes_by_address = dict((node.address(), node) for node in self.sessions)
+        all_ranges = TokenRangeScanner(session, self.keyspace, self.table, **self.scanner_options).ranges()
+
+        replica_ranges = OrderedDict((node, []) for node in self.sessions)
+        for token_range in all_ranges:
+            if token_range is None:  # not scanned by token, every node has all the data
+                replicas = list(self.sessions)
+            else:
+                hosts = token_map.get_replicas(self.keyspace, token_map.token_class(token_range[1]))
+                replicas = [nodes_by_address[host.address] for host in hosts if host.address in nodes_by_address]
+            for node in replicas:
+                replica_ranges[node].append(token_range)
+        return replica_ranges
+
+    def digests(self):
+        """
+        Returns an OrderedDict of token range to {node name: (number of rows, checksum)} of its replicas.
+        """
+        digests = OrderedDict()
+        for node, ranges in self.replica_ranges().items():
+            if not ranges:
+                continue
+            scanner = TokenRangeScanner(self.sessions[node], self.keyspace, self.table, ranges=ranges,
+                                        consistency_level=ConsistencyLevel.ONE, **self.scanner_options)
+            for token_range, digest in scanner.checksums().items():
+                digests.setdefault(token_range, OrderedDict())[node.name] = digest
+        return digests
+
+    def divergent_ranges(self):
+        """
+        The Divergence of every token range whose replicas don't have the same data.
+        """
+        divergences = [Divergence(token_range, digests) for token_range, digests in self.digests().items()
+                       if len(set(digests.values())) > 1]
+        for divergence in divergences:
+            logger.debug('Replicas of {}.{} diverge on {}: {}'.format(self.keyspace, self.table, *divergence))
+        return divergences
+
+    def assert_converged(self):
+        divergences = self.divergent_ranges()
+        assert not divergences, "Replicas of {}.{} diverge on {} token range(s): {}".format(
+            self.keyspace, self.table, len(divergences), divergences)
@@ -20,3 +20,21 @@ def cassandra_git_branch(cassandra_dir):
         raise RuntimeError('Git printed error: {err}'.format(err=err.decode("utf-8")))
     [current_branch_line] = [line for line in out.decode("utf-8").splitlines() if line.startswith('*')]
     return current_branch_line[1:].strip()
+
+
+def cassandra_git_sha(cassandra_dir):
+    '''Get the sha of the commit checked out at CASSANDRA_DIR, or None if
+    it is not a git repository.
+    '''
+    try:
+        p = subprocess.Popen(['git', 'rev-parse', 'HEAD'], cwd=cassandra_dir,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:  # e.g. if git isn't available, just give up and return None
+        logger.debug('shelling out to git failed: {}'.format(e))
+        return
+
+    out, err = p.communicate()
+    if p.returncode != 0:
+        logger.debug('Git printed error: {err}'.format(err=err.decode("utf-8")))
+        return
+    return out.decode("utf-8").strip()
@@ -0,0 +1,285 @@
+import http.client
+import re
+import socket
+import threading
+import logging
+
+from collections import OrderedDict, defaultdict
+
+from tools.jmxutils import JolokiaAgent, make_mbean
+from tools.wait import current_test
+
+logger = logging.getLogger(__name__)
+
+STORAGE_SERVICE = make_mbean('db', 'StorageService')
+COMPACTION_MANAGER = make_mbean('db', 'CompactionManager')
+
+# seconds to wait for flushes and compactions run through JMX, as long as nodetool would
+OPERATION_TIMEOUT = 3600
+
+# the columns of nodetool tpstats and the thread pool metric (and its attribute) of each of them
+TPSTATS_COLUMNS = OrderedDict([('Active', ('ActiveTasks', 'Value')),
+                               ('Pending', ('PendingTasks', 'Value')),
+                               ('Completed', ('CompletedTasks', 'Value')),
+                               ('Blocked', ('CurrentlyBlockedTasks', 'Count')),
+                               ('All time blocked', ('TotalBlockedTasks', 'Count'))])
+
+# the state letter of nodetool status for each StorageService attribute listing nodes
+STATE_ATTRIBUTES = OrderedDict([('JoiningNodes', 'J'), ('LeavingNodes', 'L'), ('MovingNodes', 'M')])
+
+UUID_PREFIX = re.compile(r'^\s*[0-9a-f]{8}-[0-9a-f]{4}-')
+
+
+class NodetoolStats(object):
+    """
+    Counts, per test, the nodetool commands which were run through JMX, avoiding the launch of a
+    nodetool JVM, and those which launched nodetool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # test -> [commands run through JMX, nodetool launches]
+            self._counts = defaultdict(lambda: [0, 0])
+
+    def record(self, avoided, test=None):
+        test = current_test() if test is None else test
+        with self._lock:
+            self._counts[test][0 if avoided else 1] += 1
+
+    def by_test(self):
+        """
+        Returns {test: (launches avoided, launches)}.
+        """
+        with self._lock:
+            return dict((test, tuple(counts)) for test, counts in self._counts.items())
+
+    def launches_avoided(self, test=None):
+        return self.by_test().get(current_test() if test is None else test, (0, 0))[0]
+
+
+nodetool_stats = NodetoolStats()
+
+
+def parse_space_used_total(cfstats):
+    """
+    The "Space used (total)" of the output of nodetool cfstats for a single table.
+    """
+    regex = re.compile(r'[\t]')
+    stats_lines = [regex.sub("", s) for s in cfstats.split('\n')
+                   if regex.sub("", s).startswith('Space used (total)')]
+    if not len(stats_lines) == 1:
+        msg = ('Expected output from `nodetool cfstats` to contain exactly 1 '
+               'line starting with "Space used (total)". Found:\n') + cfstats
+        raise RuntimeError(msg)
+    space_used_line = stats_lines[0].split()
+
+    if len(space_used_line) == 4:
+        return float(space_used_line[3])
+    else:
+        msg = ('Expected format for `Space used (total)` in nodetool cfstats is `Space used (total): <number>`.'
+               'Found:\n') + stats_lines[0]
+        raise RuntimeError(msg)
+
+
+def parse_status(output):
+    """
+    Returns {address: state}, such as {'127.0.0.1': 'UN'}, from the output of nodetool status.
+    """
+    return OrderedDict((m.group(2), m.group(1)) for m in re.finditer(r'^([UD][NLJM])\s+(\S+)', output, re.MULTILINE))
+
+
+def parse_tpstats(output):
+    """
+    Returns {pool name: {column: value}} from the thread pool section of the output of nodetool tpstats.
+    """
+    pools = OrderedDict()
+    lines = iter(output.splitlines())
+    for line in lines:
+        if line.startswith('Pool Name'):
+            break
+    for line in lines:
+        fields = line.split()
+        if len(fields) != len(TPSTATS_COLUMNS) + 1:
+            break
+        pools[fields[0]] = OrderedDict((column, int(value)) for column, value in zip(TPSTATS_COLUMNS, fields[1:]))
+    return pools
+
+
+def parse_compactionstats(output):
+    """
+    Returns {'pending': pending compactions, 'active': running compactions} from the output of nodetool compactionstats.
+    """
+    pending = re.search(r'pending tasks: (\d+)', output)
+    return {'pending': int(pending.group(1)) if pending else 0,
+            'active': len([line for line in output.splitlines() if UUID_PREFIX.match(line)])}
+
+
+def _address(endpoint):
+    """
+    The address of an endpoint as returned through Jolokia: an InetAddress serialized as a dict or
+    as its '/address' string, or an 'address:port' string.
+    """
+    if isinstance(endpoint, dict):
+        return endpoint['hostAddress']
+    endpoint = endpoint.lstrip('/')
+    if endpoint.startswith('['):
+        return endpoint[1:endpoint.index(']')]
+    return endpoint.rsplit(':', 1)[0] if endpoint.count(':') == 1 else endpoint
+
+
+def _mbean_properties(mbean):
+    return dict(prop.split('=', 1) for prop in mbean.partition(':')[2].split(','))
+
+
+class JmxNodetool(object):
+    """
+    Runs common nodetool commands through the mbeans of a node, instead of launching a nodetool
+    JVM which takes one to three seconds, and returns their results as Python values.
+
+    The commands run through the Jolokia agent of the node, when one is running in it (see
+    install_jolokia_javaagent). Otherwise, or if the mbean call fails, the real nodetool is run
+    and its output parsed, so callers don't need to know how the node was started. A call which
+    timed out is not run again with nodetool, as it may still be running. The commands run each
+    way are counted in nodetool_stats.
+
+    Example usage:
+
+        nodetool = JmxNodetool(node)
+        nodetool.flush('ks', 'cf')
+        assert nodetool.status()['127.0.0.2'] == 'DN'
+        nodetool.nodetool('compact ks cf')  # as node.nodetool, for any command
+    """
+
+    def __init__(self, node, jmx=None):
+        self.node = node
+        self.jmx = JolokiaAgent(node) if jmx is None else jmx
+        self._available = None
+
+    @property
+    def available(self):
+        """
+        Whether commands can run through JMX, checked once.
+        """
+        if self._available is None:
+            self._available = self.jmx.is_running()
+        return self._available
+
+    def close(self):
+        self.jmx.close()
+
+    def _run(self, command, through_jmx, parse=None):
+        if self.available:
+            try:
+                result = through_jmx()
+            except socket.timeout:
+                # the operation may still be running on the node, nodetool would run it a second time
+                raise
+            except (OSError, http.client.HTTPException) as e:
+                logger.debug('Lost the Jolokia agent of {}, running nodetool: {}'.format(self.node.name, e))
+                self._available = False
+            except Exception as e:
+                logger.debug('nodetool {} failed through JMX on {}, running nodetool: {}'.format(command, self.node.name, e))
+            else:
+                nodetool_stats.record(avoided=True)
+                return result
+        nodetool_stats.record(avoided=False)
+        out, _, _ = self.node.nodetool(command)
+        return parse(out) if parse is not None else None
+
+    def _keyspaces(self, keyspace):
+        return [keyspace] if keyspace is not None else self.jmx.read_attribute(STORAGE_SERVICE, 'Keyspaces')
+
+    def flush(self, keyspace=None, *tables):
+        def through_jmx():
+            self.jmx.exec_many([(STORAGE_SERVICE, 'forceKeyspaceFlush(java.lang.String,[Ljava.lang.String;)',
+                                 [ks, list(tables)]) for ks in self._keyspaces(keyspace)], timeout=OPERATION_TIMEOUT)
+        self._run(' '.join(['flush'] + ([keyspace] if keyspace else []) + list(tables)), through_jmx)
+
+    def compact(self, keyspace=None, *tables):
+        def through_jmx():
+            if self.node.get_cassandra_version() < '2.2':
+                operation, arguments = 'forceKeyspaceCompaction(java.lang.String,[Ljava.lang.String;)', []
+            else:
+                operation, arguments = 'forceKeyspaceCompaction(boolean,java.lang.String,[Ljava.lang.String;)', [False]
+            self.jmx.exec_many([(STORAGE_SERVICE, operation, arguments + [ks, list(tables)])
+                                for ks in self._keyspaces(keyspace)], timeout=OPERATION_TIMEOUT)
+        self._run(' '.join(['compact'] + ([keyspace] if keyspace else []) + list(tables)), through_jmx)
+
+    def space_used_total(self, keyspace, table):
+        """
+        The "Space used (total)" of nodetool cfstats for a table, in bytes.
+        """
+        def through_jmx():
+            type_name = 'ColumnFamily' if self.node.get_cassandra_version() < '3.0' else 'Table'
+            mbean = make_mbean('metrics', type=type_name, keyspace=keyspace, scope=table, name='TotalDiskSpaceUsed')
+            return float(self.jmx.read_attribute(mbean, 'Count'))
+        return self._run('cfstats {}.{}'.format(keyspace, table), through_jmx, parse_space_used_total)
+
+    def status(self):
+        """
+        Returns {address: state} for every node of the ring, as shown by nodetool status, such as 'UN'.
+        """
+        def through_jmx():
+            attributes = ['LiveNodes', 'UnreachableNodes'] + list(STATE_ATTRIBUTES)
+            live, unreachable, *states = self.jmx.read_many([(STORAGE_SERVICE, a) for a in attributes])
+            state_of = {}
+            for nodes, letter in zip(states, STATE_ATTRIBUTES.values()):
+                state_of.update((_address(n), letter) for n in nodes)
+            return OrderedDict((_address(n), status + state_of.get(_address(n), 'N'))
+                               for status, nodes in (('U', live), ('D', unreachable)) for n in nodes)
+        return self._run('status', through_jmx, parse_status)
+
+    def tpstats(self):
+        """
+        Returns {pool name: {column: value}} with the columns of nodetool tpstats.
+        """
+        def through_jmx():
+            by_pool = defaultdict(dict)
+            metric_columns = dict((metric, (column, attribute)) for column, (metric, attribute) in TPSTATS_COLUMNS.items())
+            for mbean, attributes in self.jmx.read_pattern('org.apache.cassandra.metrics:type=ThreadPools,*').items():
+                properties = _mbean_properties(mbean)
+                if properties.get('name') in metric_columns:
+                    column, attribute = metric_columns[properties['name']]
+                    by_pool[properties['scope']][column] = attributes[attribute]
+            return OrderedDict((pool, OrderedDict((c, by_pool[pool].get(c, 0)) for c in TPSTATS_COLUMNS))
+                               for pool in sorted(by_pool))
+        return self._run('tpstats', through_jmx, parse_tpstats)
+
+    def compactionstats(self):
+        """
+        Returns {'pending': pending compactions, 'active': running compactions}.
+        """
+        def through_jmx():
+            pending, active = self.jmx.read_many([(make_mbean('metrics', type='Compaction', name='PendingTasks'), 'Value'),
+                                                  (COMPACTION_MANAGER, 'Compactions')])
+            return {'pending': pending, 'active': len(active)}
+        return self._run('compactionstats', through_jmx, parse_compactionstats)
+
+    def getendpoints(self, keyspace, table, key):
+        """
+        The addresses of the replicas of a partition key, given as a string as to nodetool getendpoints.
+        """
+        def through_jmx():
+            if self.node.get_cassandra_version() >= '4.0':
+                operation = 'getNaturalEndpointsWithPort(java.lang.String,java.lang.String,java.lang.String)'
+            else:
+                operation = 'getNaturalEndpoints(java.lang.String,java.lang.String,java.lang.String)'
+            return [_address(e) for e in self.jmx.execute_method(STORAGE_SERVICE, operation, [keyspace, table, str(key)])]
+        return self._run('getendpoints {} {} {}'.format(keyspace, table, key), through_jmx,
+                         lambda out: [line.strip() for line in out.splitlines() if line.strip()])
+
+    def nodetool(self, command):
+        """
+        Runs a nodetool command, as node.nodetool. flush and compact commands without options run
+        through JMX, returning an empty output, other commands run nodetool.
+        """
+        name, *args = command.split()
+        if name in ('flush', 'compact') and not any(arg.startswith('-') for arg in args):
+            getattr(self, name)(*args)
+            return '', '', 0
+        nodetool_stats.record(avoided=False)
+        return self.node.nodetool(command)
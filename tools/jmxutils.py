@@ -1,9 +1,9 @@
 import glob
+import http.client
 import json
 import os
 import subprocess
-import urllib.request
-import urllib.parse
+import time
 import logging
 
 import ccmlib.common as common
@@ -13,6 +13,10 @@ from distutils.version import LooseVersion
 logger = logging.getLogger(__name__)
 
 JOLOKIA_JAR = os.path.join('lib', 'jolokia-jvm-1.2.3-agent.jar')
+JOLOKIA_PORT = 8778
+_RAISE = object()
+# the types of Jolokia requests which don't change anything, and may be sent again
+READ_ONLY_REQUEST_TYPES = ('read', 'search', 'list', 'version')
 CLASSPATH_SEP = ';' if common.is_win() else ':'
 
 
@@ -26,6 +30,31 @@ def jolokia_classpath():
         return JOLOKIA_JAR
 
 
+def jolokia_javaagent_option(node, port=JOLOKIA_PORT):
+    """
+    The JVM option loading the Jolokia agent when `node` starts, listening on the node's address.
+    """
+    return '-javaagent:{jar}=host={host},port={port}'.format(jar=os.path.abspath(JOLOKIA_JAR),
+                                                             host=node.network_interfaces['binary'][0],
+                                                             port=port)
+
+
+def install_jolokia_javaagent(node):
+    """
+    Loads the Jolokia agent in `node` whenever it starts, instead of attaching it to the running
+    process, which launches a JVM for every start and stop of a JolokiaAgent. The option is
+    appended to the JVM_EXTRA_OPTS environment variable of the node, which ccm keeps across
+    restarts, and which replaces that of the environment, so options set there are kept too.
+
+    The agent doesn't use the attach API, so this works with -XX:+PerfDisableSharedMem. Call it
+    before the node is started, JolokiaAgent then reuses the running agent.
+    """
+    option = jolokia_javaagent_option(node)
+    current = node.get_env().get('JVM_EXTRA_OPTS', '')
+    if option not in current.split():
+        node.set_environment_variable('JVM_EXTRA_OPTS', (current + ' ' + option).strip())
+
+
 def java_bin():
     if 'JAVA_HOME' in os.environ:
         return os.path.join(os.environ['JAVA_HOME'], 'bin', 'java')
@@ -174,6 +203,14 @@ def remove_perf_disable_shared_mem(node):
         common.replace_in_file(conf_file, pattern, replacement)
 
 
+def _read_only(body):
+    """
+    Whether a Jolokia request, or all the requests of a bulk request, don't change anything.
+    """
+    requests = body if isinstance(body, list) else [body]
+    return all(request['type'] in READ_ONLY_REQUEST_TYPES for request in requests)
+
+
 class JolokiaAgent(object):
     """
     This class provides a simple way to read, write, and execute
@@ -187,18 +224,42 @@ class JolokiaAgent(object):
             avg_interval = jmx.read_attribute(mbean, 'AverageIndexInterval')
             jmx.write_attribute(mbean, 'MemoryPoolCapacityInMB', 0)
             jmx.execute_method(mbean, 'redistributeSummaries')
+
+    Requests are sent over a single kept alive HTTP connection. Reading many
+    attributes or executing many operations is best done in one bulk request
+    with read_many and exec_many. The duration of every HTTP request is kept
+    in `latencies`.
     """
 
     node = None
+    port = JOLOKIA_PORT
 
-    def __init__(self, node):
+    def __init__(self, node, timeout=10.0):
         self.node = node
+        self.timeout = timeout
+        self.latencies = []
+        self._connection = None
+        self._attached = False
+
+    def is_running(self):
+        """
+        Whether an agent answers on the node, such as one loaded at startup by install_jolokia_javaagent.
+        """
+        try:
+            return self._post({'type': 'version'})['status'] == 200
+        except (OSError, http.client.HTTPException):
+            return False
 
     def start(self):
         """
         Starts the Jolokia agent.  The process will fork from the parent
         and continue running until stop() is called.
+
+        An agent which is already running, see install_jolokia_javaagent,
+        is reused instead.
         """
+        if self.is_running():
+            return
         args = (java_bin(),
                 '-cp', jolokia_classpath(),
                 'org.jolokia.jvmagent.client.AgentLauncher',
@@ -212,11 +273,16 @@ class JolokiaAgent(object):
             print("Exit status was: %d" % (exc.returncode,))
             print("Output was: %s" % (exc.output,))
             raise
+        self._attached = True
 
     def stop(self):
         """
-        Stops the Jolokia agent.
+        Stops the Jolokia agent, if it was started by start().
         """
+        self.close()
+        if not self._attached:
+            return
+        self._attached = False
         args = (java_bin(),
                 '-cp', jolokia_classpath(),
                 'org.jolokia.jvmagent.client.AgentLauncher',
@@ -229,16 +295,52 @@ class JolokiaAgent(object):
             print("Output was: %s" % (exc.output,))
             raise
 
-    def _query(self, body, verbose=True):
+    def close(self):
+        """
+        Closes the HTTP connection to the agent, a new one is opened by the next request.
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _post(self, body, timeout=None):
+        """
+        Sends a request, or a list of requests, to the agent and returns the decoded response.
+
+        `timeout` is the number of seconds to wait for the response, instead of the agent's timeout.
+        """
         request_data = json.dumps(body).encode("utf-8")
-        url = 'http://%s:8778/jolokia/' % (self.node.network_interfaces['binary'][0],)
-        req = urllib.request.Request(url)
-        response = urllib.request.urlopen(req, data=request_data, timeout=10.0)
-        if response.code != 200:
-            raise Exception("Failed to query Jolokia agent; HTTP response code: %d; response: %s" % (response.code, response.readlines()))
-
-        raw_response = response.readline()
-        response = json.loads(raw_response.decode(encoding='utf-8'))
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            reused = self._connection is not None
+            if not reused:
+                self._connection = http.client.HTTPConnection(self.node.network_interfaces['binary'][0],
+                                                              self.port, timeout=timeout)
+            elif self._connection.sock is not None:
+                self._connection.sock.settimeout(timeout)
+            self._connection.timeout = timeout
+            start = time.time()
+            sent = False
+            try:
+                self._connection.request('POST', '/jolokia/', body=request_data,
+                                         headers={'Content-Type': 'application/json'})
+                sent = True
+                response = self._connection.getresponse()
+                raw_response = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                # the agent may have closed an idle connection, retry once on a new one, unless the
+                # agent may have received a request which changes something, as it would run twice
+                if reused and (not sent or _read_only(body)):
+                    continue
+                raise
+            self.latencies.append(time.time() - start)
+            if response.status != 200:
+                raise Exception("Failed to query Jolokia agent; HTTP response code: %d; response: %s" % (response.status, raw_response))
+            return json.loads(raw_response.decode(encoding='utf-8'))
+
+    @staticmethod
+    def _check(response, verbose=True):
         if response['status'] != 200:
             stacktrace = response.get('stacktrace')
             if stacktrace and verbose:
@@ -248,6 +350,17 @@ class JolokiaAgent(object):
             raise Exception("Jolokia agent returned non-200 status: %s" % (response,))
         return response
 
+    def _query(self, body, verbose=True, timeout=None):
+        return self._check(self._post(body, timeout=timeout), verbose=verbose)
+
+    def _query_many(self, bodies, verbose=True, timeout=None):
+        """
+        Sends `bodies` in a single bulk request and returns their responses, in the same order.
+        """
+        if not bodies:
+            return []
+        return [self._check(response, verbose=verbose) for response in self._post(bodies, timeout=timeout)]
+
     def has_mbean(self, mbean, verbose=True):
         """
         Check for the existence of an MBean
@@ -303,7 +416,7 @@ class JolokiaAgent(object):
             body['path'] = path
         self._query(body, verbose=verbose)
 
-    def execute_method(self, mbean, operation, arguments=None):
+    def execute_method(self, mbean, operation, arguments=None, timeout=None):
         """
         Executes a method on a JMX mbean.
 
@@ -313,6 +426,9 @@ class JolokiaAgent(object):
         `operation` should be the name of the method on the mbean.
 
         `arguments` is an optional list of arguments to pass to the method.
+
+        `timeout` is the number of seconds to wait for the method to return, when
+        it takes longer than the agent's timeout, such as a flush or a compaction.
         """
 
         if arguments is None:
@@ -323,9 +439,70 @@ class JolokiaAgent(object):
                 'operation': operation,
                 'arguments': arguments}
 
-        response = self._query(body)
+        response = self._query(body, timeout=timeout)
         return response['value']
 
+    def read_many(self, reads, verbose=True, default=_RAISE):
+        """
+        Reads many JMX attributes in a single request and returns their values, in the same order.
+
+        `reads` is a list of (mbean, attribute) or (mbean, attribute, path) tuples. An attribute of
+        None reads all the attributes of the mbean.
+
+        `default`, if given, is returned as the value of the reads which fail, such as reads of
+        mbeans which are not registered yet, instead of raising.
+
+        Example usage:
+
+            count, mean = jmx.read_many([(mbean, 'Count'), (mbean, 'Mean')])
+        """
+        bodies = []
+        for read in reads:
+            mbean, attribute, path = (tuple(read) + (None,))[:3]
+            body = {'type': 'read', 'mbean': mbean}
+            if attribute is not None:
+                body['attribute'] = attribute
+            if path:
+                body['path'] = path
+            bodies.append(body)
+        if default is _RAISE:
+            return [response['value'] for response in self._query_many(bodies, verbose=verbose)]
+        return [response['value'] if response['status'] == 200 else default
+                for response in (self._post(bodies) if bodies else [])]
+
+    def read_pattern(self, mbean_pattern, attribute=None, verbose=True):
+        """
+        Reads an attribute, or all attributes if `attribute` is None, of all the mbeans whose name
+        matches a pattern such as 'org.apache.cassandra.metrics:type=Table,name=ReadLatency,*'.
+
+        Returns a dict of mbean name to a dict of attribute name to value, which is empty when no
+        mbean matches.
+        """
+        body = {'type': 'read', 'mbean': mbean_pattern}
+        if attribute is not None:
+            body['attribute'] = attribute
+        response = self._post(body)
+        # Jolokia reports that no mbean matches a pattern as an error
+        if response['status'] == 404:
+            return {}
+        return self._check(response, verbose=verbose)['value']
+
+    def exec_many(self, operations, verbose=True, timeout=None):
+        """
+        Executes many JMX methods in a single request and returns their results, in the same order.
+
+        `operations` is a list of (mbean, operation) or (mbean, operation, arguments) tuples.
+        `timeout`, if given, is the number of seconds to wait for all of them, see execute_method.
+        """
+        bodies = []
+        for operation in operations:
+            mbean, name, arguments = (tuple(operation) + (None,))[:3]
+            bodies.append({'type': 'exec',
+                           'mbean': mbean,
+                           'operation': name,
+                           'arguments': arguments or []})
+        return [response['value'] for response in self._query_many(bodies, verbose=verbose, timeout=timeout)]
+
     def __enter__(self):
         """ For contextmanager-style usage. """
         self.start()
@@ -0,0 +1,494 @@
+import bisect
+import math
+import re
+import threading
+import time
+import logging
+
+from collections import OrderedDict, deque, namedtuple
+from functools import partial
+
+from cassandra import ConsistencyLevel
+from cassandra.cluster import Cluster as PyCluster, EXEC_PROFILE_DEFAULT, ExecutionProfile
+from cassandra.murmur3 import murmur3
+from cassandra.policies import WhiteListRoundRobinPolicy
+from ccmlib.node import ToolError
+
+logger = logging.getLogger(__name__)
+
+# the largest number of operations run in process when run_stress picks the generator by itself
+IN_PROCESS_MAX_OPERATIONS = 10000
+
+KEYSPACE = 'keyspace1'
+TABLE = 'standard1'
+# the defaults of cassandra-stress: 10 bytes keys and 5 columns of 34 bytes
+KEY_SIZE = 10
+COLUMNS = ['C0', 'C1', 'C2', 'C3', 'C4']
+COLUMN_SIZE = 34
+# cassandra-stress salts the seeds of each generator with the murmur3 hash of its name,
+# and draws their identities from uniform(1..100B)
+KEY_SALT = murmur3(b'randomstrkey')
+COLUMN_SALTS = [murmur3(('randomstr' + c).encode('utf-8')) for c in COLUMNS]
+IDENTITY_MIN = 1
+IDENTITY_MAX = 100 * 1000 * 1000 * 1000
+DEFAULT_THREADS = 50
+RETRIES = 9
+
+# the subset of cassandra-stress options understood, see parse_stress_options
+StressOptions = namedtuple('StressOptions', 'command n consistency_level threads replication compaction')
+
+
+def _count(value):
+    """
+    A count of operations such as 10K or 1M, as accepted by cassandra-stress.
+    """
+    match = re.match(r'^(\d+)([kmb]?)$', value.lower())
+    if not match:
+        raise ValueError(value)
+    return int(match.group(1)) * {'': 1, 'k': 1000, 'm': 1000000, 'b': 1000000000}[match.group(2)]
+
+
+def _schema_options(option):
+    """
+    The options of replication(...) or compaction(...), as an ordered list of (name, value).
+    """
+    match = re.match(r'^(\w+)\((.*)\)$', option)
+    if not match:
+        raise ValueError(option)
+    pairs = [pair.split('=', 1) for pair in match.group(2).split(',') if pair.strip()]
+    if any(len(pair) != 2 for pair in pairs):
+        raise ValueError(option)
+    return match.group(1), [(name.strip(), value.strip()) for name, value in pairs]
+
+
+def parse_stress_options(options):
+    """
+    Parses cassandra-stress options made of write or read, n=, cl=, no-warmup, -rate threads=
+    and -schema replication(...) compaction(...). Returns None for any other option, which
+    needs the real cassandra-stress.
+    """
+    if not options or options[0] not in ('write', 'read'):
+        return None
+    parsed = {'command': options[0], 'n': None, 'consistency_level': 'LOCAL_ONE', 'threads': DEFAULT_THREADS,
+              'replication': [], 'compaction': []}
+    section = None
+    try:
+        for option in options[1:]:
+            if option in ('-rate', '-schema'):
+                section = option
+            elif option.startswith('-'):
+                return None
+            elif section is None and option.startswith('n='):
+                parsed['n'] = _count(option[2:])
+            elif section is None and option.startswith('cl='):
+                parsed['consistency_level'] = option[3:].upper()
+                if parsed['consistency_level'] not in ConsistencyLevel.name_to_value:
+                    return None
+            elif section is None and option == 'no-warmup':
+                continue
+            elif section == '-rate' and option.startswith('threads='):
+                parsed['threads'] = int(option[len('threads='):])
+            elif section == '-schema':
+                name, values = _schema_options(option)
+                if name not in ('replication', 'compaction'):
+                    return None
+                parsed[name] = values
+            else:
+                return None
+    except ValueError:
+        return None
+    if parsed['n'] is None:
+        return None
+    return StressOptions(**parsed)
+
+
+def stress_key(seed):
+    """
+    The key cassandra-stress writes for the partition `seed` (1 to n): the hex digits (0-9 then
+    K-P, lowest first) of the value of its uniform(1..100B) identity distribution, reseeded with
+    the seed and the salt of the key generator, as its HexBytes generator does.
+    """
+    value = _identity(seed ^ KEY_SALT)
+    digits = []
+    for _ in range(KEY_SIZE):
+        v = value & 15
+        digits.append((ord('0') + v) if v < 10 else (ord('A') + v))
+        value >>= 4
+    return bytes(digits)
+
+
+def stress_values(seed):
+    """
+    The values cassandra-stress writes in the columns of the partition `seed`. As its Bytes
+    generator does, each column draws its identity from a seed hashed from the bytes of the key
+    and the salt of the column, and its bytes from a FasterRandom seeded with that identity.
+    """
+    key_seed = 0
+    for b in stress_key(seed):
+        key_seed = _long(31 * key_seed + b)
+    values = []
+    for salt in COLUMN_SALTS:
+        longs = _faster_random(~_identity(key_seed ^ salt))
+        data = b''.join((next(longs) & 0xFFFFFFFFFFFFFFFF).to_bytes(8, 'little') for _ in range(0, COLUMN_SIZE, 8))
+        values.append(data[:COLUMN_SIZE])
+    return values
+
+
+def _long(value):
+    # the value of a Java long
+    value &= 0xFFFFFFFFFFFFFFFF
+    return value - (1 << 64) if value & (1 << 63) else value
+
+
+class JavaRandom(object):
+    """
+    The methods of java.util.Random that cassandra-stress relies on to generate its data.
+    """
+
+    def __init__(self, seed):
+        self.seed = (seed ^ 0x5DEECE66D) & ((1 << 48) - 1)
+
+    def next(self, bits):
+        self.seed = (self.seed * 0x5DEECE66D + 0xB) & ((1 << 48) - 1)
+        value = self.seed >> (48 - bits)
+        return value - (1 << 32) if value & (1 << 31) else value
+
+    def next_long(self):
+        return _long((self.next(32) << 32) + self.next(32))
+
+    def next_double(self):
+        return ((self.next(26) << 27) + self.next(27)) * (1.0 / (1 << 53))
+
+
+def _identity(seed):
+    # a sample of uniform(1..100B) reseeded with `seed`, which is a UniformRealDistribution of
+    # commons-math over [1, 100B + 1) using a java.util.Random
+    u = JavaRandom(seed).next_double()
+    return int(u * (IDENTITY_MAX + 1.0) + (1 - u) * IDENTITY_MIN)
+
+
+def _faster_random(seed):
+    # the longs of the FasterRandom of cassandra-stress: a xorshift seeded, and reseeded every
+    # 32 values, by a java.util.Random
+    state = JavaRandom(seed).next_long()
+    reseed = 0
+    while True:
+        reseed += 1
+        if reseed == 32:
+            state, reseed = JavaRandom(state).next_long(), 0
+        state ^= state >> 12
+        state ^= _long(state << 25)
+        state ^= state >> 27
+        yield _long(state * 2685821657736338717)
+
+
+def schema_statements(options, version):
+    """
+    The statements creating keyspace1.standard1 as cassandra-stress does, with the replication
+    and compaction of the -schema option.
+    """
+    replication = dict(options.replication)
+    strategy = replication.pop('strategy', 'SimpleStrategy')
+    factor = replication.pop('factor', '1')
+    if strategy.endswith('SimpleStrategy'):
+        replication = {'replication_factor': factor}
+    replication_map = ', '.join("'{}': '{}'".format(k, v) for k, v in [('class', strategy)] + sorted(replication.items()))
+    columns = ''.join(', "{}" blob'.format(c) for c in COLUMNS)
+    table = 'CREATE TABLE IF NOT EXISTS {}.{} (key blob PRIMARY KEY{})'.format(KEYSPACE, TABLE, columns)
+    table_options = []
+    if version < '4.0':
+        table_options.append('COMPACT STORAGE')
+    if options.compaction:
+        compaction = dict(options.compaction)
+        compaction['class'] = compaction.pop('strategy', 'SizeTieredCompactionStrategy')
+        table_options.append('compaction = {{{}}}'.format(', '.join("'{}': '{}'".format(k, v)
+                                                                    for k, v in sorted(compaction.items()))))
+    if table_options:
+        table += ' WITH ' + ' AND '.join(table_options)
+    return ['CREATE KEYSPACE IF NOT EXISTS {} WITH replication = {{{}}} AND durable_writes = true'
+            .format(KEYSPACE, replication_map), table]
+
+
+# a request of a workload: `key` is the partition key shown in errors, `rows` the number of rows
+# it writes or reads, and `check`, if not None, validates the rows returned, returning an error or None
+Operation = namedtuple('Operation', 'name key statement parameters rows check')
+
+
+class LatencyHistogram(object):
+    """
+    The latencies of an operation, counted in buckets of microseconds growing by 20% as in the
+    EstimatedHistogram of Cassandra, so that long workloads are summarized in constant memory.
+    Percentiles are the upper bound of their bucket, capped by the largest latency recorded.
+    """
+
+    def __init__(self, max_us=3600 * 1000 * 1000):
+        self.offsets = [1]
+        while self.offsets[-1] < max_us:
+            self.offsets.append(max(self.offsets[-1] + 1, int(round(self.offsets[-1] * 1.2))))
+        # the last bucket counts the latencies above the last offset
+        self.counts = [0] * (len(self.offsets) + 1)
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, seconds):
+        us = seconds * 1000000
+        self.counts[bisect.bisect_left(self.offsets, us)] += 1
+        self.count += 1
+        self.total_us += us
+        self.max_us = max(self.max_us, us)
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total_us += other.total_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def mean_ms(self):
+        return self.total_us / self.count / 1000 if self.count else 0.0
+
+    def max_ms(self):
+        return self.max_us / 1000
+
+    def percentile_ms(self, p):
+        """
+        The nearest-rank percentile `p` (0-100) of the latencies, in milliseconds.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(int(math.ceil(p / 100.0 * self.count)), 1)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                break
+        bound = self.offsets[i] if i < len(self.offsets) else self.max_us
+        return min(bound, self.max_us) / 1000
+
+    def buckets(self):
+        """
+        The non empty buckets, as [(upper bound in milliseconds, count)].
+        """
+        return [((self.offsets[i] if i < len(self.offsets) else self.max_us) / 1000, count)
+                for i, count in enumerate(self.counts) if count]
+
+
+class AsyncRunner(object):
+    """
+    Runs operations through the driver with at most `concurrency` requests in flight, retrying
+    failed requests as cassandra-stress does, and records the latency of each operation in the
+    LatencyHistogram of its name. Operations are taken from the iterable as requests complete,
+    so that they can be generated lazily.
+    """
+
+    def __init__(self, session, operations, concurrency, retries=RETRIES):
+        self.session = session
+        self.retries = retries
+        # operation name -> LatencyHistogram, in the order the operations were first seen
+        self.histograms = OrderedDict()
+        # operation name -> number of rows of the successful operations
+        self.rows = {}
+        self.errors = []
+        self._operations = iter(operations)
+        # callbacks run in the calling thread when the request already completed, they hand their
+        # slot back and the thread starting requests reuses it, rather than recursing
+        self._lock = threading.RLock()
+        self._slots = concurrency
+        self._retries = deque()
+        self._dispatching = False
+        self._in_flight = 0
+        self._exhausted = False
+        self._done = threading.Event()
+
+    def run(self):
+        with self._lock:
+            self._dispatch()
+        self._done.wait()
+        return self
+
+    def _dispatch(self):
+        # called with self._lock held
+        if self._dispatching:
+            return
+        self._dispatching = True
+        try:
+            while self._slots > 0:
+                if self._retries:
+                    operation, attempt = self._retries.popleft()
+                else:
+                    operation, attempt = next(self._operations, None), 0
+                    if operation is None:
+                        self._exhausted = True
+                        break
+                    if operation.name not in self.histograms:
+                        self.histograms[operation.name] = LatencyHistogram()
+                        self.rows[operation.name] = 0
+                self._slots -= 1
+                self._in_flight += 1
+                started = time.time()
+                future = self.session.execute_async(operation.statement, operation.parameters)
+                future.add_callbacks(self._on_success, self._on_error,
+                                     callback_args=(operation, attempt, started), errback_args=(operation, attempt))
+        finally:
+            self._dispatching = False
+        self._check_done()
+
+    def _finish(self, retry=None):
+        with self._lock:
+            self._in_flight -= 1
+            self._slots += 1
+            if retry is not None:
+                self._retries.append(retry)
+            self._dispatch()
+
+    def _check_done(self):
+        if self._in_flight == 0 and self._exhausted:
+            self._done.set()
+
+    def _on_success(self, rows, operation, attempt, started):
+        latency = time.time() - started
+        error = operation.check(rows) if operation.check is not None else None
+        if error is not None:
+            self._on_error(Exception(error), operation, attempt)
+            return
+        with self._lock:
+            self.histograms[operation.name].record(latency)
+            self.rows[operation.name] += operation.rows
+        self._finish()
+
+    def _on_error(self, error, operation, attempt):
+        if attempt < self.retries:
+            self._finish(retry=(operation, attempt + 1))
+            return
+        with self._lock:
+            self.errors.append('Operation x{} on key(s) [{}]: Error executing: {}'
+                               .format(attempt, operation.key, error))
+        self._finish()
+
+
+def should_run_in_process(options, max_operations=None):
+    """
+    Whether a cassandra-stress invocation can be replaced by the generator: its options are
+    understood and it runs at most `max_operations` (IN_PROCESS_MAX_OPERATIONS by default)
+    operations.
+    """
+    parsed = parse_stress_options(options)
+    if parsed is None:
+        return False
+    return parsed.n <= (IN_PROCESS_MAX_OPERATIONS if max_operations is None else max_operations)
+
+
+def format_summary(histograms, rows, errors, elapsed):
+    """
+    The "Results:" section of cassandra-stress 4.0 for a run of the operations of `histograms`,
+    {name: LatencyHistogram}, with the values of each operation in brackets, preceded by the
+    errors. See tools.stress.parse_stress_summary.
+    """
+    overall = LatencyHistogram()
+    for histogram in histograms.values():
+        overall.merge(histogram)
+
+    def rate(count):
+        return count / elapsed if elapsed > 0 else 0.0
+
+    def line(name, value, by_operation, value_format, unit=''):
+        unit = ' ' + unit if unit else ''
+        brackets = ', '.join(('{}: ' + value_format + '{}').format(op, v, unit) for op, v in by_operation)
+        return ('{:<26}: ' + value_format + '{} [{}]').format(name, value, unit, brackets)
+
+    lines = ['Results:']
+    lines.append(line('Op rate', rate(overall.count), [(op, rate(h.count)) for op, h in histograms.items()],
+                      '{:,.0f}', 'op/s'))
+    lines.append(line('Partition rate', rate(overall.count), [(op, rate(h.count)) for op, h in histograms.items()],
+                      '{:,.0f}', 'pk/s'))
+    lines.append(line('Row rate', rate(sum(rows.values())), [(op, rate(rows[op])) for op in histograms],
+                      '{:,.0f}', 'row/s'))
+    for name, value in [('Latency mean', LatencyHistogram.mean_ms),
+                        ('Latency median', lambda h: h.percentile_ms(50)),
+                        ('Latency 95th percentile', lambda h: h.percentile_ms(95)),
+                        ('Latency 99th percentile', lambda h: h.percentile_ms(99)),
+                        ('Latency 99.9th percentile', lambda h: h.percentile_ms(99.9)),
+                        ('Latency max', LatencyHistogram.max_ms)]:
+        lines.append(line(name, value(overall), [(op, value(h)) for op, h in histograms.items()], '{:.1f}', 'ms'))
+    lines.append(line('Total partitions', overall.count, [(op, h.count) for op, h in histograms.items()], '{:,}'))
+    lines.append('{:<26}: {:,}'.format('Total errors', len(errors)))
+    seconds = int(elapsed)
+    hours, minutes = seconds // 3600, seconds // 60 % 60
+    lines.append('{:<26}: {:02}:{:02}:{:02}'.format('Total operation time', hours, minutes, seconds % 60))
+    return '\n'.join(errors + lines + ['', 'END', ''])
+
+
+class LoadGenerator(object):
+    """
+    Runs small cassandra-stress write and read workloads through the driver from the test
+    process, avoiding the startup of the stress JVM, on the keyspace1.standard1 table that
+    cassandra-stress creates. The partitions 1 to n get the keys and values cassandra-stress
+    generates for them, see stress_key and stress_values, so either of them can read and
+    validate the data written by the other.
+
+    Example usage:
+
+        out, err, rc = LoadGenerator(node1).run(['write', 'n=1K', 'no-warmup', '-rate', 'threads=8'])
+    """
+
+    def __init__(self, node, whitelist=False):
+        self.node = node
+        self.whitelist = whitelist
+
+    def _session(self, consistency_level):
+        address, port = self.node.network_interfaces['binary']
+        profile = {'consistency_level': ConsistencyLevel.name_to_value[consistency_level], 'request_timeout': 30}
+        if self.whitelist:
+            profile['load_balancing_policy'] = WhiteListRoundRobinPolicy([address])
+        profile = ExecutionProfile(**profile)
+        cluster = PyCluster([address], port=port, connect_timeout=15, execution_profiles={EXEC_PROFILE_DEFAULT: profile})
+        return cluster, cluster.connect()
+
+    def run(self, options):
+        """
+        Runs the workload of cassandra-stress options and returns (stdout, stderr, rc) as
+        node.stress, raising a ToolError when some operations failed after retries.
+        """
+        parsed = parse_stress_options(options)
+        if parsed is None:
+            raise ValueError('Unsupported cassandra-stress options: {}'.format(options))
+        cluster, session = self._session(parsed.consistency_level)
+        try:
+            if parsed.command == 'write':
+                for statement in schema_statements(parsed, self.node.get_cassandra_version()):
+                    session.execute(statement, timeout=60)
+                statement = session.prepare('INSERT INTO {}.{} (key, {}) VALUES (?, {})'.format(
+                    KEYSPACE, TABLE, ', '.join('"{}"'.format(c) for c in COLUMNS), ', '.join('?' for _ in COLUMNS)))
+            else:
+                statement = session.prepare('SELECT * FROM {}.{} WHERE key = ?'.format(KEYSPACE, TABLE))
+            started = time.time()
+            runner = AsyncRunner(session, _stress_operations(parsed, statement), parsed.threads).run()
+            elapsed = time.time() - started
+        finally:
+            cluster.shutdown()
+
+        stdout = format_summary(runner.histograms, runner.rows, runner.errors, elapsed).encode('utf-8')
+        logger.debug('Ran stress {} in process in {:.2f}s'.format(' '.join(options), elapsed))
+        if runner.errors:
+            raise ToolError(['stress'] + list(options), 1, stdout, b'')
+        return stdout, b'', 0
+
+
+def _stress_operations(options, statement):
+    for seed in range(1, options.n + 1):
+        key = stress_key(seed)
+        if options.command == 'write':
+            yield Operation('WRITE', key.decode(), statement, [key] + stress_values(seed), 1, None)
+        else:
+            yield Operation('READ', key.decode(), statement, [key], 1, partial(_check_row, seed))
+
+
+def _check_row(seed, rows):
+    rows = list(rows)
+    if not rows:
+        return 'No data returned'
+    if [getattr(rows[0], c) for c in COLUMNS] != stress_values(seed):
+        return 'Data returned was not validated'
+    return None
@@ -1,11 +1,96 @@
+import logging
+import weakref
 from abc import ABCMeta, abstractproperty
 
+from cassandra import DriverException, RequestExecutionException
+from cassandra.cluster import NoHostAvailable
+from cassandra.query import SimpleStatement
+
+logger = logging.getLogger(__name__)
+
+_schema_trackers = weakref.WeakKeyDictionary()
+
+
+def schema_tracker(cluster):
+    """
+    Returns the SchemaVersionTracker shared by everything refreshing the metadata of `cluster`.
+    """
+    tracker = _schema_trackers.get(cluster)
+    if tracker is None:
+        tracker = _schema_trackers[cluster] = SchemaVersionTracker(cluster)
+    return tracker
+
+
+class SchemaVersionTracker(object):
+    """
+    Avoids refreshing the driver's schema metadata when the schema did not change since the
+    last refresh. Before each refresh, the schema version of every live node is read from its
+    system.local table, which is much cheaper than the queries on the schema tables a refresh
+    does. The refresh is skipped if all nodes agree on the version seen at the previous refresh
+    of the same metadata.
+
+    The schema versions are read with one of the cluster's sessions, if it has none (or the
+    versions can't be read) the metadata is always refreshed.
+    """
+
+    def __init__(self, cluster):
+        self._cluster = weakref.ref(cluster)
+        # schema versions seen when each metadata target was last refreshed
+        self._refreshed_versions = {}
+        self.refreshes = 0
+        self.refreshes_avoided = 0
+
+    def schema_versions(self, session=None):
+        """
+        Returns the set of schema versions of the live nodes, or None if they can't be read.
+        """
+        cluster = self._cluster()
+        if session is None:
+            session = next((s for s in list(getattr(cluster, 'sessions', None) or []) if not s.is_shutdown), None)
+        if session is None:
+            return None
+
+        statement = SimpleStatement("SELECT schema_version FROM system.local")
+        versions = set()
+        try:
+            for host in cluster.metadata.all_hosts():
+                if not host.is_up:
+                    continue
+                for row in session.execute(statement, host=host):
+                    versions.add(row['schema_version'] if isinstance(row, dict) else row[0])
+        except (DriverException, RequestExecutionException, NoHostAvailable) as e:
+            logger.debug('Could not read schema versions, refreshing metadata: {}'.format(e))
+            return None
+        return frozenset(versions)
+
+    def refresh(self, target, refresh, session=None):
+        """
+        Calls `refresh`, which refreshes the metadata identified by `target`, unless all nodes
+        still agree on the schema version they agreed on when it was last called for `target`.
+        """
+        versions = self.schema_versions(session)
+        if versions is not None and len(versions) == 1 and self._refreshed_versions.get(target) == versions:
+            self.refreshes_avoided += 1
+            return
+        refresh()
+        self.refreshes += 1
+        if versions is not None:
+            self._refreshed_versions[target] = versions
+
 
 class UpdatingMetadataWrapperBase(object, metaclass=ABCMeta):
     @abstractproperty
     def _wrapped(self):
         pass
 
+    @property
+    def refreshes_avoided(self):
+        """
+        The number of metadata refreshes that were skipped because the schema did not change,
+        counted over every wrapper of the same cluster.
+        """
+        return schema_tracker(self._cluster).refreshes_avoided
+
     def __getattr__(self, name):
         return getattr(self._wrapped, name)
 
@@ -16,7 +101,7 @@ class UpdatingMetadataWrapperBase(object, metaclass=ABCMeta):
 class UpdatingTableMetadataWrapper(UpdatingMetadataWrapperBase):
     """
     A class that provides an interface to a table's metadata that is refreshed
-    on access.
+    on access, when the schema changed since the last access.
     """
     def __init__(self, cluster, ks_name, table_name, max_schema_agreement_wait=None):
         self._cluster = cluster
@@ -26,10 +111,13 @@ class UpdatingTableMetadataWrapper(UpdatingMetadataWrapperBase):
 
     @property
     def _wrapped(self):
-        self._cluster.refresh_table_metadata(
-            self._ks_name,
-            self._table_name,
-            max_schema_agreement_wait=self.max_schema_agreement_wait
+        schema_tracker(self._cluster).refresh(
+            ('table', self._ks_name, self._table_name),
+            lambda: self._cluster.refresh_table_metadata(
+                self._ks_name,
+                self._table_name,
+                max_schema_agreement_wait=self.max_schema_agreement_wait
+            )
         )
         return self._cluster.metadata.keyspaces[self._ks_name].tables[self._table_name]
 
@@ -45,7 +133,7 @@ class UpdatingTableMetadataWrapper(UpdatingMetadataWrapperBase):
 class UpdatingKeyspaceMetadataWrapper(UpdatingMetadataWrapperBase):
     """
     A class that provides an interface to a keyspace's metadata that is
-    refreshed on access.
+    refreshed on access, when the schema changed since the last access.
     """
     def __init__(self, cluster, ks_name, max_schema_agreement_wait=None):
         self._cluster = cluster
@@ -54,9 +142,12 @@ class UpdatingKeyspaceMetadataWrapper(UpdatingMetadataWrapperBase):
 
     @property
     def _wrapped(self):
-        self._cluster.refresh_keyspace_metadata(
-            self._ks_name,
-            max_schema_agreement_wait=self.max_schema_agreement_wait
+        schema_tracker(self._cluster).refresh(
+            ('keyspace', self._ks_name),
+            lambda: self._cluster.refresh_keyspace_metadata(
+                self._ks_name,
+                max_schema_agreement_wait=self.max_schema_agreement_wait
+            )
         )
         return self._cluster.metadata.keyspaces[self._ks_name]
 
@@ -71,7 +162,7 @@ class UpdatingKeyspaceMetadataWrapper(UpdatingMetadataWrapperBase):
 class UpdatingClusterMetadataWrapper(UpdatingMetadataWrapperBase):
     """
     A class that provides an interface to a cluster's metadata that is
-    refreshed on access.
+    refreshed on access, when the schema changed since the last access.
     """
     def __init__(self, cluster, max_schema_agreement_wait=None):
         """
@@ -82,7 +173,10 @@ class UpdatingClusterMetadataWrapper(UpdatingMetadataWrapperBase):
 
     @property
     def _wrapped(self):
-        self._cluster.refresh_schema_metadata(max_schema_agreement_wait=self.max_schema_agreement_wait)
+        schema_tracker(self._cluster).refresh(
+            ('schema',),
+            lambda: self._cluster.refresh_schema_metadata(max_schema_agreement_wait=self.max_schema_agreement_wait)
+        )
         return self._cluster.metadata
 
     def __repr__(self):
@@ -0,0 +1,199 @@
+import csv
+import math
+import os
+import threading
+import time
+import logging
+
+from collections import OrderedDict, namedtuple
+
+from tools.jmxutils import JolokiaAgent, make_mbean
+
+logger = logging.getLogger(__name__)
+
+# a metric sampled on every node, `path` selects a field of composite attributes such as the heap usage
+SampledMetric = namedtuple('SampledMetric', 'name mbean attribute path')
+
+DEFAULT_METRICS = [
+    SampledMetric('pending_compactions', make_mbean('metrics', type='Compaction', name='PendingTasks'), 'Value', None),
+    SampledMetric('read_latency_p99_us', make_mbean('metrics', type='ClientRequest', scope='Read', name='Latency'),
+                  '99thPercentile', None),
+    SampledMetric('write_latency_p99_us', make_mbean('metrics', type='ClientRequest', scope='Write', name='Latency'),
+                  '99thPercentile', None),
+    SampledMetric('dropped_mutations', make_mbean('metrics', type='DroppedMessage', scope='MUTATION', name='Dropped'),
+                  'Count', None),
+    SampledMetric('dropped_reads', make_mbean('metrics', type='DroppedMessage', scope='READ', name='Dropped'),
+                  'Count', None),
+    SampledMetric('hints_in_progress', make_mbean('metrics', type='Storage', name='TotalHintsInProgress'), 'Count', None),
+    SampledMetric('heap_used', 'java.lang:type=Memory', 'HeapMemoryUsage', 'used'),
+]
+
+SUMMARY_PERCENTILES = (50, 99)
+
+
+def percentile(values, p):
+    """
+    The nearest-rank percentile `p` (0-100) of a non empty list of numbers.
+    """
+    values = sorted(values)
+    rank = max(int(math.ceil(p / 100.0 * len(values))) - 1, 0)
+    return values[rank]
+
+
+class MetricSampler(object):
+    """
+    Polls the same JMX metrics of every running node of a cluster at a fixed interval, from a
+    background thread, with one bulk Jolokia read per node and sample.
+
+    A Jolokia agent is attached to each node when it is first seen running, and again when it was
+    restarted or its agent stopped answering, for example because the sampler reused an agent
+    attached by a test which detached it since. The agent can't attach to JVMs started with -XX:+PerfDisableSharedMem, see
+    remove_perf_disable_shared_mem. Metrics which can't be read, such as those of mbeans that
+    aren't registered yet, are recorded as missing.
+
+    Example usage:
+
+        sampler = MetricSampler(cluster, interval=0.5).start()
+        node1.stress(['write', 'n=100K'])
+        sampler.stop()
+        sampler.write(log_dir)
+        assert sampler.summary()['node1']['pending_compactions']['max'] < 10
+
+    Enabled for every test with --sample-jmx-metrics, the time series then being saved with the
+    logs of the test and a summary recorded as properties of the test in the JUnit report.
+    """
+
+    def __init__(self, cluster, metrics=None, interval=1.0, agent_class=JolokiaAgent):
+        self.cluster = cluster
+        self.metrics = list(DEFAULT_METRICS if metrics is None else metrics)
+        self.interval = interval
+        self.agent_class = agent_class
+        # node name to a list of (seconds since start, values of self.metrics)
+        self.samples = OrderedDict()
+        self.start_time = None
+        self._agents = {}
+        self._failed_pids = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.start_time = time.time()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='metric-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops sampling and the Jolokia agents that were attached to running nodes.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for node, agent, _ in self._agents.values():
+            try:
+                if node.is_running():
+                    agent.stop()
+                else:
+                    agent.close()
+            except Exception as e:
+                logger.debug('Failed to stop the Jolokia agent of {}: {}'.format(node.name, e))
+        self._agents = {}
+
+    def _run(self):
+        while not self._stopped.is_set():
+            started = time.time()
+            self.sample()
+            self._stopped.wait(max(self.interval - (time.time() - started), 0))
+
+    def _agent(self, node):
+        """
+        The agent attached to the current process of `node`, or None if it can't be attached.
+        """
+        pid = node.pid
+        if node.name in self._agents and self._agents[node.name][2] == pid:
+            return self._agents[node.name][1]
+        if self._failed_pids.get(node.name) == pid:
+            return None
+        agent = self.agent_class(node)
+        try:
+            agent.start()
+        except Exception as e:
+            logger.warning('Not sampling the metrics of {}, Jolokia could not attach: {}'.format(node.name, e))
+            self._failed_pids[node.name] = pid
+            return None
+        self._agents[node.name] = (node, agent, pid)
+        return agent
+
+    def _forget_if_gone(self, node, agent):
+        """
+        Forgets the agent of `node` if it no longer answers, so that the next sample attaches a new one.
+        """
+        agent.close()
+        if not agent.is_running():
+            del self._agents[node.name]
+
+    def sample(self):
+        """
+        Reads the metrics of every running node once.
+        """
+        reads = [(m.mbean, m.attribute, m.path) for m in self.metrics]
+        for node in self.cluster.nodelist():
+            if not node.is_running():
+                continue
+            agent = self._agent(node)
+            if agent is None:
+                continue
+            elapsed = time.time() - (self.start_time or time.time())
+            try:
+                values = agent.read_many(reads, verbose=False, default=None)
+            except Exception as e:
+                logger.debug('Failed to sample the metrics of {}: {}'.format(node.name, e))
+                self._forget_if_gone(node, agent)
+                continue
+            self.samples.setdefault(node.name, []).append((round(elapsed, 3), values))
+
+    def write(self, directory):
+        """
+        Writes the samples of each node to <node name>_metrics.csv in `directory`, with one column
+        per metric. Returns the paths of the files written.
+        """
+        paths = []
+        for name, samples in self.samples.items():
+            path = os.path.join(directory, '{}_metrics.csv'.format(name))
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['seconds'] + [m.name for m in self.metrics])
+                for elapsed, values in samples:
+                    writer.writerow([elapsed] + ['' if v is None else v for v in values])
+            paths.append(path)
+        return paths
+
+    def summary(self):
+        """
+        Returns, for each node and metric, a dict of the max and SUMMARY_PERCENTILES of the sampled values.
+        Metrics which were never read are left out.
+        """
+        summary = OrderedDict()
+        for name, samples in self.samples.items():
+            by_metric = OrderedDict()
+            for i, metric in enumerate(self.metrics):
+                values = [v[i] for _, v in samples if isinstance(v[i], (int, float)) and not isinstance(v[i], bool)]
+                if not values:
+                    continue
+                stats = OrderedDict([('max', max(values))])
+                for p in SUMMARY_PERCENTILES:
+                    stats['p{}'.format(p)] = percentile(values, p)
+                by_metric[metric.name] = stats
+            summary[name] = by_metric
+        return summary
+
+    def summary_properties(self):
+        """
+        The summary as a list of (name, value) pairs, such as ('node1.pending_compactions.max', 3).
+        """
+        return [('{}.{}.{}'.format(node, metric, stat), value)
+                for node, by_metric in self.summary().items()
+                for metric, stats in by_metric.items()
+                for stat, value in stats.items()]
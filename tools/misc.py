@@ -1,6 +1,5 @@
 import os
 import subprocess
-import time
 import hashlib
 import logging
 import pytest
@@ -9,6 +8,9 @@ from collections import Mapping
 
 from ccmlib.node import Node
 
+from tools.schema import wait_for_schema_agreement
+from tools.wait import WaitTimeout, call_site, wait_until
+
 
 logger = logging.getLogger(__name__)
 
@@ -30,19 +32,25 @@ def new_node(cluster, bootstrap=True, token=None, remote_debug_port='0', data_ce
 
 
 def retry_till_success(fun, *args, **kwargs):
+    """
+    Calls fun(*args, **kwargs) until it doesn't raise bypassed_exception, backing off between
+    attempts, and returns its result. Once timeout seconds passed, the last exception is raised.
+    """
     timeout = kwargs.pop('timeout', 60)
     bypassed_exception = kwargs.pop('bypassed_exception', Exception)
+    errors = []
 
-    deadline = time.time() + timeout
-    while True:
+    def attempt():
         try:
-            return fun(*args, **kwargs)
-        except bypassed_exception:
-            if time.time() > deadline:
-                raise
-            else:
-                # brief pause before next attempt
-                time.sleep(0.25)
+            return (fun(*args, **kwargs),)
+        except bypassed_exception as e:
+            errors.append(e)
+            return None
+
+    try:
+        return wait_until(attempt, timeout=timeout, interval=0.05, max_interval=1, site=call_site(1))[0]
+    except WaitTimeout:
+        raise errors[-1] from None
 
 
 def generate_ssl_stores(base_dir, passphrase='cassandra'):
@@ -142,11 +150,18 @@ class ImmutableMapping(Mapping):
 
 
 def wait_for_agreement(thrift, timeout=10):
-    def check_agreement():
-        schemas = thrift.describe_schema_versions()
-        if len([ss for ss in list(schemas.keys()) if ss != 'UNREACHABLE']) > 1:
-            raise Exception("schema agreement not reached")
-    retry_till_success(check_agreement, timeout=timeout)
+    """
+    Thrift counterpart of tools.schema.SchemaAgreementWaiter. Thrift has no schema change
+    events, so the schema versions are polled.
+    """
+    def schema_versions():
+        try:
+            schemas = thrift.describe_schema_versions()
+        except Exception as e:
+            logger.debug('Could not describe schema versions: {}'.format(e))
+            return None
+        return set(ss for ss in schemas.keys() if ss != 'UNREACHABLE')
+    wait_for_schema_agreement(schema_versions, timeout=timeout, poll_interval=0.25)
 
 
 def add_skip(cls, reason=""):
@@ -1,16 +1,29 @@
+import threading
 import time
 
 from tools.datahelp import flatten_into_set
 from tools.misc import list_to_hashed_dict
 
 class Page(object):
+    """
+    A page of results, along with the number of rows it contains and the
+    time, in seconds, between the request for the page and its receipt.
+
+    When rows are not kept (see PageFetcher), data is None and only the
+    summary is available.
+    """
     data = None
+    num_rows = 0
+    latency = None
 
-    def __init__(self):
-        self.data = []
+    def __init__(self, keep_rows=True, latency=None):
+        self.data = [] if keep_rows else None
+        self.latency = latency
 
     def add_row(self, row):
-        self.data.append(row)
+        if self.data is not None:
+            self.data.append(row)
+        self.num_rows += 1
 
 
 class PageFetcher(object):
@@ -20,6 +33,10 @@ class PageFetcher(object):
 
     The first page is automatically retrieved, so an initial
     call to request_one is actually getting the *second* page!
+
+    With keep_rows=False, only the number of rows and latency of each page
+    are kept, so large result sets can be paged through with bounded memory,
+    for example to measure paging performance with stats().
     """
     pages = None
     error = None
@@ -28,8 +45,14 @@ class PageFetcher(object):
     retrieved_pages = None
     retrieved_empty_pages = None
 
-    def __init__(self, future):
+    def __init__(self, future, keep_rows=True):
         self.pages = []
+        self.keep_rows = keep_rows
+        # latencies of all the responses, including empty pages
+        self.latencies = []
+
+        # notified by the driver callbacks whenever a page or an error arrives
+        self._received = threading.Condition()
 
         # the first page is automagically returned (eventually)
         # so we'll count this as a request, but the retrieved count
@@ -37,6 +60,7 @@ class PageFetcher(object):
         self.requested_pages = 1
         self.retrieved_pages = 0
         self.retrieved_empty_pages = 0
+        self._requested_at = time.monotonic()
 
         self.future = future
         self.future.add_callbacks(
@@ -50,23 +74,35 @@ class PageFetcher(object):
         self.wait(seconds=30)
 
     def handle_page(self, rows):
-        # occasionally get a final blank page that is useless
-        if rows == []:
-            self.retrieved_empty_pages += 1
-            return
-
-        page = Page()
-        self.pages.append(page)
-
-        for row in rows:
-            page.add_row(row)
-
-        self.retrieved_pages += 1
+        with self._received:
+            latency = time.monotonic() - self._requested_at
+            self.latencies.append(latency)
+
+            # occasionally get a final blank page that is useless
+            if rows == []:
+                self.retrieved_empty_pages += 1
+            else:
+                page = Page(keep_rows=self.keep_rows, latency=latency)
+                for row in rows:
+                    page.add_row(row)
+                self.pages.append(page)
+                self.retrieved_pages += 1
+
+            self._received.notify_all()
 
     def handle_error(self, exc):
-        self.error = exc
+        with self._received:
+            self.error = exc
+            self._received.notify_all()
         raise exc
 
+    def _request_next_page(self, timeout):
+        with self._received:
+            self.requested_pages += 1
+            self._requested_at = time.monotonic()
+        self.future.start_fetching_next_page()
+        self.wait(seconds=timeout)
+
     def request_one(self, timeout=None):
         """
         Requests the next page if there is one.
@@ -75,9 +111,7 @@ class PageFetcher(object):
         @param timeout Time, in seconds, to wait for all pages.
         """
         if self.future.has_more_pages:
-            self.future.start_fetching_next_page()
-            self.requested_pages += 1
-            self.wait(seconds=timeout)
+            self._request_next_page(timeout)
 
         return self
 
@@ -89,32 +123,33 @@ class PageFetcher(object):
         @param timeout Time, in seconds, to wait for all pages.
         """
         while self.future.has_more_pages:
-            self.future.start_fetching_next_page()
-            self.requested_pages += 1
-            self.wait(seconds=timeout)
+            self._request_next_page(timeout)
 
         return self
 
+    def _all_delivered(self):
+        return self.requested_pages == (self.retrieved_pages + self.retrieved_empty_pages)
+
     def wait(self, seconds=None):
         """
         Blocks until all *requested* pages have been returned.
 
         Requests are made by calling request_one and/or request_all.
 
-        Raises RuntimeError if seconds is exceeded.
+        Raises RuntimeError if seconds is exceeded, or as soon as the
+        query fails since the pages will then never be delivered.
         """
         seconds = 5 if seconds is None else seconds
-        expiry = time.time() + seconds
 
-        while time.time() < expiry:
-            if self.requested_pages == (self.retrieved_pages + self.retrieved_empty_pages):
-                return self
-            # small wait so we don't need excess cpu to keep checking
-            time.sleep(0.1)
+        with self._received:
+            if self._received.wait_for(lambda: self._all_delivered() or self.error is not None, timeout=seconds):
+                if self._all_delivered():
+                    return self
 
         raise RuntimeError(
             "Requested pages were not delivered before timeout. " +
-            "Requested: {}; retrieved: {}; empty retrieved: {}".format(self.requested_pages, self.retrieved_pages, self.retrieved_empty_pages))
+            "Requested: {}; retrieved: {}; empty retrieved: {}; error: {!r}".format(
+                self.requested_pages, self.retrieved_pages, self.retrieved_empty_pages, self.error))
 
     def pagecount(self):
         """
@@ -128,10 +163,31 @@ class PageFetcher(object):
         """
         Returns the number of results found at page_num
         """
-        return len(self.pages[page_num - 1].data)
+        return self.pages[page_num - 1].num_rows
 
     def num_results_all(self):
-        return [len(page.data) for page in self.pages]
+        return [page.num_rows for page in self.pages]
+
+    def stats(self):
+        """
+        Returns a dict summarizing the retrieved pages: the number of pages, empty
+        pages and rows, and the min/mean/median/p99/max latency of all responses, in seconds.
+        """
+        latencies = sorted(self.latencies)
+        stats = {'pages': self.retrieved_pages,
+                 'empty_pages': self.retrieved_empty_pages,
+                 'rows': sum(self.num_results_all())}
+        if latencies:
+            stats.update({'min_latency': latencies[0],
+                          'mean_latency': sum(latencies) / len(latencies),
+                          'median_latency': latencies[len(latencies) // 2],
+                          'p99_latency': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+                          'max_latency': latencies[-1]})
+        return stats
+
+    def _check_rows_kept(self):
+        if not self.keep_rows:
+            raise RuntimeError("Rows are not kept by this PageFetcher, only page summaries are available")
 
     def page_data(self, page_num):
         """
@@ -139,6 +195,7 @@ class PageFetcher(object):
 
         The page should have already been requested with request_one and/or request_all.
         """
+        self._check_rows_kept()
         return self.pages[page_num - 1].data
 
     def all_data(self):
@@ -147,6 +204,7 @@ class PageFetcher(object):
 
         The page(s) should have already been requested with request_one and/or request_all.
         """
+        self._check_rows_kept()
         all_pages_combined = []
         for page in self.pages:
             all_pages_combined.extend(page.data[:])
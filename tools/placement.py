@@ -0,0 +1,262 @@
+import bisect
+import logging
+
+from collections import OrderedDict, namedtuple
+from functools import lru_cache, partial
+
+from tools.tokens import Partitioner
+
+logger = logging.getLogger(__name__)
+
+# a replica of a token range, transient replicas (CASSANDRA-14404) only hold unrepaired data
+Replica = namedtuple('Replica', 'address full')
+
+
+def parse_replication_factor(value):
+    """
+    Returns (all replicas, transient replicas) of a replication factor such as 3 or '3/1'.
+    """
+    total, _, transient = str(value).partition('/')
+    return int(total), int(transient or 0)
+
+
+class Ring(object):
+    """
+    The tokens of the nodes of a cluster and their location, as read once from ccm or from the
+    system tables. Rings are compared and cached by `version`, which changes with the tokens or
+    the topology.
+    """
+
+    def __init__(self, token_owners, datacenters, racks=None):
+        """
+        @param token_owners a dict of token to the address of the node owning it
+        @param datacenters a dict of address to the data center of the node
+        @param racks a dict of address to the rack of the node, all nodes are in the same rack by default
+        """
+        self.tokens = sorted(token_owners)
+        self.owners = [token_owners[token] for token in self.tokens]
+        self.datacenters = dict(datacenters)
+        self.racks = dict(racks) if racks is not None else dict((address, 'rack1') for address in datacenters)
+        self._key = (tuple(self.tokens), tuple(self.owners),
+                     tuple(sorted(self.datacenters.items())), tuple(sorted(self.racks.items())))
+        self.version = hash(self._key)
+
+    def __eq__(self, other):
+        return isinstance(other, Ring) and self._key == other._key
+
+    def __hash__(self):
+        return self.version
+
+    @classmethod
+    def from_ccm(cls, cluster):
+        """
+        The ring of a ccm cluster whose nodes have a single initial token. The tokens of vnodes are only
+        known by the nodes, use from_session then.
+        """
+        nodes = cluster.nodelist()
+        if any(node.initial_token is None for node in nodes):
+            raise ValueError('The tokens of the nodes are not known by ccm, read them with Ring.from_session')
+        return cls(dict((int(node.initial_token), node.address()) for node in nodes),
+                   dict((node.address(), node.data_center or 'datacenter1') for node in nodes),
+                   dict((node.address(), getattr(node, 'rack', None) or 'rack1') for node in nodes))
+
+    @classmethod
+    def from_session(cls, session, host=None):
+        """
+        The ring as seen by one node, from its system.local and system.peers tables. Both are read from
+        `host`, or the first live host of the session, as the load balancing policy could otherwise send
+        them to different nodes and the ring would miss one and list another twice.
+        """
+        if host is None:
+            host = next(h for h in session.cluster.metadata.all_hosts() if h.is_up is not False)
+        token_owners, datacenters, racks = {}, {}, {}
+        local = session.execute("SELECT broadcast_address, data_center, rack, tokens FROM system.local",
+                                host=host).one()
+        peers = list(session.execute("SELECT peer, data_center, rack, tokens FROM system.peers", host=host))
+        for address, data_center, rack, tokens in [tuple(local)] + [tuple(peer) for peer in peers]:
+            address = str(address)
+            for token in tokens or ():
+                token_owners[int(token)] = address
+            datacenters[address] = data_center
+            racks[address] = rack
+        return cls(token_owners, datacenters, racks)
+
+    def position(self, token):
+        """
+        The index in the ring of the first token >= `token`, whose owner is the primary replica of `token`.
+        """
+        position = bisect.bisect_left(self.tokens, token)
+        return 0 if position == len(self.tokens) else position
+
+
+def replication_of_keyspace(session, keyspace):
+    """
+    The replication options of a keyspace, as a dict such as {'class': 'SimpleStrategy', 'replication_factor': '3'}.
+    """
+    row = session.execute("SELECT replication FROM system_schema.keyspaces WHERE keyspace_name = %s", (keyspace,)).one()
+    return dict(row[0])
+
+
+def _replication_key(replication):
+    strategy = replication['class'].rpartition('.')[2]
+    factors = tuple(sorted((k, v) for k, v in replication.items() if k != 'class'))
+    return strategy, factors
+
+
+@lru_cache(maxsize=64)
+def _placements(ring, replication_key):
+    """
+    The replicas of every range of the ring, computed once per ring version and replication.
+    """
+    strategy, factors = replication_key
+    factors = dict(factors)
+    if strategy == 'SimpleStrategy':
+        compute = partial(_simple_strategy_replicas, replication_factor=factors['replication_factor'])
+    elif strategy == 'NetworkTopologyStrategy':
+        compute = partial(_network_topology_replicas, factors=factors)
+    else:
+        raise ValueError('Replica placement of {} is not supported'.format(strategy))
+    return [compute(ring, position) for position in range(len(ring.tokens))]
+
+
+def _simple_strategy_replicas(ring, position, replication_factor):
+    total, transient = parse_replication_factor(replication_factor)
+    total = min(total, len(set(ring.owners)))
+    replicas = []
+    for i in range(len(ring.tokens)):
+        address = ring.owners[(position + i) % len(ring.tokens)]
+        if address not in [r.address for r in replicas]:
+            replicas.append(Replica(address, len(replicas) < total - transient))
+        if len(replicas) == total:
+            break
+    return replicas
+
+
+def _network_topology_replicas(ring, position, factors):
+    """
+    NetworkTopologyStrategy.calculateNaturalReplicas: walks the ring from `position` and picks, in each
+    data center, nodes of distinct racks first, repeating racks only when there are fewer racks than replicas.
+    """
+    class DatacenterReplicas(object):
+
+        def __init__(self, factor, addresses):
+            total, transient = parse_replication_factor(factor)
+            self.left = min(total, len(addresses))
+            self.acceptable_rack_repeats = total - len(set(ring.racks[a] for a in addresses))
+            # with fewer nodes than replicas, there are fewer transient replicas
+            self.transient = max(transient - (total - self.left), 0)
+
+        def done(self):
+            return self.left <= 0
+
+    replicas = []
+    seen_racks = set()
+    datacenters = {}
+    for dc, factor in factors.items():
+        addresses = [a for a, node_dc in ring.datacenters.items() if node_dc == dc]
+        if parse_replication_factor(factor)[0] > 0 and addresses:
+            datacenters[dc] = DatacenterReplicas(factor, addresses)
+
+    for i in range(len(ring.tokens)):
+        if all(d.done() for d in datacenters.values()):
+            break
+        address = ring.owners[(position + i) % len(ring.tokens)]
+        dc = datacenters.get(ring.datacenters[address])
+        if dc is None or dc.done() or address in [r.address for r in replicas]:
+            continue
+        location = (ring.datacenters[address], ring.racks[address])
+        if location not in seen_racks:
+            seen_racks.add(location)
+        elif dc.acceptable_rack_repeats > 0:
+            dc.acceptable_rack_repeats -= 1
+        else:
+            continue
+        replicas.append(Replica(address, dc.left > dc.transient))
+        dc.left -= 1
+    return replicas
+
+
+class PlacementOracle(object):
+    """
+    Computes which nodes are replicas of a token or partition key, for SimpleStrategy and
+    NetworkTopologyStrategy keyspaces, without running nodetool getendpoints or querying the cluster
+    once the ring is known.
+
+    Example usage:
+
+        oracle = PlacementOracle.from_session(session)
+        oracle.endpoints_for_key('ks', 'cf', 1)  # ['127.0.0.2', '127.0.0.3', '127.0.0.1']
+
+    The ring and replication settings are read when the oracle is created, call refresh after
+    changing the topology or the keyspaces. Replicas are computed once per range of the ring.
+    """
+
+    def __init__(self, ring, replications=None, partitioner='Murmur3Partitioner', session=None):
+        """
+        @param replications a dict of keyspace name to replication options, see replication_of_keyspace
+        @param session if given, used to read the replication of the keyspaces missing from `replications`
+        """
+        self.ring = ring
+        self.replications = dict(replications or {})
+        self.partitioner = partitioner
+        self.session = session
+
+    @classmethod
+    def from_session(cls, session):
+        partitioner = session.cluster.metadata.partitioner or 'Murmur3Partitioner'
+        return cls(Ring.from_session(session), partitioner=partitioner, session=session)
+
+    def refresh(self):
+        if self.session is None:
+            raise ValueError('An oracle created without a session can not be refreshed')
+        self.ring = Ring.from_session(self.session)
+        self.replications = {}
+
+    def replication(self, keyspace):
+        if keyspace not in self.replications:
+            if self.session is None:
+                raise KeyError('Unknown replication for keyspace {}'.format(keyspace))
+            self.replications[keyspace] = replication_of_keyspace(self.session, keyspace)
+        return self.replications[keyspace]
+
+    def replicas(self, keyspace, token):
+        """
+        The Replicas of `token`, the primary replica first.
+        """
+        key = _replication_key(self.replication(keyspace))
+        return list(_placements(self.ring, key)[self.ring.position(token)])
+
+    def endpoints(self, keyspace, token, full=None):
+        """
+        The addresses of the replicas of `token`, or only of its full (full=True) or transient
+        (full=False) replicas.
+        """
+        return [r.address for r in self.replicas(keyspace, token) if full is None or r.full == full]
+
+    def token_for_key(self, keyspace, table, key):
+        """
+        The token of the partition key `key` of a table, whose key types are read from the driver's metadata.
+        """
+        if self.session is None:
+            raise ValueError('The partition key of {}.{} is unknown without a session, compute its token '
+                             'with tools.tokens.Partitioner'.format(keyspace, table))
+        return Partitioner.for_table(self.session.cluster.metadata, keyspace, table).token(key)
+
+    def replicas_for_key(self, keyspace, table, key):
+        return self.replicas(keyspace, self.token_for_key(keyspace, table, key))
+
+    def endpoints_for_key(self, keyspace, table, key, full=None):
+        return self.endpoints(keyspace, self.token_for_key(keyspace, table, key), full=full)
+
+    def replicas_by_endpoint(self, keyspace, keys, key_types):
+        """
+        Returns an OrderedDict of address to the keys it is a replica of, the keys being hashed in
+        one batch (see tools.tokens.Partitioner.tokens).
+        """
+        by_endpoint = OrderedDict((address, []) for address in sorted(set(self.ring.owners)))
+        keys = list(keys)
+        tokens = Partitioner.for_name(self.partitioner, key_types).tokens(keys)
+        for key, token in zip(keys, tokens):
+            for address in self.endpoints(keyspace, token):
+                by_endpoint[address].append(key)
+        return by_endpoint
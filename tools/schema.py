@@ -0,0 +1,132 @@
+import threading
+import time
+import logging
+
+from cassandra import DriverException
+
+from tools.metadata_wrapper import schema_tracker
+from tools.wait import WaitTimeout, call_site, wait_until
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaDisagreement(Exception):
+    pass
+
+
+def wait_for_schema_agreement(get_versions, timeout=120, changed=None, poll_interval=1):
+    """
+    Blocks until all nodes agree on the schema and returns the time waited, in seconds.
+
+    @param get_versions returns the set of schema versions of the live nodes, or None if they
+                        can't be read at the moment
+    @param changed a threading.Event set when the schema may have changed, the versions are then
+                   read again without waiting for the rest of poll_interval
+    @param poll_interval the maximum time, in seconds, between two reads of the versions
+
+    Raises SchemaDisagreement if the nodes still disagree after timeout seconds.
+    """
+    start = time.monotonic()
+    last_versions = []
+
+    def agreed():
+        versions = get_versions()
+        last_versions.append(versions)
+        return versions is not None and len(versions) == 1
+
+    try:
+        wait_until(agreed, timeout=timeout, interval=poll_interval, backoff=1, wake=changed, site=call_site(1))
+    except WaitTimeout:
+        raise SchemaDisagreement("Schema agreement not reached after {} seconds, versions: {}"
+                                 .format(timeout, last_versions[-1]))
+    return time.monotonic() - start
+
+
+class SchemaAgreementWaiter(object):
+    """
+    Waits for the nodes of a cluster to agree on the schema, by reading the schema version of
+    every live node (see tools.metadata_wrapper.SchemaVersionTracker) when it receives a
+    SCHEMA_CHANGE event from one of them, rather than at a fixed interval. The time taken by each
+    schema change to reach all nodes is kept in `timings`, so that schema propagation can be
+    measured.
+
+    Example usage:
+
+        with SchemaAgreementWaiter(session) as waiter:
+            waiter.execute("CREATE TABLE ks.t (k int PRIMARY KEY)")
+            waiter.execute("ALTER TABLE ks.t ADD v int")
+        logger.debug(waiter.timings)
+
+    If events can't be received from a node, the versions are still read every poll_interval.
+    """
+
+    def __init__(self, session, poll_interval=1):
+        self.session = session
+        self.cluster = session.cluster
+        self.poll_interval = poll_interval
+        # (statement, seconds between its submission and the agreement of all nodes)
+        self.timings = []
+        self._changed = threading.Event()
+        self._connections = []
+
+    def start(self):
+        for host in self.cluster.metadata.all_hosts():
+            if not host.is_up:
+                continue
+            try:
+                connection = self.cluster.connection_factory(host.endpoint)
+                connection.register_watchers({'SCHEMA_CHANGE': self._on_schema_change})
+            except (DriverException, OSError) as e:
+                logger.debug('Not receiving schema changes from {}: {}'.format(host, e))
+                continue
+            self._connections.append(connection)
+        return self
+
+    def _on_schema_change(self, event):
+        self._changed.set()
+
+    def _schema_versions(self):
+        return schema_tracker(self.cluster).schema_versions(self.session)
+
+    def wait(self, timeout=120):
+        """
+        Blocks until all live nodes agree on the schema, and returns the time waited in seconds.
+        """
+        return wait_for_schema_agreement(self._schema_versions, timeout=timeout, changed=self._changed,
+                                         poll_interval=self.poll_interval)
+
+    def execute(self, statement, timeout=120):
+        """
+        Executes a schema change, waits for all nodes to agree on the new schema and
+        returns the time it took, in seconds.
+        """
+        start = time.monotonic()
+        self.session.execute(statement)
+        self.wait(timeout=timeout)
+        elapsed = time.monotonic() - start
+        self.timings.append((statement, elapsed))
+        logger.debug('Schema agreement reached {:.3f}s after submitting {}'.format(elapsed, statement))
+        return elapsed
+
+    def stats(self):
+        """
+        Returns the number of timed schema changes and the min/median/max time to agreement.
+        """
+        times = sorted(elapsed for _, elapsed in self.timings)
+        stats = {'schema_changes': len(times)}
+        if times:
+            stats.update({'min_time_to_agreement': times[0],
+                          'median_time_to_agreement': times[len(times) // 2],
+                          'max_time_to_agreement': times[-1]})
+        return stats
+
+    def close(self):
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, value, traceback):
+        self.close()
@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+import time
+import logging
+
+from tools.wait import WaitStats, call_site
+
+logger = logging.getLogger(__name__)
+
+
+class SleepProfiler(object):
+    """
+    Replaces time.sleep with a version which records how long each call slept, attributed to
+    the test running at the time and to the code that called sleep. Only the main thread is
+    profiled, since sleeps in background threads don't make the tests any longer.
+
+    Modules which imported sleep directly (from time import sleep) keep a reference to the
+    original function, patch_modules replaces it in the modules of a given directory.
+
+    Enabled for the whole session with --profile-sleeps.
+    """
+
+    def __init__(self):
+        self.stats = WaitStats()
+        self._original_sleep = None
+
+    def _sleep(self, seconds):
+        if threading.current_thread() is not threading.main_thread():
+            return self._original_sleep(seconds)
+        start = time.monotonic()
+        try:
+            return self._original_sleep(seconds)
+        finally:
+            self.stats.record(call_site(1), time.monotonic() - start)
+
+    def install(self):
+        if self._original_sleep is None:
+            self._original_sleep = time.sleep
+            time.sleep = self._sleep
+        return self
+
+    def patch_modules(self, directory):
+        directory = os.path.abspath(directory)
+        for module in list(sys.modules.values()):
+            filename = getattr(module, '__file__', None)
+            if filename is None or not os.path.abspath(filename).startswith(directory):
+                continue
+            if getattr(module, 'sleep', None) is self._original_sleep:
+                module.sleep = self._sleep
+
+    def uninstall(self):
+        if self._original_sleep is None:
+            return
+        time.sleep = self._original_sleep
+        for module in list(sys.modules.values()):
+            if getattr(module, 'sleep', None) == self._sleep:
+                module.sleep = self._original_sleep
+        self._original_sleep = None
+
+    def report(self, top=20):
+        """
+        Returns the lines of a report of the tests and call sites which slept the longest.
+        """
+        by_test = self.stats.by_test()
+        by_site = self.stats.by_site()
+        total = sum(seconds for _, _, seconds in by_test.values())
+        lines = ['Slept {:.1f}s in {} call(s) to time.sleep'.format(total, sum(calls for calls, _, _ in by_test.values()))]
+        for title, totals in (('tests', by_test), ('call sites', by_site)):
+            lines.append('Top {} {} by time slept:'.format(min(top, len(totals)), title))
+            for name, (calls, _, seconds) in sorted(totals.items(), key=lambda item: -item[1][2])[:top]:
+                lines.append('  {:10.1f}s {:6d} call(s)  {}'.format(seconds, calls, name or '(outside of tests)'))
+        return lines
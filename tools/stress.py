@@ -0,0 +1,210 @@
+import re
+import threading
+import logging
+
+from collections import namedtuple
+from functools import lru_cache
+
+from tools.benchmark import BENCHMARK_RESULTS_DIR, BenchmarkResults
+from tools.git import cassandra_git_sha
+from tools.load_generator import LoadGenerator, should_run_in_process
+from tools.stress_profile import ProfileLoadGenerator
+from tools.wait import current_test
+
+logger = logging.getLogger(__name__)
+
+# the lines of the "Results:" section of cassandra-stress, lowercased and without their
+# units, and the field of StressSummary each of them is parsed into
+SUMMARY_LINES = [
+    ('op rate', 'op_rate'),
+    ('partition rate', 'partition_rate'),
+    ('row rate', 'row_rate'),
+    ('latency mean', 'latency_mean_ms'),
+    ('latency median', 'latency_median_ms'),
+    ('latency 95th percentile', 'latency_p95_ms'),
+    ('latency 99th percentile', 'latency_p99_ms'),
+    ('latency 99.9th percentile', 'latency_p999_ms'),
+    ('latency max', 'latency_max_ms'),
+    ('total partitions', 'total_partitions'),
+    ('total errors', 'total_errors'),
+    ('total gc count', 'gc_count'),
+    ('total gc time', 'gc_time_s'),
+    ('total operation time', 'duration_s'),
+]
+
+THROUGHPUT_METRICS = ['op_rate', 'partition_rate', 'row_rate']
+LATENCY_METRICS = ['latency_mean_ms', 'latency_median_ms', 'latency_p95_ms', 'latency_p99_ms']
+
+# the summary of a run of cassandra-stress, `by_operation` holds the values of each operation
+# (such as WRITE or READ) shown in brackets, as {field: {operation: value}}
+StressSummary = namedtuple('StressSummary', [field for _, field in SUMMARY_LINES] + ['by_operation'])
+
+_NUMBER = r'[-+]?(?:[\d,]+(?:\.\d*)?|\.\d+|NaN)'
+
+
+def _number(text):
+    text = text.replace(',', '')
+    if text == 'NaN':
+        return None
+    value = float(text)
+    return int(value) if value.is_integer() and '.' not in text else value
+
+
+def _seconds(duration):
+    seconds = 0
+    for part in duration.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def parse_stress_summary(output):
+    """
+    Parses the "Results:" section printed at the end of a cassandra-stress run, in the formats
+    of both 2.1-3.x ("op rate : 11349 [WRITE:11349]") and 4.0 ("Op rate : 11,349 op/s [WRITE: 11,349 op/s]").
+    Returns a StressSummary with None for the values that weren't printed, or None if there is
+    no summary in the output, such as when stress failed.
+    """
+    if isinstance(output, bytes):
+        output = output.decode('utf-8', 'replace')
+    if output is None or 'Results:' not in output:
+        return None
+    values = dict((field, None) for _, field in SUMMARY_LINES)
+    by_operation = {}
+    fields = dict(SUMMARY_LINES)
+    for line in output[output.rindex('Results:'):].splitlines()[1:]:
+        name, sep, value = line.partition(':')
+        if not sep:
+            continue
+        # drop units such as "total gc time (s)"
+        name = re.sub(r'\s*\(.*\)\s*$', '', name.strip().lower())
+        field = fields.get(name)
+        if field is None:
+            continue
+        overall, _, operations = value.partition('[')
+        if field == 'duration_s':
+            values[field] = _seconds(value.strip())
+            continue
+        number = re.search(_NUMBER, overall)
+        values[field] = _number(number.group(0)) if number else None
+        for operation, op_value in re.findall(r'(\w[\w-]*)\s*:\s*(' + _NUMBER + ')', operations):
+            by_operation.setdefault(field, {})[operation] = _number(op_value)
+    return StressSummary(by_operation=by_operation, **values)
+
+
+def summary_metrics(summary):
+    """
+    The values of a summary that were printed, as a dict suitable for BenchmarkResults.
+    """
+    return dict((field, value) for field, value in summary._asdict().items()
+                if field != 'by_operation' and value is not None)
+
+
+class StressRun(namedtuple('StressRun', 'stdout stderr rc')):
+    """
+    The output of node.stress, which it can replace, with the parsed summary of the run.
+    """
+
+    @property
+    def summary(self):
+        return parse_stress_summary(self.stdout)
+
+
+@lru_cache(maxsize=None)
+def _build_sha(install_dir):
+    return cassandra_git_sha(install_dir)
+
+
+class StressRecorder(object):
+    """
+    Records the summary of every cassandra-stress run made through run_stress in the benchmark
+    results (benchmarks/stress.json), keyed by the test and stress options, so that they can be
+    compared with the runs of the same test against a previous build.
+
+    Disabled unless --record-stress-results is given.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.results_dir = BENCHMARK_RESULTS_DIR
+        self._lock = threading.Lock()
+        # test -> [(BenchmarkResults, record)]
+        self._records = {}
+
+    def enable(self, results_dir=BENCHMARK_RESULTS_DIR):
+        self.enabled = True
+        self.results_dir = results_dir
+        return self
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, node, options, summary, test=None, in_process=False):
+        test = current_test() if test is None else test
+        results = BenchmarkResults('stress', cassandra_version=node.get_cassandra_version(),
+                                   build_sha=_build_sha(node.get_install_dir()), results_dir=self.results_dir)
+        config = {'options': ' '.join(options)}
+        if in_process:
+            # not comparable with the runs of cassandra-stress
+            config['in_process'] = True
+        with self._lock:
+            record = results.record(test, config, summary_metrics(summary))
+            self._records.setdefault(test, []).append((results, record))
+        return record
+
+    def records(self, test=None):
+        with self._lock:
+            return [record for _, record in self._records.get(current_test() if test is None else test, [])]
+
+    def regressions(self, test=None, tolerance=0.2, build=None):
+        """
+        Compares the runs recorded for a test (by default, the current one) with the most recent
+        runs of the same test and options against another build, or against `build` given as
+        (cassandra version, git sha). Returns a list of (record, metric, baseline value, value)
+        for the throughputs which dropped and the latencies which grew by more than `tolerance`.
+        """
+        with self._lock:
+            runs = list(self._records.get(current_test() if test is None else test, []))
+        regressions = []
+        for results, record in runs:
+            regressions.extend(results.compare_with_baseline(THROUGHPUT_METRICS, records=[record], tolerance=tolerance,
+                                                             build=build))
+            regressions.extend(results.compare_with_baseline(LATENCY_METRICS, records=[record], tolerance=tolerance,
+                                                             higher_is_better=False, build=build))
+        return regressions
+
+
+stress_recorder = StressRecorder()
+
+
+def run_stress(node, options, whitelist=False, in_process=None):
+    """
+    Runs cassandra-stress against a node, as node.stress, and returns a StressRun whose summary
+    holds the parsed results. The summary is recorded when the stress_recorder is enabled.
+
+    Small write and read workloads run in process through the LoadGenerator instead, unless
+    `in_process` is False, see load_generator.should_run_in_process. They write and read the
+    same data as cassandra-stress. User profile workloads run through the ProfileLoadGenerator
+    only with in_process=True, as their values aren't those of cassandra-stress: data they write
+    must be read in process too.
+
+    Example usage:
+
+        run = run_stress(node1, ['write', 'n=10K', 'no-warmup', '-rate', 'threads=8'])
+        assert run.summary.total_errors == 0
+        out, err, _ = run_stress(node1, ['read', 'n=10K'])
+    """
+    if in_process is None:
+        in_process = should_run_in_process(options)
+    if in_process:
+        generator = ProfileLoadGenerator if options[:1] == ['user'] else LoadGenerator
+        stdout, stderr, rc = generator(node, whitelist=whitelist).run(options)
+    else:
+        stdout, stderr, rc = node.stress(options, whitelist=whitelist)
+    run = StressRun(stdout, stderr, rc)
+    if stress_recorder.enabled:
+        summary = run.summary
+        if summary is None:
+            logger.debug('No summary in the output of stress {}'.format(' '.join(options)))
+        else:
+            stress_recorder.record(node, options, summary, in_process=in_process)
+    return run
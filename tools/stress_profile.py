@@ -0,0 +1,507 @@
+import datetime
+import decimal
+import ipaddress
+import math
+import random
+import re
+import string
+import time
+import uuid
+import logging
+
+from collections import OrderedDict, namedtuple
+
+import yaml
+from cassandra import AlreadyExists, ConsistencyLevel
+from cassandra.query import BatchStatement, BatchType
+from ccmlib.node import ToolError
+
+from tools.load_generator import DEFAULT_THREADS, RETRIES, AsyncRunner, LoadGenerator, Operation, format_summary
+
+logger = logging.getLogger(__name__)
+
+# the defaults of cassandra-stress for the columns missing from the columnspec of a profile
+DEFAULT_SIZE = 'uniform(4..8)'
+DEFAULT_POPULATION = 'uniform(1..100B)'
+DEFAULT_CLUSTER = 'fixed(1)'
+DEFAULT_BATCH_TYPE = 'LOGGED'
+
+_MULTIPLIERS = {'': 1, 'k': 1000, 'm': 1000000, 'b': 1000000000}
+_ALIASES = {'exp': 'exp', 'extreme': 'extreme', 'extr': 'extreme', 'weibull': 'extreme', 'gaussian': 'gaussian',
+            'gauss': 'gaussian', 'normal': 'gaussian', 'norm': 'gaussian', 'uniform': 'uniform', 'fixed': 'fixed',
+            'seq': 'seq'}
+# the share of the values of exp() and extreme() distributions below their max
+_TAIL = 0.999
+
+
+def _number(text):
+    """
+    A number of a distribution such as 10, 1.5, 1K or 100B.
+    """
+    match = re.match(r'^([\d.]+)([kmb]?)$', text.strip().lower())
+    if not match:
+        raise ValueError('Invalid number {}'.format(text))
+    value = float(match.group(1)) * _MULTIPLIERS[match.group(2)]
+    return int(value) if value.is_integer() else value
+
+
+class Distribution(object):
+    """
+    A distribution of integers of a stress profile, such as uniform(1..100) or ~exp(1..1M), see
+    the comments of stress_profiles/repair_wide_rows.yaml. The values have the shape of the
+    distributions of cassandra-stress, not the same values.
+    """
+
+    def __init__(self, kind, minimum, maximum, parameters=(), inverted=False):
+        self.kind = kind
+        self.min = minimum
+        self.max = maximum
+        self.parameters = parameters
+        self.inverted = inverted
+        self._next = 0
+
+    def __repr__(self):
+        return '{}{}({}..{}{})'.format('~' if self.inverted else '', self.kind, self.min, self.max,
+                                       ''.join(',{}'.format(p) for p in self.parameters))
+
+    def sample(self, rand):
+        if self.kind == 'fixed':
+            value = self.min
+        elif self.kind == 'uniform':
+            value = rand.randint(self.min, self.max)
+        elif self.kind == 'seq':
+            value = self.min + self._next % (self.max - self.min + 1)
+            self._next += 1
+        elif self.kind == 'gaussian':
+            if len(self.parameters) == 1:
+                mean = (self.min + self.max) / 2.0
+                stdev = (mean - self.min) / self.parameters[0]
+            else:
+                mean, stdev = self.parameters
+            value = rand.gauss(mean, stdev)
+        elif self.kind == 'exp':
+            value = self.min + rand.expovariate(-math.log(1 - _TAIL) / max(self.max - self.min, 1))
+        else:
+            shape = self.parameters[0]
+            scale = max(self.max - self.min, 1) / (-math.log(1 - _TAIL)) ** (1.0 / shape)
+            value = self.min + rand.weibullvariate(scale, shape)
+        value = min(max(int(round(value)), self.min), self.max)
+        return self.max - (value - self.min) if self.inverted else value
+
+
+def parse_distribution(spec):
+    """
+    Parses a distribution such as fixed(10), uniform(1..100B), gaussian(1..10,2) or ~exp(1..1K).
+    """
+    match = re.match(r'^\s*(~?)(\w+)\((.*)\)\s*$', spec)
+    if not match or match.group(2).lower() not in _ALIASES:
+        raise ValueError('Unsupported distribution {}'.format(spec))
+    kind = _ALIASES[match.group(2).lower()]
+    arguments = [a.strip() for a in match.group(3).split(',')]
+    if kind == 'fixed':
+        if len(arguments) != 1:
+            raise ValueError('Unsupported distribution {}'.format(spec))
+        value = _number(arguments[0])
+        return Distribution(kind, value, value, inverted=bool(match.group(1)))
+    bounds = arguments[0].split('..')
+    if len(bounds) != 2:
+        raise ValueError('Unsupported distribution {}'.format(spec))
+    parameters = tuple(_number(a) for a in arguments[1:])
+    expected = {'uniform': (0,), 'seq': (0,), 'exp': (0,), 'extreme': (1,), 'gaussian': (1, 2)}[kind]
+    if len(parameters) not in expected:
+        raise ValueError('Unsupported distribution {}'.format(spec))
+    return Distribution(kind, _number(bounds[0]), _number(bounds[1]), parameters, inverted=bool(match.group(1)))
+
+
+def parse_ratio(spec):
+    """
+    Parses a ratio distribution such as fixed(1)/10, as (distribution, divisor).
+    """
+    distribution, _, divisor = str(spec).rpartition('/')
+    if not distribution:
+        return parse_distribution(spec), 1
+    return parse_distribution(distribution), _number(divisor)
+
+
+# the distributions of a column of a profile
+ColumnSpec = namedtuple('ColumnSpec', 'size population cluster')
+
+# a query of a profile: `fields` is samerow or multirow
+ProfileQuery = namedtuple('ProfileQuery', 'cql fields')
+
+
+class StressProfile(object):
+    """
+    A cassandra-stress user profile: the keyspace and table to create, the distributions of the
+    columns, how inserts visit partitions and the queries which can be run.
+
+    Example usage:
+
+        profile = StressProfile.load('stress_profiles/repair_wide_rows.yaml')
+        profile.column('val').size.max == 1000
+    """
+
+    def __init__(self, config):
+        self.keyspace = config['keyspace']
+        self.keyspace_definition = config.get('keyspace_definition')
+        self.table = config['table']
+        self.table_definition = config.get('table_definition')
+        self.columnspec = dict((column['name'], _column_spec(column)) for column in config.get('columnspec') or [])
+        self._default_column = _column_spec({})
+        insert = config.get('insert') or {}
+        self.insert = {'partitions': parse_distribution(str(insert.get('partitions', 'fixed(1)'))),
+                       'select': parse_ratio(insert.get('select', 'fixed(1)/1')),
+                       'batchtype': str(insert.get('batchtype', DEFAULT_BATCH_TYPE)).upper(),
+                       'visits': parse_distribution(str(insert.get('visits', 'fixed(1)'))),
+                       'revisit': parse_distribution(str(insert.get('revisit', 'uniform(1..1M)')))}
+        if self.insert['batchtype'] not in ('LOGGED', 'UNLOGGED', 'COUNTER'):
+            raise ValueError('Unsupported batchtype {}'.format(self.insert['batchtype']))
+        self.queries = OrderedDict((name, ProfileQuery(query['cql'], query.get('fields', 'samerow')))
+                                   for name, query in (config.get('queries') or {}).items())
+
+    @classmethod
+    def from_yaml(cls, text):
+        return cls(yaml.safe_load(text))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_yaml(f.read())
+
+    def column(self, name):
+        return self.columnspec.get(name, self._default_column)
+
+
+def _column_spec(column):
+    return ColumnSpec(parse_distribution(str(column.get('size', DEFAULT_SIZE))),
+                      parse_distribution(str(column.get('population', DEFAULT_POPULATION))),
+                      parse_distribution(str(column.get('cluster', DEFAULT_CLUSTER))))
+
+
+# the columns of the table of a profile, as lists of (name, cql type)
+ProfileTable = namedtuple('ProfileTable', 'partition_key clustering regular')
+
+
+def profile_table(metadata, keyspace, table):
+    """
+    The ProfileTable of a table, from the schema metadata of the driver.
+    """
+    table = metadata.keyspaces[keyspace].tables[table]
+    keys = set(c.name for c in table.partition_key + table.clustering_key)
+    return ProfileTable([(c.name, c.cql_type) for c in table.partition_key],
+                        [(c.name, c.cql_type) for c in table.clustering_key],
+                        [(c.name, c.cql_type) for c in table.columns.values() if c.name not in keys])
+
+
+_ALPHABET = string.ascii_letters + string.digits
+
+
+def _text(rand, size):
+    return ''.join(rand.choice(_ALPHABET) for _ in range(size))
+
+
+_GENERATORS = {
+    'ascii': _text,
+    'text': _text,
+    'varchar': _text,
+    'blob': lambda rand, size: rand.getrandbits(size * 8).to_bytes(size, 'little') if size else b'',
+    'tinyint': lambda rand, size: rand.randint(-2 ** 7, 2 ** 7 - 1),
+    'smallint': lambda rand, size: rand.randint(-2 ** 15, 2 ** 15 - 1),
+    'int': lambda rand, size: rand.randint(-2 ** 31, 2 ** 31 - 1),
+    'bigint': lambda rand, size: rand.randint(-2 ** 63, 2 ** 63 - 1),
+    'varint': lambda rand, size: rand.randint(-2 ** 63, 2 ** 63 - 1),
+    'float': lambda rand, size: rand.uniform(-1e6, 1e6),
+    'double': lambda rand, size: rand.uniform(-1e6, 1e6),
+    'decimal': lambda rand, size: decimal.Decimal(rand.randint(-2 ** 63, 2 ** 63 - 1)).scaleb(-rand.randint(0, 10)),
+    'boolean': lambda rand, size: rand.random() < 0.5,
+    'uuid': lambda rand, size: uuid.UUID(int=rand.getrandbits(128), version=4),
+    'timeuuid': lambda rand, size: uuid.UUID(int=rand.getrandbits(128), version=1),
+    'timestamp': lambda rand, size: datetime.datetime.utcfromtimestamp(rand.randint(0, 2 ** 31)),
+    'date': lambda rand, size: datetime.date.fromordinal(rand.randint(1, datetime.date.max.toordinal())),
+    'time': lambda rand, size: datetime.time(rand.randint(0, 23), rand.randint(0, 59), rand.randint(0, 59)),
+    'inet': lambda rand, size: str(ipaddress.IPv4Address(rand.getrandbits(32))),
+}
+
+
+def column_value(name, cql_type, spec, seed):
+    """
+    The value of a column for a seed: the same seed always gives the same value, whose size
+    (for text and blob columns) follows the size distribution of the column.
+    """
+    generator = _GENERATORS.get(cql_type)
+    if generator is None:
+        raise ValueError('Unsupported type {} of column {}'.format(cql_type, name))
+    rand = random.Random('{}:{}'.format(name, seed))
+    return generator(rand, spec.size.sample(rand))
+
+
+# the options of a cassandra-stress user command understood by the engine, see parse_user_options
+UserOptions = namedtuple('UserOptions', 'profile n ops consistency_level threads retries visits revisit batchtype')
+
+
+def parse_user_options(options):
+    """
+    Parses cassandra-stress user options made of profile=, n=, ops(...), cl=, no-warmup,
+    -rate threads=, -insert visits= revisit= batchtype= and -errors retries=. Returns None for any
+    other option, which needs the real cassandra-stress.
+    """
+    if not options or options[0] != 'user':
+        return None
+    parsed = {'profile': None, 'n': None, 'ops': None, 'consistency_level': 'LOCAL_ONE', 'threads': DEFAULT_THREADS,
+              'retries': RETRIES, 'visits': None, 'revisit': None, 'batchtype': None}
+    section = None
+    try:
+        for option in options[1:]:
+            if option in ('-rate', '-insert', '-errors'):
+                section = option
+            elif option.startswith('-'):
+                return None
+            elif section is None and option.startswith('profile='):
+                parsed['profile'] = option[len('profile='):]
+            elif section is None and option.startswith('n='):
+                parsed['n'] = int(_number(option[2:]))
+            elif section is None and option.startswith('ops(') and option.endswith(')'):
+                parsed['ops'] = [(name.strip(), float(weight)) for name, weight in
+                                 (pair.split('=') for pair in option[4:-1].split(','))]
+            elif section is None and option.startswith('cl='):
+                parsed['consistency_level'] = option[3:].upper()
+                if parsed['consistency_level'] not in ConsistencyLevel.name_to_value:
+                    return None
+            elif section is None and option == 'no-warmup':
+                continue
+            elif section == '-rate' and option.startswith('threads='):
+                parsed['threads'] = int(option[len('threads='):])
+            elif section == '-insert' and option.lower().startswith('visits='):
+                parsed['visits'] = parse_distribution(option[len('visits='):])
+            elif section == '-insert' and option.lower().startswith('revisit='):
+                parsed['revisit'] = parse_distribution(option[len('revisit='):])
+            elif section == '-insert' and option.lower().startswith('batchtype='):
+                parsed['batchtype'] = option[len('batchtype='):].upper()
+            elif section == '-errors' and option.startswith('retries='):
+                parsed['retries'] = int(option[len('retries='):])
+            else:
+                return None
+    except ValueError:
+        return None
+    if parsed['profile'] is None or parsed['n'] is None or parsed['ops'] is None:
+        return None
+    return UserOptions(**parsed)
+
+
+class ProfileWorkload(object):
+    """
+    Generates the operations of a stress profile workload: `n` inserts and queries picked at
+    random with the weights of `ops`, {name: weight} where inserts are named "insert".
+
+    Partitions are picked from the population distribution of the first partition key column,
+    and the values of all the columns of a row are derived from its partition and position, so
+    queries find the rows written by inserts. The clustering columns hold `cluster` values for
+    each value of the previous column. Each insert writes the next 1/visits of the rows of its
+    partition, keeping those picked by the select ratio, in a batch of `batchtype` when there
+    is more than one row. As with cassandra-stress, inserts go to a new partition while fewer
+    than a sample of `revisit` partitions are partially written, and revisit one of those
+    otherwise. The population distributions of the other columns are not used.
+    """
+
+    def __init__(self, profile, table, ops, n, visits=None, revisit=None, batchtype=None, seed=0):
+        self.profile = profile
+        self.table = table
+        self.ops = list(ops.items()) if isinstance(ops, dict) else list(ops)
+        self.n = n
+        self.visits = visits or profile.insert['visits']
+        self.revisit = revisit or profile.insert['revisit']
+        self.batchtype = (batchtype or profile.insert['batchtype']).upper()
+        for name, _ in self.ops:
+            if name != 'insert' and name not in profile.queries:
+                raise ValueError('Unknown operation {}'.format(name))
+        if profile.insert['partitions'].max != 1:
+            raise ValueError('Only inserts of a single partition are supported')
+        for name, cql_type in table.partition_key + table.clustering + table.regular:
+            if cql_type not in _GENERATORS:
+                raise ValueError('Unsupported type {} of column {}'.format(cql_type, name))
+        self._rand = random.Random(seed)
+        # partition seed -> (clustering values per level, index of the next row to insert, rows per insert,
+        #                    inserts since all its rows were written)
+        self._partitions = {}
+        # the seeds of the partitions whose rows aren't all written yet, in a list to pick from
+        self._open = []
+        self._open_seeds = set()
+
+    def _partition(self, seed):
+        state = self._partitions.get(seed)
+        if state is None:
+            rand = random.Random('{}:partition'.format(seed))
+            levels = [self.profile.column(name).cluster.sample(rand) for name, _ in self.table.clustering]
+            state = [levels, 0, int(math.ceil(_rows_of(levels) / float(self.visits.sample(rand)))), 0]
+            self._partitions[seed] = state
+        return state
+
+    def partition_seed(self):
+        name = self.table.partition_key[0][0]
+        return self.profile.column(name).population.sample(self._rand)
+
+    def _key(self, seed):
+        name, cql_type = self.table.partition_key[0]
+        return column_value(name, cql_type, self.profile.column(name), seed)
+
+    def row(self, seed, index):
+        """
+        The values of the columns of row `index` of partition `seed`, by column name.
+        """
+        levels = self._partition(seed)[0]
+        values = OrderedDict()
+        for name, cql_type in self.table.partition_key:
+            values[name] = column_value(name, cql_type, self.profile.column(name), seed)
+        # the index of the row as digits of the numbers of values of each clustering column
+        digits, remainder = [], index
+        for level in reversed(levels):
+            digits.append(remainder % level)
+            remainder //= level
+        digits.reverse()
+        for depth, (name, cql_type) in enumerate(self.table.clustering):
+            path = ':'.join(str(d) for d in digits[:depth + 1])
+            values[name] = column_value(name, cql_type, self.profile.column(name), '{}:{}'.format(seed, path))
+        for name, cql_type in self.table.regular:
+            values[name] = column_value(name, cql_type, self.profile.column(name), '{}:{}'.format(seed, index))
+        return values
+
+    def _insert_seed(self):
+        if self._open and len(self._open) >= self.revisit.sample(self._rand):
+            return self._rand.choice(self._open)
+        return self.partition_seed()
+
+    def _insert(self, statement):
+        seed = self._insert_seed()
+        state = self._partition(seed)
+        levels, start, chunk, visited = state
+        total = _rows_of(levels)
+        state[1] = (start + chunk) % total
+        state[3] = (visited + 1) % int(math.ceil(total / float(chunk)))
+        if state[3] == 0 and seed in self._open_seeds:
+            self._open.remove(seed)
+            self._open_seeds.remove(seed)
+        elif state[3] > 0 and seed not in self._open_seeds:
+            self._open.append(seed)
+            self._open_seeds.add(seed)
+        select, divisor = self.profile.insert['select']
+        ratio = select.sample(self._rand) / float(divisor)
+        indexes = [(start + i) % total for i in range(min(chunk, total))]
+        selected = [i for i in indexes if self._rand.random() < ratio] or indexes[:1]
+        parameters = [list(self.row(seed, i).values()) for i in selected]
+        if len(parameters) == 1:
+            return Operation('insert', self._key(seed), statement, parameters[0], 1, None)
+        batch = BatchStatement(batch_type=getattr(BatchType, self.batchtype))
+        for row in parameters:
+            batch.add(statement, row)
+        return Operation('insert', self._key(seed), batch, None, len(parameters), None)
+
+    def _query(self, name, statement, bound):
+        seed = self.partition_seed()
+        total = _rows_of(self._partition(seed)[0])
+        if self.profile.queries[name].fields == 'multirow':
+            parameters = [self.row(seed, self._rand.randrange(total))[column] for column in bound]
+        else:
+            row = self.row(seed, self._rand.randrange(total))
+            parameters = [row[column] for column in bound]
+        return Operation(name, self._key(seed), statement, parameters, 1, None)
+
+    def operations(self, session):
+        """
+        Prepares the statements of the workload and yields its operations, generated lazily.
+        """
+        columns = [name for name, _ in self.table.partition_key + self.table.clustering + self.table.regular]
+        statements = {'insert': session.prepare('INSERT INTO {} ({}) VALUES ({})'.format(
+            self.profile.table, ', '.join('"{}"'.format(c) for c in columns), ', '.join('?' for _ in columns)))}
+        bound = {}
+        for name, _ in self.ops:
+            if name != 'insert':
+                statements[name] = session.prepare(self.profile.queries[name].cql)
+                bound[name] = query_columns(self.profile.queries[name].cql)
+        names = [name for name, _ in self.ops]
+        weights = [weight for _, weight in self.ops]
+        for _ in range(self.n):
+            name = self._rand.choices(names, weights)[0]
+            if name == 'insert':
+                yield self._insert(statements[name])
+            else:
+                yield self._query(name, statements[name], bound[name])
+
+
+def _rows_of(levels):
+    rows = 1
+    for level in levels:
+        rows *= level
+    return rows
+
+
+def query_columns(cql):
+    """
+    The columns bound by the markers of a query, such as ['key', 'col1'] for
+    "select * from t where key = ? and col1 = ? LIMIT 100".
+    """
+    markers = re.findall(r'("[^"]+"|\w+)\s*(?:=|<=|>=|<|>)\s*\?', cql)
+    columns = [c[1:-1] if c.startswith('"') else c.lower() for c in markers]
+    if len(columns) != cql.count('?'):
+        raise ValueError('Unsupported bind markers in query {}'.format(cql))
+    return columns
+
+
+class ProfileLoadGenerator(LoadGenerator):
+    """
+    Runs cassandra-stress user profile workloads through the driver from the test process, see
+    ProfileWorkload. The latency histogram of each operation of the last run is kept in
+    `histograms`, {operation: LatencyHistogram}.
+
+    Example usage:
+
+        generator = ProfileLoadGenerator(node1)
+        out, err, rc = generator.run(['user', 'profile=stress_profiles/repair_wide_rows.yaml', 'n=50',
+                                      'ops(insert=1,simple1=1)', '-insert', 'visits=FIXED(100K)'])
+        assert generator.histograms['simple1'].percentile_ms(99) < 100
+    """
+
+    def __init__(self, node, whitelist=False):
+        LoadGenerator.__init__(self, node, whitelist=whitelist)
+        self.histograms = OrderedDict()
+
+    def _create_schema(self, session, profile):
+        # as cassandra-stress, the table is created in the keyspace of the profile
+        if profile.keyspace_definition:
+            try:
+                session.execute(profile.keyspace_definition, timeout=60)
+            except AlreadyExists:
+                pass
+        session.set_keyspace(profile.keyspace)
+        if profile.table_definition:
+            try:
+                session.execute(profile.table_definition, timeout=60)
+            except AlreadyExists:
+                pass
+
+    def run(self, options):
+        """
+        Runs the workload of cassandra-stress user options and returns (stdout, stderr, rc) as
+        node.stress, raising a ToolError when some operations failed after retries.
+        """
+        parsed = parse_user_options(options)
+        if parsed is None:
+            raise ValueError('Unsupported cassandra-stress options: {}'.format(options))
+        profile = StressProfile.load(parsed.profile)
+        cluster, session = self._session(parsed.consistency_level)
+        try:
+            self._create_schema(session, profile)
+            table = profile_table(cluster.metadata, profile.keyspace, profile.table)
+            workload = ProfileWorkload(profile, table, parsed.ops, parsed.n, visits=parsed.visits,
+                                       revisit=parsed.revisit, batchtype=parsed.batchtype)
+            started = time.time()
+            runner = AsyncRunner(session, workload.operations(session), parsed.threads, retries=parsed.retries).run()
+            elapsed = time.time() - started
+        finally:
+            cluster.shutdown()
+
+        self.histograms = runner.histograms
+        stdout = format_summary(runner.histograms, runner.rows, runner.errors, elapsed).encode('utf-8')
+        logger.debug('Ran stress {} in process in {:.2f}s'.format(' '.join(options), elapsed))
+        if runner.errors:
+            raise ToolError(['stress'] + list(options), 1, stdout, b'')
+        return stdout, b'', 0
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+import logging
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from cassandra.cluster import EXEC_PROFILE_DEFAULT
+from cassandra.metadata import protect_name
+from cassandra.query import tuple_factory
+
+logger = logging.getLogger(__name__)
+
+# (exclusive lower bound, inclusive upper bound) of the tokens of each partitioner that can be scanned
+# by token range, token(pk) > lower bound AND token(pk) <= upper bound then covers the whole ring
+PARTITIONER_BOUNDS = {
+    'org.apache.cassandra.dht.Murmur3Partitioner': (-2 ** 63, 2 ** 63 - 1),
+    'org.apache.cassandra.dht.RandomPartitioner': (-1, 2 ** 127),
+}
+
+
+def split_range(start, end, parts):
+    """
+    Splits the token range (start, end] into `parts` contiguous sub-ranges of about the same size.
+    """
+    parts = max(1, min(parts, end - start))
+    bounds = [start + (end - start) * i // parts for i in range(parts)] + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def ring_ranges(ring_tokens, min_token, max_token, min_ranges=1):
+    """
+    Returns the token ranges (start, end] between the tokens of the ring, the range wrapping around
+    being split at the bounds of the partitioner, so that together they cover (min_token, max_token].
+    The ranges are split further if needed to get at least `min_ranges` of them.
+    """
+    tokens = sorted(set(t for t in ring_tokens if min_token < t < max_token))
+    bounds = [min_token] + tokens + [max_token]
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+    parts = -(-min_ranges // len(ranges))
+    return [sub_range for start, end in ranges for sub_range in split_range(start, end, parts)]
+
+
+def row_digest(row):
+    """
+    A 64 bits hash of the values of a row. The sum of the digests of a set of rows does not depend on
+    the order they are read in, see TokenRangeScanner.checksums.
+    """
+    return int.from_bytes(hashlib.md5(repr(tuple(row)).encode('utf-8')).digest()[:8], 'big')
+
+
+class TokenRangeScanner(object):
+    """
+    Reads a table by token ranges, several of them at a time, rather than with a single query that
+    may time out once the table is large. The ranges are those between the tokens of the ring, as
+    known by the driver, split further to get at least `min_ranges` of them.
+
+    Example usage:
+
+        scanner = TokenRangeScanner(session, 'ks', 'cf', consistency_level=ConsistencyLevel.ALL)
+        assert scanner.count() == 100000
+        scanner.scan(lambda row: check(row))
+
+    Tables of partitioners that can't be scanned by token (ByteOrderedPartitioner) are read as a
+    single range.
+    """
+
+    def __init__(self, session, keyspace, table, columns='*', concurrency=8, min_ranges=32,
+                 fetch_size=1000, consistency_level=None, timeout=60, ranges=None):
+        self.session = session
+        self.keyspace = keyspace
+        self.table = table
+        self.columns = columns if isinstance(columns, str) else ', '.join(protect_name(c) for c in columns)
+        self.concurrency = concurrency
+        self.min_ranges = min_ranges
+        self.fetch_size = fetch_size
+        self.consistency_level = consistency_level
+        self.timeout = timeout
+        self._ranges = ranges
+        # (range, seconds) of the last scan, to find slow ranges
+        self.range_times = []
+        self._profile = session.execution_profile_clone_update(EXEC_PROFILE_DEFAULT, row_factory=tuple_factory)
+
+    def ranges(self):
+        """
+        The token ranges (start, end] scanned, or [None] if the table can't be scanned by token.
+        Those given to the constructor if any, all the ranges of the ring otherwise.
+        """
+        if self._ranges is not None:
+            return list(self._ranges)
+        metadata = self.session.cluster.metadata
+        bounds = PARTITIONER_BOUNDS.get(metadata.partitioner)
+        if bounds is None:
+            return [None]
+        token_map = metadata.token_map
+        tokens = [token.value for token in token_map.ring] if token_map is not None else []
+        return ring_ranges(tokens, bounds[0], bounds[1], self.min_ranges)
+
+    def _statement(self, selection, token_ranges):
+        query = 'SELECT {} FROM {}.{}'.format(selection, protect_name(self.keyspace), protect_name(self.table))
+        if token_ranges != [None]:
+            keyspace_metadata = self.session.cluster.metadata.keyspaces[self.keyspace]
+            table_metadata = keyspace_metadata.tables.get(self.table) or keyspace_metadata.views[self.table]
+            partition_key = ', '.join(protect_name(c.name) for c in table_metadata.partition_key)
+            query += ' WHERE token({pk}) > ? AND token({pk}) <= ?'.format(pk=partition_key)
+        statement = self.session.prepare(query)
+        if self.consistency_level is not None:
+            statement.consistency_level = self.consistency_level
+        statement.fetch_size = self.fetch_size
+        return statement
+
+    def _execute(self, statement, token_range, process_rows):
+        start = time.monotonic()
+        rows = self.session.execute(statement, token_range, timeout=self.timeout, execution_profile=self._profile)
+        result = process_rows(rows)
+        self.range_times.append((token_range, time.monotonic() - start))
+        return result
+
+    def _scan(self, selection, process_rows):
+        """
+        Calls process_rows with the rows of each token range, in `concurrency` threads, and returns an
+        OrderedDict of token range to the value returned for that range.
+        """
+        self.range_times = []
+        ranges = self.ranges()
+        statement = self._statement(selection, ranges)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [(token_range, executor.submit(self._execute, statement, token_range, process_rows))
+                       for token_range in ranges]
+            results = OrderedDict((token_range, future.result()) for token_range, future in futures)
+        logger.debug('Scanned {}.{} in {} token ranges, slowest took {:.3f}s'
+                     .format(self.keyspace, self.table, len(ranges), max(t for _, t in self.range_times)))
+        return results
+
+    def count(self):
+        """
+        The number of rows of the table, counted range by range.
+        """
+        return sum(self._scan('count(*)', lambda rows: rows.one()[0]).values())
+
+    def checksums(self):
+        """
+        Returns an OrderedDict of token range to (number of rows, checksum) of the rows of that range,
+        the checksum being the sum of their row_digest modulo 2^64.
+        """
+        def checksum(rows):
+            count, total = 0, 0
+            for row in rows:
+                count += 1
+                total += row_digest(row)
+            return count, total % 2 ** 64
+        return self._scan(self.columns, checksum)
+
+    def checksum(self):
+        """
+        The number of rows and the checksum of the whole table, see checksums.
+        """
+        checksums = list(self.checksums().values())
+        return sum(count for count, _ in checksums), sum(total for _, total in checksums) % 2 ** 64
+
+    def scan(self, visitor):
+        """
+        Calls visitor with every row of the table. Rows of different ranges are read concurrently,
+        but visitor is only called by one thread at a time.
+        """
+        lock = threading.Lock()
+
+        def visit(rows):
+            for row in rows:
+                with lock:
+                    visitor(row)
+        self._scan(self.columns, visit)
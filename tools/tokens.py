@@ -0,0 +1,246 @@
+import hashlib
+import struct
+
+from collections import defaultdict
+
+from cassandra import cqltypes
+from cassandra.metadata import Murmur3Token
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MURMUR3_PARTITIONER = 'org.apache.cassandra.dht.Murmur3Partitioner'
+RANDOM_PARTITIONER = 'org.apache.cassandra.dht.RandomPartitioner'
+
+PROTOCOL_VERSION = 4
+
+# numpy dtypes of the serialized form of the fixed size types, which can be serialized without a loop
+FIXED_SIZE_DTYPES = {
+    'tinyint': '>i1',
+    'smallint': '>i2',
+    'int': '>i4',
+    'bigint': '>i8',
+    'counter': '>i8',
+    'float': '>f4',
+    'double': '>f8',
+}
+
+
+def cql_type(type_name):
+    """
+    The driver type of a CQL type name, such as 'int' or 'text'.
+    """
+    return cqltypes._cqltypes[type_name]
+
+
+class PartitionKeyEncoder(object):
+    """
+    Serializes partition keys the way Cassandra does before hashing them: the serialized value for a
+    single column key, and for composite keys, the length (2 bytes), serialized value and a 0 byte of
+    each component.
+
+        encoder = PartitionKeyEncoder(['text', 'int'])
+        encoder.encode(('k1', 2))
+    """
+
+    def __init__(self, type_names):
+        self.type_names = [type_names] if isinstance(type_names, str) else list(type_names)
+        self.types = [cql_type(name) for name in self.type_names]
+
+    @property
+    def composite(self):
+        return len(self.types) > 1
+
+    def encode(self, key):
+        if not self.composite:
+            return self.types[0].serialize(key, PROTOCOL_VERSION)
+        parts = []
+        for cass_type, value in zip(self.types, key):
+            serialized = cass_type.serialize(value, PROTOCOL_VERSION)
+            parts.append(struct.pack('>H', len(serialized)) + serialized + b'\x00')
+        return b''.join(parts)
+
+    def encode_array(self, keys):
+        """
+        The serialized keys as a 2d array of bytes if they all have the same size, None otherwise.
+        Single column keys of a fixed size type are serialized without a Python loop.
+        """
+        if not self.composite and self.type_names[0] in FIXED_SIZE_DTYPES:
+            values = numpy.asarray(keys, dtype=FIXED_SIZE_DTYPES[self.type_names[0]])
+            return values.view(numpy.uint8).reshape(len(values), values.dtype.itemsize)
+        encoded = [self.encode(key) for key in keys]
+        lengths = set(len(e) for e in encoded)
+        if len(lengths) > 1:
+            return None
+        return numpy.frombuffer(b''.join(encoded), dtype=numpy.uint8).reshape(len(encoded), lengths.pop())
+
+
+def murmur3_token(key_bytes):
+    """
+    The Murmur3Partitioner token of a serialized partition key.
+    """
+    return Murmur3Token.hash_fn(key_bytes)
+
+
+def random_token(key_bytes):
+    """
+    The RandomPartitioner token of a serialized partition key.
+    """
+    return abs(int.from_bytes(hashlib.md5(key_bytes).digest(), 'big', signed=True))
+
+
+if numpy is not None:
+    _C1 = numpy.uint64(0x87c37b91114253d5)
+    _C2 = numpy.uint64(0x4cf5ad432745937f)
+
+
+def _rotl(x, r):
+    return (x << numpy.uint64(r)) | (x >> numpy.uint64(64 - r))
+
+
+def _fmix(k):
+    k ^= k >> numpy.uint64(33)
+    k *= numpy.uint64(0xff51afd7ed558ccd)
+    k ^= k >> numpy.uint64(33)
+    k *= numpy.uint64(0xc4ceb9fe1a85ec53)
+    k ^= k >> numpy.uint64(33)
+    return k
+
+
+def murmur3_tokens_array(keys):
+    """
+    The Murmur3Partitioner tokens of serialized partition keys of the same length, given as a 2d array
+    of bytes with one key per row. This is the first half of MurmurHash3_x64_128 with a seed of 0, as
+    implemented by Cassandra, where the bytes of the tail are sign extended.
+    """
+    count, length = keys.shape
+    h1 = numpy.zeros(count, dtype=numpy.uint64)
+    h2 = numpy.zeros(count, dtype=numpy.uint64)
+    with numpy.errstate(over='ignore'):
+        nblocks = length // 16
+        if nblocks:
+            blocks = numpy.ascontiguousarray(keys[:, :nblocks * 16]).view('<u8').reshape(count, nblocks, 2)
+            for i in range(nblocks):
+                k1 = blocks[:, i, 0].copy()
+                k2 = blocks[:, i, 1].copy()
+
+                k1 *= _C1
+                k1 = _rotl(k1, 31)
+                k1 *= _C2
+                h1 ^= k1
+                h1 = _rotl(h1, 27)
+                h1 += h2
+                h1 = h1 * numpy.uint64(5) + numpy.uint64(0x52dce729)
+
+                k2 *= _C2
+                k2 = _rotl(k2, 33)
+                k2 *= _C1
+                h2 ^= k2
+                h2 = _rotl(h2, 31)
+                h2 += h1
+                h2 = h2 * numpy.uint64(5) + numpy.uint64(0x38495ab5)
+
+        # Java bytes are signed, so each byte of the tail is sign extended before being shifted
+        tail = keys[:, nblocks * 16:].view(numpy.int8).astype(numpy.int64).view(numpy.uint64)
+        tail_length = tail.shape[1]
+        if tail_length > 8:
+            k2 = numpy.zeros(count, dtype=numpy.uint64)
+            for i in range(tail_length - 1, 7, -1):
+                k2 ^= tail[:, i] << numpy.uint64((i - 8) * 8)
+            k2 *= _C2
+            k2 = _rotl(k2, 33)
+            k2 *= _C1
+            h2 ^= k2
+        if tail_length > 0:
+            k1 = numpy.zeros(count, dtype=numpy.uint64)
+            for i in range(min(tail_length, 8) - 1, -1, -1):
+                k1 ^= tail[:, i] << numpy.uint64(i * 8)
+            k1 *= _C1
+            k1 = _rotl(k1, 31)
+            k1 *= _C2
+            h1 ^= k1
+
+        h1 ^= numpy.uint64(length)
+        h2 ^= numpy.uint64(length)
+        h1 += h2
+        h2 += h1
+        h1 = _fmix(h1)
+        h2 = _fmix(h2)
+        h1 += h2
+
+    tokens = h1.view(numpy.int64)
+    # Long.MIN_VALUE is not a valid token, Cassandra uses Long.MAX_VALUE instead
+    tokens[tokens == numpy.iinfo(numpy.int64).min] = numpy.iinfo(numpy.int64).max
+    return tokens
+
+
+class Partitioner(object):
+    """
+    Computes the tokens of partition keys offline, without querying the cluster.
+
+        partitioner = Partitioner.for_name(cluster.partitioner, ['int'])
+        tokens = partitioner.tokens(range(1000000))
+
+    Batches of keys are hashed with numpy when it is available, Murmur3Partitioner keys of the same
+    size then being hashed without a Python loop.
+    """
+
+    def __init__(self, name, key_types):
+        if name not in (MURMUR3_PARTITIONER, RANDOM_PARTITIONER):
+            raise ValueError('Tokens of {} can not be computed'.format(name))
+        self.name = name
+        self.encoder = PartitionKeyEncoder(key_types)
+        self._hash = murmur3_token if name == MURMUR3_PARTITIONER else random_token
+
+    @classmethod
+    def for_name(cls, name, key_types):
+        """
+        @param name the class name of the partitioner, qualified or not
+        """
+        if '.' not in name:
+            name = 'org.apache.cassandra.dht.' + name
+        return cls(name, key_types)
+
+    @classmethod
+    def for_table(cls, cluster_metadata, keyspace, table):
+        """
+        The partitioner of a table, from the metadata of the driver.
+        """
+        table_metadata = cluster_metadata.keyspaces[keyspace].tables[table]
+        return cls(cluster_metadata.partitioner, [c.cql_type for c in table_metadata.partition_key])
+
+    def token(self, key):
+        return self._hash(self.encoder.encode(key))
+
+    def tokens(self, keys):
+        """
+        The tokens of `keys`, as a list.
+        """
+        keys = list(keys)
+        if numpy is None or self.name != MURMUR3_PARTITIONER or not keys:
+            return [self.token(key) for key in keys]
+
+        encoded = self.encoder.encode_array(keys)
+        if encoded is not None:
+            return murmur3_tokens_array(encoded).tolist()
+
+        # keys of different sizes, hashed by groups of keys of the same size
+        by_length = defaultdict(list)
+        for i, key in enumerate(keys):
+            serialized = self.encoder.encode(key)
+            by_length[len(serialized)].append((i, serialized))
+        tokens = [None] * len(keys)
+        for length, group in by_length.items():
+            array = numpy.frombuffer(b''.join(s for _, s in group), dtype=numpy.uint8).reshape(len(group), length)
+            for (i, _), token in zip(group, murmur3_tokens_array(array).tolist()):
+                tokens[i] = token
+        return tokens
+
+    def token_map(self, keys):
+        """
+        Returns a dict of key to token.
+        """
+        keys = list(keys)
+        return dict(zip(keys, self.tokens(keys)))
@@ -0,0 +1,205 @@
+import os
+import re
+import sys
+import threading
+import time
+import logging
+
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+
+class WaitTimeout(Exception):
+    pass
+
+
+def call_site(depth=1):
+    """
+    Returns a description of the code calling the function that calls call_site,
+    or of the code further up the stack when depth > 1.
+    """
+    frame = sys._getframe(depth + 1)
+    return '{}:{} ({})'.format(os.path.basename(frame.f_code.co_filename), frame.f_lineno, frame.f_code.co_name)
+
+
+def current_test():
+    """
+    Returns the node id of the running test, or None outside of tests.
+    """
+    current = os.environ.get('PYTEST_CURRENT_TEST')
+    if current is None:
+        return None
+    return re.sub(r' \((setup|call|teardown)\)$', '', current)
+
+
+class WaitStats(object):
+    """
+    Accumulates the time spent in wait_until, per test and per call site.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (test, site) -> [number of waits, number of timeouts, total seconds]
+            self._waits = defaultdict(lambda: [0, 0, 0.0])
+
+    def record(self, site, elapsed, timed_out=False, test=None):
+        test = current_test() if test is None else test
+        with self._lock:
+            stats = self._waits[(test, site)]
+            stats[0] += 1
+            stats[1] += int(timed_out)
+            stats[2] += elapsed
+
+    def _totals(self, key):
+        totals = defaultdict(lambda: [0, 0, 0.0])
+        with self._lock:
+            for (test, site), stats in self._waits.items():
+                total = totals[key(test, site)]
+                for i, value in enumerate(stats):
+                    total[i] += value
+        return dict((k, tuple(v)) for k, v in totals.items())
+
+    def by_site(self, test=None):
+        """
+        Returns {site: (waits, timeouts, seconds)}, for the given test or all of them.
+        """
+        if test is None:
+            return self._totals(lambda t, site: site)
+        return dict((site, stats) for (t, site), stats in self._totals(lambda t, site: (t, site)).items()
+                    if t == test)
+
+    def by_test(self):
+        """
+        Returns {test: (waits, timeouts, seconds)}.
+        """
+        return self._totals(lambda test, site: test)
+
+
+wait_stats = WaitStats()
+
+
+def wait_until(predicate, timeout=60, interval=0.1, max_interval=2, backoff=2, wake=None, site=None):
+    """
+    Calls predicate until it returns a truthy value, and returns that value.
+
+    Between two calls, waits for `interval` seconds, multiplied by `backoff` after each call up
+    to `max_interval`, so that fast conditions are noticed quickly without hammering the cluster
+    when they take longer. If `wake` (a threading.Event, for example one set by a LogWatcher,
+    a JmxWatcher or a driver callback) is set, predicate is called again right away.
+
+    The time spent waiting is recorded in wait_stats, under `site` or the caller's file and line.
+
+    Raises WaitTimeout if predicate did not return a truthy value within timeout seconds.
+    """
+    site = call_site(1) if site is None else site
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        if wake is not None:
+            wake.clear()
+        result = predicate()
+        if result:
+            wait_stats.record(site, time.monotonic() - start)
+            return result
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            wait_stats.record(site, time.monotonic() - start, timed_out=True)
+            raise WaitTimeout('Condition not met after {} seconds at {}'.format(timeout, site))
+        if wake is not None:
+            wake.wait(min(interval, remaining))
+        else:
+            time.sleep(min(interval, remaining))
+        interval = min(interval * backoff, max_interval)
+
+
+class _Watcher(threading.Thread):
+    """
+    Base class of the threads which set an event when something happens, to wake up wait_until.
+    """
+
+    def __init__(self, wake=None, interval=0.05):
+        super(_Watcher, self).__init__(daemon=True)
+        self.wake = threading.Event() if wake is None else wake
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def check(self):
+        raise NotImplementedError()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.check():
+                    self.wake.set()
+            except Exception as e:
+                logger.debug('{} check failed: {}'.format(self.__class__.__name__, e))
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, value, traceback):
+        self.stop()
+
+
+class LogWatcher(_Watcher):
+    """
+    Sets `wake` whenever a line matching `pattern` is appended to the log of `node`, after the
+    current end of the log or `from_mark` (see Node.mark_log). Reading new log lines is much
+    cheaper than running nodetool or querying the node, so this can be checked often.
+
+        with LogWatcher(node, 'Index build of .* complete') as watcher:
+            wait_until(index_is_built, timeout=30, wake=watcher.wake)
+    """
+
+    def __init__(self, node, pattern, wake=None, from_mark=None, filename='system.log', interval=0.05):
+        super(LogWatcher, self).__init__(wake=wake, interval=interval)
+        self.pattern = re.compile(pattern)
+        self.filename = os.path.join(os.path.dirname(node.logfilename()), filename)
+        self.position = node.mark_log(filename=filename) if from_mark is None else from_mark
+        self.matches = []
+
+    def check(self):
+        if not os.path.exists(self.filename):
+            return False
+        with open(self.filename, 'rb') as f:
+            f.seek(self.position)
+            data = f.read()
+        # only consume complete lines
+        data = data[:data.rfind(b'\n') + 1]
+        self.position += len(data)
+        matches = [line for line in data.decode('utf-8', 'replace').splitlines() if self.pattern.search(line)]
+        self.matches.extend(matches)
+        return bool(matches)
+
+
+class JmxWatcher(_Watcher):
+    """
+    Sets `wake` whenever `condition` is true of the value of the attribute `attribute` of
+    `mbean`, read with the JolokiaAgent `jmx`. A JMX read is cheap, so it can guard a more
+    expensive predicate:
+
+        with JolokiaAgent(node) as jmx, JmxWatcher(jmx, mbean, 'Value', lambda pending: pending == 0) as watcher:
+            wait_until(expensive_check, wake=watcher.wake)
+    """
+
+    def __init__(self, jmx, mbean, attribute, condition, wake=None, interval=0.1):
+        super(JmxWatcher, self).__init__(wake=wake, interval=interval)
+        self.jmx = jmx
+        self.mbean = mbean
+        self.attribute = attribute
+        self.condition = condition
+
+    def check(self):
+        return self.condition(self.jmx.read_attribute(self.mbean, self.attribute))
@@ -10,6 +10,7 @@ from ccmlib.node import TimeoutError, ToolError
 
 from dtest import Tester, create_ks, create_cf
 from tools.assertions import assert_almost_equal, assert_all, assert_none
+from tools.byteman import byteman_submit, versioned_script
 from tools.data import insert_c1c2, query_c1c2
 
 since = pytest.mark.since
@@ -218,11 +219,7 @@ class TestTopology(Tester):
 
         # Execute first rebuild, should fail
         with pytest.raises(ToolError):
-            if cluster.version() >= '4.0':
-                script = ['./byteman/4.0/decommission_failure_inject.btm']
-            else:
-                script = ['./byteman/pre4.0/decommission_failure_inject.btm']
-            node2.byteman_submit(script)
+            byteman_submit(node2, [versioned_script('decommission_failure_inject.btm', cluster.version())])
             node2.nodetool('decommission')
 
         # Make sure previous ToolError is due to decommission
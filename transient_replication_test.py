@@ -10,6 +10,7 @@ from cassandra.protocol import ConfigurationException
 from ccmlib.node import Node
 
 from dtest import Tester
+from tools.byteman import byteman_submit
 from tools.jmxutils import JolokiaAgent, make_mbean
 from tools.data import rows_to_list
 from tools.assertions import (assert_all)
@@ -177,7 +178,7 @@ class TransientReplicationBase(Tester):
         self.node1, self.node2, self.node3 = self.nodes
 
         # Make sure digest is not attempted against the transient node
-        self.node3.byteman_submit(['./byteman/throw_on_digest.btm'])
+        byteman_submit(self.node3, ['./byteman/throw_on_digest.btm'])
 
 
     def replication_factor(self):
@@ -310,7 +311,7 @@ class TestTransientReplication(TransientReplicationBase):
         with tm(self.node1) as tm1, tm(self.node2) as tm2, tm(self.node3) as tm3:
             self.insert_row(1, 1, 1)
             # Stop writes to the other full node
-            self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+            byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
             self.insert_row(1, 2, 2)
 
         # node1 should contain both rows
@@ -335,7 +336,7 @@ class TestTransientReplication(TransientReplicationBase):
         tm = lambda n: self.table_metrics(n)
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         self.insert_row(1, 2, 2)
 
         # Stop reads from the node that will hold the second row
@@ -360,7 +361,7 @@ class TestTransientReplication(TransientReplicationBase):
         self.insert_row(1, 2, 2)
 
         # Stop writes to the other full node
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         self.delete_row(1, 1, node = self.node1)
 
         # Stop reads from the node that will hold the second row
@@ -390,7 +391,7 @@ class TestTransientReplication(TransientReplicationBase):
         self.insert_row(1, 1, 1)
         self.insert_row(1, 2, 2)
         # Stop writes to the other full node
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         self.delete_row(1, 2)
 
         self.assert_local_rows(self.node3,
@@ -410,7 +411,7 @@ class TestTransientReplication(TransientReplicationBase):
         for node in self.nodes:
             self.assert_has_no_sstables(node)
 
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         # self.insert_row(1)
         tm = lambda n: self.table_metrics(n)
         with tm(self.node1) as tm1, tm(self.node2) as tm2, tm(self.node3) as tm3:
@@ -492,7 +493,7 @@ class TestTransientReplication(TransientReplicationBase):
     def test_speculative_write(self):
         """ if a full replica isn't responding, we should send the write to the transient replica """
         session = self.exclusive_cql_connection(self.node1)
-        self.node2.byteman_submit(['./byteman/slow_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/slow_writes.btm'])
 
         self.insert_row(1, 1, 1, session=session)
         self.assert_local_rows(self.node1, [[1,1,1]])
@@ -577,7 +578,7 @@ class TestTransientReplicationSpeculativeQueries(TransientReplicationBase):
         session.execute("ALTER TABLE %s.%s WITH speculative_retry = 'ALWAYS';" % (self.keyspace, self.table))
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         self.insert_row(1, 2, 2)
 
         for node in self.nodes:
@@ -594,7 +595,7 @@ class TestTransientReplicationSpeculativeQueries(TransientReplicationBase):
         session.execute("ALTER TABLE %s.%s WITH speculative_retry = '99.99PERCENTILE';" % (self.keyspace, self.table))
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         self.insert_row(1, 2, 2)
 
         for node in self.nodes:
@@ -627,7 +628,7 @@ class TestMultipleTransientNodes(TransientReplicationBase):
         tm = lambda n: self.table_metrics(n)
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit(['./byteman/stop_writes.btm'])
+        byteman_submit(self.node2, ['./byteman/stop_writes.btm'])
         self.insert_row(1, 2, 2)
 
         self.assert_local_rows(self.node1,
@@ -1,9 +1,11 @@
+import heapq
 import os
+import threading
 import time
 import pytest
 import logging
 
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 from distutils import dir_util
 from distutils.version import LooseVersion
 
@@ -12,6 +14,7 @@ from cassandra.query import SimpleStatement
 from cassandra.util import sortedset
 
 from dtest import Tester, create_ks
+from dtest_setup import DTestSetup
 from tools.assertions import (assert_all, assert_almost_equal, assert_none,
                               assert_row_count, assert_unavailable)
 
@@ -20,15 +23,190 @@ logger = logging.getLogger(__name__)
 
 from scrub_test import TestHelper
 
+TTL_TABLE_COLUMNS = 'key int primary key, col1 int, col2 int, col3 int'
+
+TTLScenario = namedtuple('TTLScenario', 'name function default_time_to_live columns')
+
+
+def ttl_scenario(default_time_to_live=None, columns=TTL_TABLE_COLUMNS):
+    """
+    Turns a generator function into a test whose scenario runs on the shared TTLTimeline of its
+    class. The generator gets a session using a keyspace of its own, holding an empty ttl_table
+    made of `columns`. It writes its data, then yields the time at which it must be resumed to
+    check it, as often as needed:
+
+        @ttl_scenario(default_time_to_live=1)
+        def test_default_ttl(self, session):
+            start = time.time()
+            session.execute("INSERT INTO ttl_table (key, col1) VALUES (1, 1)")
+            yield start + 3
+            assert_row_count(session, 'ttl_table', 0)
+
+    The test itself waits until its scenario completed and reports its result.
+    """
+    def decorator(function):
+        def test(self):
+            self.ttl_timeline.result(function.__name__)
+        test.__name__ = function.__name__
+        test.__doc__ = function.__doc__
+        test.ttl_scenario = TTLScenario(function.__name__, function, default_time_to_live, columns)
+        return test
+    return decorator
+
+
+class TTLTimeline(object):
+    """
+    Runs TTL scenarios (see ttl_scenario) in a background thread on a single timeline, so that their
+    waits for data to expire overlap: the time waited is that of the longest scenario rather than
+    the sum of all of them.
+
+    All keyspaces and tables are created first, then the scenarios are started one after the other
+    and resumed in the order they are due, sleeping until each of them is. A scenario due while
+    others are still being started is resumed between two of them so that it is not delayed.
+    """
+
+    def __init__(self, session, scenarios, instance, after=None):
+        """
+        @param session The session used to create the keyspaces and tables of the scenarios
+        @param instance The test class instance passed to the scenarios
+        @param after Function called once all scenarios completed, returning an error message
+                     to report for every scenario which didn't fail, or None
+        """
+        self.session = session
+        self.scenarios = scenarios
+        self.instance = instance
+        self.after = after
+        self.done = threading.Event()
+        self._completed = dict((scenario.name, threading.Event()) for scenario in scenarios)
+        self._failures = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wait(self, timeout=600):
+        return self.done.wait(timeout)
+
+    def result(self, name, timeout=600):
+        """
+        Waits until scenario `name` completed and raises its failure, if any.
+        """
+        assert self._completed[name].wait(timeout), "TTL scenario {} did not complete in {} seconds".format(name, timeout)
+        if name in self._failures:
+            raise self._failures[name]
+
+    def _complete(self, name, failure=None):
+        if failure is not None:
+            self._failures[name] = failure
+        self._completed[name].set()
+
+    def _resume(self, timeline, name, scenario):
+        try:
+            due = next(scenario)
+        except StopIteration:
+            self._complete(name)
+        except Exception as e:
+            self._complete(name, e)
+        else:
+            heapq.heappush(timeline, (due, len(timeline), name, scenario))
+
+    def _run(self):
+        try:
+            self._run_scenarios()
+        except Exception as e:
+            for name, completed in self._completed.items():
+                if not completed.is_set():
+                    self._complete(name, e)
+
+        try:
+            error = self.after() if self.after is not None else None
+        except Exception as e:
+            error = str(e)
+        if error is not None:
+            for name in self._completed:
+                self._failures.setdefault(name, AssertionError(error))
+        self.done.set()
+
+    def _run_scenarios(self):
+        pending = []
+        for i, scenario in enumerate(self.scenarios):
+            session = self.session.cluster.connect()
+            create_ks(session, 'ttl_{}'.format(i), 1)
+            query = "CREATE TABLE ttl_table ({})".format(scenario.columns)
+            if scenario.default_time_to_live:
+                query += " WITH default_time_to_live = {};".format(scenario.default_time_to_live)
+            session.execute(query)
+            pending.append((scenario.name, scenario.function, session))
+
+        timeline = []
+        while pending or timeline:
+            if timeline and (not pending or timeline[0][0] <= time.time()):
+                due, _, name, scenario = heapq.heappop(timeline)
+                remaining = due - time.time()
+                if remaining > 0:
+                    time.sleep(remaining)
+                logger.debug("Resuming TTL scenario {} ({:.2f}s late)".format(name, time.time() - due))
+                self._resume(timeline, name, scenario)
+            else:
+                name, function, session = pending.pop(0)
+                logger.debug("Starting TTL scenario {}".format(name))
+                self._resume(timeline, name, function(self.instance, session))
+
 
 @since('2.0')
 class TestTTL(Tester):
     """ Test Time To Live Feature """
 
+    @pytest.fixture(scope='class', autouse=True)
+    def fixture_ttl_timeline(self, request, dtest_config):
+        """
+        Runs the scenarios of the selected ttl_scenario tests on a cluster shared by all of them,
+        see TTLTimeline.
+        """
+        selected = set(item.name for item in request.session.items if item.cls is request.cls)
+        scenarios = [test.ttl_scenario for name, test in vars(request.cls).items()
+                     if hasattr(test, 'ttl_scenario') and name in selected]
+        if not scenarios:
+            yield None
+            return
+
+        dtest_setup = DTestSetup(dtest_config=dtest_config)
+        dtest_setup.initialize_cluster(DTestSetup.create_ccm_cluster)
+
+        def finish():
+            # the other tests of the class start a cluster on the same addresses, so this one is
+            # stopped as soon as it is no longer needed
+            errors = dtest_setup.check_logs_for_errors()
+            for con in dtest_setup.connections:
+                con.cluster.shutdown()
+            dtest_setup.connections = []
+            dtest_setup.cluster.stop()
+            if errors:
+                return 'Unexpected error found in node logs (see stdout for full details)'
+
+        try:
+            dtest_setup.cluster.populate(1).start()
+            [node1] = dtest_setup.cluster.nodelist()
+            session = dtest_setup.patient_cql_connection(node1)
+            timeline = TTLTimeline(session, scenarios, self, after=finish).start()
+            yield timeline
+            timeline.wait()
+        finally:
+            for con in dtest_setup.connections:
+                con.cluster.shutdown()
+            dtest_setup.cleanup_cluster()
+
     @pytest.fixture(scope='function', autouse=True)
-    def fixture_ttl_test_setup(self, fixture_dtest_setup):
+    def fixture_ttl_test_setup(self, request, fixture_dtest_setup, fixture_ttl_timeline):
         self.cluster = fixture_dtest_setup.cluster
         self.fixture_dtest_setup = fixture_dtest_setup
+        self.ttl_timeline = fixture_ttl_timeline
+        if hasattr(request.function, 'ttl_scenario'):
+            return
+        if fixture_ttl_timeline is not None:
+            # wait for the cluster of the scenarios to be stopped, it uses the same addresses
+            fixture_ttl_timeline.wait()
         self.cluster.populate(1).start()
         [node1] = self.cluster.nodelist()
         self.session1 = self.patient_cql_connection(node1)
@@ -63,118 +241,111 @@ class TestTTL(Tester):
         if real_time_to_wait > 0:
             time.sleep(real_time_to_wait)
 
-    def test_default_ttl(self):
+    @ttl_scenario(default_time_to_live=1)
+    def test_default_ttl(self, session):
         """ Test default_time_to_live specified on a table """
-        self.prepare(default_time_to_live=1)
         start = time.time()
-        self.session1.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d)" % (1, 1))
-        self.session1.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d)" % (2, 2))
-        self.session1.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d)" % (3, 3))
-        self.smart_sleep(start, 3)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        session.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d)" % (1, 1))
+        session.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d)" % (2, 2))
+        session.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d)" % (3, 3))
+        yield start + 3
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_insert_ttl_has_priority_on_defaut_ttl(self):
+    @ttl_scenario(default_time_to_live=1)
+    def test_insert_ttl_has_priority_on_defaut_ttl(self, session):
         """ Test that a ttl specified during an insert has priority on the default table ttl """
-        self.prepare(default_time_to_live=1)
-
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1) VALUES (%d, %d) USING TTL 5;
         """ % (1, 1))
-        self.smart_sleep(start, 2)
-        assert_row_count(self.session1, 'ttl_table', 1)  # should still exist
-        self.smart_sleep(start, 7)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        yield start + 2
+        assert_row_count(session, 'ttl_table', 1)  # should still exist
+        yield start + 7
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_insert_ttl_works_without_default_ttl(self):
+    @ttl_scenario()
+    def test_insert_ttl_works_without_default_ttl(self, session):
         """ Test that a ttl specified during an insert works even if a table has no default ttl """
-        self.prepare()
-
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1) VALUES (%d, %d) USING TTL 1;
         """ % (1, 1))
-        self.smart_sleep(start, 3)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        yield start + 3
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_default_ttl_can_be_removed(self):
+    @ttl_scenario(default_time_to_live=1)
+    def test_default_ttl_can_be_removed(self, session):
         """ Test that default_time_to_live can be removed """
-        self.prepare(default_time_to_live=1)
-
         start = time.time()
-        self.session1.execute("ALTER TABLE ttl_table WITH default_time_to_live = 0;")
-        self.session1.execute("""
+        session.execute("ALTER TABLE ttl_table WITH default_time_to_live = 0;")
+        session.execute("""
             INSERT INTO ttl_table (key, col1) VALUES (%d, %d);
         """ % (1, 1))
-        self.smart_sleep(start, 1.5)
-        assert_row_count(self.session1, 'ttl_table', 1)
+        yield start + 1.5
+        assert_row_count(session, 'ttl_table', 1)
 
-    def test_removing_default_ttl_does_not_affect_existing_rows(self):
+    @ttl_scenario(default_time_to_live=1)
+    def test_removing_default_ttl_does_not_affect_existing_rows(self, session):
         """ Test that removing a default_time_to_live doesn't affect the existings rows """
-        self.prepare(default_time_to_live=1)
-
-        self.session1.execute("ALTER TABLE ttl_table WITH default_time_to_live = 10;")
+        session.execute("ALTER TABLE ttl_table WITH default_time_to_live = 10;")
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1) VALUES (%d, %d);
         """ % (1, 1))
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1) VALUES (%d, %d) USING TTL 15;
         """ % (2, 1))
-        self.session1.execute("ALTER TABLE ttl_table WITH default_time_to_live = 0;")
-        self.session1.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d);" % (3, 1))
-        self.smart_sleep(start, 5)
-        assert_row_count(self.session1, 'ttl_table', 3)
-        self.smart_sleep(start, 12)
-        assert_row_count(self.session1, 'ttl_table', 2)
-        self.smart_sleep(start, 20)
-        assert_row_count(self.session1, 'ttl_table', 1)
-
-    def test_update_single_column_ttl(self):
+        session.execute("ALTER TABLE ttl_table WITH default_time_to_live = 0;")
+        session.execute("INSERT INTO ttl_table (key, col1) VALUES (%d, %d);" % (3, 1))
+        yield start + 5
+        assert_row_count(session, 'ttl_table', 3)
+        yield start + 12
+        assert_row_count(session, 'ttl_table', 2)
+        yield start + 20
+        assert_row_count(session, 'ttl_table', 1)
+
+    @ttl_scenario()
+    def test_update_single_column_ttl(self, session):
         """ Test that specifying a TTL on a single column works """
-        self.prepare()
-
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, col2, col3) VALUES (%d, %d, %d, %d);
         """ % (1, 1, 1, 1))
         start = time.time()
-        self.session1.execute("UPDATE ttl_table USING TTL 3 set col1=42 where key=%s;" % (1,))
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 42, 1, 1]])
-        self.smart_sleep(start, 5)
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, None, 1, 1]])
+        session.execute("UPDATE ttl_table USING TTL 3 set col1=42 where key=%s;" % (1,))
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 42, 1, 1]])
+        yield start + 5
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, None, 1, 1]])
 
-    def test_update_multiple_columns_ttl(self):
+    @ttl_scenario()
+    def test_update_multiple_columns_ttl(self, session):
         """ Test that specifying a TTL on multiple columns works """
-        self.prepare()
-
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, col2, col3) VALUES (%d, %d, %d, %d);
         """ % (1, 1, 1, 1))
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             UPDATE ttl_table USING TTL 2 set col1=42, col2=42, col3=42 where key=%s;
         """ % (1,))
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 42, 42, 42]])
-        self.smart_sleep(start, 4)
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, None, None, None]])
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 42, 42, 42]])
+        yield start + 4
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, None, None, None]])
 
-    def test_update_column_ttl_with_default_ttl(self):
+    @ttl_scenario(default_time_to_live=8)
+    def test_update_column_ttl_with_default_ttl(self, session):
         """
         Test that specifying a column ttl works when a default ttl is set.
         This test specify a lower ttl for the column than the default ttl.
         """
-        self.prepare(default_time_to_live=8)
-
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, col2, col3) VALUES (%d, %d, %d, %d);
         """ % (1, 1, 1, 1))
-        self.session1.execute("UPDATE ttl_table USING TTL 3 set col1=42 where key=%s;" % (1,))
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 42, 1, 1]])
-        self.smart_sleep(start, 5)
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, None, 1, 1]])
-        self.smart_sleep(start, 10)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        session.execute("UPDATE ttl_table USING TTL 3 set col1=42 where key=%s;" % (1,))
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 42, 1, 1]])
+        yield start + 5
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, None, 1, 1]])
+        yield start + 10
+        assert_row_count(session, 'ttl_table', 0)
 
     def update_column_ttl_with_default_ttl_test2(self):
         """
@@ -194,149 +365,141 @@ class TestTTL(Tester):
         self.smart_sleep(start, 8)
         assert_row_count(self.session1, 'ttl_table', 0)
 
-    def test_remove_column_ttl(self):
+    @ttl_scenario()
+    def test_remove_column_ttl(self, session):
         """
         Test that removing a column ttl works.
         """
-        self.prepare()
-
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, col2, col3) VALUES (%d, %d, %d, %d) USING TTL 2;
         """ % (1, 1, 1, 1))
-        self.session1.execute("UPDATE ttl_table set col1=42 where key=%s;" % (1,))
-        self.smart_sleep(start, 4)
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 42, None, None]])
+        session.execute("UPDATE ttl_table set col1=42 where key=%s;" % (1,))
+        yield start + 4
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 42, None, None]])
 
     @since('3.6')
-    def test_set_ttl_to_zero_to_default_ttl(self):
+    @ttl_scenario(default_time_to_live=2)
+    def test_set_ttl_to_zero_to_default_ttl(self, session):
         """
         Test that we can remove the default ttl by setting the ttl explicitly to zero.
         CASSANDRA-11207
         """
-        self.prepare(default_time_to_live=2)
-
         start = time.time()
-        self.session1.execute("INSERT INTO ttl_table (key, col1, col2, col3) VALUES ({}, {}, {}, {});".format(1, 1, 1, 1))
-        self.session1.execute("INSERT INTO ttl_table (key, col1, col2, col3) VALUES ({}, {}, {}, {});".format(2, 1, 1, 1))
-        self.session1.execute("UPDATE ttl_table using ttl 0 set col1=42 where key={};".format(1))
-        self.session1.execute("UPDATE ttl_table using ttl 3 set col1=42 where key={};".format(2))
-        self.smart_sleep(start, 5)
+        session.execute("INSERT INTO ttl_table (key, col1, col2, col3) VALUES ({}, {}, {}, {});".format(1, 1, 1, 1))
+        session.execute("INSERT INTO ttl_table (key, col1, col2, col3) VALUES ({}, {}, {}, {});".format(2, 1, 1, 1))
+        session.execute("UPDATE ttl_table using ttl 0 set col1=42 where key={};".format(1))
+        session.execute("UPDATE ttl_table using ttl 3 set col1=42 where key={};".format(2))
+        yield start + 5
 
         # The first row should be deleted, using ttl 0 should fallback to default_time_to_live
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 42, None, None]])
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 42, None, None]])
 
     @since('2.1', max_version='3.5')
-    def test_remove_column_ttl_with_default_ttl(self):
+    @ttl_scenario(default_time_to_live=2)
+    def test_remove_column_ttl_with_default_ttl(self, session):
         """
         Test that we cannot remove a column ttl when a default ttl is set.
         """
-        self.prepare(default_time_to_live=2)
-
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, col2, col3) VALUES (%d, %d, %d, %d);
         """ % (1, 1, 1, 1))
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, col2, col3) VALUES (%d, %d, %d, %d);
         """ % (2, 1, 1, 1))
-        self.session1.execute("UPDATE ttl_table using ttl 0 set col1=42 where key=%s;" % (1,))
-        self.session1.execute("UPDATE ttl_table using ttl 8 set col1=42 where key=%s;" % (2,))
-        self.smart_sleep(start, 5)
+        session.execute("UPDATE ttl_table using ttl 0 set col1=42 where key=%s;" % (1,))
+        session.execute("UPDATE ttl_table using ttl 8 set col1=42 where key=%s;" % (2,))
+        yield start + 5
         # The first row should be deleted, using ttl 0 should fallback to default_time_to_live
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[2, 42, None, None]])
-        self.smart_sleep(start, 10)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        assert_all(session, "SELECT * FROM ttl_table;", [[2, 42, None, None]])
+        yield start + 10
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_collection_list_ttl(self):
+    @ttl_scenario(default_time_to_live=10)
+    def test_collection_list_ttl(self, session):
         """
         Test that ttl has a granularity of elements using a list collection.
         """
-        self.prepare(default_time_to_live=10)
-
-        self.session1.execute("ALTER TABLE ttl_table ADD mylist list<int>;""")
+        session.execute("ALTER TABLE ttl_table ADD mylist list<int>;""")
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, mylist) VALUES (%d, %d, %s);
         """ % (1, 1, [1, 2, 3, 4, 5]))
-        self.session1.execute("""
+        session.execute("""
             UPDATE ttl_table USING TTL 5 SET mylist[0] = 42, mylist[4] = 42 WHERE key=1;
         """)
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 1, None, None, [42, 2, 3, 4, 42]]])
-        self.smart_sleep(start, 7)
-        assert_all(self.session1, "SELECT * FROM ttl_table;", [[1, 1, None, None, [2, 3, 4]]])
-        self.smart_sleep(start, 12)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 1, None, None, [42, 2, 3, 4, 42]]])
+        yield start + 7
+        assert_all(session, "SELECT * FROM ttl_table;", [[1, 1, None, None, [2, 3, 4]]])
+        yield start + 12
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_collection_set_ttl(self):
+    @ttl_scenario(default_time_to_live=10)
+    def test_collection_set_ttl(self, session):
         """
         Test that ttl has a granularity of elements using a set collection.
         """
-        self.prepare(default_time_to_live=10)
-
-        self.session1.execute("ALTER TABLE ttl_table ADD myset set<int>;""")
+        session.execute("ALTER TABLE ttl_table ADD myset set<int>;""")
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, myset) VALUES (%d, %d, %s);
         """ % (1, 1, '{1,2,3,4,5}'))
-        self.session1.execute("""
+        session.execute("""
             UPDATE ttl_table USING TTL 3 SET myset = myset + {42} WHERE key=1;
         """)
         assert_all(
-            self.session1,
+            session,
             "SELECT * FROM ttl_table;",
             [[1, 1, None, None, sortedset([1, 2, 3, 4, 5, 42])]]
         )
-        self.smart_sleep(start, 5)
+        yield start + 5
         assert_all(
-            self.session1,
+            session,
             "SELECT * FROM ttl_table;",
             [[1, 1, None, None, sortedset([1, 2, 3, 4, 5])]]
         )
-        self.smart_sleep(start, 12)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        yield start + 12
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_collection_map_ttl(self):
+    @ttl_scenario(default_time_to_live=6)
+    def test_collection_map_ttl(self, session):
         """
         Test that ttl has a granularity of elements using a map collection.
         """
-        self.prepare(default_time_to_live=6)
-
-        self.session1.execute("ALTER TABLE ttl_table ADD mymap map<int, int>;""")
+        session.execute("ALTER TABLE ttl_table ADD mymap map<int, int>;""")
         start = time.time()
-        self.session1.execute("""
+        session.execute("""
             INSERT INTO ttl_table (key, col1, mymap) VALUES (%d, %d, %s);
         """ % (1, 1, '{1:1,2:2,3:3,4:4,5:5}'))
-        self.session1.execute("""
+        session.execute("""
             UPDATE ttl_table USING TTL 2 SET mymap[1] = 42, mymap[5] = 42 WHERE key=1;
         """)
         assert_all(
-            self.session1,
+            session,
             "SELECT * FROM ttl_table;",
             [[1, 1, None, None, OrderedDict([(1, 42), (2, 2), (3, 3), (4, 4), (5, 42)])]]
         )
-        self.smart_sleep(start, 4)
+        yield start + 4
         assert_all(
-            self.session1,
+            session,
             "SELECT * FROM ttl_table;",
             [[1, 1, None, None, OrderedDict([(2, 2), (3, 3), (4, 4)])]]
         )
-        self.smart_sleep(start, 8)
-        assert_row_count(self.session1, 'ttl_table', 0)
+        yield start + 8
+        assert_row_count(session, 'ttl_table', 0)
 
-    def test_delete_with_ttl_expired(self):
+    @ttl_scenario(columns='id text, usr text, valid int, PRIMARY KEY (id)')
+    def test_delete_with_ttl_expired(self, session):
         """
         Updating a row with a ttl does not prevent deletion, test for CASSANDRA-6363
         """
-        self.session1.execute("DROP TABLE IF EXISTS session")
-        self.session1.execute("CREATE TABLE session (id text, usr text, valid int, PRIMARY KEY (id))")
+        session.execute("insert into ttl_table (id, usr) values ('abc', 'abc')")
+        session.execute("update ttl_table using ttl 1 set valid = 1 where id = 'abc'")
+        yield time.time() + 2
 
-        self.session1.execute("insert into session (id, usr) values ('abc', 'abc')")
-        self.session1.execute("update session using ttl 1 set valid = 1 where id = 'abc'")
-        self.smart_sleep(time.time(), 2)
-
-        self.session1.execute("delete from session where id = 'abc' if usr ='abc'")
-        assert_row_count(self.session1, 'session', 0)
+        session.execute("delete from ttl_table where id = 'abc' if usr ='abc'")
+        assert_row_count(session, 'ttl_table', 0)
 
     @since('2.1')
     def test_expiration_overflow_policy_cap(self):
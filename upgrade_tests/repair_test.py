@@ -27,7 +27,7 @@ class TestUpgradeRepair(BaseRepairTest):
         cluster = self.cluster
         logger.debug("Setting version to 2.2.5")
         cluster.set_install_dir(version="2.2.5")
-        self._populate_cluster()
+        self._populate_cluster(prefer_local_reads=True)
 
         self._do_upgrade(default_install_dir)
         self._repair_and_verify(True)
@@ -17,7 +17,11 @@ from cassandra import ConsistencyLevel, WriteTimeout
 from cassandra.query import SimpleStatement
 
 from dtest import RUN_STATIC_UPGRADE_MATRIX, Tester
+from tools.columnar import assert_column_values, fetch_columns
+from tools.funcutils import get_rate_limited_function
 from tools.misc import generate_ssl_stores, new_node
+from tools.token_scan import TokenRangeScanner
+from tools.wait import WaitTimeout, wait_until
 from .upgrade_base import switch_jdks
 from .upgrade_manifest import (build_upgrade_pairs,
                                current_2_1_x, current_2_2_x, current_3_0_x,
@@ -26,6 +30,9 @@ from .upgrade_manifest import (build_upgrade_pairs,
 
 logger = logging.getLogger(__name__)
 
+# number of counters read by each query of counter_checker
+COUNTER_CHECK_BATCH_SIZE = 100
+
 
 def data_writer(tester, to_verify_queue, verification_done_queue, rewrite_probability=0):
     """
@@ -186,7 +193,8 @@ def counter_checker(tester, to_verify_queue, verification_done_queue):
     # 'tester' is a cloned object so we shouldn't be inappropriately sharing anything with another process
     session = tester.patient_cql_connection(tester.node1, keyspace="upgrade", protocol_version=tester.protocol_version)
 
-    prepared = session.prepare("SELECT c FROM countertable WHERE k1=?")
+    # the counters are checked in batches, with a single query and vectorized comparisons
+    prepared = session.prepare("SELECT k1, c FROM countertable WHERE k1 IN ?")
     prepared.consistency_level = ConsistencyLevel.QUORUM
 
     def handle_sigterm(signum, frame):
@@ -201,27 +209,34 @@ def counter_checker(tester, to_verify_queue, verification_done_queue):
         try:
             # here we could block, but if the writer process terminates early with an empty queue
             # we would end up blocking indefinitely
-            (key, expected_count) = to_verify_queue.get_nowait()
+            expected_counts = {}
+            while len(expected_counts) < COUNTER_CHECK_BATCH_SIZE:
+                try:
+                    (key, expected_count) = to_verify_queue.get_nowait()
+                except Empty:
+                    break
+                expected_counts[key] = expected_count
+            if not expected_counts:
+                time.sleep(0.1)  # let's not eat CPU if the queue is empty
+                continue
 
-            actual_count = session.execute(prepared, (key,))[0][0]
-        except Empty:
-            time.sleep(0.1)  # let's not eat CPU if the queue is empty
-            continue
+            columns = fetch_columns(session, prepared, (list(expected_counts),))
         except Exception:
             logger.debug("Error in counter verifier process!")
             verification_done_queue.close()
             raise
         else:
-            tester.assertEqual(expected_count, actual_count, "Data did not match expected value!")
+            assert_column_values(columns, 'k1', 'c', expected_counts)
 
-            try:
-                verification_done_queue.put_nowait((key, actual_count))
-            except Full:
-                # the rewritable queue is full, not a big deal. drop this one.
-                # we keep the rewritable queue held to a modest max size
-                # and allow dropping some rewritables because we don't want to
-                # rewrite rows in the same sequence as originally written
-                pass
+            for key, actual_count in expected_counts.items():
+                try:
+                    verification_done_queue.put_nowait((key, actual_count))
+                except Full:
+                    # the rewritable queue is full, not a big deal. drop this one.
+                    # we keep the rewritable queue held to a modest max size
+                    # and allow dropping some rewritables because we don't want to
+                    # rewrite rows in the same sequence as originally written
+                    pass
 
 
 @pytest.mark.upgrade_test
@@ -531,24 +546,26 @@ class TestUpgrade(Tester):
 
         If time runs out, raises RuntimeError.
         """
-        wait_end_time = time.time() + max_wait_s
+        rate_limited_debug_logger = get_rate_limited_function(logger.debug, 30)
+        qsize = None
 
-        while time.time() < wait_end_time:
+        def condition_met():
+            nonlocal qsize
             try:
                 qsize = queue.qsize()
             except NotImplementedError:
                 logger.debug("Queue size may not be checkable on Mac OS X. Test will continue without waiting.")
-                break
+                return True
             if opfunc(qsize, required_len):
                 logger.debug("{} queue size ({}) is '{}' to {}. Continuing.".format(label, qsize, opfunc.__name__, required_len))
-                break
+                return True
 
-            if divmod(round(time.time()), 30)[1] == 0:
-                logger.debug("{} queue size is at {}, target is to reach '{}' {}".format(label, qsize, opfunc.__name__, required_len))
+            rate_limited_debug_logger("{} queue size is at {}, target is to reach '{}' {}".format(label, qsize, opfunc.__name__, required_len))
+            return False
 
-            time.sleep(0.1)
-            continue
-        else:
+        try:
+            wait_until(condition_met, timeout=max_wait_s, interval=0.05, max_interval=1)
+        except WaitTimeout:
             raise RuntimeError("Ran out of time waiting for queue size ({}) to be '{}' to {}. Aborting.".format(qsize, opfunc.__name__, required_len))
 
     def _start_continuous_write_and_verify(self, wait_for_rowcount=0, max_wait_s=600):
@@ -644,21 +661,17 @@ class TestUpgrade(Tester):
         session = self.patient_cql_connection(self.node2, protocol_version=self.protocol_version)
         session.execute("use upgrade;")
 
-        for key1 in list(self.expected_counts.keys()):
-            for key2 in list(self.expected_counts[key1].keys()):
-                expected_value = self.expected_counts[key1][key2]
-
-                query = SimpleStatement("SELECT c from countertable where k1='{key1}' and k2={key2};".format(key1=key1, key2=key2),
-                                        consistency_level=ConsistencyLevel.ONE)
-                results = session.execute(query)
+        # the table also holds the counters of the previous calls to _increment_counters, and the
+        # partitions may hold increments whose write timed out but was applied: only the tracked
+        # counters are compared
+        keys = ", ".join("'{}'".format(key1) for key1 in self.expected_counts)
+        query = SimpleStatement("SELECT k1, k2, c FROM countertable WHERE k1 IN ({});".format(keys),
+                                consistency_level=ConsistencyLevel.ONE)
+        columns = fetch_columns(session, query)
 
-                if results is not None:
-                    actual_value = results[0][0]
-                else:
-                    # counter wasn't found
-                    actual_value = None
-
-                assert actual_value == expected_value
+        expected = dict(((str(key1), key2), value)
+                        for key1, counts in self.expected_counts.items() for key2, value in counts.items())
+        assert_column_values(columns, ('k1', 'k2'), 'c', expected, ignore_unexpected=True)
 
     def _check_select_count(self, consistency_level=ConsistencyLevel.ALL):
         logger.debug("Checking SELECT COUNT(*)")
@@ -667,14 +680,8 @@ class TestUpgrade(Tester):
 
         expected_num_rows = len(self.row_values)
 
-        countquery = SimpleStatement("SELECT COUNT(*) FROM cf;", consistency_level=consistency_level)
-        result = session.execute(countquery)
-
-        if result is not None:
-            actual_num_rows = result[0][0]
-            assert actual_num_rows == expected_num_rows, "SELECT COUNT(*) returned %s when expecting %s" % (actual_num_rows, expected_num_rows)
-        else:
-            self.fail("Count query did not return")
+        actual_num_rows = TokenRangeScanner(session, 'upgrade', 'cf', consistency_level=consistency_level).count()
+        assert actual_num_rows == expected_num_rows, "SELECT COUNT(*) returned %s when expecting %s" % (actual_num_rows, expected_num_rows)
 
 class BootstrapMixin(object):
     """